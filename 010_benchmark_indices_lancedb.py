@@ -0,0 +1,7 @@
+import os
+from rag_dof.benchmark_indices import main
+
+# Benchmark de índices ANN de LanceDB (recall@k, latencia, tamaño).
+# Igual que 'rag-dof bench indices' en esta carpeta; el código está en rag_dof/benchmark_indices.py.
+if __name__ == "__main__":
+    main(directorio_base=os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,7 @@
+import os
+from rag_dof.consulta_lote import main
+
+# Recuperación por lotes sobre LanceDB a partir de un JSONL de preguntas.
+# Igual que 'rag-dof query --lote' en esta carpeta; el código está en rag_dof/consulta_lote.py.
+if __name__ == "__main__":
+    main(directorio_base=os.path.dirname(os.path.abspath(__file__)))
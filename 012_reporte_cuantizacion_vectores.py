@@ -0,0 +1,7 @@
+import os
+from rag_dof.reporte_cuantizacion import main
+
+# Reporte de tamaño y recall@k de vectores float32 / float16 / int8.
+# Igual que 'rag-dof bench cuantizacion' en esta carpeta; el código está en rag_dof/reporte_cuantizacion.py.
+if __name__ == "__main__":
+    main(directorio_base=os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,116 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from typing import List, Dict, Optional
+
+from ejecutar_bench import DIRECTORIO_REPO, DIRECTORIO_RESULTADOS, VERSION_FORMATO_RESULTADOS, percentil_ms, commit_actual, describir_entorno
+
+# --- Configuración ---
+# Tiempo de arranque con 'python -X importtime': cada script con --help (lo que tarda en importar antes de hacer nada
+# útil), un worker de la app web importando main.py y la carga de la tabla BPE desde cache_tiktoken/.
+# Cada medición es un proceso nuevo; se reporta la mediana de las repeticiones y qué módulos pesados quedaron importados.
+SCRIPTS_CLI = ("005_generar_resumenes_dof.py", "006_contar_tokens_dof.py", "007_crear_bd_lancedb_dof.py",
+               "008_consultar_bd_lancedb_terminal.py", "009_rag_dof_ollama_groq_deepseek.py", "010_benchmark_indices_lancedb.py",
+               "011_consulta_lote_lancedb.py", "012_reporte_cuantizacion_vectores.py")
+MODULOS_PESADOS = ("lancedb", "ollama", "groq", "tiktoken", "sklearn", "numpy", "pyarrow", "fastapi", "sentence_transformers")
+NUM_REPETICIONES = 5
+NUM_IMPORTACIONES_EN_REPORTE = 5
+PATRON_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+def analizar_importtime(salida_error: str) -> Dict:
+    """Suma de tiempos propios, módulos de primer nivel más costosos (acumulado) y módulos pesados importados."""
+    total_us, primer_nivel, importados = 0, [], set()
+    for linea in salida_error.splitlines():
+        m = PATRON_IMPORTTIME.match(linea)
+        if not m: continue
+        propio, acumulado, sangria, modulo = int(m.group(1)), int(m.group(2)), m.group(3), m.group(4)
+        total_us += propio; importados.add(modulo.split(".")[0])
+        if not sangria: primer_nivel.append((acumulado, modulo))
+    primer_nivel.sort(reverse=True)
+    return {"importaciones_ms": round(total_us / 1000, 1),
+            "mas_costosas": [{"modulo": modulo, "ms": round(us / 1000, 1)} for us, modulo in primer_nivel[:NUM_IMPORTACIONES_EN_REPORTE]],
+            "modulos_pesados": sorted(m for m in MODULOS_PESADOS if m in importados)}
+
+def medir_arranque(comando: List[str], cwd: str, repeticiones: int, entorno: Optional[Dict[str, str]] = None) -> Dict:
+    """Corre el comando con -X importtime 'repeticiones' veces; segundos de pared (p50/max) y el análisis de la última."""
+    segundos, analisis, error = [], {}, None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        proceso = subprocess.run([sys.executable, "-X", "importtime", *comando], cwd=cwd, env=entorno, capture_output=True, text=True)
+        segundos.append(time.perf_counter() - inicio)
+        if proceso.returncode != 0:
+            lineas_error = [l for l in proceso.stderr.strip().splitlines() if not l.startswith("import time:")]
+            error = (lineas_error or [f"código {proceso.returncode}"])[-1]; break
+        analisis = analizar_importtime(proceso.stderr)
+    resultado = {"segundos_p50": round(percentil_ms(segundos, 50) / 1000, 3), "segundos_max": round(max(segundos), 3), **analisis}
+    if error: resultado["error"] = error
+    return resultado
+
+def generar_proyecto_web(trabajo: str) -> str:
+    directorio_web = os.path.join(trabajo, "web")
+    os.makedirs(directorio_web)
+    subprocess.run([sys.executable, os.path.join(DIRECTORIO_REPO, "setup_web_project.py")], cwd=directorio_web, check=True,
+                   stdout=subprocess.DEVNULL)
+    return directorio_web
+
+# Métricas que se comparan entre corridas (ver comparar_resultados.py): nombre -> True si mayor es mejor
+METRICAS_PRINCIPALES = {
+    "cli_008.segundos_p50": False, "cli_009.segundos_p50": False, "cli_007.segundos_p50": False,
+    "web_worker.segundos_p50": False, "tokenizador.segundos_p50": False,
+}
+
+def ejecutar_medicion(args) -> Dict:
+    metricas = {}
+    scripts = [s for s in SCRIPTS_CLI if not args.scripts or s[:3] in args.scripts.split(",")]
+    for script in scripts:
+        nombre = f"cli_{script[:3]}"
+        metricas[nombre] = medir_arranque([script, "--help"], DIRECTORIO_REPO, args.repeticiones)
+        print(f"[{nombre}] {json.dumps(metricas[nombre], ensure_ascii=False)}", flush=True)
+    # La tabla BPE se lee de cache_tiktoken/ (python -m rag_dof.tokenizador la deja lista); sin ella, queda el error
+    metricas["tokenizador"] = medir_arranque(["-c", "from rag_dof.tokenizador import precargar_codificaciones; precargar_codificaciones()"],
+                                             DIRECTORIO_REPO, args.repeticiones)
+    print(f"[tokenizador] {json.dumps(metricas['tokenizador'], ensure_ascii=False)}", flush=True)
+    if not args.sin_web:
+        trabajo = tempfile.mkdtemp(prefix="arranque_rag_dof_")
+        try:
+            # Lo que hace cada worker de uvicorn antes del lifespan: importar main.py y con él core/
+            metricas["web_worker"] = medir_arranque(["-c", "import main"], generar_proyecto_web(trabajo), args.repeticiones)
+            print(f"[web_worker] {json.dumps(metricas['web_worker'], ensure_ascii=False)}", flush=True)
+        finally:
+            shutil.rmtree(trabajo, ignore_errors=True)
+    return {
+        "version_formato": VERSION_FORMATO_RESULTADOS,
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        **commit_actual(),
+        "entorno": describir_entorno(),
+        "parametros": {c: v for c, v in vars(args).items() if c != "salida"},
+        "metricas": metricas,
+        "metricas_principales": dict(METRICAS_PRINCIPALES),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mide el arranque de los scripts y de un worker web con 'python -X importtime'.")
+    parser.add_argument("--repeticiones", type=int, default=NUM_REPETICIONES, help="Procesos por medición (se reporta la mediana).")
+    parser.add_argument("--scripts", default="", help="Prefijos separados por comas (p. ej. 008,009); por defecto todos.")
+    parser.add_argument("--sin-web", action="store_true", help="No generar el proyecto web ni medir el arranque del worker.")
+    parser.add_argument("--salida", default="", help="Archivo JSON de resultados (por defecto bench/resultados/arranque_<fecha>_<commit>.json).")
+    args = parser.parse_args()
+
+    resultados = ejecutar_medicion(args)
+    ruta_salida = args.salida
+    if not ruta_salida:
+        os.makedirs(DIRECTORIO_RESULTADOS, exist_ok=True)
+        sello = datetime.now().strftime("%Y%m%d_%H%M%S")
+        ruta_salida = os.path.join(DIRECTORIO_RESULTADOS, f"arranque_{sello}_{(resultados['commit'] or 'sin_git')[:10]}.json")
+    with open(ruta_salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados guardados en: {ruta_salida}")
+    print(f"Comparar con otra corrida: python bench/comparar_resultados.py <base.json> {ruta_salida}")
@@ -0,0 +1,217 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import importlib.util
+from datetime import datetime, timezone
+from typing import List, Dict, Tuple
+import httpx
+
+import corpus_sintetico
+from servidores_locales import ManejadorOllama, ManejadorGroq, iniciar_servidor, detener_servidor
+from ejecutar_bench import (DIRECTORIO_REPO, DIRECTORIO_RESULTADOS, VERSION_FORMATO_RESULTADOS, cargar_etapa, salida_silenciada,
+                            percentil_ms, por_segundo, commit_actual, describir_entorno)
+
+# --- Configuración ---
+# Prueba de carga de la aplicación web (setup_web_project.py) con solicitudes concurrentes contra Ollama y Groq falsos.
+# Cada escenario se corre con y sin COALESCER_PREGUNTAS_EN_VUELO: con preguntas idénticas en curso, la coalescencia
+# debe bajar las llamadas a Groq y a Ollama a una por grupo sin empeorar la latencia; con preguntas distintas no cambia nada.
+MODOS = {"coalescida": True, "sin_coalescer": False}
+ESCENARIOS = ("identicas_stream", "identicas_chat", "distintas_stream")
+NUM_SOLICITUDES_CONCURRENTES = 32
+SEGUNDOS_MAX_ARRANQUE_SERVIDOR = 60
+# El límite de Groq lo aplica el servidor falso (--groq-rpm/--groq-tpm); el limitador de la app no debe frenar la prueba.
+# Sin caché compartida: los modos repiten las mismas preguntas y se mide la coalescencia, no las respuestas guardadas.
+AJUSTES_CONFIG_WEB = {"LIMITE_SOLICITUDES_POR_MINUTO_GROQ": 10 ** 9, "LIMITE_TOKENS_POR_MINUTO_PROCESADOS_GROQ": 10 ** 12,
+                      "MAX_CONTEXTO_TOTAL_PARA_GENERACION": 5100, "ARCHIVO_TRAZAS_JSONL": None, "USAR_CACHE_COMPARTIDA": False}
+
+def variantes_pregunta(pregunta: str, n: int) -> List[str]:
+    """La misma pregunta escrita de formas que la normalización considera iguales (mayúsculas, signos, espacios)."""
+    formas = [pregunta, pregunta.upper(), "  " + pregunta.rstrip("?") + " ", pregunta.lower().replace("¿", "")]
+    return [formas[i % len(formas)] for i in range(n)]
+
+def ajustar_config_web(ruta_config: str, valores: Dict):
+    """Reemplaza 'NOMBRE = ...' en el core/config.py generado."""
+    with open(ruta_config, "r", encoding="utf-8") as f: contenido = f.read()
+    for nombre, valor in valores.items():
+        contenido, reemplazos = re.subn(rf"^{nombre} = .*$", f"{nombre} = {valor!r}", contenido, flags=re.M)
+        if not reemplazos: raise ValueError(f"{nombre} no está en {ruta_config}")
+    with open(ruta_config, "w", encoding="utf-8") as f: f.write(contenido)
+
+def cargar_config_web(directorio_web: str):
+    if DIRECTORIO_REPO not in sys.path: sys.path.insert(0, DIRECTORIO_REPO) # core/config.py importa el paquete rag_dof
+    spec = importlib.util.spec_from_file_location("config_web_bench", os.path.join(directorio_web, "core", "config.py"))
+    modulo = importlib.util.module_from_spec(spec)
+    with salida_silenciada(): spec.loader.exec_module(modulo)
+    return modulo
+
+def preparar_proyecto_web(trabajo: str, documentos: List[Dict], args) -> str:
+    """Genera el proyecto con setup_web_project.py y llena su tabla de LanceDB con el corpus sintético usando 007."""
+    directorio_web = os.path.join(trabajo, "web")
+    os.makedirs(directorio_web)
+    subprocess.run([sys.executable, os.path.join(DIRECTORIO_REPO, "setup_web_project.py")], cwd=directorio_web, check=True,
+                   stdout=subprocess.DEVNULL)
+    config_web = cargar_config_web(directorio_web)
+    corpus_sintetico.escribir_corpus_txt(documentos, config_web.DECRETOS_COLECTADOS_DIR)
+    modulo_007 = cargar_etapa("indexado")
+    with salida_silenciada(not args.verbose):
+        modulo_007.crear_base_de_datos_lance(config_web.DECRETOS_COLECTADOS_DIR, config_web.LANCEDB_TABLE_NAME_DEFAULT,
+                                             directorio_bd_lance=config_web.LANCEDB_DIR,
+                                             ruta_config_busqueda=os.path.join(trabajo, "config_busqueda_lancedb.json"))
+    return directorio_web
+
+def puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0)); return s.getsockname()[1]
+
+def iniciar_app_web(directorio_web: str, entorno: Dict[str, str], verbose: bool) -> Tuple[subprocess.Popen, str]:
+    puerto = puerto_libre()
+    proceso = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(puerto), "--log-level", "warning"],
+                               cwd=directorio_web, env=entorno, stdout=None if verbose else subprocess.DEVNULL, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{puerto}"
+    limite = time.time() + SEGUNDOS_MAX_ARRANQUE_SERVIDOR
+    while time.time() < limite:
+        if proceso.poll() is not None: raise RuntimeError(f"La app web terminó al arrancar (código {proceso.returncode})")
+        try:
+            if httpx.get(url + "/metrics", timeout=1.0).status_code == 200: return proceso, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proceso.terminate(); raise RuntimeError("La app web no respondió a tiempo")
+
+async def solicitud_stream(cliente: httpx.AsyncClient, url: str, pregunta: str) -> Dict:
+    inicio = time.perf_counter(); primer_token = None; evento = ""; fin = {}
+    async with cliente.stream("GET", url + "/api/rag/stream", params={"q": pregunta}) as respuesta:
+        async for linea in respuesta.aiter_lines():
+            if linea.startswith("event: "): evento = linea[7:]
+            elif linea.startswith("data: "):
+                if evento == "token" and primer_token is None: primer_token = time.perf_counter() - inicio
+                elif evento == "fin": fin = json.loads(linea[6:])
+                elif evento == "error": return {"error": json.loads(linea[6:])}
+    return {"latencia": time.perf_counter() - inicio, "primer_token": primer_token, "coalescida": bool(fin.get("coalescida")),
+            "error": None if fin else "sin evento 'fin'"}
+
+async def solicitud_chat(cliente: httpx.AsyncClient, url: str, pregunta: str) -> Dict:
+    inicio = time.perf_counter()
+    respuesta = await cliente.post(url + "/rag-chat", data={"query_text_rag": pregunta})
+    if respuesta.status_code != 200: error = f"HTTP {respuesta.status_code}"
+    else: error = "la página muestra un error" if 'class="error"' in respuesta.text else None
+    return {"latencia": time.perf_counter() - inicio, "primer_token": None, "coalescida": False, "error": error}
+
+def preguntas_escenario(escenario: str, preguntas: List[str], n: int) -> List[str]:
+    """'identicas_*': n variantes de una pregunta propia del escenario; 'distintas_*': n preguntas con claves distintas."""
+    if escenario.startswith("identicas"): return variantes_pregunta(preguntas[ESCENARIOS.index(escenario) % len(preguntas)], n)
+    return [f"{preguntas[i % len(preguntas)]} (consulta {i + 1})" for i in range(n)]
+
+async def ejecutar_escenario(url: str, escenario: str, lista: List[str]) -> Tuple[List[Dict], float]:
+    funcion = solicitud_chat if escenario.endswith("_chat") else solicitud_stream
+    n = len(lista)
+    async with httpx.AsyncClient(timeout=300.0, limits=httpx.Limits(max_connections=n)) as cliente:
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*[funcion(cliente, url, p) for p in lista], return_exceptions=True)
+        segundos = time.perf_counter() - inicio
+    return [r if isinstance(r, dict) else {"error": f"{type(r).__name__}: {r}"} for r in resultados], segundos
+
+def resumir_escenario(resultados: List[Dict], segundos: float, contadores_antes: Dict, contadores_despues: Dict) -> Dict:
+    correctas = [r for r in resultados if not r.get("error")]
+    latencias = [r["latencia"] for r in correctas]
+    primeros_tokens = [r["primer_token"] for r in correctas if r.get("primer_token") is not None]
+    return {"solicitudes": len(resultados), "errores": len(resultados) - len(correctas), "segundos": round(segundos, 3),
+            "solicitudes_por_s": por_segundo(len(correctas), segundos),
+            "latencia_p50_ms": percentil_ms(latencias, 50), "latencia_p99_ms": percentil_ms(latencias, 99),
+            "primer_token_p50_ms": percentil_ms(primeros_tokens, 50),
+            "coalescidas": sum(1 for r in correctas if r.get("coalescida")),
+            "llamadas_groq": contadores_despues["groq"] - contadores_antes["groq"],
+            "embeddings_ollama": contadores_despues["ollama"] - contadores_antes["ollama"]}
+
+# Métricas que se comparan entre corridas (ver comparar_resultados.py): nombre -> True si mayor es mejor
+METRICAS_PRINCIPALES = {
+    "coalescida_identicas_stream.llamadas_groq": False, "coalescida_identicas_stream.latencia_p99_ms": False,
+    "coalescida_identicas_chat.latencia_p99_ms": False, "coalescida_distintas_stream.latencia_p99_ms": False,
+    "coalescida_distintas_stream.solicitudes_por_s": True,
+}
+
+def ejecutar_prueba_carga(args) -> Dict:
+    trabajo = tempfile.mkdtemp(prefix="carga_web_rag_dof_")
+    documentos = corpus_sintetico.generar_documentos(args.documentos, args.semilla, args.palabras)
+    preguntas = list(dict.fromkeys(corpus_sintetico.generar_preguntas(documentos, args.solicitudes, args.semilla)))
+    servidor_ollama, url_ollama = iniciar_servidor(ManejadorOllama, dimension=args.dim, latencia_ms=args.embed_latencia_ms)
+    servidor_groq, url_groq = iniciar_servidor(ManejadorGroq, latencia_primer_token_ms=args.groq_primer_token_ms,
+                                               ms_por_token=args.groq_ms_por_token, tokens_respuesta=args.groq_tokens_respuesta,
+                                               limite_solicitudes_por_minuto=args.groq_rpm, limite_tokens_por_minuto=args.groq_tpm)
+    # El cliente por defecto de ollama lee OLLAMA_HOST al importarse (007 en este proceso, la app en el suyo)
+    os.environ["OLLAMA_HOST"] = url_ollama
+    entorno_app = dict(os.environ, OLLAMA_HOST=url_ollama, GROQ_BASE_URL=url_groq, GROQ_API_KEY="bench")
+    def contadores() -> Dict[str, int]:
+        return {"groq": servidor_groq.RequestHandlerClass.contadores.get("solicitudes", 0),
+                "ollama": servidor_ollama.RequestHandlerClass.contadores.get("textos", 0)}
+    metricas: Dict[str, Dict] = {}
+    try:
+        print("[preparacion] generando el proyecto web e ingiriendo el corpus...", flush=True)
+        directorio_web = preparar_proyecto_web(trabajo, documentos, args)
+        for modo, coalescer in MODOS.items():
+            if args.modos and modo not in args.modos.split(","): continue
+            ajustar_config_web(os.path.join(directorio_web, "core", "config.py"),
+                               dict(AJUSTES_CONFIG_WEB, COALESCER_PREGUNTAS_EN_VUELO=coalescer, MODO_RERANKING=args.reranking))
+            proceso, url = iniciar_app_web(directorio_web, entorno_app, args.verbose)
+            try:
+                asyncio.run(ejecutar_escenario(url, "distintas_stream", ["calentamiento"])) # Tabla abierta y conexiones listas
+                for escenario in ESCENARIOS:
+                    antes = contadores()
+                    resultados, segundos = asyncio.run(ejecutar_escenario(url, escenario, preguntas_escenario(escenario, preguntas, args.solicitudes)))
+                    metricas[f"{modo}_{escenario}"] = resumir_escenario(resultados, segundos, antes, contadores())
+                    print(f"[{modo}_{escenario}] {json.dumps(metricas[f'{modo}_{escenario}'], ensure_ascii=False)}", flush=True)
+            finally:
+                proceso.terminate(); proceso.wait(timeout=30)
+    finally:
+        for servidor in (servidor_ollama, servidor_groq): detener_servidor(servidor)
+        if args.conservar: print(f"Directorio de trabajo conservado: {trabajo}")
+        else: shutil.rmtree(trabajo, ignore_errors=True)
+
+    return {
+        "version_formato": VERSION_FORMATO_RESULTADOS,
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        **commit_actual(),
+        "entorno": describir_entorno(),
+        "parametros": {c: v for c, v in vars(args).items() if c not in ("salida", "verbose", "conservar")},
+        "servidores": {"ollama": servidor_ollama.RequestHandlerClass.contadores, "groq": servidor_groq.RequestHandlerClass.contadores},
+        "metricas": metricas,
+        "metricas_principales": dict(METRICAS_PRINCIPALES),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga de la app web con solicitudes concurrentes (con y sin coalescencia).")
+    parser.add_argument("--solicitudes", type=int, default=NUM_SOLICITUDES_CONCURRENTES, help="Solicitudes concurrentes por escenario.")
+    parser.add_argument("--modos", default="", help=f"Lista separada por comas; por defecto todos: {','.join(MODOS)}")
+    parser.add_argument("--documentos", type=int, default=50, help="Notas en el corpus sintético.")
+    parser.add_argument("--palabras", type=int, default=corpus_sintetico.PALABRAS_PROMEDIO_POR_DOCUMENTO, help="Palabras promedio por nota.")
+    parser.add_argument("--semilla", type=int, default=corpus_sintetico.SEMILLA_CORPUS)
+    parser.add_argument("--dim", type=int, default=1024, help="Dimensión del embedder falso.")
+    parser.add_argument("--reranking", default="ninguno", help="MODO_RERANKING de la app durante la prueba.")
+    parser.add_argument("--embed-latencia-ms", type=float, default=20.0, help="Latencia por solicitud del Ollama falso.")
+    parser.add_argument("--groq-primer-token-ms", type=float, default=300.0)
+    parser.add_argument("--groq-ms-por-token", type=float, default=5.0)
+    parser.add_argument("--groq-tokens-respuesta", type=int, default=200)
+    parser.add_argument("--groq-rpm", type=int, default=0, help="Límite de solicitudes/min del Groq falso (0 = sin límite).")
+    parser.add_argument("--groq-tpm", type=int, default=0, help="Límite de tokens/min del Groq falso (0 = sin límite).")
+    parser.add_argument("--salida", default="", help="Archivo JSON de resultados (por defecto bench/resultados/carga_web_<fecha>_<commit>.json).")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar la salida de 007 y de la app web.")
+    parser.add_argument("--conservar", action="store_true", help="No borrar el directorio de trabajo temporal.")
+    args = parser.parse_args()
+
+    resultados = ejecutar_prueba_carga(args)
+    ruta_salida = args.salida
+    if not ruta_salida:
+        os.makedirs(DIRECTORIO_RESULTADOS, exist_ok=True)
+        sello = datetime.now().strftime("%Y%m%d_%H%M%S")
+        ruta_salida = os.path.join(DIRECTORIO_RESULTADOS, f"carga_web_{sello}_{(resultados['commit'] or 'sin_git')[:10]}.json")
+    with open(ruta_salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados guardados en: {ruta_salida}")
@@ -0,0 +1,62 @@
+import sys
+import json
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+# --- Configuración ---
+TOLERANCIA_REGRESION = 0.10 # Empeorar más de un 10% en una métrica principal cuenta como regresión
+
+def cargar_resultados(ruta: str) -> Dict:
+    with open(ruta, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def obtener_metrica(resultados: Dict, nombre: str) -> Optional[float]:
+    """'etapa.metrica' -> valor numérico, o None si la etapa se omitió o la métrica no existe."""
+    etapa, _, metrica = nombre.partition(".")
+    valor = resultados.get("metricas", {}).get(etapa, {}).get(metrica)
+    return float(valor) if isinstance(valor, (int, float)) else None
+
+def comparar(base: Dict, nueva: Dict, tolerancia: float = TOLERANCIA_REGRESION) -> Tuple[List[Dict], List[str]]:
+    """Devuelve (filas de la tabla, advertencias). Cada fila marca 'regresion' si la métrica empeoró más que la tolerancia."""
+    advertencias = []
+    if base.get("parametros") != nueva.get("parametros"):
+        advertencias.append("Los parámetros del benchmark difieren entre corridas; la comparación puede no ser válida.")
+    if base.get("entorno", {}).get("cpus") != nueva.get("entorno", {}).get("cpus"):
+        advertencias.append("Las corridas se hicieron en máquinas con distinto número de CPUs.")
+    if nueva.get("cambios_sin_commit"):
+        advertencias.append("La corrida nueva tenía cambios sin commit.")
+
+    metricas = dict(base.get("metricas_principales", {}), **nueva.get("metricas_principales", {}))
+    filas = []
+    for nombre, mayor_es_mejor in metricas.items():
+        valor_base, valor_nuevo = obtener_metrica(base, nombre), obtener_metrica(nueva, nombre)
+        if valor_base is None or valor_nuevo is None or valor_base == 0:
+            filas.append({"metrica": nombre, "base": valor_base, "nueva": valor_nuevo, "cambio": None, "regresion": False}); continue
+        cambio = (valor_nuevo - valor_base) / valor_base
+        empeora = -cambio if mayor_es_mejor else cambio
+        filas.append({"metrica": nombre, "base": valor_base, "nueva": valor_nuevo, "cambio": cambio, "regresion": empeora > tolerancia})
+    return filas, advertencias
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara dos resultados de bench/ejecutar_bench.py y señala regresiones.")
+    parser.add_argument("base", help="JSON de referencia (p.ej. el del commit desplegado).")
+    parser.add_argument("nueva", help="JSON de la corrida a evaluar.")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_REGRESION, help="Fracción de empeoramiento tolerada (0.10 = 10%%).")
+    args = parser.parse_args()
+
+    resultados_base, resultados_nueva = cargar_resultados(args.base), cargar_resultados(args.nueva)
+    filas_comparacion, advertencias_comparacion = comparar(resultados_base, resultados_nueva, args.tolerancia)
+    print(f"Base : {resultados_base.get('commit', '')[:10]} ({resultados_base.get('fecha', '')})")
+    print(f"Nueva: {resultados_nueva.get('commit', '')[:10]} ({resultados_nueva.get('fecha', '')})")
+    for advertencia in advertencias_comparacion: print(f"Advertencia: {advertencia}")
+    print(f"\n{'métrica':<34} {'base':>12} {'nueva':>12} {'cambio':>9}")
+    for fila in filas_comparacion:
+        formato = lambda v: f"{v:>12.3f}" if v is not None else f"{'-':>12}"
+        cambio = f"{fila['cambio'] * 100:>+8.1f}%" if fila["cambio"] is not None else f"{'-':>9}"
+        print(f"{fila['metrica']:<34} {formato(fila['base'])} {formato(fila['nueva'])} {cambio}{'  <-- REGRESIÓN' if fila['regresion'] else ''}")
+    regresiones = [f["metrica"] for f in filas_comparacion if f["regresion"]]
+    if regresiones:
+        print(f"\n{len(regresiones)} regresión(es) por encima de {args.tolerancia:.0%}: {', '.join(regresiones)}")
+        sys.exit(1)
+    print(f"\nSin regresiones por encima de {args.tolerancia:.0%}.")
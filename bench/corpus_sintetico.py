@@ -0,0 +1,111 @@
+import os
+import random
+from typing import List, Dict
+
+# --- Configuración ---
+# Notas con la misma forma que las del DOF: encabezado con la dependencia, título con el tipo de documento,
+# considerandos, artículos y transitorios. Todo sale de una semilla, así que dos corridas generan el mismo corpus.
+SEMILLA_CORPUS = 42
+NUM_DOCUMENTOS = 200
+PALABRAS_PROMEDIO_POR_DOCUMENTO = 1500
+CODIGO_DOF_INICIAL = 5700000
+
+DEPENDENCIAS = [
+    "SECRETARIA DE HACIENDA Y CREDITO PUBLICO", "SECRETARIA DE GOBERNACION", "SECRETARIA DE ECONOMIA",
+    "SECRETARIA DE ENERGIA", "SECRETARIA DE SALUD", "SECRETARIA DE EDUCACION PUBLICA",
+    "SECRETARIA DE MEDIO AMBIENTE Y RECURSOS NATURALES", "SECRETARIA DE AGRICULTURA Y DESARROLLO RURAL",
+    "SECRETARIA DEL TRABAJO Y PREVISION SOCIAL", "BANCO DE MEXICO", "INSTITUTO NACIONAL ELECTORAL",
+]
+TIPOS_DOCUMENTO = ["DECRETO", "ACUERDO", "AVISO", "LINEAMIENTOS", "RESOLUCION", "NORMA OFICIAL MEXICANA", "CONVENIO", "REGLAS"]
+TEMAS = [
+    "aranceles de importación de acero", "tipo de cambio para solventar obligaciones", "etiquetado de alimentos y bebidas",
+    "programa de apoyo a productores de maíz", "tarifas eléctricas para uso doméstico", "calendario escolar del ciclo lectivo",
+    "vacunación contra la influenza estacional", "áreas naturales protegidas", "salario mínimo general",
+    "padrón de contribuyentes", "estímulos fiscales a combustibles", "registro de asociaciones religiosas",
+    "protección de datos personales", "comercio exterior de hidrocarburos", "verificación de emisiones vehiculares",
+    "becas para estudiantes de educación media superior", "inspección de centros de trabajo", "lineamientos de austeridad",
+]
+FRASES_CONSIDERANDO = [
+    "Que el Plan Nacional de Desarrollo establece como prioridad {tema}",
+    "Que es necesario actualizar las disposiciones aplicables en materia de {tema}",
+    "Que la Ley Federal de Procedimiento Administrativo dispone la publicación de los actos en materia de {tema}",
+    "Que con fecha reciente se sometió a consulta pública el proyecto relativo a {tema}",
+    "Que corresponde a esta dependencia emitir las reglas de operación sobre {tema}",
+]
+FRASES_ARTICULO = [
+    "Se reforman las disposiciones relativas a {tema} conforme a lo previsto en el presente instrumento",
+    "Las unidades administrativas deberán observar los plazos establecidos para {tema}",
+    "Los sujetos obligados presentarán la información correspondiente a {tema} dentro de los treinta días hábiles siguientes",
+    "La interpretación del presente ordenamiento en lo referente a {tema} corresponde a la unidad de asuntos jurídicos",
+    "Se deroga cualquier disposición que se oponga a lo establecido en materia de {tema}",
+    "El monto de los apoyos para {tema} se determinará conforme a la disponibilidad presupuestaria",
+]
+RELLENO = ("en términos de lo dispuesto por los artículos aplicables de la Constitución Política de los Estados Unidos "
+           "Mexicanos y de la Ley Orgánica de la Administración Pública Federal, así como de las demás disposiciones "
+           "jurídicas aplicables, con el fin de garantizar la certeza jurídica de los particulares").split()
+ORDINALES = ["PRIMERO", "SEGUNDO", "TERCERO", "CUARTO", "QUINTO", "SEXTO", "SÉPTIMO", "OCTAVO", "NOVENO", "DÉCIMO"]
+
+def generar_parrafo(rng: random.Random, plantillas: List[str], tema: str, palabras_objetivo: int) -> str:
+    oracion = rng.choice(plantillas).format(tema=tema)
+    palabras_relleno = max(0, palabras_objetivo - len(oracion.split()))
+    inicio = rng.randrange(len(RELLENO))
+    relleno = [RELLENO[(inicio + i) % len(RELLENO)] for i in range(palabras_relleno)]
+    return (oracion + ", " + " ".join(relleno)).rstrip(", ") + "."
+
+def generar_documento(rng: random.Random, indice: int, palabras_promedio: int) -> Dict:
+    """Una nota del DOF: dict con codigo, fecha (dd/mm/aaaa), titulo, dependencia, tema y contenido."""
+    dependencia = rng.choice(DEPENDENCIAS)
+    tipo = rng.choice(TIPOS_DOCUMENTO)
+    tema = rng.choice(TEMAS)
+    fecha = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(2019, 2025)}"
+    # Títulos únicos: 004 nombra el .txt a partir del título
+    titulo = f"{tipo} por el que se emiten disposiciones en materia de {tema} (folio {indice + 1})"
+    palabras_objetivo = max(200, int(rng.lognormvariate(0, 0.5) * palabras_promedio))
+
+    partes = [dependencia, titulo.upper(), "CONSIDERANDO"]
+    palabras = 0
+    while palabras < palabras_objetivo * 0.3:
+        parrafo = generar_parrafo(rng, FRASES_CONSIDERANDO, tema, rng.randint(40, 90))
+        partes.append(parrafo); palabras += len(parrafo.split())
+    partes.append("Por lo anterior, he tenido a bien expedir el siguiente")
+    numero_articulo = 1
+    while palabras < palabras_objetivo * 0.9:
+        parrafo = generar_parrafo(rng, FRASES_ARTICULO, tema, rng.randint(30, 120))
+        partes.append(f"ARTÍCULO {numero_articulo}.- {parrafo}"); palabras += len(parrafo.split()); numero_articulo += 1
+    partes.append("TRANSITORIOS")
+    for ordinal in ORDINALES[:rng.randint(1, 4)]:
+        partes.append(f"{ordinal}.- " + generar_parrafo(rng, FRASES_ARTICULO, tema, rng.randint(15, 40)))
+    partes.append(f"Dado en la Ciudad de México, a {fecha}.- Rúbrica.")
+    return {"codigo": str(CODIGO_DOF_INICIAL + indice), "fecha": fecha, "titulo": titulo, "dependencia": dependencia,
+            "tema": tema, "contenido": "\n\n".join(partes)}
+
+def generar_documentos(n: int = NUM_DOCUMENTOS, semilla: int = SEMILLA_CORPUS,
+                       palabras_promedio: int = PALABRAS_PROMEDIO_POR_DOCUMENTO) -> List[Dict]:
+    rng = random.Random(semilla)
+    return [generar_documento(rng, i, palabras_promedio) for i in range(n)]
+
+def url_nota(documento: Dict, url_base: str = "https://dof.gob.mx") -> str:
+    return f"{url_base}/nota_detalle.php?codigo={documento['codigo']}&fecha={documento['fecha']}"
+
+def escribir_corpus_txt(documentos: List[Dict], carpeta: str) -> int:
+    """Escribe los documentos con el mismo formato que 004 (URL, TÍTULO ORIGINAL, CONTENIDO), listos para 005-007."""
+    os.makedirs(carpeta, exist_ok=True)
+    for documento in documentos:
+        nombre_archivo = f"{documento['codigo']}.txt"
+        with open(os.path.join(carpeta, nombre_archivo), "w", encoding="utf-8") as f_txt:
+            f_txt.write(f"URL: {url_nota(documento)}\n")
+            f_txt.write(f"TÍTULO ORIGINAL: {documento['titulo']}\n\n")
+            f_txt.write("-------------------- CONTENIDO --------------------\n\n")
+            f_txt.write(documento["contenido"])
+    return len(documentos)
+
+def generar_preguntas(documentos: List[Dict], n: int, semilla: int = SEMILLA_CORPUS) -> List[str]:
+    """Preguntas sobre los temas del corpus, para que la recuperación tenga fragmentos relevantes que encontrar."""
+    rng = random.Random(semilla + 1)
+    plantillas = ["¿Qué establece el {tipo} sobre {tema}?", "¿Cuáles son los plazos en materia de {tema}?",
+                  "¿Qué dependencia publicó disposiciones sobre {tema}?", "Resume las obligaciones relativas a {tema}"]
+    preguntas = []
+    for _ in range(n):
+        documento = rng.choice(documentos)
+        preguntas.append(rng.choice(plantillas).format(tipo=documento["titulo"].split(" ", 1)[0].lower(), tema=documento["tema"]))
+    return preguntas
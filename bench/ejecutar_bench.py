@@ -0,0 +1,282 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+import importlib.util
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime, timezone
+from typing import List, Dict, Optional
+import numpy as np
+
+import corpus_sintetico
+from servidores_locales import ManejadorDOF, ManejadorOllama, ManejadorGroq, iniciar_servidor, detener_servidor
+
+# --- Configuración ---
+# Benchmark de punta a punta con sustitutos locales: el DOF, Ollama y Groq son servidores HTTP en 127.0.0.1,
+# así que dos corridas con los mismos parámetros miden el mismo trabajo y se pueden comparar entre commits.
+DIRECTORIO_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRECTORIO_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+VERSION_FORMATO_RESULTADOS = 1
+ETAPAS = ("scrape", "descarga", "fragmentado", "embeddings", "ingesta", "consultas", "rag")
+TERMINO_BUSQUEDA_BENCH = "decreto"
+NOMBRE_TABLA_BENCH = "bench"
+NUM_CONSULTAS = 100
+NUM_CONSULTAS_CALENTAMIENTO = 3
+NUM_EMBEDDINGS = 300
+NUM_RESPUESTAS_RAG = 20
+
+def cargar_etapa(nombre_modulo: str):
+    """Importa el módulo de una etapa del paquete (p.ej. 'indexado', el de 007); el benchmark ajusta sus constantes."""
+    if DIRECTORIO_REPO not in sys.path: sys.path.insert(0, DIRECTORIO_REPO) # El rag_dof del repo, aunque no esté instalado
+    return importlib.import_module("rag_dof." + nombre_modulo)
+
+@contextmanager
+def salida_silenciada(activa: bool = True):
+    """Los scripts imprimen una o más líneas por elemento; en el benchmark solo interesa el resumen."""
+    if not activa: yield; return
+    with redirect_stdout(io.StringIO()): yield
+
+def percentil_ms(latencias_s: List[float], p: float) -> Optional[float]:
+    return round(float(np.percentile(latencias_s, p)) * 1000, 3) if latencias_s else None
+
+def por_segundo(cantidad: int, segundos: float) -> Optional[float]:
+    return round(cantidad / segundos, 3) if segundos > 0 else None
+
+def commit_actual() -> Dict:
+    def git(*args) -> str:
+        try: return subprocess.run(["git", *args], cwd=DIRECTORIO_REPO, capture_output=True, text=True, timeout=30).stdout.strip()
+        except Exception: return ""
+    return {"commit": git("rev-parse", "HEAD"), "rama": git("rev-parse", "--abbrev-ref", "HEAD"),
+            "cambios_sin_commit": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+def describir_entorno() -> Dict:
+    versiones = {}
+    for paquete in ("lancedb", "pyarrow", "numpy", "tiktoken", "ollama", "groq", "playwright"):
+        try:
+            from importlib.metadata import version
+            versiones[paquete] = version(paquete)
+        except Exception:
+            versiones[paquete] = None
+    return {"python": platform.python_version(), "plataforma": platform.platform(), "cpus": os.cpu_count(), "paquetes": versiones}
+
+# --- Etapas ---
+def etapa_scrape(args, trabajo: str, url_dof: str, servidor_dof) -> Dict:
+    modulo = cargar_etapa("recoleccion")
+    modulo.BASE_URL = url_dof + "/"
+    inicio = time.perf_counter()
+    modulo.buscar_en_dof_con_paginacion(TERMINO_BUSQUEDA_BENCH, "resultados_bench.csv", args.documentos)
+    segundos = time.perf_counter() - inicio
+    paginas = servidor_dof.RequestHandlerClass.contadores.get("resultados", 0)
+    return {"paginas": paginas, "segundos": round(segundos, 3), "paginas_por_s": por_segundo(paginas, segundos)}
+
+def etapa_descarga(args, trabajo: str) -> Dict:
+    if not os.path.exists(os.path.join(trabajo, "resultados_bench.csv")):
+        return {"omitida": "no hay CSV de la etapa scrape"}
+    modulo = cargar_etapa("descarga")
+    modulo.MIN_DELAY_SECONDS = modulo.MAX_DELAY_SECONDS = 0.0 # El retardo de cortesía no es parte del costo a medir
+    inicio = time.perf_counter()
+    modulo.procesar_urls_y_guardar_contenido("resultados_bench.csv", TERMINO_BUSQUEDA_BENCH)
+    segundos = time.perf_counter() - inicio
+    carpeta = os.path.join(trabajo, modulo.sanitizar_nombre(TERMINO_BUSQUEDA_BENCH, es_carpeta=True) + "_colectados")
+    notas = len([n for n in os.listdir(carpeta) if n.endswith(".txt")]) if os.path.isdir(carpeta) else 0
+    return {"notas": notas, "segundos": round(segundos, 3), "notas_por_s": por_segundo(notas, segundos)}
+
+def etapa_fragmentado(args, modulo_007, documentos: List[Dict]) -> Dict:
+    inicio = time.perf_counter()
+    fragmentos = [f for d in documentos for f, _ in modulo_007.fragmentar_documento(d["contenido"], modulo_007.MODO_FRAGMENTACION)]
+    segundos = time.perf_counter() - inicio
+    return {"fragmentos": len(fragmentos), "segundos": round(segundos, 3), "fragmentos_por_s": por_segundo(len(fragmentos), segundos),
+            "_fragmentos": fragmentos}
+
+def etapa_embeddings(args, modulo_007, fragmentos: List[str]) -> Dict:
+    muestra = fragmentos[:args.embeddings]
+    inicio = time.perf_counter()
+    obtenidos = sum(1 for f in muestra if modulo_007.obtener_embedding_ollama_para_bd(f))
+    segundos = time.perf_counter() - inicio
+    return {"embeddings": obtenidos, "segundos": round(segundos, 3), "embeddings_por_s": por_segundo(obtenidos, segundos)}
+
+def etapa_ingesta(args, modulo_007, carpeta_corpus: str, directorio_bd: str) -> Dict:
+    inicio = time.perf_counter()
+    modulo_007.crear_base_de_datos_lance(carpeta_corpus, NOMBRE_TABLA_BENCH, directorio_bd_lance=directorio_bd)
+    segundos_ingesta = time.perf_counter() - inicio
+    import lancedb
+    db_bench = lancedb.connect(directorio_bd)
+    tabla = db_bench.open_table(NOMBRE_TABLA_BENCH)
+    filas = tabla.count_rows()
+    nombre_tabla_alias = NOMBRE_TABLA_BENCH + modulo_007.SUFIJO_TABLA_ALIAS # Fragmentos casi duplicados sin embedding propio
+    filas_alias = db_bench.open_table(nombre_tabla_alias).count_rows() if nombre_tabla_alias in db_bench.table_names() else 0
+    # Los índices se reconstruyen por separado para medir su tiempo sin el de los embeddings
+    inicio = time.perf_counter(); modulo_007.crear_indice_texto_completo(tabla); segundos_fts = time.perf_counter() - inicio
+    inicio = time.perf_counter(); modulo_007.crear_indices_escalares_metadatos(tabla); segundos_escalares = time.perf_counter() - inicio
+    resultado = {"filas": filas, "fragmentos_alias": filas_alias, "ingesta_total_s": round(segundos_ingesta, 3), "indice_fts_s": round(segundos_fts, 3),
+                 "indices_escalares_s": round(segundos_escalares, 3)}
+    if modulo_007.TIPO_VECTOR_ALMACENADO != "int8" and filas >= 256: # IVF_PQ necesita al menos 256 filas para entrenar PQ
+        inicio = time.perf_counter()
+        tabla.create_index(metric="cosine", index_type="IVF_PQ", replace=True)
+        resultado["indice_vectorial_s"] = round(time.perf_counter() - inicio, 3)
+    return resultado
+
+def etapa_consultas(args, directorio_bd: str, preguntas: List[str]) -> Dict:
+    modulo = cargar_etapa("consulta")
+    for pregunta in preguntas[:NUM_CONSULTAS_CALENTAMIENTO]:
+        modulo.buscar_fragmentos_similares_lance(directorio_bd, NOMBRE_TABLA_BENCH, pregunta, config_busqueda={})
+    latencias, sin_resultados = [], 0
+    for pregunta in preguntas:
+        inicio = time.perf_counter()
+        filas = modulo.buscar_fragmentos_similares_lance(directorio_bd, NOMBRE_TABLA_BENCH, pregunta, config_busqueda={})
+        latencias.append(time.perf_counter() - inicio)
+        sin_resultados += not filas
+    return {"consultas": len(latencias), "sin_resultados": sin_resultados, "consulta_p50_ms": percentil_ms(latencias, 50),
+            "consulta_p99_ms": percentil_ms(latencias, 99), "consultas_por_s": por_segundo(len(latencias), sum(latencias))}
+
+def etapa_rag(args, directorio_bd: str, url_groq: str, preguntas: List[str]) -> Dict:
+    modulo = cargar_etapa("consulta_rag")
+    from groq import AsyncGroq
+    # Los límites reales los aplica el servidor falso (--groq-rpm/--groq-tpm); el limitador del script no debe dormir aquí
+    modulo.LIMITE_SOLICITUDES_POR_MINUTO_GROQ = 10 ** 9
+    modulo.LIMITE_TOKENS_POR_MINUTO_PROCESADOS_GROQ = 10 ** 12
+    modulo.MODO_RERANKING = args.reranking
+    import lancedb
+    tabla = lancedb.connect(directorio_bd).open_table(NOMBRE_TABLA_BENCH)
+    latencias, primeros_tokens, respuestas_vacias = [], [], 0
+
+    async def responder_todas():
+        nonlocal respuestas_vacias
+        cliente = AsyncGroq(api_key="bench", base_url=url_groq) # Un solo event loop, como la sesión de 009
+        for pregunta in preguntas:
+            inicio = time.perf_counter()
+            fragmentos, prompt, tokens, _ = await modulo.orquestar_consulta_rag(cliente, tabla, pregunta, config_busqueda={})
+            if not fragmentos: respuestas_vacias += 1; continue
+            primer_token = None; partes = []
+            async for parte in modulo.generar_respuesta_rag_stream(cliente, prompt, tokens):
+                if primer_token is None: primer_token = time.perf_counter() - inicio
+                partes.append(parte)
+            latencias.append(time.perf_counter() - inicio)
+            if primer_token is not None: primeros_tokens.append(primer_token)
+            respuestas_vacias += not "".join(partes).strip()
+    inicio_total = time.perf_counter()
+    asyncio.run(responder_todas())
+    segundos = time.perf_counter() - inicio_total
+    return {"respuestas": len(latencias), "respuestas_vacias": respuestas_vacias, "segundos": round(segundos, 3),
+            "rag_respuestas_por_s": por_segundo(len(latencias), segundos),
+            "rag_primer_token_p50_ms": percentil_ms(primeros_tokens, 50), "rag_primer_token_p99_ms": percentil_ms(primeros_tokens, 99),
+            "rag_total_p50_ms": percentil_ms(latencias, 50), "rag_total_p99_ms": percentil_ms(latencias, 99)}
+
+# Métricas que se comparan entre corridas (ver comparar_resultados.py): nombre -> True si mayor es mejor
+METRICAS_PRINCIPALES = {
+    "scrape.paginas_por_s": True, "descarga.notas_por_s": True, "fragmentado.fragmentos_por_s": True,
+    "embeddings.embeddings_por_s": True, "ingesta.ingesta_total_s": False, "ingesta.indice_fts_s": False,
+    "ingesta.indice_vectorial_s": False, "consultas.consulta_p50_ms": False, "consultas.consulta_p99_ms": False,
+    "rag.rag_respuestas_por_s": True, "rag.rag_primer_token_p50_ms": False, "rag.rag_total_p99_ms": False,
+}
+
+def ejecutar_benchmark(args) -> Dict:
+    etapas_pedidas = [e.strip() for e in args.etapas.split(",")] if args.etapas else list(ETAPAS)
+    trabajo = tempfile.mkdtemp(prefix="bench_rag_dof_")
+    documentos = corpus_sintetico.generar_documentos(args.documentos, args.semilla, args.palabras)
+    preguntas = corpus_sintetico.generar_preguntas(documentos, max(args.consultas, args.rag), args.semilla)
+    servidor_dof, url_dof = iniciar_servidor(ManejadorDOF, documentos=documentos, latencia_ms=args.dof_latencia_ms)
+    servidor_ollama, url_ollama = iniciar_servidor(ManejadorOllama, dimension=args.dim, latencia_ms=args.embed_latencia_ms)
+    servidor_groq, url_groq = iniciar_servidor(ManejadorGroq, latencia_primer_token_ms=args.groq_primer_token_ms,
+                                               ms_por_token=args.groq_ms_por_token, tokens_respuesta=args.groq_tokens_respuesta,
+                                               limite_solicitudes_por_minuto=args.groq_rpm, limite_tokens_por_minuto=args.groq_tpm)
+    # El cliente por defecto de ollama lee OLLAMA_HOST al importarse: debe fijarse antes de cargar cualquier etapa
+    os.environ["OLLAMA_HOST"] = url_ollama
+    directorio_original = os.getcwd()
+    os.chdir(trabajo) # 003 y 004 escriben el CSV y los .txt relativos al directorio actual
+    metricas: Dict[str, Dict] = {}
+    try:
+        carpeta_corpus = os.path.join(trabajo, "corpus_txt")
+        corpus_sintetico.escribir_corpus_txt(documentos, carpeta_corpus)
+        directorio_bd = os.path.join(trabajo, "lancedb_bench")
+        modulo_007 = None
+        if {"fragmentado", "embeddings", "ingesta"} & set(etapas_pedidas):
+            # 007 busca la configuración de 010 junto a la BD, en 'trabajo', donde no la hay: mismos parámetros de índice en todas las corridas
+            modulo_007 = cargar_etapa("indexado")
+            modulo_007.MODO_FRAGMENTACION = args.fragmentacion
+        fragmentos: List[str] = []
+        for etapa in ETAPAS:
+            if etapa not in etapas_pedidas: continue
+            if etapa in ("scrape", "descarga") and importlib.util.find_spec("playwright") is None:
+                metricas[etapa] = {"omitida": "playwright no está instalado"}; print(f"[{etapa}] omitida: playwright no está instalado"); continue
+            if etapa in ("consultas", "rag") and not os.path.isdir(directorio_bd):
+                metricas[etapa] = {"omitida": "requiere la etapa ingesta"}; print(f"[{etapa}] omitida: requiere la etapa ingesta"); continue
+            print(f"[{etapa}] ejecutando...", flush=True)
+            try:
+                with salida_silenciada(not args.verbose):
+                    if etapa == "scrape": resultado = etapa_scrape(args, trabajo, url_dof, servidor_dof)
+                    elif etapa == "descarga": resultado = etapa_descarga(args, trabajo)
+                    elif etapa == "fragmentado": resultado = etapa_fragmentado(args, modulo_007, documentos)
+                    elif etapa == "embeddings":
+                        if not fragmentos: fragmentos = etapa_fragmentado(args, modulo_007, documentos[:50])["_fragmentos"]
+                        resultado = etapa_embeddings(args, modulo_007, fragmentos)
+                    elif etapa == "ingesta": resultado = etapa_ingesta(args, modulo_007, carpeta_corpus, directorio_bd)
+                    elif etapa == "consultas": resultado = etapa_consultas(args, directorio_bd, preguntas[:args.consultas])
+                    else: resultado = etapa_rag(args, directorio_bd, url_groq, preguntas[:args.rag])
+            except Exception as e_etapa:
+                # Una etapa rota (p.ej. una dependencia que falta) no invalida las demás mediciones
+                resultado = {"error": f"{type(e_etapa).__name__}: {e_etapa}"}
+            if etapa == "fragmentado" and "_fragmentos" in resultado: fragmentos = resultado.pop("_fragmentos")
+            metricas[etapa] = resultado
+            print(f"[{etapa}] {json.dumps(resultado, ensure_ascii=False)}")
+    finally:
+        os.chdir(directorio_original)
+        for servidor in (servidor_dof, servidor_ollama, servidor_groq): detener_servidor(servidor)
+        if args.conservar: print(f"Directorio de trabajo conservado: {trabajo}")
+        else: shutil.rmtree(trabajo, ignore_errors=True)
+
+    return {
+        "version_formato": VERSION_FORMATO_RESULTADOS,
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        **commit_actual(),
+        "entorno": describir_entorno(),
+        "parametros": {c: v for c, v in vars(args).items() if c not in ("salida", "verbose", "conservar")},
+        "servidores": {"dof": servidor_dof.RequestHandlerClass.contadores, "ollama": servidor_ollama.RequestHandlerClass.contadores,
+                       "groq": servidor_groq.RequestHandlerClass.contadores},
+        "metricas": metricas,
+        "metricas_principales": dict(METRICAS_PRINCIPALES),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de punta a punta (scraping, ingesta, consultas y RAG) con servidores locales.")
+    parser.add_argument("--etapas", default="", help=f"Lista separada por comas; por defecto todas: {','.join(ETAPAS)}")
+    parser.add_argument("--documentos", type=int, default=corpus_sintetico.NUM_DOCUMENTOS, help="Notas en el corpus sintético.")
+    parser.add_argument("--palabras", type=int, default=corpus_sintetico.PALABRAS_PROMEDIO_POR_DOCUMENTO, help="Palabras promedio por nota.")
+    parser.add_argument("--semilla", type=int, default=corpus_sintetico.SEMILLA_CORPUS)
+    parser.add_argument("--dim", type=int, default=1024, help="Dimensión del embedder falso.")
+    parser.add_argument("--embeddings", type=int, default=NUM_EMBEDDINGS, help="Fragmentos a embeber en la etapa 'embeddings'.")
+    parser.add_argument("--consultas", type=int, default=NUM_CONSULTAS)
+    parser.add_argument("--rag", type=int, default=NUM_RESPUESTAS_RAG, help="Preguntas respondidas en la etapa 'rag'.")
+    parser.add_argument("--reranking", default="ninguno", help="Modo de reranking de 009 durante la etapa 'rag'.")
+    parser.add_argument("--fragmentacion", default="estructura", choices=["estructura", "tokens"],
+                        help="MODO_FRAGMENTACION de 007 en las etapas 'fragmentado', 'embeddings' e 'ingesta'.")
+    parser.add_argument("--dof-latencia-ms", type=float, default=0.0, help="Latencia por solicitud del DOF local.")
+    parser.add_argument("--embed-latencia-ms", type=float, default=0.0, help="Latencia por solicitud del Ollama falso.")
+    parser.add_argument("--groq-primer-token-ms", type=float, default=200.0)
+    parser.add_argument("--groq-ms-por-token", type=float, default=5.0)
+    parser.add_argument("--groq-tokens-respuesta", type=int, default=200)
+    parser.add_argument("--groq-rpm", type=int, default=0, help="Límite de solicitudes/min del Groq falso (0 = sin límite).")
+    parser.add_argument("--groq-tpm", type=int, default=0, help="Límite de tokens/min del Groq falso (0 = sin límite).")
+    parser.add_argument("--salida", default="", help="Archivo JSON de resultados (por defecto bench/resultados/<fecha>_<commit>.json).")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar la salida de los scripts durante cada etapa.")
+    parser.add_argument("--conservar", action="store_true", help="No borrar el directorio de trabajo temporal.")
+    args = parser.parse_args()
+
+    resultados = ejecutar_benchmark(args)
+    ruta_salida = args.salida
+    if not ruta_salida:
+        os.makedirs(DIRECTORIO_RESULTADOS, exist_ok=True)
+        sello = datetime.now().strftime("%Y%m%d_%H%M%S")
+        ruta_salida = os.path.join(DIRECTORIO_RESULTADOS, f"{sello}_{(resultados['commit'] or 'sin_git')[:10]}.json")
+    with open(ruta_salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados guardados en: {ruta_salida}")
+    print(f"Comparar con otra corrida: python bench/comparar_resultados.py <base.json> {ruta_salida}")
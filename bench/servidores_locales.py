@@ -0,0 +1,208 @@
+import re
+import json
+import time
+import hashlib
+import threading
+import unicodedata
+from functools import lru_cache
+from html import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from typing import List, Dict, Tuple
+import numpy as np
+
+# --- Configuración ---
+# Servidores HTTP locales que sustituyen al DOF, a Ollama y a Groq durante el benchmark.
+# Cada uno corre en un hilo daemon sobre 127.0.0.1 y un puerto libre; la configuración se lee de atributos de la clase.
+RESULTADOS_POR_PAGINA_DOF = 10
+DIMENSION_EMBEDDING_FALSO = 1024 # Igual que bge-m3
+MODELO_GROQ_FALSO = "deepseek-r1-distill-llama-70b"
+CARACTERES_POR_TOKEN_ESTIMADOS = 4
+
+class ManejadorBase(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True # Encabezados y cuerpo van en escrituras separadas; con Nagle cada respuesta tarda ~40 ms
+    latencia_ms = 0.0
+    contadores: Dict[str, int] = {}
+    ventana: Dict = {} # Cuotas por minuto (solo Groq)
+    bloqueo = threading.Lock()
+
+    def log_message(self, formato, *args): pass # Sin una línea por solicitud en la salida del benchmark
+
+    def contar(self, clave: str, cantidad: int = 1):
+        with self.bloqueo: self.contadores[clave] = self.contadores.get(clave, 0) + cantidad
+
+    def esperar_latencia(self):
+        if self.latencia_ms > 0: time.sleep(self.latencia_ms / 1000.0)
+
+    def leer_json(self) -> Dict:
+        longitud = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(longitud) or b"{}")
+
+    def responder(self, estado: int, cuerpo: bytes, tipo: str, encabezados: Dict[str, str] = None):
+        self.send_response(estado)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        for clave, valor in (encabezados or {}).items(): self.send_header(clave, valor)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def responder_json(self, estado: int, datos: Dict, encabezados: Dict[str, str] = None):
+        self.responder(estado, json.dumps(datos).encode("utf-8"), "application/json", encabezados)
+
+def iniciar_servidor(clase_manejador, **configuracion) -> Tuple[ThreadingHTTPServer, str]:
+    """Crea una subclase del manejador con la configuración dada, la sirve en un hilo y devuelve (servidor, url_base)."""
+    manejador = type(clase_manejador.__name__, (clase_manejador,), dict(configuracion, contadores={}, ventana={}, bloqueo=threading.Lock()))
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), manejador)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}"
+
+def detener_servidor(servidor: ThreadingHTTPServer):
+    servidor.shutdown(); servidor.server_close()
+
+# --- DOF: portada con buscador, páginas de resultados y notas (mismos selectores que 003 y 004) ---
+class ManejadorDOF(ManejadorBase):
+    documentos: List[Dict] = []
+    resultados_por_pagina = RESULTADOS_POR_PAGINA_DOF
+
+    def do_GET(self):
+        self.esperar_latencia()
+        url = urlparse(self.path); parametros = parse_qs(url.query)
+        if url.path in ("/", "/index.php"):
+            self.contar("portada")
+            html = ('<html><body><form action="/busqueda_detalle.php" method="get">'
+                    '<input id="textobusqueda" name="textobusqueda" type="text"></form></body></html>')
+        elif url.path == "/busqueda_detalle.php":
+            self.contar("resultados")
+            html = self.pagina_resultados(parametros.get("textobusqueda", [""])[0], int(parametros.get("pagina", ["1"])[0]))
+        elif url.path == "/nota_detalle.php":
+            self.contar("notas")
+            documento = next((d for d in self.documentos if d["codigo"] == parametros.get("codigo", [""])[0]), None)
+            if documento is None: self.responder(404, b"no encontrada", "text/plain"); return
+            contenido = "".join(f"<p>{escape(p)}</p>" for p in documento["contenido"].split("\n\n"))
+            html = f'<html><body><h1>{escape(documento["titulo"])}</h1><div id="DivDetalleNota">{contenido}</div></body></html>'
+        else:
+            self.responder(404, b"no encontrada", "text/plain"); return
+        self.responder(200, html.encode("utf-8"), "text/html; charset=utf-8")
+
+    def pagina_resultados(self, termino: str, pagina: int) -> str:
+        inicio = (pagina - 1) * self.resultados_por_pagina
+        enlaces = "".join(f'<li><a href="/nota_detalle.php?codigo={d["codigo"]}&fecha={d["fecha"]}">{escape(d["titulo"])}</a></li>'
+                          for d in self.documentos[inicio:inicio + self.resultados_por_pagina])
+        siguiente = ""
+        if inicio + self.resultados_por_pagina < len(self.documentos):
+            siguiente = (f'<a class="txt_azul" href="/busqueda_detalle.php?textobusqueda={escape(termino)}&pagina={pagina + 1}">'
+                         '<img alt="siguiente" src="/flecha.png" width="16" height="16"></a>')
+        return f"<html><body><ul>{enlaces}</ul>{siguiente}</body></html>"
+
+# --- Ollama: embeddings deterministas (bolsa de palabras con vectores pseudoaleatorios por palabra) ---
+def normalizar_palabra(palabra: str) -> str:
+    return unicodedata.normalize("NFKD", palabra.lower()).encode("ascii", "ignore").decode("ascii")
+
+@lru_cache(maxsize=200000)
+def vector_palabra(palabra: str, dim: int) -> np.ndarray:
+    semilla = int.from_bytes(hashlib.md5(palabra.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(semilla).standard_normal(dim).astype(np.float32)
+
+def embedding_determinista(texto: str, dim: int = DIMENSION_EMBEDDING_FALSO) -> List[float]:
+    """Mismo texto -> mismo vector; textos que comparten palabras quedan cerca, como con un modelo real."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for palabra in re.findall(r"\w+", texto):
+        if len(palabra) > 2: vector += vector_palabra(normalizar_palabra(palabra), dim)
+    norma = float(np.linalg.norm(vector))
+    return (vector / norma if norma else vector).tolist()
+
+class ManejadorOllama(ManejadorBase):
+    dimension = DIMENSION_EMBEDDING_FALSO
+    ms_por_texto = 0.0
+
+    def do_GET(self):
+        if self.path.startswith("/api/version"): self.responder_json(200, {"version": "bench"}); return
+        self.responder_json(200, {"models": [{"name": "bge-m3:latest", "model": "bge-m3:latest"}]})
+
+    def do_POST(self):
+        self.esperar_latencia()
+        cuerpo = self.leer_json()
+        if self.path == "/api/embeddings": # API antigua: un texto por solicitud (la que usan 007, 008 y 009)
+            textos = [cuerpo.get("prompt", "")]
+        elif self.path == "/api/embed":
+            entrada = cuerpo.get("input", "")
+            textos = entrada if isinstance(entrada, list) else [entrada]
+        else:
+            self.responder_json(404, {"error": "ruta desconocida"}); return
+        self.contar("solicitudes"); self.contar("textos", len(textos))
+        if self.ms_por_texto > 0: time.sleep(self.ms_por_texto * len(textos) / 1000.0)
+        vectores = [embedding_determinista(t, self.dimension) for t in textos]
+        if self.path == "/api/embeddings": self.responder_json(200, {"embedding": vectores[0]})
+        else: self.responder_json(200, {"model": cuerpo.get("model", ""), "embeddings": vectores})
+
+# --- Groq: API compatible con OpenAI, con latencia de primer token, ritmo de tokens y límites RPM/TPM ---
+class ManejadorGroq(ManejadorBase):
+    latencia_primer_token_ms = 200.0
+    ms_por_token = 5.0
+    tokens_respuesta = 200
+    limite_solicitudes_por_minuto = 0 # 0 = sin límite
+    limite_tokens_por_minuto = 0
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self.contar("modelos")
+            self.responder_json(200, {"object": "list", "data": [{"id": MODELO_GROQ_FALSO, "object": "model", "owned_by": "bench"}]})
+        else:
+            self.responder_json(404, {"error": {"message": "ruta desconocida"}})
+
+    def consumir_cuota(self, tokens: int) -> float:
+        """Registra la solicitud en la ventana del minuto actual; devuelve los segundos de espera si excede un límite (0 si no)."""
+        with self.bloqueo:
+            ahora = time.time()
+            if ahora - self.ventana.get("inicio", 0.0) >= 60: self.ventana.update(inicio=ahora, solicitudes=0, tokens=0)
+            espera = 60.0 - (ahora - self.ventana["inicio"])
+            if self.limite_solicitudes_por_minuto and self.ventana["solicitudes"] + 1 > self.limite_solicitudes_por_minuto: return espera
+            if self.limite_tokens_por_minuto and self.ventana["tokens"] + tokens > self.limite_tokens_por_minuto: return espera
+            self.ventana["solicitudes"] += 1; self.ventana["tokens"] += tokens
+            return 0.0
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.responder_json(404, {"error": {"message": "ruta desconocida"}}); return
+        cuerpo = self.leer_json()
+        prompt = "".join(m.get("content") or "" for m in cuerpo.get("messages", []))
+        tokens_prompt = len(prompt) // CARACTERES_POR_TOKEN_ESTIMADOS
+        tokens_respuesta = min(self.tokens_respuesta, int(cuerpo.get("max_tokens") or self.tokens_respuesta))
+        espera = self.consumir_cuota(tokens_prompt + tokens_respuesta)
+        if espera > 0:
+            self.contar("rechazadas_429")
+            self.responder_json(429, {"error": {"message": f"Rate limit reached. Please try again in {espera:.1f}s.",
+                                                "type": "tokens", "code": "rate_limit_exceeded"}},
+                                {"retry-after": str(max(1, int(espera)))})
+            return
+        self.contar("solicitudes")
+        palabras = [f"palabra{i % 50}" for i in range(tokens_respuesta)]
+        id_respuesta = f"chatcmpl-bench-{self.contadores.get('solicitudes', 0)}"
+        uso = {"prompt_tokens": tokens_prompt, "completion_tokens": tokens_respuesta, "total_tokens": tokens_prompt + tokens_respuesta}
+        time.sleep(self.latencia_primer_token_ms / 1000.0)
+        if not cuerpo.get("stream"):
+            time.sleep(self.ms_por_token * tokens_respuesta / 1000.0)
+            self.responder_json(200, {"id": id_respuesta, "object": "chat.completion", "created": int(time.time()),
+                                      "model": cuerpo.get("model", MODELO_GROQ_FALSO),
+                                      "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(palabras)},
+                                                   "finish_reason": "stop"}], "usage": uso})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        def evento(delta: Dict, fin=None, **extra):
+            datos = {"id": id_respuesta, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": cuerpo.get("model", MODELO_GROQ_FALSO),
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": fin}], **extra}
+            self.wfile.write(f"data: {json.dumps(datos)}\n\n".encode("utf-8")); self.wfile.flush()
+        evento({"role": "assistant", "content": ""})
+        for i, palabra in enumerate(palabras):
+            if i and self.ms_por_token > 0: time.sleep(self.ms_por_token / 1000.0)
+            evento({"content": palabra + " "})
+        evento({}, fin="stop", x_groq={"usage": uso})
+        self.wfile.write(b"data: [DONE]\n\n"); self.wfile.flush()
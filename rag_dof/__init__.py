@@ -0,0 +1,18 @@
+import importlib
+
+# --- Configuración ---
+# Etapas del pipeline (una por script numerado, las que corre el CLI) y el código que comparten con el benchmark (bench/)
+# y setup_web_project.py.
+# Los submódulos se importan al primer acceso (rag_dof.tokenizador, rag_dof.catalogo...), así que importar el paquete
+# no carga lancedb, ollama, groq ni tiktoken; ver rag_dof/perezoso.py.
+SUBMODULOS = ("perezoso", "tokenizador", "perfilado", "catalogo", "nombres", "documentos", "trazas", "limites", "embeddings",
+              "fragmentacion", "duplicados", "busqueda", "diversificacion", "contexto", "reranking", "generacion", "evaluacion",
+              "recoleccion", "descarga", "resumenes", "conteo_tokens", "indexado", "consulta", "consulta_rag", "consulta_lote",
+              "benchmark_indices", "reporte_cuantizacion", "cli")
+
+def __getattr__(nombre: str):
+    if nombre in SUBMODULOS: return importlib.import_module(f"{__name__}.{nombre}")
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(SUBMODULOS))
@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import numpy as np
+import pyarrow as pa
+from typing import List, Dict, Optional, Tuple
+from .perezoso import importar_perezoso
+from .busqueda import ARCHIVO_CONFIG_BUSQUEDA # Lo leen 007 (creación del índice) y las rutas de consulta (008, 009, 011 y la web)
+from .evaluacion import (NUM_VECTORES_SINTETICOS, DIMENSION_SINTETICA, generar_vectores_sinteticos, generar_consultas,
+                         cargar_vectores_de_tabla, top_k, tamano_directorio_bytes)
+lancedb = importar_perezoso("lancedb") # Se importa al primer uso (ver rag_dof/perezoso.py)
+
+# --- Configuración ---
+# Etapa 010 ('rag-dof bench indices'): recall@k, latencia y tamaño de los índices ANN de LanceDB; escribe la
+# configuración de búsqueda elegida en ARCHIVO_CONFIG_BUSQUEDA.
+DIRECTORIO_BD_BENCHMARK = "lancedb_benchmark_indices" # Copia de trabajo; nunca se toca la BD real
+NOMBRE_TABLA_BENCHMARK = "benchmark_vectores"
+METRICA = "cosine"
+K_RECALL = 10
+NUM_CONSULTAS = 200
+RECALL_OBJETIVO = 0.95 # Se elige la variante más rápida (p95) que alcance este recall
+
+def crear_tabla_benchmark(db, vectores: np.ndarray):
+    dim = vectores.shape[1]
+    datos = pa.table({
+        "fila": pa.array(np.arange(len(vectores), dtype=np.int64)),
+        "vector": pa.FixedSizeListArray.from_arrays(pa.array(vectores.reshape(-1)), dim),
+    })
+    return db.create_table(NOMBRE_TABLA_BENCHMARK, data=datos, mode="overwrite")
+
+def sugerir_num_sub_vectors(dim: int, divisor_objetivo: int) -> int:
+    """num_sub_vectors debe dividir a la dimensión; se busca el divisor más cercano a dim/divisor_objetivo."""
+    objetivo = max(1, dim // divisor_objetivo)
+    divisores = [d for d in range(1, dim + 1) if dim % d == 0]
+    return min(divisores, key=lambda d: abs(d - objetivo))
+
+def definir_variantes(n_filas: int, dim: int, k: int) -> List[Dict]:
+    """
+    Cada variante describe cómo construir el índice ('construccion') y una lista de
+    parámetros de consulta a barrer sobre ese mismo índice ('consultas').
+    """
+    n_particiones = max(1, min(256, int(np.sqrt(n_filas))))
+    variantes = [{"index_type": "FLAT", "construccion": {}, "consultas": [{}]}]
+    for divisor in (16, 8):
+        variantes.append({
+            "index_type": "IVF_PQ",
+            "construccion": {"num_partitions": n_particiones, "num_sub_vectors": sugerir_num_sub_vectors(dim, divisor)},
+            "consultas": [{"nprobes": nprobes, "refine_factor": refine}
+                          for nprobes in (10, 20, 50) for refine in (None, 10)],
+        })
+    variantes.append({
+        "index_type": "IVF_HNSW_SQ",
+        "construccion": {"num_partitions": max(1, n_particiones // 4), "m": 20, "ef_construction": 300},
+        "consultas": [{"nprobes": nprobes, "ef": ef} for nprobes in (5, 20) for ef in (k * 5, k * 20)],
+    })
+    return variantes
+
+def aplicar_parametros_consulta(consulta, parametros: Dict):
+    if parametros.get("nprobes"): consulta = consulta.nprobes(int(parametros["nprobes"]))
+    if parametros.get("refine_factor"): consulta = consulta.refine_factor(int(parametros["refine_factor"]))
+    if parametros.get("ef"): consulta = consulta.ef(int(parametros["ef"]))
+    return consulta
+
+def medir_consultas(tabla, consultas: np.ndarray, vecinos_exactos: np.ndarray, k: int, parametros: Dict, usar_indice: bool) -> Dict:
+    latencias_ms, aciertos = [], 0
+    for i, q in enumerate(consultas):
+        consulta = tabla.search(q.tolist()).distance_type(METRICA).select(["fila"]).limit(k)
+        consulta = aplicar_parametros_consulta(consulta, parametros) if usar_indice else consulta.bypass_vector_index()
+        inicio = time.perf_counter()
+        resultado = consulta.to_arrow()
+        latencias_ms.append((time.perf_counter() - inicio) * 1000)
+        aciertos += len(set(resultado.column("fila").to_pylist()) & set(vecinos_exactos[i].tolist()))
+    return {
+        "recall_at_k": aciertos / (len(consultas) * k),
+        "p50_ms": float(np.percentile(latencias_ms, 50)),
+        "p95_ms": float(np.percentile(latencias_ms, 95)),
+        "p99_ms": float(np.percentile(latencias_ms, 99)),
+    }
+
+def ejecutar_benchmark(vectores: np.ndarray, consultas: np.ndarray, directorio_bd: str, k: int = K_RECALL) -> List[Dict]:
+    n_filas, dim = vectores.shape
+    print(f"Calculando vecinos exactos (fuerza bruta) para {len(consultas)} consultas sobre {n_filas} vectores de dim {dim}...")
+    vecinos_exactos = top_k(consultas @ vectores.T, k) # Verdad de referencia por fuerza bruta
+
+    if os.path.isdir(directorio_bd): shutil.rmtree(directorio_bd)
+    db = lancedb.connect(directorio_bd)
+    resultados = []
+    for variante in definir_variantes(n_filas, dim, k):
+        index_type = variante["index_type"]
+        print(f"\n--- Variante {index_type} {variante['construccion']} ---")
+        tabla = crear_tabla_benchmark(db, vectores)
+        tamano_datos = tamano_directorio_bytes(os.path.join(directorio_bd, f"{NOMBRE_TABLA_BENCHMARK}.lance"))
+        tiempo_construccion = 0.0
+        if index_type != "FLAT":
+            inicio = time.perf_counter()
+            try:
+                tabla.create_index(metric=METRICA, index_type=index_type, replace=True, **variante["construccion"])
+            except Exception as e_index:
+                print(f"  Error al construir el índice {index_type}: {e_index}. Variante omitida.")
+                continue
+            tiempo_construccion = time.perf_counter() - inicio
+        tamano_total = tamano_directorio_bytes(os.path.join(directorio_bd, f"{NOMBRE_TABLA_BENCHMARK}.lance"))
+        print(f"  Construcción: {tiempo_construccion:.2f}s. Tamaño índice en disco: {(tamano_total - tamano_datos) / 1e6:.2f} MB")
+
+        for parametros in variante["consultas"]:
+            metricas = medir_consultas(tabla, consultas, vecinos_exactos, k, parametros, usar_indice=index_type != "FLAT")
+            fila = {
+                "index_type": index_type, "metric": METRICA, **variante["construccion"],
+                **{p: v for p, v in parametros.items() if v is not None},
+                **metricas,
+                "tiempo_construccion_s": round(tiempo_construccion, 3),
+                "tamano_indice_bytes": tamano_total - tamano_datos,
+                "tamano_total_bytes": tamano_total,
+            }
+            resultados.append(fila)
+            print(f"  {parametros or '(búsqueda exacta)'} -> recall@{k}: {metricas['recall_at_k']:.3f}, "
+                  f"p50: {metricas['p50_ms']:.2f}ms, p95: {metricas['p95_ms']:.2f}ms, p99: {metricas['p99_ms']:.2f}ms")
+    return resultados
+
+def elegir_configuracion(resultados: List[Dict], recall_objetivo: float = RECALL_OBJETIVO) -> Optional[Dict]:
+    """La variante con menor p95 que cumpla el recall objetivo; si ninguna lo cumple, la de mayor recall."""
+    if not resultados: return None
+    candidatas = [r for r in resultados if r["recall_at_k"] >= recall_objetivo]
+    if candidatas: return min(candidatas, key=lambda r: r["p95_ms"])
+    return max(resultados, key=lambda r: (r["recall_at_k"], -r["p95_ms"]))
+
+def guardar_configuracion_busqueda(eleccion: Dict, ruta_config: str, origen: str, k: int):
+    claves_config = ("index_type", "metric", "num_partitions", "num_sub_vectors", "m", "ef_construction",
+                     "nprobes", "refine_factor", "ef")
+    config = {c: eleccion[c] for c in claves_config if c in eleccion}
+    config["benchmark"] = {
+        "origen_datos": origen, f"recall_at_{k}": eleccion["recall_at_k"],
+        "p50_ms": eleccion["p50_ms"], "p95_ms": eleccion["p95_ms"], "p99_ms": eleccion["p99_ms"],
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    with open(ruta_config, "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+    print(f"\nConfiguración elegida guardada en: {ruta_config}")
+    print(json.dumps(config, ensure_ascii=False, indent=2))
+
+
+def main(argv: Optional[List[str]] = None, directorio_base: Optional[str] = None):
+    """'rag-dof bench indices' y 010: BD real, copia de trabajo y configuración en directorio_base (por defecto, el actual)."""
+    parser = argparse.ArgumentParser(description="Benchmark de índices ANN de LanceDB (recall@k, latencia, tamaño).")
+    parser.add_argument("--sintetico", action="store_true", help="Usar vectores aleatorios agrupados en lugar de la tabla real.")
+    parser.add_argument("--n", type=int, default=NUM_VECTORES_SINTETICOS, help="Número de vectores sintéticos.")
+    parser.add_argument("--dim", type=int, default=DIMENSION_SINTETICA, help="Dimensión de los vectores sintéticos.")
+    parser.add_argument("--consultas", type=int, default=NUM_CONSULTAS)
+    parser.add_argument("--k", type=int, default=K_RECALL)
+    parser.add_argument("--no-guardar", action="store_true", help="Solo reportar; no escribir el archivo de configuración.")
+    parser.add_argument("--guardar", action="store_true",
+                        help="Con --sintetico, escribir igualmente la configuración elegida (por omisión una corrida sintética solo reporta).")
+    args = parser.parse_args(argv)
+
+    termino_busqueda_usado = "decreto"
+    script_dir = directorio_base or os.getcwd()
+    directorio_bd_real = os.path.join(script_dir, "lancedb_store_bge_m3")
+    directorio_bd_benchmark = os.path.join(script_dir, DIRECTORIO_BD_BENCHMARK)
+
+    if args.sintetico:
+        origen = f"sintetico_n{args.n}_dim{args.dim}"
+        vectores_base = generar_vectores_sinteticos(args.n, args.dim)
+    else:
+        origen = f"tabla_{termino_busqueda_usado}"
+        try:
+            vectores_base = cargar_vectores_de_tabla(directorio_bd_real, termino_busqueda_usado)
+        except Exception as e_tabla:
+            print(f"Error al leer la tabla '{termino_busqueda_usado}' en '{directorio_bd_real}': {e_tabla}")
+            print("Ejecuta primero 007 o usa --sintetico.")
+            return
+    consultas_bench = generar_consultas(vectores_base, args.consultas)
+
+    resultados_bench = ejecutar_benchmark(vectores_base, consultas_bench, directorio_bd_benchmark, k=args.k)
+    shutil.rmtree(directorio_bd_benchmark, ignore_errors=True)
+
+    print("\n================ Resumen ================")
+    print(f"{'índice':<12} {'params':<64} {'recall':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'build(s)':>9} {'idx(MB)':>8}")
+    for r in resultados_bench:
+        params = {c: r[c] for c in ("num_partitions", "num_sub_vectors", "nprobes", "refine_factor", "ef") if c in r}
+        print(f"{r['index_type']:<12} {str(params):<64} {r['recall_at_k']:>7.3f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+              f"{r['p99_ms']:>8.2f} {r['tiempo_construccion_s']:>9.2f} {r['tamano_indice_bytes'] / 1e6:>8.2f}")
+
+    eleccion_final = elegir_configuracion(resultados_bench)
+    # Los vectores sintéticos no representan la tabla real: sus parámetros no deben pisar la configuración de producción
+    guardar = not args.no_guardar and (args.guardar or not args.sintetico)
+    if eleccion_final and args.sintetico and not guardar and not args.no_guardar:
+        print(f"\nCorrida sintética: no se escribe '{ARCHIVO_CONFIG_BUSQUEDA}' (usa --guardar para escribirlo).")
+    if eleccion_final and guardar:
+        guardar_configuracion_busqueda(eleccion_final, os.path.join(script_dir, ARCHIVO_CONFIG_BUSQUEDA), origen, args.k)
+
+if __name__ == "__main__":
+    main()
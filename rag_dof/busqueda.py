@@ -0,0 +1,270 @@
+import os
+import re
+import json
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from .nombres import normalizar_texto_metadato
+from .perezoso import importar_perezoso
+from .perfilado import medir_punto_caliente
+from .trazas import trazar, registrar_acceso_cache
+from .duplicados import SUFIJO_TABLA_ALIAS
+
+pa = importar_perezoso("pyarrow")
+lancedb = importar_perezoso("lancedb")
+
+# --- Configuración ---
+# Búsqueda sobre la tabla de fragmentos de 007: prefiltrado por metadatos, búsqueda vectorial según el tipo de vector
+# almacenado (float32, o float16/int8 con rescoring contra la copia float32), rama de palabras clave (FTS/BM25) y fusión de ambas.
+# La usan 008, 009, 011, 012 y la web; los parámetros del índice (métrica, nprobes, refine_factor, ef) salen de
+# ARCHIVO_CONFIG_BUSQUEDA, que escribe 010_benchmark_indices_lancedb.py.
+ARCHIVO_CONFIG_BUSQUEDA = "config_busqueda_lancedb.json"
+FACTOR_SOBREMUESTREO_RESCORING = 4 # Con vectores float16/int8: candidatos = k * factor antes del rescoring en float32
+# Con float16/int8, 007 guarda además los vectores originales en '<tabla>_float32' (id, vector); la búsqueda solo lee de
+# ahí los k * factor candidatos, por id, para reordenarlos con la precisión completa. Sin esa tabla (bases anteriores) el
+# rescoring usa los valores cuantizados.
+SUFIJO_TABLA_FLOAT32 = "_float32"
+TAMANO_BLOQUE_ESCANEO_INT8 = 65536 # Filas por bloque al puntuar la matriz int8 (acota la memoria temporal)
+NUM_RESULTADOS_FTS = 20
+CONSTANTE_RRF = 60 # Fusión por rango recíproco de las listas vectorial y FTS: score = suma de 1 / (CONSTANTE_RRF + rango)
+CLAVES_FILTRO = ("dependencia", "tipo", "anio", "desde", "hasta", "codigo")
+# Un fragmento casi duplicado de otro documento no tiene fila propia: está en '<tabla>_alias' (007, rag_dof/duplicados.py)
+# con sus metadatos. Con filtros, las búsquedas incluyen los canónicos de los alias que cumplen el filtro y los devuelven
+# con el documento, el índice y los metadatos del alias ('id_canonico' indica el fragmento guardado).
+COLUMNAS_DE_ALIAS = ("id", "nombre_archivo_original", "indice_fragmento_en_doc", "fecha_publicacion", "anio_publicacion",
+                     "dependencia", "tipo_documento", "codigo_dof")
+_cache_matrices_int8: Dict = {}
+_cache_tablas_auxiliares: Dict = {}
+_tablas_sin_indice_fts: set = set()
+
+def separar_filtros_de_pregunta(texto: str) -> Tuple[str, Dict[str, str]]:
+    """
+    Extrae filtros escritos en la pregunta con la forma clave:valor (o clave:"valor con espacios").
+    Claves: dependencia (siglas, p.ej. SHCP), tipo (p.ej. decreto), anio, desde/hasta (AAAA-MM-DD), codigo.
+    Ejemplo: 'decretos sobre aranceles dependencia:SHCP anio:2024'
+    """
+    filtros = {}
+    def capturar(m):
+        filtros[m.group(1).lower()] = m.group(2).strip('"')
+        return ""
+    pregunta = re.sub(rf'\b({"|".join(CLAVES_FILTRO)}):("[^"]+"|\S+)', capturar, texto, flags=re.IGNORECASE)
+    return re.sub(r'\s+', ' ', pregunta).strip(), filtros
+
+def construir_filtro_metadatos(filtros: Optional[Dict[str, str]]) -> Optional[str]:
+    """Traduce los filtros a una cláusula SQL para prefiltrar en LanceDB sobre las columnas con índice escalar de 007."""
+    if not filtros: return None
+    def literal(valor: str) -> str: return "'" + valor.replace("'", "''") + "'"
+    condiciones = []
+    if filtros.get("dependencia"): condiciones.append(f"dependencia = {literal(normalizar_texto_metadato(filtros['dependencia']))}")
+    if filtros.get("tipo"): condiciones.append(f"tipo_documento = {literal(normalizar_texto_metadato(filtros['tipo']))}")
+    if str(filtros.get("anio") or "").isdigit(): condiciones.append(f"anio_publicacion = {int(filtros['anio'])}")
+    if str(filtros.get("codigo") or "").isdigit(): condiciones.append(f"codigo_dof = {literal(str(filtros['codigo']))}")
+    for clave, operador in (("desde", ">="), ("hasta", "<=")):
+        if re.fullmatch(r'\d{4}-\d{2}-\d{2}', str(filtros.get(clave) or "")):
+            condiciones.append(f"fecha_publicacion {operador} {literal(filtros[clave])}")
+    return " AND ".join(condiciones) if condiciones else None
+
+def cargar_config_busqueda_lancedb(ruta_config: str) -> Dict:
+    if not os.path.exists(ruta_config): return {}
+    try:
+        with open(ruta_config, 'r', encoding='utf-8') as f: return json.load(f)
+    except Exception as e: print(f"Advertencia: No se pudo leer '{ruta_config}': {e}. Usando defaults."); return {}
+
+def lista_sql(valores: List[str]) -> str:
+    return ", ".join("'" + str(v).replace("'", "''") + "'" for v in valores)
+
+def aplicar_config_busqueda(consulta, config_busqueda: Dict, filtros: Optional[Dict[str, str]] = None, filtro_sql: Optional[str] = None):
+    """filtro_sql, si se da, reemplaza al construido desde 'filtros' (p. ej. ya ampliado con los alias)."""
+    filtro_sql = filtro_sql or construir_filtro_metadatos(filtros)
+    if filtro_sql: consulta = consulta.where(filtro_sql, prefilter=True)
+    consulta = consulta.distance_type(config_busqueda.get("metric", "cosine"))
+    if config_busqueda.get("nprobes"): consulta = consulta.nprobes(int(config_busqueda["nprobes"]))
+    if config_busqueda.get("refine_factor"): consulta = consulta.refine_factor(int(config_busqueda["refine_factor"]))
+    if config_busqueda.get("ef"): consulta = consulta.ef(int(config_busqueda["ef"]))
+    return consulta
+
+def abrir_tabla_auxiliar(table, sufijo: str):
+    """'<tabla><sufijo>' de la misma base que 'table', o None si 007 no la escribió; una vez por versión de la tabla."""
+    clave = (table.name, table.version, sufijo)
+    registrar_acceso_cache(f"tabla{sufijo}", clave in _cache_tablas_auxiliares)
+    if clave not in _cache_tablas_auxiliares:
+        tabla_auxiliar = None
+        try:
+            db = lancedb.connect(os.path.dirname(table.uri))
+            if table.name + sufijo in db.table_names(): tabla_auxiliar = db.open_table(table.name + sufijo)
+        except Exception as e_auxiliar:
+            print(f"Advertencia: No se pudo abrir la tabla '{table.name}{sufijo}': {e_auxiliar}")
+        for vieja in [c for c in _cache_tablas_auxiliares if c[0] == table.name and c[2] == sufijo]: del _cache_tablas_auxiliares[vieja]
+        _cache_tablas_auxiliares[clave] = tabla_auxiliar
+    return _cache_tablas_auxiliares[clave]
+
+def abrir_tabla_alias(table):
+    return abrir_tabla_auxiliar(table, SUFIJO_TABLA_ALIAS)
+
+def alias_que_cumplen_filtro(table, filtro_sql: Optional[str]) -> Dict[str, Dict]:
+    """
+    id_canonico -> fila de '<tabla>_alias' que cumple el filtro, solo para canónicos que no lo cumplen por sí mismos
+    (los demás ya aparecen con sus propios metadatos). Sin filtro o sin tabla de alias, {}.
+    """
+    if not filtro_sql: return {}
+    tabla_alias = abrir_tabla_alias(table)
+    if tabla_alias is None: return {}
+    try:
+        alias: Dict[str, Dict] = {}
+        for fila in tabla_alias.search().where(filtro_sql).limit(None).to_list(): alias.setdefault(fila["id_canonico"], fila)
+        if alias:
+            propios = (table.search().where(f"({filtro_sql}) AND id IN ({lista_sql(list(alias))})").select(["id"])
+                       .limit(None).to_arrow().column("id").to_pylist())
+            for id_canonico in propios: alias.pop(id_canonico, None)
+        return alias
+    except Exception as e_alias:
+        print(f"Advertencia: No se pudieron consultar los alias con el filtro ({e_alias}).")
+        return {}
+
+def ampliar_filtro_con_alias(filtro_sql: Optional[str], alias: Dict[str, Dict]) -> Optional[str]:
+    if not alias: return filtro_sql
+    return f"({filtro_sql}) OR id IN ({lista_sql(list(alias))})"
+
+def presentar_alias(resultados: List[Dict], alias: Dict[str, Dict]) -> List[Dict]:
+    """Los canónicos que entraron por un alias se devuelven con el documento y los metadatos del alias."""
+    if not alias: return resultados
+    for fila in resultados:
+        if fila.get("id") in alias:
+            fila["id_canonico"] = fila["id"]
+            fila.update({c: alias[fila["id"]][c] for c in COLUMNAS_DE_ALIAS if c in alias[fila["id"]]})
+    return resultados
+
+def detectar_tipo_vector(table) -> str:
+    """'int8' si la tabla guarda vectores cuantizados (007 con TIPO_VECTOR_ALMACENADO='int8'); si no, el tipo de 'vector'."""
+    if "vector_int8" in table.schema.names: return "int8"
+    return "float16" if pa.types.is_float16(table.schema.field("vector").type.value_type) else "float32"
+
+def cargar_matriz_int8(table) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Carga (una vez por versión de la tabla) ids, matriz int8 y escalas; ocupa 1 byte por dimensión en RAM."""
+    clave = (table.name, table.version)
+    registrar_acceso_cache("matriz_int8", clave in _cache_matrices_int8)
+    if clave not in _cache_matrices_int8:
+        datos = table.search().select(["id", "vector_int8", "escala_vector"]).limit(None).to_arrow()
+        dim = datos.schema.field("vector_int8").type.list_size
+        matriz = datos.column("vector_int8").combine_chunks().flatten().to_numpy().reshape(-1, dim)
+        _cache_matrices_int8.clear()
+        _cache_matrices_int8[clave] = (datos.column("id").to_numpy(zero_copy_only=False), matriz,
+                                       datos.column("escala_vector").to_numpy().astype(np.float32))
+    return _cache_matrices_int8[clave]
+
+def similitudes_precision_completa(table, ids: List[str], q: np.ndarray, vectores_cuantizados: np.ndarray) -> np.ndarray:
+    """
+    Coseno de la consulta normalizada 'q' con los vectores originales de 'ids', leídos de '<tabla>_float32'. Un id sin
+    fila ahí (o una base sin esa tabla) se puntúa con su vector cuantizado (fila de vectores_cuantizados).
+    """
+    matriz = vectores_cuantizados.astype(np.float32) # Copia: se reemplazan las filas con su original
+    tabla_float32 = abrir_tabla_auxiliar(table, SUFIJO_TABLA_FLOAT32)
+    if tabla_float32 is not None and ids:
+        try:
+            datos = (tabla_float32.search().where(f"id IN ({lista_sql(ids)})").select(["id", "vector"])
+                     .limit(len(ids)).to_arrow())
+            if datos.num_rows:
+                posicion = {id_frag: i for i, id_frag in enumerate(ids)}
+                dim = datos.schema.field("vector").type.list_size
+                originales = datos.column("vector").combine_chunks().flatten().to_numpy(zero_copy_only=False).reshape(-1, dim)
+                filas = [posicion[id_frag] for id_frag in datos.column("id").to_pylist()]
+                matriz[filas] = originales
+        except Exception as e_float32:
+            print(f"Advertencia: No se pudieron leer los vectores float32 del rescoring ({e_float32}); se usan los cuantizados.")
+    return (matriz @ q) / np.maximum(np.linalg.norm(matriz, axis=1), 1e-12)
+
+def buscar_int8_con_rescoring(table, consulta: np.ndarray, k: int, factor: int, filtro_sql: Optional[str] = None,
+                              columnas: Optional[List[str]] = None) -> List[Dict]:
+    """
+    1) Puntuación aproximada: consulta cuantizada a int8 contra la matriz int8 (escaneo por bloques en NumPy).
+    2) Rescoring: los k*factor mejores candidatos se reordenan con la consulta en float32 contra sus vectores
+       originales float32 (similitudes_precision_completa).
+    """
+    ids, matriz, escalas = cargar_matriz_int8(table)
+    if len(ids) == 0: return []
+    q = consulta.astype(np.float32) / (np.linalg.norm(consulta) or 1.0)
+    escala_q = float(np.max(np.abs(q))) / 127.0 or 1.0
+    q_int8 = np.round(q / escala_q).astype(np.float32)
+    aprox = np.empty(len(ids), dtype=np.float32)
+    for inicio in range(0, len(ids), TAMANO_BLOQUE_ESCANEO_INT8):
+        bloque = matriz[inicio:inicio + TAMANO_BLOQUE_ESCANEO_INT8].astype(np.float32)
+        aprox[inicio:inicio + TAMANO_BLOQUE_ESCANEO_INT8] = (bloque @ q_int8) * escalas[inicio:inicio + TAMANO_BLOQUE_ESCANEO_INT8]
+    if filtro_sql:
+        permitidos = table.search().where(filtro_sql).select(["id"]).limit(None).to_arrow().column("id").to_numpy(zero_copy_only=False)
+        aprox[~np.isin(ids, permitidos)] = -np.inf
+    n_candidatos = min(len(ids), k * max(1, factor))
+    candidatos = np.argpartition(-aprox, n_candidatos - 1)[:n_candidatos]
+    candidatos = candidatos[np.isfinite(aprox[candidatos])]
+    if len(candidatos) == 0: return []
+    ids_candidatos = [str(ids[i]) for i in candidatos]
+    similitudes = similitudes_precision_completa(table, ids_candidatos, q, matriz[candidatos].astype(np.float32) * escalas[candidatos, None])
+    orden = np.argsort(-similitudes)[:k]
+    ids_finales = [ids_candidatos[i] for i in orden]
+    consulta_filas = table.search().where(f"id IN ({lista_sql(ids_finales)})")
+    if columnas: consulta_filas = consulta_filas.select([c for c in columnas if c != "_distance"])
+    filas_por_id = {f["id"]: f for f in consulta_filas.limit(len(ids_finales)).to_list()}
+    resultados = []
+    for id_frag, i in zip(ids_finales, orden):
+        if id_frag in filas_por_id:
+            fila = filas_por_id[id_frag]; fila["_distance"] = float(1.0 - similitudes[i]); resultados.append(fila)
+    return resultados
+
+@medir_punto_caliente("busqueda_vectorial")
+@trazar("busqueda_vectorial")
+def ejecutar_busqueda_vectorial(table, consulta: np.ndarray, k: int, config_busqueda: Dict,
+                                filtros: Optional[Dict[str, str]] = None, columnas: Optional[List[str]] = None) -> List[Dict]:
+    """Búsqueda por vector según cómo guardó 007 los vectores (float32, float16 o int8), con rescoring en float32."""
+    filtro_sql = construir_filtro_metadatos(filtros)
+    alias = alias_que_cumplen_filtro(table, filtro_sql)
+    filtro_sql = ampliar_filtro_con_alias(filtro_sql, alias)
+    return presentar_alias(buscar_por_tipo_vector(table, consulta, k, config_busqueda, filtro_sql, columnas), alias)
+
+def buscar_por_tipo_vector(table, consulta: np.ndarray, k: int, config_busqueda: Dict, filtro_sql: Optional[str],
+                           columnas: Optional[List[str]]) -> List[Dict]:
+    tipo_vector = detectar_tipo_vector(table)
+    factor = int(config_busqueda.get("factor_sobremuestreo_rescoring", FACTOR_SOBREMUESTREO_RESCORING))
+    if tipo_vector == "int8":
+        return buscar_int8_con_rescoring(table, consulta, k, factor, filtro_sql, columnas)
+    consulta_lance = aplicar_config_busqueda(table.search(consulta.astype(np.float32).tolist()), config_busqueda, filtro_sql=filtro_sql)
+    if tipo_vector == "float32" or factor <= 1:
+        if columnas: consulta_lance = consulta_lance.select(columnas)
+        return consulta_lance.limit(k).to_list()
+    # float16: se sobremuestrea y se reordena con similitud coseno exacta contra los vectores originales float32
+    if columnas: consulta_lance = consulta_lance.select(list(dict.fromkeys(columnas + ["id", "vector"])))
+    filas = consulta_lance.limit(k * factor).to_list()
+    if not filas: return []
+    q = consulta.astype(np.float32) / (np.linalg.norm(consulta) or 1.0)
+    similitudes = similitudes_precision_completa(table, [f["id"] for f in filas], q, np.asarray([f["vector"] for f in filas], dtype=np.float32))
+    resultados = []
+    for i in np.argsort(-similitudes)[:k]:
+        fila = filas[i]; fila["_distance"] = float(1.0 - similitudes[i])
+        if columnas and "vector" not in columnas: fila.pop("vector", None)
+        resultados.append(fila)
+    return resultados
+
+@medir_punto_caliente("busqueda_fts")
+@trazar("busqueda_fts")
+def buscar_fts(table, pregunta_texto: str, k: int = NUM_RESULTADOS_FTS, filtros: Optional[Dict[str, str]] = None) -> List[Dict]:
+    """
+    Búsqueda por palabras clave (BM25) sobre el índice FTS de 'texto' que crea 007. Sin índice devuelve [] y no lo
+    vuelve a intentar hasta que cambie la versión de la tabla.
+    """
+    if (table.name, table.version) in _tablas_sin_indice_fts: return []
+    try:
+        consulta = table.search(pregunta_texto, query_type="fts")
+        filtro_sql = construir_filtro_metadatos(filtros)
+        alias = alias_que_cumplen_filtro(table, filtro_sql)
+        filtro_sql = ampliar_filtro_con_alias(filtro_sql, alias)
+        if filtro_sql: consulta = consulta.where(filtro_sql, prefilter=True)
+        return presentar_alias(consulta.limit(k).to_list(), alias)
+    except Exception as e_fts:
+        print(f"Advertencia: Rama FTS no disponible ({e_fts}). Ejecuta 007 para crear el índice de texto completo.")
+        _tablas_sin_indice_fts.add((table.name, table.version)); return []
+
+def fusionar_por_rango_reciproco(listas_resultados: List[List[Dict]], constante: int = CONSTANTE_RRF) -> List[Dict]:
+    """Une listas ordenadas de fragmentos por 'id' con Reciprocal Rank Fusion (campo '_score_rrf', mayor es mejor)."""
+    fusionados: Dict[str, Dict] = {}
+    for resultados in listas_resultados:
+        for rango, fila in enumerate(resultados):
+            if fila["id"] not in fusionados: fusionados[fila["id"]] = dict(fila, _score_rrf=0.0)
+            fusionados[fila["id"]]["_score_rrf"] += 1.0 / (constante + rango + 1)
+    return sorted(fusionados.values(), key=lambda f: f["_score_rrf"], reverse=True)
@@ -0,0 +1,168 @@
+import os
+import time
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+from .documentos import leer_cabecera_documento
+
+# --- Configuración ---
+# Catálogo de documentos (SQLite) para listar, ordenar y filtrar sin recorrer las carpetas en cada consulta.
+# Lo actualiza 007 al terminar la ingesta; la aplicación web usa la misma lógica en core/catalogo.py y lo refresca
+# de forma incremental cuando cambia una carpeta. Solo se leen las primeras líneas de los archivos nuevos o modificados.
+ARCHIVO_CATALOGO = "catalogo_documentos.sqlite"
+COLECCIONES_CATALOGO = ("completo", "resumen")
+SUFIJO_RESUMEN = "_resumen.txt"
+TAMANO_PAGINA_POR_DEFECTO = 50
+MAX_TAMANO_PAGINA = 500
+# orden -> (columnas de ORDER BY, descendente). Todas las columnas están en un índice con la colección al frente.
+ORDENES_CATALOGO = {
+    "nombre": (("nombre",), False),
+    "-nombre": (("nombre",), True),
+    "fecha": (("fecha_publicacion", "nombre"), False),
+    "-fecha": (("fecha_publicacion", "nombre"), True),
+    "modificado": (("modificado", "nombre"), False),
+    "-modificado": (("modificado", "nombre"), True),
+}
+SENTENCIAS_ESQUEMA_CATALOGO = (
+    "CREATE TABLE IF NOT EXISTS documentos (coleccion TEXT NOT NULL, nombre TEXT NOT NULL, titulo TEXT NOT NULL DEFAULT '', "
+    "fecha_publicacion TEXT NOT NULL DEFAULT '', codigo_dof TEXT NOT NULL DEFAULT '', tamano_bytes INTEGER NOT NULL, "
+    "modificado INTEGER NOT NULL, desplazamiento_contenido INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (coleccion, nombre))",
+    "CREATE INDEX IF NOT EXISTS idx_documentos_fecha ON documentos (coleccion, fecha_publicacion, nombre)",
+    "CREATE INDEX IF NOT EXISTS idx_documentos_modificado ON documentos (coleccion, modificado, nombre)",
+    "CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT NOT NULL)",
+)
+COLUMNAS_LISTADO = ("nombre", "titulo", "fecha_publicacion", "codigo_dof", "tamano_bytes", "modificado")
+
+def abrir_catalogo(ruta_catalogo: str) -> sqlite3.Connection:
+    conexion = sqlite3.connect(ruta_catalogo, timeout=30, check_same_thread=False)
+    conexion.row_factory = sqlite3.Row
+    conexion.execute("PRAGMA journal_mode=WAL") # Lectores (web) y escritor (007) no se bloquean entre sí
+    conexion.execute("PRAGMA synchronous=NORMAL")
+    with conexion:
+        for sentencia in SENTENCIAS_ESQUEMA_CATALOGO: conexion.execute(sentencia)
+    migrar_catalogo(conexion)
+    return conexion
+
+def migrar_catalogo(conexion: sqlite3.Connection):
+    """Catálogos creados antes de guardar el desplazamiento del contenido: se agrega la columna y se releen todas las cabeceras."""
+    if "desplazamiento_contenido" in {fila[1] for fila in conexion.execute("PRAGMA table_info(documentos)")}: return
+    try:
+        with conexion:
+            conexion.execute("ALTER TABLE documentos ADD COLUMN desplazamiento_contenido INTEGER NOT NULL DEFAULT 0")
+            conexion.execute("UPDATE documentos SET modificado = 0")
+            conexion.execute("DELETE FROM meta WHERE clave = 'mtimes_carpetas'")
+    except sqlite3.OperationalError as e:
+        if "duplicate column" not in str(e): raise # Otro proceso migró al mismo tiempo
+
+def nombre_original_de_resumen(nombre_resumen: str) -> str:
+    return nombre_resumen[:-len(SUFIJO_RESUMEN)] + ".txt" if nombre_resumen.endswith(SUFIJO_RESUMEN) else nombre_resumen
+
+def nombre_resumen_de_original(nombre_original: str) -> str:
+    return nombre_original.rsplit(".txt", 1)[0] + SUFIJO_RESUMEN
+
+def actualizar_coleccion(conexion: sqlite3.Connection, coleccion: str, carpeta: str) -> Tuple[int, int]:
+    """
+    Sincroniza una colección con su carpeta: inserta o actualiza solo los archivos cuyo tamaño o mtime cambió
+    y borra los que ya no existen. Los resúmenes no tienen cabecera; toman título y fecha de su documento completo.
+    Devuelve (actualizados, borrados).
+    """
+    existentes = {fila["nombre"]: (fila["tamano_bytes"], fila["modificado"])
+                  for fila in conexion.execute("SELECT nombre, tamano_bytes, modificado FROM documentos WHERE coleccion = ?", (coleccion,))}
+    vistos, filas_nuevas = set(), []
+    if os.path.isdir(carpeta):
+        with os.scandir(carpeta) as entradas:
+            for entrada in entradas:
+                if not entrada.name.endswith(".txt") or not entrada.is_file(): continue
+                estado = entrada.stat()
+                vistos.add(entrada.name)
+                if existentes.get(entrada.name) == (estado.st_size, estado.st_mtime_ns): continue
+                cabecera = leer_cabecera_documento(entrada.path)
+                if coleccion == "resumen":
+                    original = conexion.execute("SELECT titulo, fecha_publicacion, codigo_dof FROM documentos WHERE coleccion = 'completo' AND nombre = ?",
+                                                (nombre_original_de_resumen(entrada.name),)).fetchone()
+                    cabecera.update(dict(original) if original else {"titulo": "", "fecha_publicacion": "", "codigo_dof": ""})
+                filas_nuevas.append((coleccion, entrada.name, cabecera["titulo"], cabecera["fecha_publicacion"], cabecera["codigo_dof"],
+                                     estado.st_size, estado.st_mtime_ns, cabecera["desplazamiento_contenido"]))
+    borrados = [(coleccion, nombre) for nombre in existentes if nombre not in vistos]
+    with conexion:
+        conexion.executemany("INSERT OR REPLACE INTO documentos (coleccion, nombre, titulo, fecha_publicacion, codigo_dof, tamano_bytes, modificado, "
+                             "desplazamiento_contenido) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", filas_nuevas)
+        conexion.executemany("DELETE FROM documentos WHERE coleccion = ? AND nombre = ?", borrados)
+        if coleccion == "completo": # Resúmenes ya catalogados de documentos que cambiaron (o llegaron después que su resumen)
+            conexion.executemany("UPDATE documentos SET titulo = ?, fecha_publicacion = ?, codigo_dof = ? WHERE coleccion = 'resumen' AND nombre = ?",
+                                 [(f[2], f[3], f[4], nombre_resumen_de_original(f[1])) for f in filas_nuevas])
+        if filas_nuevas or borrados:
+            conexion.execute("INSERT INTO meta (clave, valor) VALUES ('version', '1') "
+                             "ON CONFLICT(clave) DO UPDATE SET valor = CAST(valor AS INTEGER) + 1")
+    return len(filas_nuevas), len(borrados)
+
+def actualizar_catalogo(ruta_catalogo: str, carpeta_documentos: str, carpeta_resumenes: Optional[str] = None) -> Dict[str, Tuple[int, int]]:
+    inicio = time.perf_counter()
+    conexion = abrir_catalogo(ruta_catalogo)
+    try:
+        cambios = {"completo": actualizar_coleccion(conexion, "completo", carpeta_documentos)} # Primero: los resúmenes copian su cabecera
+        if carpeta_resumenes: cambios["resumen"] = actualizar_coleccion(conexion, "resumen", carpeta_resumenes)
+        totales = dict(conexion.execute("SELECT coleccion, COUNT(*) FROM documentos GROUP BY coleccion").fetchall())
+    finally:
+        conexion.close()
+    resumen_cambios = ", ".join(f"{c}: {totales.get(c, 0)} ({a} actualizados, {b} borrados)" for c, (a, b) in cambios.items())
+    print(f"Catálogo de documentos '{ruta_catalogo}' actualizado en {time.perf_counter() - inicio:.2f}s. {resumen_cambios}")
+    return cambios
+
+def ubicar_documento(conexion: sqlite3.Connection, coleccion: str, carpeta: str, nombre: str) -> Optional[Dict]:
+    """
+    Ruta, tamaño, mtime (ns) y desplazamiento del contenido de un archivo. El desplazamiento sale del catálogo si el archivo
+    no cambió desde que se catalogó; si cambió o no está catalogado se recalcula leyendo su cabecera. None si no existe.
+    """
+    ruta = os.path.join(carpeta, nombre)
+    try: estado = os.stat(ruta)
+    except OSError: return None
+    fila = conexion.execute("SELECT tamano_bytes, modificado, desplazamiento_contenido FROM documentos WHERE coleccion = ? AND nombre = ?",
+                            (coleccion, nombre)).fetchone()
+    if fila and (fila["tamano_bytes"], fila["modificado"]) == (estado.st_size, estado.st_mtime_ns): desplazamiento = fila["desplazamiento_contenido"]
+    else: desplazamiento = leer_cabecera_documento(ruta)["desplazamiento_contenido"]
+    return {"ruta": ruta, "tamano_bytes": estado.st_size, "modificado": estado.st_mtime_ns, "desplazamiento_contenido": min(desplazamiento, estado.st_size)}
+
+def obtener_documento(conexion: sqlite3.Connection, coleccion: str, nombre: str) -> Optional[Dict]:
+    fila = conexion.execute(f"SELECT {', '.join(COLUMNAS_LISTADO)} FROM documentos WHERE coleccion = ? AND nombre = ?", (coleccion, nombre)).fetchone()
+    return dict(fila) if fila else None
+
+def condiciones_filtro(coleccion: str, prefijo: Optional[str], desde: Optional[str], hasta: Optional[str]) -> Tuple[List[str], List]:
+    condiciones, parametros = ["coleccion = ?"], [coleccion]
+    if prefijo:
+        # Rango sobre la clave primaria en lugar de LIKE: usa el índice y distingue '_' literal
+        condiciones.append("nombre >= ? AND nombre < ?"); parametros += [prefijo, prefijo + "\U0010ffff"]
+    if desde: condiciones.append("fecha_publicacion >= ?"); parametros.append(desde)
+    if hasta: condiciones.append("fecha_publicacion <= ?"); parametros.append(hasta)
+    return condiciones, parametros
+
+def listar_documentos(conexion: sqlite3.Connection, coleccion: str = "completo", pagina: int = 1, tamano_pagina: int = TAMANO_PAGINA_POR_DEFECTO,
+                      orden: str = "nombre", prefijo: Optional[str] = None, desde: Optional[str] = None, hasta: Optional[str] = None,
+                      cursor: Optional[List] = None, contar_total: bool = True) -> Dict:
+    """
+    Una página del catálogo. Con 'cursor' (los valores de orden de la última fila de la página anterior, ver
+    'siguiente_cursor') la consulta salta directo por el índice: O(página) sin importar la profundidad.
+    Con 'pagina' se usa OFFSET sobre el índice (solo claves, sin leer filas) y luego se leen las filas de la página.
+    """
+    if coleccion not in COLECCIONES_CATALOGO: raise ValueError(f"Colección desconocida: {coleccion}")
+    if orden not in ORDENES_CATALOGO: raise ValueError(f"Orden desconocido: {orden}. Opciones: {', '.join(ORDENES_CATALOGO)}")
+    columnas_orden, descendente = ORDENES_CATALOGO[orden]
+    tamano_pagina = max(1, min(int(tamano_pagina), MAX_TAMANO_PAGINA)); pagina = max(1, int(pagina))
+    condiciones, parametros = condiciones_filtro(coleccion, prefijo, desde, hasta)
+    total = conexion.execute(f"SELECT COUNT(*) FROM documentos WHERE {' AND '.join(condiciones)}", parametros).fetchone()[0] if contar_total else None
+    direccion = "DESC" if descendente else "ASC"
+    order_by = ", ".join(f"{c} {direccion}" for c in columnas_orden)
+    if cursor:
+        if len(cursor) != len(columnas_orden): raise ValueError("El cursor no corresponde al orden pedido.")
+        condiciones_pagina = condiciones + [f"({', '.join(columnas_orden)}) {'<' if descendente else '>'} ({', '.join('?' * len(cursor))})"]
+        filas = conexion.execute(f"SELECT {', '.join(COLUMNAS_LISTADO)} FROM documentos WHERE {' AND '.join(condiciones_pagina)} "
+                                 f"ORDER BY {order_by} LIMIT ?", parametros + list(cursor) + [tamano_pagina]).fetchall()
+    else:
+        filas = conexion.execute(f"SELECT {', '.join(COLUMNAS_LISTADO)} FROM documentos WHERE rowid IN ("
+                                 f"SELECT rowid FROM documentos WHERE {' AND '.join(condiciones)} ORDER BY {order_by} LIMIT ? OFFSET ?) "
+                                 f"ORDER BY {order_by}", parametros + [tamano_pagina, (pagina - 1) * tamano_pagina]).fetchall()
+    documentos = [dict(fila) for fila in filas]
+    siguiente_cursor = [documentos[-1][c] for c in columnas_orden] if len(documentos) == tamano_pagina else None
+    return {"coleccion": coleccion, "orden": orden, "pagina": pagina, "tamano_pagina": tamano_pagina, "total": total,
+            "total_paginas": (total + tamano_pagina - 1) // tamano_pagina if total is not None else None,
+            "documentos": documentos, "siguiente_cursor": siguiente_cursor}
@@ -0,0 +1,111 @@
+import os
+import sys
+import runpy
+import argparse
+import importlib
+from typing import List, Optional
+
+# --- Configuración ---
+# Punto de entrada único 'rag-dof' (pyproject.toml) y 'python -m rag_dof'. Cada subcomando llama a main() del módulo de su
+# etapa con el resto de los argumentos, tomando el directorio actual como carpeta de datos; los scripts numerados llaman
+# al mismo main() con su propia carpeta. El módulo se importa al elegir el subcomando ('rag-dof query' no carga playwright).
+MODULOS_ETAPAS = {
+    "harvest": "recoleccion", # 003
+    "fetch": "descarga", # 004
+    "summarize": "resumenes", # 005
+    "index": "indexado", # 007
+    "query": "consulta", # 008
+}
+# Variantes de una etapa con una opción propia del CLI: (subcomando, opción) -> módulo
+MODULOS_VARIANTES = {
+    ("summarize", "contar_tokens"): "conteo_tokens", # 006
+    ("query", "rag"): "consulta_rag", # 009
+    ("query", "lote"): "consulta_lote", # 011
+}
+MODULOS_BENCH = {
+    "indices": "benchmark_indices", # 010
+    "cuantizacion": "reporte_cuantizacion", # 012
+}
+# Los benchmarks con servidores falsos y corpus sintético viven en bench/, que no se instala con el paquete: estos
+# subcomandos necesitan el repo ('pip install -e .' o 'python -m rag_dof' desde su raíz).
+DIRECTORIO_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_BENCH = {
+    "ejecucion": os.path.join("bench", "ejecutar_bench.py"),
+    "carga": os.path.join("bench", "carga_web.py"),
+    "arranque": os.path.join("bench", "arranque_importaciones.py"),
+    "comparar": os.path.join("bench", "comparar_resultados.py"),
+}
+MODULO_SETUP_WEB = "setup_web_project" # Se instala junto al paquete como módulo de primer nivel (pyproject.toml)
+
+def ejecutar_etapa(nombre_modulo: str, argumentos: List[str]):
+    """Importa rag_dof.<nombre_modulo> y corre su main() con los argumentos sobre el directorio actual."""
+    modulo = importlib.import_module(f"{__package__}.{nombre_modulo}")
+    modulo.main(argumentos, os.getcwd())
+
+def ejecutar_script(ruta: str, argumentos: List[str], directorio: Optional[str] = None):
+    """Ejecuta un script como 'python ruta argumentos...' (en 'directorio' si se indica) dentro de este mismo proceso."""
+    argv_original, path_original, cwd_original = sys.argv[:], sys.path[:], os.getcwd()
+    sys.argv = [ruta] + list(argumentos)
+    sys.path.insert(0, os.path.dirname(ruta)) # Como 'python script.py': los módulos vecinos (bench/, core/) son importables
+    if directorio: os.chdir(directorio)
+    try: runpy.run_path(ruta, run_name="__main__")
+    finally:
+        sys.argv, sys.path[:] = argv_original, path_original
+        os.chdir(cwd_original)
+
+def ejecutar_bench_del_repo(tipo: str, argumentos: List[str]):
+    ruta = os.path.join(DIRECTORIO_REPO, SCRIPTS_BENCH[tipo])
+    if not os.path.exists(ruta):
+        raise SystemExit(f"Error: 'rag-dof bench {tipo}' usa {SCRIPTS_BENCH[tipo]}, que no se instala con el paquete. "
+                         "Córrelo desde el repo (instalado con 'pip install -e .').")
+    ejecutar_script(ruta, argumentos)
+
+def servir_web(args, resto: List[str]):
+    """Genera (o actualiza) el proyecto web en args.directorio con setup_web_project y arranca su main.py."""
+    directorio = os.path.abspath(args.directorio)
+    os.makedirs(directorio, exist_ok=True)
+    if not args.sin_setup or not os.path.exists(os.path.join(directorio, "main.py")):
+        cwd_original = os.getcwd()
+        os.chdir(directorio) # setup_web_project genera el proyecto en el directorio actual
+        try: runpy.run_module(MODULO_SETUP_WEB, run_name="__main__", alter_sys=True)
+        finally: os.chdir(cwd_original)
+    ejecutar_script(os.path.join(directorio, "main.py"), resto, directorio)
+
+def construir_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="rag-dof", description="Pipeline RAG sobre el Diario Oficial de la Federación. "
+                                     "Los datos se leen y escriben en el directorio actual. Los argumentos no reconocidos "
+                                     "pasan a la etapa (p. ej. 'rag-dof index --profile').")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+    subparsers.add_parser("harvest", help="Recolecta las URLs de las notas del DOF (003).")
+    subparsers.add_parser("fetch", help="Descarga el contenido de las URLs recolectadas (004).")
+    parser_summarize = subparsers.add_parser("summarize", help="Genera resúmenes con Groq (005).")
+    parser_summarize.add_argument("--contar-tokens", dest="contar_tokens", action="store_true",
+                                  help="En su lugar, cuenta los tokens de documentos y resúmenes (006).")
+    subparsers.add_parser("index", help="Crea la base LanceDB: fragmentos, embeddings e índices (007).")
+    parser_query = subparsers.add_parser("query", help="Consulta interactiva de la base LanceDB (008).")
+    modo_query = parser_query.add_mutually_exclusive_group()
+    modo_query.add_argument("--rag", action="store_true", help="Preguntas respondidas con Groq sobre el contexto recuperado (009).")
+    modo_query.add_argument("--lote", action="store_true", help="Recuperación por lotes desde un JSONL de preguntas (011).")
+    parser_serve = subparsers.add_parser("serve", help="Genera el proyecto web con setup_web_project y arranca su main.py.")
+    parser_serve.add_argument("--directorio", default=os.getcwd(), help="Carpeta del proyecto web (por defecto, la actual).")
+    parser_serve.add_argument("--sin-setup", dest="sin_setup", action="store_true",
+                              help="No volver a correr setup_web_project si el proyecto ya existe.")
+    tipos_bench = list(MODULOS_BENCH) + list(SCRIPTS_BENCH)
+    parser_bench = subparsers.add_parser("bench", help="Benchmarks: " + ", ".join(tipos_bench) + ".")
+    parser_bench.add_argument("tipo", choices=tipos_bench, nargs="?", default="ejecucion")
+    return parser
+
+def resolver_modulo(args) -> str:
+    for (comando, opcion), nombre_modulo in MODULOS_VARIANTES.items():
+        if args.comando == comando and getattr(args, opcion, False): return nombre_modulo
+    if args.comando == "bench": return MODULOS_BENCH[args.tipo]
+    return MODULOS_ETAPAS[args.comando]
+
+def main(argv: Optional[List[str]] = None):
+    args, resto = construir_parser().parse_known_args(argv)
+    if args.comando == "serve": return servir_web(args, resto)
+    if args.comando == "bench" and args.tipo in SCRIPTS_BENCH: return ejecutar_bench_del_repo(args.tipo, resto)
+    ejecutar_etapa(resolver_modulo(args), resto)
+
+if __name__ == "__main__":
+    main()
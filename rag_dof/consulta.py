@@ -0,0 +1,157 @@
+import os
+import argparse
+import numpy as np
+from typing import List, Dict, Optional
+from .perfilado import agregar_argumentos_perfilado, iniciar_perfilado_si_se_pide
+from .perezoso import importar_perezoso, importar_modulos, iniciar_en_segundo_plano
+from .nombres import sanitizar_nombre_tabla_lancedb
+from .trazas import traza_activa, resumen_traza
+from .embeddings import MODELO_EMBEDDING_OLLAMA, obtener_embedding_ollama
+from .busqueda import (ARCHIVO_CONFIG_BUSQUEDA, separar_filtros_de_pregunta, construir_filtro_metadatos,
+                       cargar_config_busqueda_lancedb, ejecutar_busqueda_vectorial)
+from .diversificacion import num_candidatos_diversificacion, diversificar_fragmentos
+lancedb = importar_perezoso("lancedb") # Se importan al primer uso (ver rag_dof/perezoso.py)
+
+# --- Configuración ---
+# Etapa 008 ('rag-dof query'): consulta interactiva de la tabla de 007, solo recuperación.
+# Modelo de embedding, búsqueda (float32/float16/int8 con rescoring) y trazas vienen de embeddings.py, busqueda.py y
+# trazas.py, igual que en 009 y la web.
+NUM_FRAGMENTOS_A_RECUPERAR = 4 # Cuántos fragmentos más similares traer
+# Diversificación (ver rag_dof/diversificacion.py): MMR sobre k * FACTOR_SOBREMUESTREO_MMR candidatos para no devolver
+# k fragmentos consecutivos que repiten el mismo texto; MAX_FRAGMENTOS_POR_DOCUMENTO (None: sin límite) por documento.
+USAR_MMR = True
+MAX_FRAGMENTOS_POR_DOCUMENTO = None
+ARCHIVO_TRAZAS_JSONL = "trazas_rag.jsonl" # En el directorio base; None desactiva la exportación (ver README: trazas y métricas)
+NOMBRE_SERVICIO_TRAZAS = "rag-dof-008"
+
+def obtener_embedding_ollama_pregunta(texto: str, modelo: str = MODELO_EMBEDDING_OLLAMA) -> Optional[np.ndarray]:
+    """Genera un embedding para la pregunta del usuario."""
+    return obtener_embedding_ollama(texto, modelo)
+
+def buscar_fragmentos_similares_lance(db_path: str, table_name: str, pregunta_texto: str, k: int = NUM_FRAGMENTOS_A_RECUPERAR,
+                                      config_busqueda: Optional[Dict] = None, filtros: Optional[Dict[str, str]] = None) -> List[Dict]:
+    """
+    Conecta a LanceDB, genera embedding para la pregunta y busca los k fragmentos más similares.
+    Devuelve los fragmentos recuperados como una lista de diccionarios.
+    """
+    try:
+        db = lancedb.connect(db_path)
+        table = db.open_table(table_name)
+    except Exception as e:
+        print(f"Error al conectar o abrir la tabla LanceDB '{table_name}' en '{db_path}': {e}")
+        return []
+
+    print(f"\nGenerando embedding para la pregunta: '{pregunta_texto[:100]}...'")
+    pregunta_embedding = obtener_embedding_ollama_pregunta(pregunta_texto)
+
+    if pregunta_embedding is None:
+        return []
+
+    print(f"Buscando los {k} fragmentos más similares en la tabla '{table_name}'...")
+    try:
+        # LanceDB puede tomar el vector directamente o el texto (y usará el modelo de embedding asociado si se definió con SourceField/VectorField)
+        # Como aquí estamos generando el embedding de la pregunta explícitamente, lo pasamos.
+        # Si el esquema de la tabla se creó con LanceModel y especificando un modelo de embedding
+        # para el campo 'texto' (como SourceField), podríamos hacer table.search(pregunta_texto)
+        # pero como construimos los embeddings fuera y los pasamos como List[float], es más seguro
+        # generar el embedding de la pregunta con el mismo método y buscar por vector.
+        
+        # El vector de consulta se mantiene en float32; ejecutar_busqueda_vectorial lo convierte a lista para LanceDB
+        # y, si la tabla guarda vectores float16/int8, reordena los candidatos con precisión completa.
+        filtro_sql = construir_filtro_metadatos(filtros)
+        # prefilter=True: primero se reduce el conjunto candidato con los índices escalares y después se busca por vector
+        if filtro_sql: print(f"Prefiltrando por metadatos: {filtro_sql}")
+        k_busqueda = num_candidatos_diversificacion(k, USAR_MMR, MAX_FRAGMENTOS_POR_DOCUMENTO)
+        results = ejecutar_busqueda_vectorial(table, pregunta_embedding, k_busqueda, config_busqueda or {}, filtros)
+        results = diversificar_fragmentos(results, k, pregunta_embedding, USAR_MMR, MAX_FRAGMENTOS_POR_DOCUMENTO)
+        # to_list() devuelve una lista de diccionarios, donde cada dict es una fila.
+        # Ya incluye los metadatos y la distancia.
+        
+        print(f"Búsqueda completada. Se encontraron {len(results)} resultados.")
+        return results
+    except Exception as e:
+        print(f"Error durante la búsqueda en LanceDB: {e}")
+        return []
+
+
+def main(argv: Optional[List[str]] = None, directorio_base: Optional[str] = None):
+    """'rag-dof query' y 008: BD, configuración de búsqueda y trazas en directorio_base (por defecto, el directorio actual)."""
+    parser_cli = agregar_argumentos_perfilado(argparse.ArgumentParser(description="Consulta interactiva de la base LanceDB desde la terminal."))
+    iniciar_perfilado_si_se_pide(parser_cli.parse_args(argv), __file__)
+    termino_busqueda_usado = "decreto" # El mismo término usado para crear la BD y la tabla
+
+    script_dir = directorio_base or os.getcwd()
+    directorio_bd = os.path.join(script_dir, "lancedb_store_bge_m3") # Donde guardaste la BD Lance
+    nombre_de_la_tabla = sanitizar_nombre_tabla_lancedb(termino_busqueda_usado) # El mismo nombre de tabla que usa 007
+    config_busqueda_main = cargar_config_busqueda_lancedb(os.path.join(script_dir, ARCHIVO_CONFIG_BUSQUEDA))
+
+    print("Mini Aplicación de Consulta RAG (Terminal) - Probando LanceDB")
+    print("----------------------------------------------------------")
+    print(f"Usando Base de Datos LanceDB en: {directorio_bd}")
+    print(f"Tabla: {nombre_de_la_tabla}")
+    print(f"Modelo de Embedding (Ollama): {MODELO_EMBEDDING_OLLAMA}")
+    print(f"Se recuperarán los {NUM_FRAGMENTOS_A_RECUPERAR} fragmentos más relevantes.")
+    print("Filtros opcionales en la pregunta: dependencia:SHCP tipo:decreto anio:2024 desde:2024-01-01 hasta:2024-12-31 codigo:5712345")
+    print(f"Parámetros de búsqueda: {({c: v for c, v in config_busqueda_main.items() if c != 'benchmark'}) or 'defaults (sin config_busqueda_lancedb.json)'}")
+    print("----------------------------------------------------------")
+
+    if not os.path.exists(directorio_bd) or not os.path.isdir(directorio_bd):
+        print(f"Error: El directorio de la base de datos LanceDB '{directorio_bd}' no existe.")
+        print("Asegúrate de haber ejecutado primero 'rag-dof index' (007).")
+        return
+    
+    # Pequeña prueba para ver si podemos abrir la tabla. Corre en otro hilo (importar lancedb y ollama tarda unos 2 s)
+    # mientras se escribe la primera pregunta; su resultado se revisa antes de responderla.
+    def abrir_tabla_de_prueba():
+        tbl_test = lancedb.connect(directorio_bd).open_table(nombre_de_la_tabla)
+        filas_tabla = tbl_test.count_rows()
+        importar_modulos("ollama") # También el cliente de Ollama, para no importarlo en la primera consulta
+        return filas_tabla
+    apertura_tabla = iniciar_en_segundo_plano(abrir_tabla_de_prueba)
+
+    while True:
+        pregunta_usuario = input("\nIntroduce tu pregunta sobre los decretos (o escribe 'salir' para terminar):\n> ")
+        if pregunta_usuario.lower() == 'salir':
+            break
+        if not pregunta_usuario.strip():
+            continue
+        if apertura_tabla is not None:
+            try:
+                print(f"Tabla '{nombre_de_la_tabla}' abierta exitosamente. Contiene {apertura_tabla.result()} fragmentos.")
+            except Exception as e_test:
+                print(f"Error al intentar abrir la tabla '{nombre_de_la_tabla}' para prueba inicial: {e_test}")
+                print("Asegúrate de que el nombre de la tabla y el directorio de la BD sean correctos y la BD se haya creado.")
+                return
+            apertura_tabla = None
+
+        pregunta_sin_filtros, filtros_pregunta = separar_filtros_de_pregunta(pregunta_usuario)
+        with traza_activa("consulta_terminal", os.path.join(script_dir, ARCHIVO_TRAZAS_JSONL) if ARCHIVO_TRAZAS_JSONL else None,
+                          NOMBRE_SERVICIO_TRAZAS, pregunta=pregunta_usuario[:200]) as traza_consulta:
+            fragmentos_recuperados = buscar_fragmentos_similares_lance(directorio_bd, nombre_de_la_tabla, pregunta_sin_filtros or pregunta_usuario,
+                                                                       config_busqueda=config_busqueda_main, filtros=filtros_pregunta)
+        print(f"Tiempos: {resumen_traza(traza_consulta) or 'sin etapas medidas'}")
+
+        if fragmentos_recuperados:
+            print("\n--- Fragmentos Recuperados Más Relevantes ---")
+            for i, frag_info in enumerate(fragmentos_recuperados):
+                print(f"\nFragmento {i+1}:")
+                print(f"  ID del Fragmento: {frag_info.get('id', 'N/A')}")
+                print(f"  Archivo Original: {frag_info.get('nombre_archivo_original', 'N/A')}")
+                print(f"  Índice en Documento: {frag_info.get('indice_fragmento_en_doc', 'N/A')}")
+                if frag_info.get('id_canonico'): print(f"  Casi duplicado de: {frag_info['id_canonico']} (texto del fragmento canónico)")
+                print(f"  Publicación: {frag_info.get('fecha_publicacion') or 'N/A'} | Dependencia: {frag_info.get('dependencia') or 'N/A'} | Tipo: {frag_info.get('tipo_documento') or 'N/A'}")
+                # La distancia es una métrica interna de LanceDB, menor es mejor para L2/Euclidiana, mayor es mejor para Coseno (si no está normalizada a distancia)
+                # Por defecto, search() ordena por la métrica con la que se creó el índice (o L2 si no hay índice).
+                # bge-m3 suele usar similitud coseno, por lo que un valor más alto de similitud (o menor distancia coseno) es mejor.
+                # LanceDB devuelve un campo '_distance' que para 'cosine' es 1 - similitud_coseno (menor es mejor).
+                if '_distance' in frag_info:
+                    print(f"  Distancia (menor es mejor): {frag_info['_distance']:.4f}")
+                print(f"  Texto del Fragmento (primeros 300 caracteres):\n    \"{frag_info.get('texto', '')[:300]}...\"")
+            print("--------------------------------------------")
+        else:
+            print("No se encontraron fragmentos relevantes para tu pregunta en la base de datos.")
+
+    print("\nSaliendo de la aplicación de consulta.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
+from .perezoso import importar_perezoso
+from .nombres import sanitizar_nombre_tabla_lancedb
+from .embeddings import TAMANO_LOTE_EMBEDDINGS, obtener_embeddings_ollama_lote
+from .busqueda import (ARCHIVO_CONFIG_BUSQUEDA, cargar_config_busqueda_lancedb, detectar_tipo_vector, cargar_matriz_int8,
+                       ejecutar_busqueda_vectorial)
+lancedb = importar_perezoso("lancedb") # Se importan al primer uso (ver rag_dof/perezoso.py)
+
+# --- Configuración ---
+# Etapa 011 ('rag-dof query --lote'): recuperación por lotes a partir de un JSONL de preguntas, sin interacción.
+# Modelo de embedding, tamaño de lote y búsqueda (float32/float16/int8 con rescoring) vienen de embeddings.py y busqueda.py.
+NUM_FRAGMENTOS_A_RECUPERAR = 4
+NUM_HILOS_BUSQUEDA = 8 # Búsquedas vectoriales concurrentes contra LanceDB
+COLUMNAS_RESULTADO = ["id", "nombre_archivo_original", "indice_fragmento_en_doc", "texto", "_distance"]
+
+ESQUEMA_RESULTADOS = pa.schema([
+    ("consulta_id", pa.string()),
+    ("pregunta", pa.string()),
+    ("rango", pa.int32()),
+    ("id", pa.string()),
+    ("nombre_archivo_original", pa.string()),
+    ("indice_fragmento_en_doc", pa.int64()),
+    ("_distance", pa.float32()),
+    ("texto", pa.string()),
+])
+
+def leer_preguntas_jsonl(ruta_jsonl: str) -> List[Dict[str, str]]:
+    """
+    Lee un JSONL con una pregunta por línea: {"id": "...", "pregunta": "..."}.
+    Si falta 'id' se usa el número de línea.
+    """
+    preguntas = []
+    with open(ruta_jsonl, 'r', encoding='utf-8') as f:
+        for num_linea, linea in enumerate(f, start=1):
+            if not linea.strip(): continue
+            try:
+                registro = json.loads(linea)
+            except json.JSONDecodeError as e:
+                print(f"  Advertencia: Línea {num_linea} no es JSON válido ({e}). Saltando.")
+                continue
+            pregunta = (registro.get("pregunta") or "").strip()
+            if not pregunta:
+                print(f"  Advertencia: Línea {num_linea} sin campo 'pregunta'. Saltando.")
+                continue
+            preguntas.append({"id": str(registro.get("id", num_linea)), "pregunta": pregunta})
+    return preguntas
+
+def buscar_lote_en_tabla(table, vectores: List[Optional[List[float]]], k: int, config_busqueda: Dict,
+                         num_hilos: int = NUM_HILOS_BUSQUEDA) -> List[List[Dict]]:
+    """Ejecuta una búsqueda vectorial por pregunta en paralelo sobre la misma tabla abierta."""
+    def buscar_uno(vector: Optional[List[float]]) -> List[Dict]:
+        if vector is None: return []
+        try:
+            return ejecutar_busqueda_vectorial(table, np.asarray(vector, dtype=np.float32), k, config_busqueda, columnas=COLUMNAS_RESULTADO)
+        except Exception as e:
+            print(f"  Error en búsqueda LanceDB: {e}")
+            return []
+    if detectar_tipo_vector(table) == "int8": cargar_matriz_int8(table) # Una sola carga antes de repartir entre hilos
+    with ThreadPoolExecutor(max_workers=num_hilos) as executor:
+        return list(executor.map(buscar_uno, vectores))
+
+def resultados_a_tabla_arrow(preguntas: List[Dict[str, str]], resultados: List[List[Dict]]) -> pa.Table:
+    """Aplana los resultados por pregunta en una tabla Arrow (una fila por fragmento recuperado)."""
+    filas = {campo: [] for campo in ESQUEMA_RESULTADOS.names}
+    for pregunta, fragmentos in zip(preguntas, resultados):
+        for rango, frag in enumerate(fragmentos, start=1):
+            filas["consulta_id"].append(pregunta["id"])
+            filas["pregunta"].append(pregunta["pregunta"])
+            filas["rango"].append(rango)
+            for campo in ("id", "nombre_archivo_original", "indice_fragmento_en_doc", "_distance", "texto"):
+                filas[campo].append(frag.get(campo))
+    return pa.table(filas, schema=ESQUEMA_RESULTADOS)
+
+def buscar_fragmentos_lote_lance(db_path: str, table_name: str, preguntas: List[Dict[str, str]],
+                                 k: int = NUM_FRAGMENTOS_A_RECUPERAR, config_busqueda: Optional[Dict] = None) -> Optional[pa.Table]:
+    try:
+        db = lancedb.connect(db_path); table = db.open_table(table_name)
+    except Exception as e:
+        print(f"Error al conectar o abrir la tabla LanceDB '{table_name}' en '{db_path}': {e}")
+        return None
+
+    inicio = time.time()
+    print(f"Generando embeddings para {len(preguntas)} preguntas en lotes de {TAMANO_LOTE_EMBEDDINGS}...")
+    vectores = obtener_embeddings_ollama_lote([p["pregunta"] for p in preguntas])
+    tiempo_embeddings = time.time() - inicio
+    print(f"Embeddings generados en {tiempo_embeddings:.2f}s. Buscando {k} fragmentos por pregunta ({NUM_HILOS_BUSQUEDA} hilos)...")
+    resultados = buscar_lote_en_tabla(table, vectores, k, config_busqueda or {})
+    tiempo_total = time.time() - inicio
+    print(f"Búsqueda por lotes completada en {tiempo_total:.2f}s ({len(preguntas) / max(tiempo_total, 1e-9):.1f} preguntas/s).")
+    return resultados_a_tabla_arrow(preguntas, resultados)
+
+def guardar_tabla_resultados(tabla_resultados: pa.Table, ruta_salida: str):
+    """Guarda según la extensión: .parquet, .arrow (IPC) o .jsonl."""
+    if ruta_salida.endswith(".parquet"):
+        pq.write_table(tabla_resultados, ruta_salida)
+    elif ruta_salida.endswith(".arrow"):
+        with pa.OSFile(ruta_salida, "wb") as sink, pa.ipc.new_file(sink, tabla_resultados.schema) as writer:
+            writer.write_table(tabla_resultados)
+    else:
+        with open(ruta_salida, "w", encoding="utf-8") as f:
+            for fila in tabla_resultados.to_pylist():
+                f.write(json.dumps(fila, ensure_ascii=False) + "\n")
+    print(f"Resultados ({tabla_resultados.num_rows} filas) guardados en: {ruta_salida}")
+
+
+def main(argv: Optional[List[str]] = None, directorio_base: Optional[str] = None):
+    """'rag-dof query --lote' y 011: BD y configuración de búsqueda en directorio_base (por defecto, el directorio actual)."""
+    parser = argparse.ArgumentParser(description="Recuperación por lotes sobre LanceDB a partir de un JSONL de preguntas.")
+    parser.add_argument("entrada", help='Archivo JSONL con líneas {"id": "...", "pregunta": "..."}')
+    parser.add_argument("--salida", default="resultados_consulta_lote.parquet", help="Ruta .parquet, .arrow o .jsonl")
+    parser.add_argument("--k", type=int, default=NUM_FRAGMENTOS_A_RECUPERAR)
+    args = parser.parse_args(argv)
+
+    termino_busqueda_usado = "decreto"
+    script_dir = directorio_base or os.getcwd()
+    directorio_bd = os.path.join(script_dir, "lancedb_store_bge_m3")
+    nombre_de_la_tabla = sanitizar_nombre_tabla_lancedb(termino_busqueda_usado)
+    config_busqueda_main = cargar_config_busqueda_lancedb(os.path.join(script_dir, ARCHIVO_CONFIG_BUSQUEDA))
+
+    if not os.path.exists(args.entrada):
+        print(f"Error: El archivo de preguntas '{args.entrada}' no existe."); return
+    preguntas_main = leer_preguntas_jsonl(args.entrada)
+    if not preguntas_main:
+        print("No se encontraron preguntas para procesar."); return
+
+    tabla_resultados_main = buscar_fragmentos_lote_lance(directorio_bd, nombre_de_la_tabla, preguntas_main,
+                                                         k=args.k, config_busqueda=config_busqueda_main)
+    if tabla_resultados_main is not None:
+        guardar_tabla_resultados(tabla_resultados_main, args.salida)
+
+if __name__ == "__main__":
+    main()
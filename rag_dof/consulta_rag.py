@@ -0,0 +1,252 @@
+import os
+import time
+import json
+import asyncio
+import argparse
+import numpy as np
+from dotenv import load_dotenv
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+from .perfilado import agregar_argumentos_perfilado, iniciar_perfilado_si_se_pide
+from .perezoso import importar_perezoso, importar_modulos, iniciar_en_segundo_plano
+from .tokenizador import recortar_a_tokens, precargar_codificaciones
+from .nombres import sanitizar_nombre, sanitizar_nombre_tabla_lancedb
+from .trazas import trazar, traza_activa, calcular_ruta_critica
+from .limites import LimitadorPorMinuto, CuotaLimitadorPorMinuto
+from .embeddings import MODELO_EMBEDDING_OLLAMA, obtener_embedding_ollama
+from .busqueda import (ARCHIVO_CONFIG_BUSQUEDA, NUM_RESULTADOS_FTS, separar_filtros_de_pregunta, cargar_config_busqueda_lancedb,
+                       ejecutar_busqueda_vectorial, buscar_fts)
+from .reranking import NUM_CANDIDATOS_RERANKING, cargar_reranker, reordenar_fragmentos
+from .diversificacion import num_candidatos_diversificacion, diversificar_fragmentos
+from .contexto import SUFIJO_TABLA_RESUMENES, MAX_TOKENS_POR_RESUMEN_EN_CONTEXTO, cargar_resumenes_en_memoria, leer_resumen_de_archivo
+from .generacion import OrquestadorRag, generar_respuesta_groq_stream
+lancedb = importar_perezoso("lancedb") # Se importan al primer uso (ver rag_dof/perezoso.py)
+groq = importar_perezoso("groq")
+
+# --- Configuración ---
+load_dotenv()
+
+# Etapa 009 ('rag-dof query --rag'): preguntas en la terminal respondidas por Groq con el contexto recuperado.
+# Embeddings, búsqueda (vectorial, FTS y fusión), reranking, empaquetado del contexto, orquestador, prompt y respuesta de Groq
+# en streaming vienen de los otros módulos del paquete, igual que en la web (generacion.py); aquí solo está la configuración de 009.
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+MODELO_GENERACION_GROQ = "deepseek-r1-distill-llama-70b"
+ENCODING_TIKTOKEN_GENERACION = "cl100k_base"
+
+LIMITE_SOLICITUDES_POR_MINUTO_GROQ = 30
+LIMITE_TOKENS_POR_MINUTO_PROCESADOS_GROQ = 6000
+
+NUM_DOCUMENTOS_RELEVANTES_K = 4
+# MODO_RERANKING: "cross_encoder", "bge_m3_colbert" o "ninguno" (ver rag_dof/reranking.py); se pasa en cada llamada.
+MODO_RERANKING = "cross_encoder"
+# Diversificación (ver rag_dof/diversificacion.py): el reranker devuelve k * FACTOR_SOBREMUESTREO_MMR candidatos y MMR elige
+# los k del contexto, para no gastarlos en fragmentos consecutivos que se repiten. MAX_FRAGMENTOS_POR_DOCUMENTO: None = sin límite.
+USAR_MMR = True
+MAX_FRAGMENTOS_POR_DOCUMENTO = None
+# Orquestador de la consulta (asyncio): el embedding, la rama FTS y el calentamiento de la conexión a Groq arrancan a la vez;
+# los resúmenes de los documentos candidatos se piden en cuanto llega cada lista de resultados.
+USAR_RAMA_FTS = True # Requiere el índice FTS sobre 'texto' que crea 007; sin él la rama se omite
+MAX_CONTEXTO_TOTAL_PARA_GENERACION = LIMITE_TOKENS_POR_MINUTO_PROCESADOS_GROQ * 0.90
+MAX_COMPLETION_TOKENS_GENERACION = 768
+TEMPERATURE_GENERACION = 0.3
+
+MAX_API_REINTENTOS_GROQ = 3
+TIEMPO_ESPERA_REINTENTO_GROQ_SEGUNDOS = 10
+PAUSA_MINIMA_GROQ_SEGUNDOS = 2.0
+ARCHIVO_TRAZAS_JSONL = "trazas_rag.jsonl" # En el directorio base; None desactiva la exportación (ver README: trazas y métricas)
+NOMBRE_SERVICIO_TRAZAS = "rag-dof-009"
+
+limitador_groq = LimitadorPorMinuto("Groq")
+
+def obtener_embedding_ollama_pregunta(texto: str, modelo: str = MODELO_EMBEDDING_OLLAMA) -> Optional[np.ndarray]:
+    return obtener_embedding_ollama(texto, modelo)
+
+def buscar_fragmentos_similares_lance(db_path: str, table_name: str, pregunta_texto: str, k: int = NUM_DOCUMENTOS_RELEVANTES_K,
+                                      config_busqueda: Optional[Dict] = None, filtros: Optional[Dict[str, str]] = None) -> List[Dict]:
+    try:
+        db = lancedb.connect(db_path); table = db.open_table(table_name)
+    except Exception as e: print(f"Error conectando/abriendo tabla LanceDB '{table_name}': {e}"); return []
+    print(f"Generando embedding para pregunta: '{pregunta_texto[:70]}...'")
+    pregunta_embedding = obtener_embedding_ollama_pregunta(pregunta_texto)
+    if pregunta_embedding is None: return []
+    k_candidatos = num_candidatos_diversificacion(k, USAR_MMR, MAX_FRAGMENTOS_POR_DOCUMENTO)
+    k_busqueda = max(k_candidatos, NUM_CANDIDATOS_RERANKING) if MODO_RERANKING != "ninguno" else k_candidatos
+    print(f"Buscando {k_busqueda} fragmentos más similares en '{table_name}'...")
+    try:
+        results = ejecutar_busqueda_vectorial(table, pregunta_embedding, k_busqueda, config_busqueda or {}, filtros)
+        print(f"Búsqueda completada. {len(results)} resultados.")
+    except Exception as e: print(f"Error en búsqueda LanceDB: {e}"); return []
+    candidatos = reordenar_fragmentos(pregunta_texto, results, k_candidatos, modo=MODO_RERANKING)
+    return diversificar_fragmentos(candidatos, k, pregunta_embedding, USAR_MMR, MAX_FRAGMENTOS_POR_DOCUMENTO)
+
+async def calentar_conexion_groq(cliente_groq: "groq.AsyncGroq"):
+    """Petición ligera (lista de modelos) para abrir la conexión TLS con Groq mientras se recupera el contexto."""
+    try: await cliente_groq.models.list()
+    except Exception as e_calentar: print(f"  Advertencia: No se pudo calentar la conexión con Groq: {e_calentar}")
+
+def imprimir_tiempos_etapas(tiempos_etapas: Dict[str, Tuple[float, float]]):
+    ruta_critica = calcular_ruta_critica(tiempos_etapas)
+    total = max((fin for _, fin in tiempos_etapas.values()), default=0.0) or 1.0
+    print("\n--- Tiempos por etapa (ms desde el inicio de la consulta; * = ruta crítica) ---")
+    for etapa, (inicio, fin) in sorted(tiempos_etapas.items(), key=lambda x: x[1][0]):
+        barra = " " * int(40 * inicio / total) + "#" * max(1, int(40 * (fin - inicio) / total))
+        print(f"{'*' if etapa in ruta_critica else ' '} {etapa:<24} {inicio:>8.0f} {fin:>8.0f} {fin - inicio:>8.0f}  |{barra}")
+    print(f"  Ruta crítica: {' -> '.join(ruta_critica)}")
+
+async def orquestar_consulta_rag(cliente_groq: Optional["groq.AsyncGroq"], table, pregunta_texto: str, k: int = NUM_DOCUMENTOS_RELEVANTES_K,
+                                 config_busqueda: Optional[Dict] = None, filtros: Optional[Dict[str, str]] = None,
+                                 resumenes_en_memoria: Optional[Dict] = None, carpeta_resumenes: Optional[str] = None
+                                 ) -> Tuple[List[Dict], Optional[str], int, Dict[str, Tuple[float, float]]]:
+    """
+    Recuperación y prompt con el orquestador compartido con la web (rag_dof/generacion.py): embedding -> búsqueda
+    vectorial || búsqueda FTS || calentamiento de Groq. Aquí solo se ponen los servicios y la configuración de 009.
+    Devuelve (fragmentos, prompt, tokens del prompt, tiempos por etapa).
+    """
+    orquestador = OrquestadorRag(
+        obtener_embedding=lambda pregunta: asyncio.to_thread(obtener_embedding_ollama_pregunta, pregunta),
+        buscar_vectorial=lambda embedding, k_busqueda, filtros_busqueda: asyncio.to_thread(
+            ejecutar_busqueda_vectorial, table, embedding, k_busqueda, config_busqueda or {}, filtros_busqueda),
+        buscar_fts=lambda pregunta, k_fts, filtros_busqueda: asyncio.to_thread(buscar_fts, table, pregunta, k_fts, filtros_busqueda),
+        obtener_resumenes=lambda nombres: asyncio.to_thread(obtener_resumenes_para_contexto, nombres, resumenes_en_memoria, carpeta_resumenes),
+        reordenar=lambda pregunta, candidatos, k_candidatos: reordenar_fragmentos(pregunta, candidatos, k_candidatos, modo=MODO_RERANKING),
+        calentar_llm=(lambda: calentar_conexion_groq(cliente_groq)) if cliente_groq else None,
+        k=k, modo_reranking=MODO_RERANKING, num_candidatos_reranking=NUM_CANDIDATOS_RERANKING, usar_mmr=USAR_MMR,
+        max_fragmentos_por_documento=MAX_FRAGMENTOS_POR_DOCUMENTO, usar_rama_fts=USAR_RAMA_FTS, num_resultados_fts=NUM_RESULTADOS_FTS,
+        max_tokens_prompt=MAX_CONTEXTO_TOTAL_PARA_GENERACION, encoding=ENCODING_TIKTOKEN_GENERACION,
+    )
+    fragmentos, prompt_completo, tokens_prompt, tiempos = await orquestador.consultar(pregunta_texto, filtros)
+    if not fragmentos: return [], None, 0, tiempos
+    print("\n--- PROMPT COMPLETO ENVIADO A GROQ ---")
+    print(prompt_completo)
+    print(f"--- FIN DEL PROMPT (Tokens estimados: {tokens_prompt}) ---\n")
+    return fragmentos, prompt_completo, tokens_prompt, tiempos
+
+@trazar("carga_resumenes")
+def obtener_resumenes_para_contexto(nombres_archivo: List[str], resumenes_en_memoria: Optional[Dict] = None,
+                                    carpeta_base_resumenes: Optional[str] = None) -> Dict[str, Optional[Tuple[str, int]]]:
+    """Resúmenes de los documentos recuperados: del diccionario en memoria; sin tabla de resúmenes, de los _resumen.txt."""
+    if resumenes_en_memoria is not None: return {n: resumenes_en_memoria.get(n) for n in nombres_archivo}
+    resumenes = {}
+    for nombre in nombres_archivo:
+        resumen = leer_resumen_de_archivo(nombre, carpeta_base_resumenes) if carpeta_base_resumenes else None
+        resumenes[nombre] = recortar_a_tokens(resumen, MAX_TOKENS_POR_RESUMEN_EN_CONTEXTO, ENCODING_TIKTOKEN_GENERACION) if resumen else None
+    return resumenes
+
+def generar_respuesta_rag_stream(cliente_groq: "groq.AsyncGroq", prompt_completo: str, tokens_prompt_final_enviados: int) -> AsyncIterator[str]:
+    """
+    Generador async con los fragmentos de texto de la respuesta de Groq según van llegando (rag_dof/generacion.py, el
+    mismo que usa la web). La cuota es la de este proceso: limitador_groq con los límites por minuto de 009.
+    """
+    cuota = CuotaLimitadorPorMinuto(limitador_groq, LIMITE_SOLICITUDES_POR_MINUTO_GROQ, LIMITE_TOKENS_POR_MINUTO_PROCESADOS_GROQ,
+                                    MAX_COMPLETION_TOKENS_GENERACION)
+    return generar_respuesta_groq_stream(cliente_groq, prompt_completo, tokens_prompt_final_enviados, cuota, modelo=MODELO_GENERACION_GROQ,
+                                         temperatura=TEMPERATURE_GENERACION, max_tokens=MAX_COMPLETION_TOKENS_GENERACION,
+                                         max_reintentos=MAX_API_REINTENTOS_GROQ, espera_reintento_segundos=TIEMPO_ESPERA_REINTENTO_GROQ_SEGUNDOS,
+                                         encoding=ENCODING_TIKTOKEN_GENERACION)
+
+async def responder_pregunta(cliente_groq: "groq.AsyncGroq", tabla, pregunta_usuario: str, filtros: Dict[str, str], config_busqueda: Dict,
+                             resumenes_en_memoria: Optional[Dict], carpeta_resumenes: str) -> List[Dict]:
+    """Recupera el contexto, imprime la respuesta de Groq según llega y los tiempos por etapa. Devuelve los fragmentos usados."""
+    print(f"Recuperando contexto para: '{pregunta_usuario[:70]}...'")
+    fragmentos_recuperados, prompt_rag, tokens_usados_prompt_llm, tiempos_etapas = await orquestar_consulta_rag(
+        cliente_groq, tabla, pregunta_usuario, config_busqueda=config_busqueda, filtros=filtros,
+        resumenes_en_memoria=resumenes_en_memoria, carpeta_resumenes=carpeta_resumenes
+    )
+    print("\nRespuesta del Asistente RAG:")
+    print("==================================================")
+    if not fragmentos_recuperados:
+        print("No se encontraron fragmentos relevantes.")
+        print("==================================================")
+        return []
+    # Los tokens se imprimen según llegan de Groq en lugar de esperar la respuesta completa
+    inicio_respuesta = time.perf_counter(); primer_token_ms = None; hubo_texto = False
+    async for parte_respuesta in generar_respuesta_rag_stream(cliente_groq, prompt_rag, tokens_usados_prompt_llm):
+        if primer_token_ms is None: primer_token_ms = (time.perf_counter() - inicio_respuesta) * 1000
+        hubo_texto = hubo_texto or bool(parte_respuesta.strip())
+        print(parte_respuesta, end="", flush=True)
+    if not hubo_texto: print("El modelo no generó una respuesta.", end="")
+    print("\n==================================================")
+    if primer_token_ms is not None:
+        print(f"(Primer token en {primer_token_ms:.0f} ms; respuesta completa en {(time.perf_counter() - inicio_respuesta) * 1000:.0f} ms)")
+        # Se agregan a la línea de tiempo de la consulta, a continuación de la construcción del prompt
+        fin_prompt_ms = max(fin for _, fin in tiempos_etapas.values())
+        tiempos_etapas["llm_primer_token"] = (fin_prompt_ms, fin_prompt_ms + primer_token_ms)
+        tiempos_etapas["llm_respuesta_completa"] = (fin_prompt_ms + primer_token_ms, fin_prompt_ms + (time.perf_counter() - inicio_respuesta) * 1000)
+    imprimir_tiempos_etapas(tiempos_etapas)
+    return fragmentos_recuperados
+
+def imprimir_fragmentos_usados(fragmentos_recuperados: List[Dict]):
+    print("\n--- Fragmentos de Documentos Originales Usados para Contextualizar (base de la recuperación) ---")
+    for i, frag_info in enumerate(fragmentos_recuperados):
+        distancia = frag_info.get('_distance', float('inf'))
+        print(f"\nFragmento {i+1}:")
+        print(f"  ID: {frag_info.get('id', 'N/A')}")
+        print(f"  Archivo Original: {frag_info.get('nombre_archivo_original', 'N/A')}")
+        print(f"  Índice en Documento: {frag_info.get('indice_fragmento_en_doc', 'N/A')}")
+        if frag_info.get('id_canonico'): print(f"  Casi duplicado de: {frag_info['id_canonico']} (texto del fragmento canónico)")
+        print(f"  Distancia (menor es mejor): {distancia:.4f}")
+        if '_score_reranking' in frag_info: print(f"  Score reranking (mayor es mejor): {frag_info['_score_reranking']:.4f}")
+        print(f"  Texto del Fragmento (primeros 250 caracteres):\n    \"{frag_info.get('texto', '')[:250].replace(chr(10), ' ')}...\"")
+    print("------------------------------------------------------------------------------------")
+
+async def sesion_interactiva(preparacion, nombre_de_la_tabla: str, config_busqueda: Dict, carpeta_resumenes: str, ruta_trazas: Optional[str]):
+    """Bucle de preguntas en un solo event loop: el cliente AsyncGroq conserva sus conexiones entre preguntas."""
+    while True:
+        pregunta_usuario = await asyncio.to_thread(input, "\nIntroduce tu pregunta (o 'salir'). Filtros opcionales: dependencia:SHCP tipo:decreto anio:2024 desde:AAAA-MM-DD hasta:AAAA-MM-DD\n> ")
+        if pregunta_usuario.lower() == 'salir': break
+        if not pregunta_usuario.strip(): continue
+        try: cliente_groq, tabla, resumenes_en_memoria, mensajes_preparacion = await asyncio.wrap_future(preparacion)
+        except Exception as e_test: print(f"Error al abrir tabla '{nombre_de_la_tabla}': {e_test}"); return
+        if mensajes_preparacion: print("\n".join(mensajes_preparacion)); mensajes_preparacion.clear()
+        pregunta_usuario, filtros_pregunta = separar_filtros_de_pregunta(pregunta_usuario)
+        if not pregunta_usuario: continue
+        with traza_activa("consulta_rag", ruta_trazas, NOMBRE_SERVICIO_TRAZAS, pregunta=pregunta_usuario[:200], filtros=json.dumps(filtros_pregunta, ensure_ascii=False)) as traza_consulta:
+            fragmentos_recuperados = await responder_pregunta(cliente_groq, tabla, pregunta_usuario, filtros_pregunta, config_busqueda,
+                                                              resumenes_en_memoria, carpeta_resumenes)
+        if ruta_trazas: print(f"(Traza {traza_consulta['trace_id']} agregada a {ARCHIVO_TRAZAS_JSONL})")
+        # No mostramos el conteo de tokens del prompt aquí, ya se mostró antes de la llamada a Groq
+        if fragmentos_recuperados: imprimir_fragmentos_usados(fragmentos_recuperados)
+        await asyncio.sleep(PAUSA_MINIMA_GROQ_SEGUNDOS)
+
+
+def main(argv: Optional[List[str]] = None, directorio_base: Optional[str] = None):
+    """'rag-dof query --rag' y 009: BD, resúmenes, configuración y trazas en directorio_base (por defecto, el directorio actual)."""
+    parser_cli = agregar_argumentos_perfilado(argparse.ArgumentParser(description="Aplicación RAG interactiva en la terminal (LanceDB + Groq)."))
+    iniciar_perfilado_si_se_pide(parser_cli.parse_args(argv), __file__)
+    if not GROQ_API_KEY: print("Error: GROQ_API_KEY no configurada."); return
+    termino_busqueda_usado = "decreto"
+    script_dir = directorio_base or os.getcwd()
+    directorio_bd = os.path.join(script_dir, "lancedb_store_bge_m3")
+    nombre_de_la_tabla = sanitizar_nombre_tabla_lancedb(termino_busqueda_usado)
+    carpeta_resumenes_entrada = sanitizar_nombre(termino_busqueda_usado, es_carpeta=True) + "_colectados_resumen"
+    ruta_carpeta_resumenes_completa = os.path.join(script_dir, carpeta_resumenes_entrada)
+    config_busqueda_main = cargar_config_busqueda_lancedb(os.path.join(script_dir, ARCHIVO_CONFIG_BUSQUEDA))
+
+    print(f"App RAG :: DOF :: Ollama (Embed) :: Groq (Gen) || Modelo Groq: {MODELO_GENERACION_GROQ}")
+    print(f"Usando resúmenes de: {ruta_carpeta_resumenes_completa}")
+    print("--------------------------------------------------------------------------------")
+    if not os.path.exists(directorio_bd) or not os.path.isdir(directorio_bd):
+        print(f"Error: Dir BD LanceDB '{directorio_bd}' no existe."); return
+    if not os.path.exists(ruta_carpeta_resumenes_completa) or not os.path.isdir(ruta_carpeta_resumenes_completa):
+        print(f"Error: Carpeta de resúmenes '{ruta_carpeta_resumenes_completa}' no existe."); return
+    # Importar lancedb, ollama y groq, abrir la tabla, cargar los resúmenes y la tabla BPE toma unos segundos: se hace
+    # en otro hilo mientras se escribe la primera pregunta, y los mensajes se muestran al revisar el resultado.
+    def preparar_consulta() -> Tuple:
+        mensajes = []
+        db_test = lancedb.connect(directorio_bd); tbl_test = db_test.open_table(nombre_de_la_tabla)
+        mensajes.append(f"Tabla LanceDB '{nombre_de_la_tabla}' abierta. Contiene {tbl_test.count_rows()} fragmentos (de docs completos).")
+        resumenes_en_memoria = None
+        if nombre_de_la_tabla + SUFIJO_TABLA_RESUMENES in db_test.table_names():
+            resumenes_en_memoria = cargar_resumenes_en_memoria(db_test.open_table(nombre_de_la_tabla + SUFIJO_TABLA_RESUMENES))
+            mensajes.append(f"{len(resumenes_en_memoria)} resúmenes cargados en memoria desde '{nombre_de_la_tabla + SUFIJO_TABLA_RESUMENES}'.")
+        importar_modulos("ollama")
+        cargar_reranker(MODO_RERANKING) # Fuera de la primera consulta y de su presupuesto de reranking
+        try: precargar_codificaciones((ENCODING_TIKTOKEN_GENERACION,))
+        except Exception as e_bpe: mensajes.append(f"Advertencia: No se pudo cargar la codificación '{ENCODING_TIKTOKEN_GENERACION}' ({e_bpe}); los tokens se aproximarán por palabras.")
+        return groq.AsyncGroq(), tbl_test, resumenes_en_memoria, mensajes
+    ruta_trazas = os.path.join(script_dir, ARCHIVO_TRAZAS_JSONL) if ARCHIVO_TRAZAS_JSONL else None
+    asyncio.run(sesion_interactiva(iniciar_en_segundo_plano(preparar_consulta), nombre_de_la_tabla, config_busqueda_main,
+                                   ruta_carpeta_resumenes_completa, ruta_trazas))
+    print("\nSaliendo...")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import os
+from typing import Dict, List, Optional, Tuple
+from .fragmentacion import CHUNK_OVERLAP_TOKENS
+from .tokenizador import CODIFICACIONES_USADAS, obtener_codificacion, contar_tokens, recortar_a_tokens
+
+# --- Configuración ---
+# Armado del contexto del prompt RAG (009 y la web) con conteos de tokens precalculados: los fragmentos traen
+# 'num_tokens' y 'caracteres_traslape' (007) y los resúmenes vienen de '<tabla>_resumenes' (005/007) ya recortados.
+SUFIJO_TABLA_RESUMENES = "_resumenes"
+SUFIJO_ARCHIVO_RESUMEN = "_resumen.txt"
+ENCODING_TIKTOKEN_CONTEXTO = CODIFICACIONES_USADAS[0]
+MAX_TOKENS_POR_RESUMEN_EN_CONTEXTO = 400
+MARGEN_TOKENS_EMPAQUETADO = 64 # Encabezados y separadores que el conteo por pieza no ve
+MIN_TOKENS_FRAGMENTO_PARCIAL = 200 # Por debajo de esto no vale la pena meter un fragmento recortado
+TOKENS_ENCABEZADO_PIEZA = 24 # Estimación de la línea "Fragmento N (del archivo: ...)" / "Resumen del documento ..."
+COLUMNAS_RESUMEN_CONTEXTO = ["nombre_archivo_original", "resumen_contexto", "num_tokens_contexto"]
+
+def construir_fila_resumen(nombre_archivo_original: str, resumen: str) -> Dict:
+    """Fila de '<tabla>_resumenes': resumen completo y recortado a MAX_TOKENS_POR_RESUMEN_EN_CONTEXTO, con sus conteos."""
+    encoding = obtener_codificacion(ENCODING_TIKTOKEN_CONTEXTO)
+    tokens_resumen = encoding.encode(resumen)
+    tokens_contexto = tokens_resumen[:MAX_TOKENS_POR_RESUMEN_EN_CONTEXTO]
+    return {
+        "nombre_archivo_original": nombre_archivo_original,
+        "resumen": resumen,
+        "num_tokens": len(tokens_resumen),
+        "resumen_contexto": resumen if len(tokens_resumen) == len(tokens_contexto) else encoding.decode(tokens_contexto),
+        "num_tokens_contexto": len(tokens_contexto),
+    }
+
+def cargar_resumenes_en_memoria(tabla_resumenes) -> Dict[str, Tuple[str, int]]:
+    """Lee una sola vez la tabla '<tabla>_resumenes': nombre_archivo -> (resumen recortado, num_tokens)."""
+    datos = tabla_resumenes.search().select(COLUMNAS_RESUMEN_CONTEXTO).limit(None).to_arrow().to_pydict()
+    return {nombre: (texto, num_tokens) for nombre, texto, num_tokens in
+            zip(datos["nombre_archivo_original"], datos["resumen_contexto"], datos["num_tokens_contexto"])}
+
+def leer_resumen_de_archivo(nombre_archivo_original_txt: str, carpeta_base_resumenes: str) -> Optional[str]:
+    """El _resumen.txt de un documento (para bases anteriores a la tabla de resúmenes); None si no existe o no se puede leer."""
+    ruta_archivo_resumen = os.path.join(carpeta_base_resumenes, nombre_archivo_original_txt.rsplit('.txt', 1)[0] + SUFIJO_ARCHIVO_RESUMEN)
+    try:
+        with open(ruta_archivo_resumen, 'r', encoding='utf-8') as f_resumen: return f_resumen.read().strip()
+    except OSError:
+        return None
+
+def unir_fragmentos_contiguos(fragmentos: List[Dict]) -> List[Dict]:
+    """
+    Agrupa fragmentos consecutivos del mismo documento (indice_fragmento_en_doc i, i+1, ...) en bloques y quita el
+    texto repetido entre ellos, para no pagar dos veces el mismo texto. Cada bloque conserva
+    el mejor rango de relevancia de sus fragmentos; la lista resultante queda ordenada por ese rango.
+    Con las columnas 'num_tokens' y 'caracteres_traslape' que guarda 007 no se tokeniza nada; sin ellas (tablas
+    anteriores) se calculan aquí.
+    """
+    por_documento: Dict[str, List[Tuple[int, Dict]]] = {}
+    for rango, frag in enumerate(fragmentos):
+        por_documento.setdefault(frag.get('nombre_archivo_original') or "", []).append((rango, frag))
+    bloques = []
+    for nombre_doc, lista in por_documento.items():
+        lista.sort(key=lambda par: par[1].get('indice_fragmento_en_doc', 0))
+        bloque = None
+        for rango, frag in lista:
+            texto = frag.get('texto', '')
+            num_tokens = frag.get('num_tokens') or contar_tokens(texto, ENCODING_TIKTOKEN_CONTEXTO)
+            indice = frag.get('indice_fragmento_en_doc', 0)
+            if bloque and indice == bloque['indice_final'] + 1:
+                if 'caracteres_traslape' in frag:
+                    caracteres_traslape = frag['caracteres_traslape'] or 0
+                else:
+                    traslape = recortar_a_tokens(texto, CHUNK_OVERLAP_TOKENS, ENCODING_TIKTOKEN_CONTEXTO)[0].strip()
+                    caracteres_traslape = len(traslape) if traslape and bloque['texto'].endswith(traslape) else 0
+                if caracteres_traslape:
+                    # El traslape ya no mide siempre CHUNK_OVERLAP_TOKENS (007 solo repite párrafos al partir unidades grandes)
+                    bloque['texto'] += texto[caracteres_traslape:]
+                    bloque['num_tokens'] += max(0, num_tokens - round(num_tokens * caracteres_traslape / max(1, len(texto))))
+                else:
+                    bloque['texto'] += "\n" + texto; bloque['num_tokens'] += num_tokens
+                bloque['ids'].append(frag.get('id', 'N/A')); bloque['indice_final'] = indice
+                bloque['rango'] = min(bloque['rango'], rango)
+                continue
+            bloque = {'nombre_archivo_original': nombre_doc, 'texto': texto, 'num_tokens': num_tokens, 'rango': rango,
+                      'ids': [frag.get('id', 'N/A')], 'indice_inicial': indice, 'indice_final': indice}
+            bloques.append(bloque)
+    return sorted(bloques, key=lambda b: b['rango'])
+
+def empaquetar_contexto(fragmentos: List[Dict], resumenes: Dict[str, Optional[Tuple[str, int]]], presupuesto_tokens: int) -> Tuple[str, int, int]:
+    """
+    Llena el presupuesto de tokens con bloques de fragmentos (ya unidos) en orden de relevancia y, tras el primer
+    bloque de cada documento, con su resumen. Lo que no cabe se salta y se prueba con la siguiente pieza; si ni el
+    bloque más relevante cabe, entra recortado. Devuelve (contexto, tokens estimados, número de bloques incluidos).
+    resumenes: nombre_archivo -> (resumen ya recortado, num_tokens), obtenidos antes en una sola consulta.
+    """
+    disponible = presupuesto_tokens - MARGEN_TOKENS_EMPAQUETADO
+    partes_resumen, partes_fragmentos = [], []
+    documentos_con_resumen = set()
+    for bloque in unir_fragmentos_contiguos(fragmentos):
+        texto, num_tokens = bloque['texto'], bloque['num_tokens'] + TOKENS_ENCABEZADO_PIEZA
+        if num_tokens > disponible:
+            if partes_fragmentos and disponible < MIN_TOKENS_FRAGMENTO_PARCIAL: continue
+            if disponible <= 0: break
+            texto, num_tokens = recortar_a_tokens(texto, disponible - TOKENS_ENCABEZADO_PIEZA, ENCODING_TIKTOKEN_CONTEXTO)
+            num_tokens += TOKENS_ENCABEZADO_PIEZA
+        disponible -= num_tokens
+        ids = ", ".join(str(i) for i in bloque['ids'])
+        indices = str(bloque['indice_inicial']) if len(bloque['ids']) == 1 else f"{bloque['indice_inicial']}-{bloque['indice_final']}"
+        partes_fragmentos.append(f"Fragmento {len(partes_fragmentos) + 1} (del archivo: '{bloque['nombre_archivo_original'] or 'N/A'}', "
+                                 f"ID: {ids}, índices: {indices}):\n{texto}")
+        nombre_doc = bloque['nombre_archivo_original']
+        if nombre_doc and nombre_doc not in documentos_con_resumen:
+            documentos_con_resumen.add(nombre_doc)
+            resumen_recortado = resumenes.get(nombre_doc)
+            if resumen_recortado and resumen_recortado[1] + TOKENS_ENCABEZADO_PIEZA <= disponible:
+                disponible -= resumen_recortado[1] + TOKENS_ENCABEZADO_PIEZA
+                partes_resumen.append(f"Resumen del documento '{nombre_doc}':\n{resumen_recortado[0]}")
+    partes = partes_resumen + (["\n--- Detalles de Fragmentos Específicos Recuperados ---"] if partes_resumen else []) + partes_fragmentos
+    return "\n\n".join(partes), presupuesto_tokens - MARGEN_TOKENS_EMPAQUETADO - disponible, len(partes_fragmentos)
@@ -0,0 +1,73 @@
+import numpy as np
+from typing import Dict, List, Optional
+from .perfilado import medir_punto_caliente
+from .trazas import trazar
+
+# --- Configuración ---
+# Selección de los k fragmentos finales en 008, 009 y el chat RAG web. Con MMR (maximal marginal relevance) se recuperan
+# k * FACTOR_SOBREMUESTREO_MMR candidatos y se eligen uno a uno maximizando
+#   LAMBDA_MMR * relevancia - (1 - LAMBDA_MMR) * similitud coseno máxima con los ya elegidos,
+# para que fragmentos consecutivos de un mismo decreto, que repiten buena parte de su texto, no ocupen todos los lugares.
+# La relevancia es el score del reranker (o el de la fusión RRF) normalizado a [0, 1]; sin ninguno, la similitud coseno
+# con la pregunta. Las similitudes entre candidatos salen de los vectores que ya devuelve la búsqueda ('vector' o
+# 'vector_int8' * 'escala_vector'). Un límite de fragmentos por documento se puede aplicar con o sin MMR; cada script
+# elige ambos en su configuración y los pasa en cada llamada.
+USAR_MMR = True
+LAMBDA_MMR = 0.5 # 1.0: solo relevancia (el orden de entrada); 0.5 ya separa fragmentos casi iguales
+FACTOR_SOBREMUESTREO_MMR = 4
+MAX_FRAGMENTOS_POR_DOCUMENTO = None # p. ej. 2; None: sin límite
+
+def num_candidatos_diversificacion(k: int, usar_mmr: bool = USAR_MMR, max_por_documento: Optional[int] = MAX_FRAGMENTOS_POR_DOCUMENTO) -> int:
+    """Cuántos candidatos deben llegar a diversificar_fragmentos para elegir k."""
+    return k * FACTOR_SOBREMUESTREO_MMR if usar_mmr or max_por_documento else k
+
+def matriz_vectores_candidatos(candidatos: List[Dict]) -> Optional[np.ndarray]:
+    """Vectores normalizados de los candidatos; fila de ceros (sin penalización) si una fila no trae su vector."""
+    vectores = []
+    for fila in candidatos:
+        if fila.get("vector") is not None: vectores.append(np.asarray(fila["vector"], dtype=np.float32))
+        elif fila.get("vector_int8") is not None:
+            vectores.append(np.asarray(fila["vector_int8"], dtype=np.float32) * np.float32(fila.get("escala_vector") or 1.0))
+        else: vectores.append(None)
+    dim = next((len(v) for v in vectores if v is not None), 0)
+    if dim == 0: return None
+    matriz = np.stack([v if v is not None else np.zeros(dim, dtype=np.float32) for v in vectores])
+    return matriz / np.maximum(np.linalg.norm(matriz, axis=1, keepdims=True), 1e-12)
+
+def relevancias_candidatos(candidatos: List[Dict], matriz: Optional[np.ndarray], consulta: Optional[np.ndarray]) -> np.ndarray:
+    for campo in ("_score_reranking", "_score_rrf"):
+        if all(campo in fila for fila in candidatos):
+            scores = np.asarray([fila[campo] for fila in candidatos], dtype=np.float32)
+            rango = float(scores.max() - scores.min())
+            return (scores - scores.min()) / rango if rango > 0 else np.ones_like(scores)
+    if matriz is not None and consulta is not None:
+        return matriz @ (consulta.astype(np.float32) / (np.linalg.norm(consulta) or 1.0))
+    return 1.0 - np.arange(len(candidatos), dtype=np.float32) / len(candidatos) # Solo el orden de entrada
+
+@medir_punto_caliente("diversificacion")
+@trazar("diversificacion")
+def diversificar_fragmentos(candidatos: List[Dict], k: int, consulta: Optional[np.ndarray] = None, usar_mmr: bool = USAR_MMR,
+                            max_por_documento: Optional[int] = MAX_FRAGMENTOS_POR_DOCUMENTO, lambda_mmr: float = LAMBDA_MMR) -> List[Dict]:
+    """
+    Elige k candidatos (ordenados de más a menos relevante) con MMR y/o límite por documento; sin ninguno de los dos,
+    los k primeros. La selección es voraz: en cada paso se puntúan todos los candidatos restantes con una sola operación
+    vectorial y la similitud máxima con los elegidos se actualiza con el vector del último.
+    """
+    if not usar_mmr and not max_por_documento: return candidatos[:k]
+    if len(candidatos) <= 1: return candidatos[:k]
+    matriz = matriz_vectores_candidatos(candidatos) if usar_mmr else None
+    relevancia = relevancias_candidatos(candidatos, matriz, consulta)
+    similitud_maxima = np.zeros(len(candidatos), dtype=np.float32)
+    disponibles = np.ones(len(candidatos), dtype=bool)
+    documentos = np.asarray([fila.get("nombre_archivo_original") or "" for fila in candidatos], dtype=object)
+    elegidos_por_documento: Dict[str, int] = {}
+    elegidos: List[int] = []
+    while len(elegidos) < k and disponibles.any():
+        puntaje = lambda_mmr * relevancia - (1.0 - lambda_mmr) * similitud_maxima if matriz is not None else relevancia
+        i = int(np.argmax(np.where(disponibles, puntaje, -np.inf)))
+        elegidos.append(i); disponibles[i] = False
+        elegidos_por_documento[documentos[i]] = elegidos_por_documento.get(documentos[i], 0) + 1
+        if max_por_documento and elegidos_por_documento[documentos[i]] >= max_por_documento:
+            disponibles &= documentos != documentos[i]
+        if matriz is not None: np.maximum(similitud_maxima, matriz @ matriz[i], out=similitud_maxima)
+    return [candidatos[i] for i in elegidos]
@@ -0,0 +1,70 @@
+import re
+from typing import Dict, List, Tuple
+
+# --- Configuración ---
+# Formato de los .txt que escribe 004 y leen 005, 006, 007, el catálogo y la web:
+#   URL: <url de la nota, con codigo= y fecha=dd/mm/aaaa>
+#   TÍTULO ORIGINAL: <título>
+#   <línea en blanco>
+#   -------------------- CONTENIDO --------------------
+#   <línea en blanco>
+#   <contenido>
+# Los resúmenes (_resumen.txt) no tienen cabecera ni separador: se leen completos, sin pasar por aquí.
+SEPARADOR_CONTENIDO = "-------------------- CONTENIDO --------------------"
+PREFIJO_URL = "URL:"
+PREFIJO_TITULO = "TÍTULO ORIGINAL:"
+LINEAS_CABECERA = 5 # Líneas que se revisan buscando la cabecera y el separador
+PATRON_CODIGO_DOF = re.compile(r'codigo=(\d+)')
+PATRON_FECHA_DOF = re.compile(r'fecha=(\d{1,2})/(\d{1,2})/(\d{4})')
+
+def escribir_documento(ruta_archivo: str, url: str, titulo: str, contenido: str):
+    with open(ruta_archivo, "w", encoding="utf-8") as f:
+        f.write(f"{PREFIJO_URL} {url}\n{PREFIJO_TITULO} {titulo}\n\n{SEPARADOR_CONTENIDO}\n\n{contenido}")
+
+def separar_cabecera(texto: str) -> Tuple[List[str], str]:
+    """(líneas de la cabecera, contenido sin espacios al inicio y al final). Sin separador no hay contenido que procesar."""
+    cabecera, separador, contenido = texto.partition(SEPARADOR_CONTENIDO)
+    return cabecera.splitlines(), contenido.strip() if separador else ""
+
+def leer_documento(ruta_archivo: str) -> Tuple[List[str], str]:
+    with open(ruta_archivo, "r", encoding="utf-8") as f:
+        return separar_cabecera(f.read())
+
+def analizar_cabecera(lineas: List[str]) -> Dict:
+    """titulo, codigo_dof, fecha_publicacion (aaaa-mm-dd) y anio_publicacion de las líneas 'URL:' y 'TÍTULO ORIGINAL:'."""
+    cabecera = {"titulo": "", "codigo_dof": "", "fecha_publicacion": "", "anio_publicacion": 0}
+    for linea in lineas[:LINEAS_CABECERA]:
+        if linea.startswith(PREFIJO_URL):
+            m_codigo = PATRON_CODIGO_DOF.search(linea)
+            if m_codigo: cabecera["codigo_dof"] = m_codigo.group(1)
+            m_fecha = PATRON_FECHA_DOF.search(linea)
+            if m_fecha:
+                dia, mes, anio = m_fecha.groups()
+                cabecera["fecha_publicacion"] = f"{anio}-{int(mes):02d}-{int(dia):02d}"
+                cabecera["anio_publicacion"] = int(anio)
+        elif linea.startswith(PREFIJO_TITULO):
+            cabecera["titulo"] = linea[len(PREFIJO_TITULO):].strip()
+    return cabecera
+
+def leer_cabecera_documento(ruta_archivo: str) -> Dict:
+    """
+    analizar_cabecera de las primeras líneas del archivo, sin leer el contenido, más desplazamiento_contenido: el byte
+    donde empieza el texto tras el separador y las líneas en blanco (0 si no hay separador).
+    """
+    lineas, desplazamiento = [], 0
+    try:
+        with open(ruta_archivo, "rb") as f:
+            for _ in range(LINEAS_CABECERA):
+                linea_bytes = f.readline()
+                if not linea_bytes: break
+                linea = linea_bytes.decode("utf-8", errors="replace")
+                if SEPARADOR_CONTENIDO in linea:
+                    desplazamiento = f.tell()
+                    for siguiente in iter(f.readline, b""):
+                        if siguiente.strip(): break
+                        desplazamiento = f.tell()
+                    break
+                lineas.append(linea)
+    except OSError:
+        pass
+    return dict(analizar_cabecera(lineas), desplazamiento_contenido=desplazamiento)
@@ -0,0 +1,80 @@
+import re
+import zlib
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from .nombres import normalizar_texto_metadato
+
+# --- Configuración ---
+# Casi-duplicados (MinHash + LSH) que 007 detecta antes de calcular embeddings. El DOF republica decretos, publica
+# aclaraciones que repiten el texto corregido y avisos casi idénticos, y 004 guarda cada copia. Un fragmento cuya
+# similitud de Jaccard estimada con uno ya indexado alcanza UMBRAL_SIMILITUD_DUPLICADO no se vuelve a embeber: queda en
+# '<tabla>_alias' apuntando al fragmento canónico (el primero que 007 guardó). Los documentos se comparan igual, completos,
+# para reportar qué notas son republicaciones; el ahorro viene de los fragmentos, que cubren también las partes repetidas
+# de un documento que no es duplicado completo.
+DEDUPLICAR_FRAGMENTOS = True
+SUFIJO_TABLA_ALIAS = "_alias"
+PALABRAS_POR_SHINGLE = 5
+NUM_PERMUTACIONES_MINHASH = 128
+BANDAS_LSH = 16 # 16 bandas de 8 filas: un par con Jaccard 0.9 comparte alguna banda con probabilidad > 0.999
+UMBRAL_SIMILITUD_DUPLICADO = 0.9
+SEMILLA_MINHASH = 20240601 # Fija: firmas de ejecuciones distintas son comparables
+SHINGLES_POR_BLOQUE = 4096 # Limita la matriz permutaciones x shingles en documentos largos
+PATRON_PALABRA = re.compile(r'\w+')
+
+@lru_cache(maxsize=None)
+def coeficientes_minhash(num_permutaciones: int = NUM_PERMUTACIONES_MINHASH, semilla: int = SEMILLA_MINHASH) -> Tuple[np.ndarray, np.ndarray]:
+    """Hash multiplicativo (a*x + b) mod 2^64 >> 32 por permutación; 'a' impar."""
+    rng = np.random.default_rng(semilla)
+    a = rng.integers(0, np.iinfo(np.uint64).max, size=num_permutaciones, dtype=np.uint64, endpoint=True) | np.uint64(1)
+    b = rng.integers(0, np.iinfo(np.uint64).max, size=num_permutaciones, dtype=np.uint64, endpoint=True)
+    return a, b
+
+def shingles_de_texto(texto: str, palabras_por_shingle: int = PALABRAS_POR_SHINGLE) -> np.ndarray:
+    """Hashes (crc32) de las secuencias de palabras del texto normalizado (mayúsculas, sin acentos ni puntuación)."""
+    palabras = PATRON_PALABRA.findall(normalizar_texto_metadato(texto))
+    if not palabras: return np.empty(0, dtype=np.uint64)
+    n = max(1, len(palabras) - palabras_por_shingle + 1)
+    return np.unique(np.fromiter((zlib.crc32(" ".join(palabras[i:i + palabras_por_shingle]).encode()) for i in range(n)),
+                                 dtype=np.uint64, count=n))
+
+def firma_minhash(texto: str, num_permutaciones: int = NUM_PERMUTACIONES_MINHASH) -> Optional[np.ndarray]:
+    """Mínimo de cada permutación sobre los shingles del texto; None si el texto no tiene palabras."""
+    shingles = shingles_de_texto(texto)
+    if shingles.size == 0: return None
+    a, b = coeficientes_minhash(num_permutaciones)
+    firma = np.full(num_permutaciones, np.iinfo(np.uint64).max, dtype=np.uint64)
+    with np.errstate(over="ignore"): # El módulo 2^64 es el desbordamiento de uint64
+        for inicio in range(0, shingles.size, SHINGLES_POR_BLOQUE):
+            bloque = shingles[inicio:inicio + SHINGLES_POR_BLOQUE]
+            np.minimum(firma, ((a[:, None] * bloque[None, :] + b[:, None]) >> np.uint64(32)).min(axis=1), out=firma)
+    return firma
+
+def similitud_estimada(firma_a: np.ndarray, firma_b: np.ndarray) -> float:
+    return float(np.mean(firma_a == firma_b))
+
+class IndiceDuplicados:
+    """Firmas ya vistas en cubetas LSH; buscar() devuelve la clave más parecida que alcanza el umbral."""
+    def __init__(self, bandas: int = BANDAS_LSH, umbral: float = UMBRAL_SIMILITUD_DUPLICADO):
+        self.bandas, self.umbral = bandas, umbral
+        self.cubetas: List[Dict[bytes, List[str]]] = [{} for _ in range(bandas)]
+        self.firmas: Dict[str, np.ndarray] = {}
+
+    def _claves_bandas(self, firma: np.ndarray) -> List[bytes]:
+        return [banda.tobytes() for banda in np.array_split(firma, self.bandas)]
+
+    def buscar(self, firma: Optional[np.ndarray]) -> Optional[Tuple[str, float]]:
+        if firma is None: return None
+        candidatos = dict.fromkeys(clave for cubeta, banda in zip(self.cubetas, self._claves_bandas(firma))
+                                   for clave in cubeta.get(banda, ())) # dict: conserva el orden, gana el primero indexado
+        mejor = max(((clave, similitud_estimada(self.firmas[clave], firma)) for clave in candidatos),
+                    key=lambda par: par[1], default=None)
+        return mejor if mejor and mejor[1] >= self.umbral else None
+
+    def agregar(self, clave: str, firma: Optional[np.ndarray]):
+        if firma is None: return
+        self.firmas[clave] = firma
+        for cubeta, banda in zip(self.cubetas, self._claves_bandas(firma)): cubeta.setdefault(banda, []).append(clave)
+
+    def __len__(self) -> int:
+        return len(self.firmas)
@@ -0,0 +1,39 @@
+import numpy as np
+from typing import List, Optional
+from .perezoso import importar_perezoso
+from .perfilado import medir_punto_caliente, punto_caliente
+from .trazas import trazar
+
+ollama = importar_perezoso("ollama")
+
+# --- Configuración ---
+# Embeddings densos con Ollama. Documentos (007), preguntas (008, 009, la web) y lotes (011, /api/search/batch) usan el
+# mismo modelo: cambiarlo obliga a reconstruir la tabla con 007.
+MODELO_EMBEDDING_OLLAMA = "bge-m3"
+DIMENSION_EMBEDDING = 1024 # Por defecto; 007 la confirma con un embedding de prueba
+TAMANO_LOTE_EMBEDDINGS = 32 # Textos por llamada a ollama.embed
+
+@medir_punto_caliente("embedding_ollama")
+@trazar("embedding")
+def obtener_embedding_ollama(texto: str, modelo: str = MODELO_EMBEDDING_OLLAMA) -> Optional[np.ndarray]:
+    """Vector float32 de 'texto', o None si Ollama falla o no devuelve embedding."""
+    try:
+        embedding = ollama.embeddings(model=modelo, prompt=texto).get('embedding')
+        if embedding: return np.asarray(embedding, dtype=np.float32)
+        print(f"Error: Ollama no devolvió embedding para '{texto[:50]}...'."); return None
+    except Exception as e: print(f"Error generando embedding con Ollama (modelo: {modelo}) para '{texto[:50]}...': {e}"); return None
+
+@trazar("embedding_lote")
+def obtener_embeddings_ollama_lote(textos: List[str], modelo: str = MODELO_EMBEDDING_OLLAMA,
+                                   tamano_lote: int = TAMANO_LOTE_EMBEDDINGS) -> List[Optional[List[float]]]:
+    """Un embedding por texto (None en los lotes que fallen), pidiendo a Ollama tamano_lote textos por llamada."""
+    embeddings = []
+    for inicio in range(0, len(textos), tamano_lote):
+        lote = textos[inicio:inicio + tamano_lote]
+        try:
+            with punto_caliente("embedding_ollama_lote"): response = ollama.embed(model=modelo, input=lote)
+            embeddings.extend(response.get('embeddings') or [None] * len(lote))
+        except Exception as e:
+            print(f"Error generando embeddings con Ollama (lote {inicio // tamano_lote + 1}): {e}")
+            embeddings.extend([None] * len(lote))
+    return embeddings
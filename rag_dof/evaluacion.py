@@ -0,0 +1,72 @@
+import os
+import numpy as np
+from .perezoso import importar_perezoso
+from .busqueda import SUFIJO_TABLA_FLOAT32
+
+lancedb = importar_perezoso("lancedb")
+
+# --- Configuración ---
+# Datos y medidas comunes de los reportes de recall sobre vectores: 010 (índices ANN) y 012 (cuantización). Con datos
+# sintéticos corren sin Ollama ni BD previa (útiles en CI); si no, leen los vectores de la tabla que creó 007.
+NUM_VECTORES_SINTETICOS = 20000
+DIMENSION_SINTETICA = 1024 # Igual que bge-m3
+NUM_GRUPOS_SINTETICOS = 64 # Los embeddings reales no son ruido uniforme; se simulan temas
+
+def generar_vectores_sinteticos(n: int, dim: int, n_grupos: int = NUM_GRUPOS_SINTETICOS, semilla: int = 42) -> np.ndarray:
+    """Genera vectores agrupados (mezcla de gaussianas) normalizados, parecidos a embeddings de texto."""
+    rng = np.random.default_rng(semilla)
+    centros = rng.standard_normal((n_grupos, dim)).astype(np.float32)
+    asignacion = rng.integers(0, n_grupos, size=n)
+    vectores = centros[asignacion] + 0.35 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectores / np.linalg.norm(vectores, axis=1, keepdims=True)
+
+def generar_consultas(vectores: np.ndarray, n_consultas: int, semilla: int = 7) -> np.ndarray:
+    """Consultas = vectores existentes perturbados, para que haya vecinos cercanos con sentido."""
+    rng = np.random.default_rng(semilla)
+    idx = rng.choice(len(vectores), size=min(n_consultas, len(vectores)), replace=False)
+    consultas = vectores[idx] + 0.1 * rng.standard_normal((len(idx), vectores.shape[1])).astype(np.float32)
+    return consultas / np.linalg.norm(consultas, axis=1, keepdims=True)
+
+def cargar_vectores_de_tabla(db_path: str, table_name: str, exigir_sin_cuantizar: bool = False) -> np.ndarray:
+    """
+    Vectores normalizados de una tabla de 007: la columna 'vector' (float32 o float16) o, si 007 guardó int8, su
+    copia '<tabla>_float32' o, sin ella, 'vector_int8' * 'escala_vector'. Con
+    exigir_sin_cuantizar, una tabla int8 es un error: sus vectores no sirven como referencia de recall.
+    """
+    db = lancedb.connect(db_path)
+    tabla = db.open_table(table_name)
+    if "vector" not in tabla.schema.names and table_name + SUFIJO_TABLA_FLOAT32 in db.table_names():
+        tabla = db.open_table(table_name + SUFIJO_TABLA_FLOAT32) # Copia float32 que 007 guarda para el rescoring
+    if "vector" in tabla.schema.names:
+        datos = tabla.to_arrow().select(["vector"])
+        columna = datos.column("vector").combine_chunks()
+        escalas = None
+    elif exigir_sin_cuantizar:
+        raise ValueError("la tabla guarda vectores int8; hace falta una tabla float32/float16 como referencia")
+    else:
+        datos = tabla.to_arrow().select(["vector_int8", "escala_vector"])
+        columna = datos.column("vector_int8").combine_chunks()
+        escalas = datos.column("escala_vector").to_numpy().astype(np.float32)
+    dim = columna.type.list_size
+    vectores = columna.flatten().to_numpy(zero_copy_only=False).astype(np.float32).reshape(-1, dim)
+    if escalas is not None: vectores *= escalas[:, None]
+    return vectores / np.maximum(np.linalg.norm(vectores, axis=1, keepdims=True), 1e-12)
+
+def top_k(similitudes: np.ndarray, k: int) -> np.ndarray:
+    """Índices de los k mayores de cada fila, ordenados (fuerza bruta sobre vectores normalizados = coseno)."""
+    k = min(k, similitudes.shape[1])
+    candidatos = np.argpartition(-similitudes, kth=k - 1, axis=1)[:, :k]
+    orden = np.argsort(-np.take_along_axis(similitudes, candidatos, axis=1), axis=1)
+    return np.take_along_axis(candidatos, orden, axis=1)
+
+def calcular_recall(vecinos: np.ndarray, vecinos_exactos: np.ndarray) -> float:
+    aciertos = sum(len(set(a) & set(b)) for a, b in zip(vecinos, vecinos_exactos))
+    return aciertos / vecinos_exactos.size
+
+def tamano_directorio_bytes(ruta: str) -> int:
+    total = 0
+    for raiz, _, archivos in os.walk(ruta):
+        for nombre in archivos:
+            try: total += os.path.getsize(os.path.join(raiz, nombre))
+            except OSError: pass
+    return total
@@ -0,0 +1,168 @@
+import re
+import hashlib
+from typing import Generator, List, Optional, Tuple
+from .perfilado import punto_caliente
+from .tokenizador import obtener_codificacion
+
+# --- Configuración ---
+# Fragmentos de los documentos que se indexan en 007. 009 y la web unen fragmentos consecutivos de un documento quitando
+# el texto que comparten (columna 'caracteres_traslape'), así que ingesta y consulta deben usar estos mismos valores.
+# MODO_FRAGMENTACION:
+# - "estructura": corta en los encabezados del DOF (ARTÍCULO N, CAPÍTULO, TÍTULO, SECCIÓN, TRANSITORIOS, CONSIDERANDO) y
+#   junta unidades completas hasta CHUNK_SIZE_TOKENS, sin traslape. Solo una unidad que por sí sola no cabe se parte por
+#   párrafos (fracciones, incisos) repitiendo hasta CHUNK_OVERLAP_TOKENS de párrafos completos; un párrafo que tampoco
+#   cabe se parte por tokens con traslape.
+# - "tokens": ventanas fijas de CHUNK_SIZE_TOKENS con CHUNK_OVERLAP_TOKENS de traslape (bases anteriores).
+MODO_FRAGMENTACION = "estructura"
+MODOS_FRAGMENTACION = ("estructura", "tokens")
+CHUNK_SIZE_TOKENS = 1000
+CHUNK_OVERLAP_TOKENS = 150
+ENCODING_TIKTOKEN_CHUNKING = "cl100k_base"
+MIN_TOKENS_UNIDAD = 40 # Unidades más cortas (un CAPÍTULO con su título, un preámbulo breve) se pegan a la siguiente
+# Sin IGNORECASE: 'artículo 5.' en minúsculas al inicio de una línea es una referencia partida, no un encabezado
+ORDINAL_ENCABEZADO = r'(?:\d+[ \t]*[oº°]?|[IVXLC]+|[A-ZÁÉÍÓÚÑ][A-Za-zÁÉÍÓÚÑáéíóúñ]*)(?:[ \t]+(?:Bis|BIS|Ter|TER))?'
+PATRON_ENCABEZADO_DOF = re.compile(
+    r'^[ \t]*(?:'
+    rf'(?:ART[ÍI]CULO|Art[íi]culo)[ \t]+{ORDINAL_ENCABEZADO}[ \t]*[.:-]' # ARTÍCULO 5.- / Artículo 1o. / ARTÍCULO PRIMERO.-
+    rf'|(?:CAP[ÍI]TULO|Cap[íi]tulo|T[ÍI]TULO|T[íi]tulo|SECCI[ÓO]N|Secci[óo]n)[ \t]+{ORDINAL_ENCABEZADO}[ \t]*(?:[.:-]|$)' # CAPÍTULO I
+    r'|(?:T[ \t]?R[ \t]?A[ \t]?N[ \t]?S[ \t]?I[ \t]?T[ \t]?O[ \t]?R[ \t]?I[ \t]?O[ \t]?S?|Transitorios?)[ \t]*:?[ \t]*$' # T R A N S I T O R I O S
+    r'|(?:C[ \t]?O[ \t]?N[ \t]?S[ \t]?I[ \t]?D[ \t]?E[ \t]?R[ \t]?A[ \t]?N[ \t]?D[ \t]?O[ \t]?S?|Considerandos?)[ \t]*:?[ \t]*$'
+    r')', re.MULTILINE)
+PATRON_SALTO_PARRAFO = re.compile(r'\n\s*')
+
+def fragmentador_texto_con_traslape(texto_completo: str,
+                                   chunk_size: int = CHUNK_SIZE_TOKENS,
+                                   chunk_overlap: int = CHUNK_OVERLAP_TOKENS,
+                                   encoding_nombre: str = ENCODING_TIKTOKEN_CHUNKING) -> Generator[str, None, None]:
+    if not texto_completo.strip(): return
+    try:
+        encoding = obtener_codificacion(encoding_nombre)
+    except Exception as e:
+        print(f"Error al obtener encoding de tiktoken '{encoding_nombre}': {e}. No se puede fragmentar.")
+        return
+    with punto_caliente("tokenizacion"):
+        tokens_totales = encoding.encode(texto_completo)
+    longitud_total_tokens = len(tokens_totales)
+    if longitud_total_tokens == 0: return
+    inicio = 0
+    while inicio < longitud_total_tokens:
+        fin = min(inicio + chunk_size, longitud_total_tokens)
+        with punto_caliente("fragmentado_decode"):
+            fragmento_texto = encoding.decode(tokens_totales[inicio:fin])
+        fragmento_texto_limpio = fragmento_texto.strip()
+        if fragmento_texto_limpio: yield fragmento_texto_limpio
+        if fin == longitud_total_tokens: break
+        avance = chunk_size - chunk_overlap
+        inicio = inicio + avance if avance > 0 else fin
+
+def recortar_espacios(texto: str, inicio: int, fin: int) -> Tuple[int, int]:
+    while inicio < fin and texto[inicio].isspace(): inicio += 1
+    while fin > inicio and texto[fin - 1].isspace(): fin -= 1
+    return inicio, fin
+
+def segmentar(texto: str, inicios: List[int], inicio: int, fin: int) -> List[Tuple[int, int]]:
+    """(inicio, fin) sin espacios en los extremos de cada tramo entre inicios consecutivos dentro de [inicio, fin); sin vacíos."""
+    limites = sorted({inicio, *[i for i in inicios if inicio < i < fin]}) + [fin]
+    tramos = [recortar_espacios(texto, a, b) for a, b in zip(limites, limites[1:])]
+    return [(a, b) for a, b in tramos if b > a]
+
+def unidades_estructurales(texto: str) -> List[Tuple[int, int]]:
+    """Tramos del documento que empiezan en un encabezado del DOF (el primero puede ser el preámbulo sin encabezado)."""
+    return segmentar(texto, [m.start() for m in PATRON_ENCABEZADO_DOF.finditer(texto)], 0, len(texto))
+
+def partir_unidad_grande(texto: str, inicio: int, fin: int, encoding, chunk_size: int, chunk_overlap: int,
+                         encoding_nombre: str) -> Generator[Tuple[str, int], None, None]:
+    """
+    Una unidad que no cabe en chunk_size: se juntan párrafos completos y cada pieza repite los últimos párrafos de la
+    anterior que sumen hasta chunk_overlap tokens. Un párrafo que por sí solo no cabe se parte por tokens.
+    Produce (texto, caracteres repetidos de la pieza anterior).
+    """
+    parrafos = segmentar(texto, [m.end() for m in PATRON_SALTO_PARRAFO.finditer(texto, inicio, fin)], inicio, fin)
+    with punto_caliente("tokenizacion"):
+        tokens = [len(encoding.encode(texto[a:b])) for a, b in parrafos]
+    pieza: List[int] = [] # Índices de párrafos de la pieza en curso
+    fin_anterior = None # Dónde terminó la pieza emitida antes (para medir el traslape)
+    i = 0
+    while i < len(parrafos):
+        if tokens[i] > chunk_size:
+            if pieza: yield texto[parrafos[pieza[0]][0]:parrafos[pieza[-1]][1]], max(0, (fin_anterior or 0) - parrafos[pieza[0]][0])
+            anterior = None
+            for sub in fragmentador_texto_con_traslape(texto[parrafos[i][0]:parrafos[i][1]], chunk_size, chunk_overlap, encoding_nombre):
+                yield sub, calcular_caracteres_traslape(anterior, sub, encoding_nombre, chunk_overlap)
+                anterior = sub
+            pieza, fin_anterior, i = [], None, i + 1
+            continue
+        if pieza and sum(tokens[j] + 1 for j in pieza) + tokens[i] > chunk_size:
+            yield texto[parrafos[pieza[0]][0]:parrafos[pieza[-1]][1]], max(0, (fin_anterior or 0) - parrafos[pieza[0]][0])
+            fin_anterior = parrafos[pieza[-1]][1]
+            traslape, tokens_traslape = [], 0
+            for j in reversed(pieza[1:]): # Nunca la pieza entera: cada pieza avanza al menos un párrafo
+                if tokens_traslape + tokens[j] + 1 > chunk_overlap or tokens_traslape + tokens[j] + tokens[i] + 1 > chunk_size: break
+                traslape.insert(0, j); tokens_traslape += tokens[j] + 1
+            pieza = traslape
+            if not pieza: fin_anterior = None
+        pieza.append(i); i += 1
+    if pieza: yield texto[parrafos[pieza[0]][0]:parrafos[pieza[-1]][1]], max(0, (fin_anterior or 0) - parrafos[pieza[0]][0])
+
+def fragmentador_por_estructura(texto_completo: str,
+                                chunk_size: int = CHUNK_SIZE_TOKENS,
+                                chunk_overlap: int = CHUNK_OVERLAP_TOKENS,
+                                encoding_nombre: str = ENCODING_TIKTOKEN_CHUNKING) -> Generator[Tuple[str, int], None, None]:
+    """
+    Junta unidades completas (de un encabezado del DOF al siguiente) mientras quepan en chunk_size tokens; las que no
+    caben solas se parten con partir_unidad_grande. Produce (texto, caracteres repetidos del fragmento anterior).
+    """
+    if not texto_completo.strip(): return
+    try:
+        encoding = obtener_codificacion(encoding_nombre)
+    except Exception as e:
+        print(f"Error al obtener encoding de tiktoken '{encoding_nombre}': {e}. No se puede fragmentar.")
+        return
+    unidades = unidades_estructurales(texto_completo)
+    with punto_caliente("tokenizacion"):
+        tokens = [len(encoding.encode(texto_completo[a:b])) for a, b in unidades]
+    # Encabezados sueltos (CAPÍTULO I + su título) y preámbulos cortos van con la unidad siguiente
+    unidas: List[Tuple[int, int, int]] = []
+    pendiente = None
+    for (a, b), n in zip(unidades, tokens):
+        if pendiente: a, n = pendiente[0], n + pendiente[2] + 1
+        pendiente = (a, b, n) if n < MIN_TOKENS_UNIDAD else None
+        if not pendiente: unidas.append((a, b, n))
+    if pendiente: unidas.append(pendiente)
+    inicio_grupo, fin_grupo, tokens_grupo = None, None, 0
+    for a, b, n in unidas:
+        if inicio_grupo is not None and (tokens_grupo + n > chunk_size or n > chunk_size):
+            yield texto_completo[inicio_grupo:fin_grupo], 0
+            inicio_grupo, tokens_grupo = None, 0
+        if n > chunk_size:
+            yield from partir_unidad_grande(texto_completo, a, b, encoding, chunk_size, chunk_overlap, encoding_nombre)
+            continue
+        if inicio_grupo is None: inicio_grupo = a
+        fin_grupo, tokens_grupo = b, tokens_grupo + n + 1 # +1: el salto de línea entre unidades
+    if inicio_grupo is not None: yield texto_completo[inicio_grupo:fin_grupo], 0
+
+def fragmentar_documento(texto_completo: str, modo: str = MODO_FRAGMENTACION) -> Generator[Tuple[str, int], None, None]:
+    """Fragmentos de un documento según MODO_FRAGMENTACION: (texto, caracteres repetidos del fragmento anterior)."""
+    if modo == "estructura":
+        yield from fragmentador_por_estructura(texto_completo)
+        return
+    if modo != "tokens": raise ValueError(f"MODO_FRAGMENTACION desconocido: {modo}. Opciones: {', '.join(MODOS_FRAGMENTACION)}")
+    anterior = None
+    for fragmento in fragmentador_texto_con_traslape(texto_completo):
+        yield fragmento, calcular_caracteres_traslape(anterior, fragmento)
+        anterior = fragmento
+
+def calcular_caracteres_traslape(texto_anterior: Optional[str], texto: str, encoding_nombre: str = ENCODING_TIKTOKEN_CHUNKING,
+                                 chunk_overlap: int = CHUNK_OVERLAP_TOKENS) -> int:
+    """Caracteres al inicio de 'texto' que repiten el final del fragmento anterior (los chunk_overlap tokens compartidos)."""
+    if not texto_anterior: return 0
+    try:
+        encoding = obtener_codificacion(encoding_nombre)
+        traslape = encoding.decode(encoding.encode(texto)[:chunk_overlap]).strip()
+    except Exception:
+        return 0
+    return len(traslape) if traslape and texto_anterior.endswith(traslape) and texto.startswith(traslape) else 0
+
+def generar_id_fragmento(nombre_archivo: str, indice_fragmento: int) -> str:
+    hash_nombre = hashlib.md5(nombre_archivo.encode()).hexdigest()[:8]
+    return f"{hash_nombre}_frag_{indice_fragmento}"
@@ -0,0 +1,174 @@
+import time
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from .tokenizador import contar_tokens
+from .contexto import ENCODING_TIKTOKEN_CONTEXTO, empaquetar_contexto
+from .busqueda import fusionar_por_rango_reciproco
+from .diversificacion import num_candidatos_diversificacion, diversificar_fragmentos
+from .perfilado import punto_caliente
+from .trazas import trazar, registrar_span, obtener_traza_actual
+
+# --- Configuración ---
+# Consulta RAG de 009 y del chat web (core/rag_service.py): orquestación de la recuperación, prompt y respuesta de Groq
+# en streaming. Cada uno pasa sus valores de configuración y sus servicios como funciones async (embedding, búsquedas,
+# resúmenes, calentamiento y cuota de Groq); aquí no se abre ninguna conexión ni se lee configuración propia.
+MARCAS_RESPUESTA_FALLIDA = ("Error persistente con API Groq", "No se pudo obtener respuesta de Groq.", "[Respuesta interrumpida")
+ESPERA_TRAS_429_SEGUNDOS = 60.1 # Un 429 de Groq indica que la cuota del minuto ya se agotó
+_tareas_en_segundo_plano: set = set() # Referencias a tareas sin await (calentamiento) para que no las recoja el GC
+
+def construir_prompt_rag(pregunta_usuario: str, contexto_str: str) -> str:
+    return (
+        "Eres un asistente experto en responder preguntas sobre documentos del Diario Oficial de la Federación (DOF) de México. "
+        "Tu respuesta debe basarse ESTRICTAMENTE en la información contenida en los siguientes resúmenes y fragmentos de documentos proporcionados. "
+        "Primero se presentan resúmenes generales de los documentos relevantes, seguidos de fragmentos específicos. "
+        "Sé directo y factual. Si la información necesaria para responder la pregunta no está presente en los fragmentos, debes indicar claramente: "
+        "'La información específica para responder a su pregunta no se encuentra en los fragmentos de documentos proporcionados.' "
+        "No inventes información ni hagas suposiciones más allá del texto dado. Cita el archivo original si es relevante, ej: '(según archivo.txt)'.\n\n"
+        f"PREGUNTA DEL USUARIO:\n{pregunta_usuario}\n\n"
+        "CONTEXTO (RESÚMENES Y FRAGMENTOS DE DOCUMENTOS RELEVANTES):\n"
+        f"{contexto_str}\n\n"
+        "RESPUESTA (basada únicamente en el contexto anterior):"
+    )
+
+@trazar("construccion_prompt")
+def preparar_prompt_rag(pregunta_usuario: str, fragmentos: List[Dict], resumenes: Dict[str, Optional[Tuple[str, int]]],
+                        max_tokens_prompt: int, encoding: str = ENCODING_TIKTOKEN_CONTEXTO) -> Tuple[str, int]:
+    """Empaqueta fragmentos y resúmenes en max_tokens_prompt y devuelve (prompt, tokens estimados del prompt)."""
+    # Solo se tokeniza la plantilla con la pregunta; fragmentos y resúmenes traen su conteo precalculado (007)
+    tokens_plantilla = contar_tokens(construir_prompt_rag(pregunta_usuario, ""), encoding)
+    presupuesto_contexto = int(max_tokens_prompt) - tokens_plantilla
+    contexto_str, tokens_contexto, num_bloques = empaquetar_contexto(fragmentos, resumenes, presupuesto_contexto)
+    print(f"Contexto empaquetado: {num_bloques} bloque(s) de {len(fragmentos)} fragmento(s), ~{tokens_contexto}/{presupuesto_contexto} tokens.")
+    return construir_prompt_rag(pregunta_usuario, contexto_str), tokens_plantilla + tokens_contexto
+
+async def ejecutar_etapa(tiempos_etapas: Dict[str, Tuple[float, float]], nombre_etapa: str, inicio_consulta: float, corrutina):
+    """Espera la corrutina de una etapa y registra (inicio_ms, fin_ms) relativos al inicio de la consulta."""
+    inicio = time.perf_counter()
+    try: return await corrutina
+    finally: tiempos_etapas[nombre_etapa] = ((inicio - inicio_consulta) * 1000, (time.perf_counter() - inicio_consulta) * 1000)
+
+class OrquestadorRag:
+    """
+    Recuperación de una consulta RAG con las partes independientes en paralelo: embedding -> búsqueda vectorial ||
+    búsqueda FTS || calentamiento del LLM; los resúmenes se piden en cuanto llega cada lista de resultados.
+    Servicios (async): obtener_embedding(pregunta), buscar_vectorial(embedding, k, filtros), buscar_fts(pregunta, k,
+    filtros), obtener_resumenes(nombres) y calentar_llm() (opcional). reordenar(pregunta, candidatos, k) es el
+    reranker, síncrono: corre en el pool por defecto de asyncio.
+    """
+    def __init__(self, obtener_embedding, buscar_vectorial, buscar_fts, obtener_resumenes, reordenar, calentar_llm=None, *,
+                 k: int, modo_reranking: str, num_candidatos_reranking: int, usar_mmr: bool, max_fragmentos_por_documento: Optional[int],
+                 usar_rama_fts: bool, num_resultados_fts: int, max_tokens_prompt: int, encoding: str = ENCODING_TIKTOKEN_CONTEXTO):
+        self.obtener_embedding, self.buscar_vectorial, self.buscar_fts = obtener_embedding, buscar_vectorial, buscar_fts
+        self.obtener_resumenes, self.reordenar, self.calentar_llm = obtener_resumenes, reordenar, calentar_llm
+        self.k, self.usar_mmr, self.max_fragmentos_por_documento = k, usar_mmr, max_fragmentos_por_documento
+        self.k_candidatos = num_candidatos_diversificacion(k, usar_mmr, max_fragmentos_por_documento)
+        self.k_busqueda = max(self.k_candidatos, num_candidatos_reranking) if modo_reranking != "ninguno" else self.k_candidatos
+        self.usar_rama_fts, self.num_resultados_fts = usar_rama_fts, num_resultados_fts
+        self.max_tokens_prompt, self.encoding = max_tokens_prompt, encoding
+
+    async def consultar(self, pregunta_usuario: str, filtros: Optional[Dict[str, str]] = None
+                        ) -> Tuple[List[Dict], str, int, Dict[str, Tuple[float, float]]]:
+        """Devuelve (fragmentos, prompt, tokens del prompt, tiempos por etapa); sin fragmentos, el prompt es ''."""
+        inicio_consulta = time.perf_counter()
+        tiempos: Dict[str, Tuple[float, float]] = {}
+        tareas_resumenes, documentos_pedidos = [], set()
+        embedding_pregunta = None # Lo usa MMR si no hay scores de reranking ni de fusión
+
+        def precargar_resumenes(filas: List[Dict], nombre_etapa: str):
+            nuevos = [n for n in dict.fromkeys(f.get("nombre_archivo_original") for f in filas) if n and n not in documentos_pedidos]
+            if not nuevos: return
+            documentos_pedidos.update(nuevos)
+            tareas_resumenes.append(asyncio.create_task(ejecutar_etapa(tiempos, nombre_etapa, inicio_consulta, self.obtener_resumenes(nuevos))))
+
+        async def rama_vectorial() -> List[Dict]:
+            nonlocal embedding_pregunta
+            embedding = await ejecutar_etapa(tiempos, "embedding", inicio_consulta, self.obtener_embedding(pregunta_usuario))
+            if embedding is None: return []
+            embedding_pregunta = embedding
+            try:
+                filas = await ejecutar_etapa(tiempos, "busqueda_vectorial", inicio_consulta, self.buscar_vectorial(embedding, self.k_busqueda, filtros))
+            except Exception as e: print(f"Error en búsqueda LanceDB: {e}"); return []
+            precargar_resumenes(filas, "resumenes_vectorial")
+            return filas
+
+        async def rama_fts() -> List[Dict]:
+            if not self.usar_rama_fts: return []
+            filas = await ejecutar_etapa(tiempos, "busqueda_fts", inicio_consulta, self.buscar_fts(pregunta_usuario, self.num_resultados_fts, filtros))
+            precargar_resumenes(filas, "resumenes_fts")
+            return filas
+
+        # Tarea sin esperarla: si el calentamiento tarda más que la recuperación, no retrasa la llamada al LLM
+        if self.calentar_llm is not None:
+            tarea_calentamiento = asyncio.create_task(ejecutar_etapa(tiempos, "calentamiento_llm", inicio_consulta, self.calentar_llm()))
+            _tareas_en_segundo_plano.add(tarea_calentamiento); tarea_calentamiento.add_done_callback(_tareas_en_segundo_plano.discard)
+        resultados_vectoriales, resultados_fts = await asyncio.gather(rama_vectorial(), rama_fts())
+        print(f"Búsqueda completada. {len(resultados_vectoriales)} resultados vectoriales, {len(resultados_fts)} por FTS.")
+        candidatos = fusionar_por_rango_reciproco([resultados_vectoriales, resultados_fts]) if resultados_fts else resultados_vectoriales
+        candidatos = await ejecutar_etapa(tiempos, "reranking", inicio_consulta,
+                                          asyncio.to_thread(self.reordenar, pregunta_usuario, candidatos, self.k_candidatos))
+        fragmentos = diversificar_fragmentos(candidatos, self.k, embedding_pregunta, self.usar_mmr, self.max_fragmentos_por_documento)
+        if not fragmentos:
+            return [], "", 0, dict(tiempos)
+
+        resumenes: Dict[str, Optional[Tuple[str, int]]] = {}
+        for parcial in await asyncio.gather(*tareas_resumenes): resumenes.update(parcial)
+        faltantes = [n for n in dict.fromkeys(f.get("nombre_archivo_original") for f in fragmentos) if n and n not in resumenes]
+        if faltantes: resumenes.update(await self.obtener_resumenes(faltantes))
+        prompt_completo, tokens_prompt = await ejecutar_etapa(tiempos, "construccion_prompt", inicio_consulta, asyncio.to_thread(
+            preparar_prompt_rag, pregunta_usuario, fragmentos, resumenes, self.max_tokens_prompt, self.encoding))
+        return fragmentos, prompt_completo, tokens_prompt, dict(tiempos) # Copia: la tarea de calentamiento puede seguir escribiendo
+
+async def generar_respuesta_groq_stream(cliente_groq, prompt_completo: str, tokens_prompt: Optional[int], cuota, *, modelo: str,
+                                        temperatura: float, max_tokens: int, max_reintentos: int, espera_reintento_segundos: float,
+                                        encoding: str = ENCODING_TIKTOKEN_CONTEXTO, traza: Optional[Dict] = None) -> AsyncIterator[str]:
+    """
+    Generador async con los fragmentos de texto de la respuesta según llegan de Groq (AsyncGroq, stream=True).
+    Antes espera turno con cuota.esperar_turno(tokens_prompt), que puede rendirse con su propia excepción sin haber
+    emitido nada. Solo se reintenta mientras no se haya emitido ningún token; un corte a mitad de respuesta se informa
+    en el texto. En el 'finally' (también si quien consume cierra el stream) cuota.liquidar recibe lo consumido.
+    """
+    # Spans 'llm_primer_token' (hasta el primer texto de Groq) y 'llm_total' (incluye esperas por límites y reintentos)
+    traza = traza or obtener_traza_actual(); inicio_llm_ns = time.time_ns()
+    tokens_prompt = tokens_prompt or contar_tokens(prompt_completo, encoding)
+    atributos_llm = {"tokens_prompt": tokens_prompt}
+    partes_emitidas, prompt_enviado = [], False
+    try:
+        with punto_caliente("espera_limites_groq"): await cuota.esperar_turno(tokens_prompt)
+        for intento in range(max_reintentos):
+            partes_emitidas = []
+            try:
+                print(f"Enviando a Groq (intento {intento + 1}), tokens del prompt: {tokens_prompt}")
+                stream = await cliente_groq.chat.completions.create(
+                    model=modelo, messages=[{"role": "user", "content": prompt_completo}],
+                    temperature=temperatura, max_tokens=max_tokens, top_p=1, stream=True
+                )
+                prompt_enviado = True
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        if "respuesta_recibida" not in atributos_llm:
+                            atributos_llm["respuesta_recibida"] = True
+                            registrar_span(traza, "llm_primer_token", inicio_llm_ns, time.time_ns(), intento=intento + 1)
+                        partes_emitidas.append(delta)
+                        yield delta
+                return
+            except Exception as e:
+                if partes_emitidas:
+                    # Ya se mostró parte de la respuesta: reintentar la duplicaría
+                    print(f"    Error API Groq (stream interrumpido): {e}")
+                    yield f"\n[Respuesta interrumpida por error de la API Groq: {e}]"; return
+                error_str = str(e).lower()
+                print(f"    Error API Groq (intento {intento + 1}/{max_reintentos}): {e}")
+                if "rate limit" in error_str or "ratelimit" in error_str or "429" in error_str or "413" in error_str:
+                    espera = ESPERA_TRAS_429_SEGUNDOS if "429" in error_str else espera_reintento_segundos * (intento + 1)
+                    print(f"    Error límite API. Esperando {espera:.1f}s...")
+                    with punto_caliente("espera_limites_groq"): await asyncio.sleep(espera)
+                    if "429" in error_str or "413" in error_str: await cuota.reiniciar()
+                elif intento < max_reintentos - 1:
+                    await asyncio.sleep(espera_reintento_segundos)
+                else: yield f"Error persistente con API Groq: {e}"; return
+        yield "No se pudo obtener respuesta de Groq."
+    finally:
+        tokens_respuesta = contar_tokens("".join(partes_emitidas), encoding) if partes_emitidas else 0
+        cuota.liquidar((tokens_prompt if prompt_enviado else 0) + tokens_respuesta)
+        registrar_span(traza, "llm_total", inicio_llm_ns, time.time_ns(), **atributos_llm)
@@ -0,0 +1,448 @@
+import os
+import time
+import argparse
+import numpy as np
+import pyarrow as pa
+from typing import List, Dict, Optional, Tuple
+from .perfilado import agregar_argumentos_perfilado, iniciar_perfilado_si_se_pide, punto_caliente, medir_punto_caliente
+from .catalogo import ARCHIVO_CATALOGO, actualizar_catalogo
+from .perezoso import importar_perezoso, precargar_modulos
+from .tokenizador import contar_tokens
+from .nombres import sanitizar_nombre, sanitizar_nombre_tabla_lancedb, normalizar_texto_metadato
+from .documentos import leer_documento, analizar_cabecera
+from .embeddings import MODELO_EMBEDDING_OLLAMA, DIMENSION_EMBEDDING, obtener_embedding_ollama
+from .fragmentacion import ENCODING_TIKTOKEN_CHUNKING, MODO_FRAGMENTACION, fragmentar_documento, generar_id_fragmento
+from .duplicados import DEDUPLICAR_FRAGMENTOS, SUFIJO_TABLA_ALIAS, IndiceDuplicados, firma_minhash
+from .busqueda import ARCHIVO_CONFIG_BUSQUEDA, SUFIJO_TABLA_FLOAT32, cargar_config_busqueda_lancedb
+from .contexto import SUFIJO_TABLA_RESUMENES, SUFIJO_ARCHIVO_RESUMEN, construir_fila_resumen
+lancedb = importar_perezoso("lancedb") # Se importan al primer uso (ver rag_dof/perezoso.py)
+# from pydantic import BaseModel # Ya no necesitamos el BaseModel genérico de pydantic
+
+# --- Configuración ---
+# Etapa 007 ('rag-dof index'): fragmentos, embeddings e índices de LanceDB a partir de los documentos de 004.
+# Modelo de embedding, fragmentado (por encabezados del DOF o por ventanas de tokens, ver MODO_FRAGMENTACION) y sufijo
+# de la tabla de resúmenes vienen de rag_dof/ (embeddings.py, fragmentacion.py, contexto.py).
+# Con DEDUPLICAR_FRAGMENTOS (rag_dof/duplicados.py) los fragmentos casi idénticos a uno ya guardado (decretos republicados,
+# aclaraciones) no se embeben: van a '<tabla>_alias' con el id del fragmento canónico.
+# Conteos de tokens precalculados para que el armado del prompt (009, core/) no tokenice en cada consulta.
+# Los resúmenes van en la tabla '<tabla>_resumenes' (la escribe 005) completos y ya recortados al límite del contexto.
+# Representación de los vectores en disco (ver 012_reporte_cuantizacion_vectores.py para el ahorro y la pérdida de recall):
+# - "float32": como los devuelve Ollama (4 bytes por dimensión).
+# - "float16": mitad de tamaño; LanceDB indexa y busca directamente sobre la columna 'vector'.
+# - "int8": un cuarto; columnas 'vector_int8' + 'escala_vector' (cuantización escalar por vector). Las consultas
+#   escanean la matriz int8 en memoria.
+# Con float16 e int8 los originales float32 van además a '<tabla>_float32' (id, vector): las consultas reordenan ahí,
+# leyendo solo sus k * factor candidatos, con la pregunta en float32. El índice y la matriz en RAM son los que se
+# reducen; en disco se suma esa copia.
+TIPO_VECTOR_ALMACENADO = "float32"
+# Columnas escalares de metadatos (extraídas del encabezado y del inicio del contenido) con su tipo de índice.
+# BITMAP para columnas de baja cardinalidad; BTREE para rangos (fechas) y búsquedas puntuales (código).
+INDICES_ESCALARES_METADATOS = {
+    "fecha_publicacion": "BTREE",
+    "anio_publicacion": "BTREE",
+    "codigo_dof": "BTREE",
+    "dependencia": "BITMAP",
+    "tipo_documento": "BITMAP",
+}
+# Índice de texto completo (BM25) sobre 'texto': lo usa la rama FTS que 009 y core/ lanzan en paralelo al embedding
+IDIOMA_INDICE_FTS = "Spanish" # Stemming y stop words en español; ascii_folding ignora acentos
+# Siglas -> nombre normalizado (mayúsculas, sin acentos) como aparece al inicio de las notas del DOF
+DEPENDENCIAS_DOF = {
+    "SHCP": "SECRETARIA DE HACIENDA Y CREDITO PUBLICO",
+    "SEGOB": "SECRETARIA DE GOBERNACION",
+    "SRE": "SECRETARIA DE RELACIONES EXTERIORES",
+    "SEDENA": "SECRETARIA DE LA DEFENSA NACIONAL",
+    "SEMAR": "SECRETARIA DE MARINA",
+    "SSPC": "SECRETARIA DE SEGURIDAD Y PROTECCION CIUDADANA",
+    "BIENESTAR": "SECRETARIA DE BIENESTAR",
+    "SEMARNAT": "SECRETARIA DE MEDIO AMBIENTE Y RECURSOS NATURALES",
+    "SENER": "SECRETARIA DE ENERGIA",
+    "SE": "SECRETARIA DE ECONOMIA",
+    "SADER": "SECRETARIA DE AGRICULTURA Y DESARROLLO RURAL",
+    "SICT": "SECRETARIA DE INFRAESTRUCTURA, COMUNICACIONES Y TRANSPORTES",
+    "SCT": "SECRETARIA DE COMUNICACIONES Y TRANSPORTES",
+    "SFP": "SECRETARIA DE LA FUNCION PUBLICA",
+    "SABG": "SECRETARIA ANTICORRUPCION Y BUEN GOBIERNO",
+    "SEP": "SECRETARIA DE EDUCACION PUBLICA",
+    "SALUD": "SECRETARIA DE SALUD",
+    "STPS": "SECRETARIA DEL TRABAJO Y PREVISION SOCIAL",
+    "SEDATU": "SECRETARIA DE DESARROLLO AGRARIO, TERRITORIAL Y URBANO",
+    "CULTURA": "SECRETARIA DE CULTURA",
+    "SECTUR": "SECRETARIA DE TURISMO",
+    "SECIHTI": "SECRETARIA DE CIENCIA, HUMANIDADES, TECNOLOGIA E INNOVACION",
+    "BANXICO": "BANCO DE MEXICO",
+    "INE": "INSTITUTO NACIONAL ELECTORAL",
+    "SCJN": "SUPREMA CORTE DE JUSTICIA DE LA NACION",
+    "CJF": "CONSEJO DE LA JUDICATURA FEDERAL",
+}
+TIPOS_DOCUMENTO_DOF = ("DECRETO", "ACUERDO", "AVISO", "ACLARACION", "CONVENIO", "LINEAMIENTOS", "RESOLUCION",
+                       "NORMA OFICIAL MEXICANA", "PROYECTO DE NORMA", "REGLAS", "CIRCULAR", "OFICIO", "EXTRACTO",
+                       "CONVOCATORIA", "EDICTO", "LISTA", "INDICE", "TIPO DE CAMBIO", "TASAS", "ESTATUTO",
+                       "REGLAMENTO", "MANUAL", "DECLARATORIA", "SENTENCIA", "PROGRAMA")
+# ARCHIVO_CONFIG_BUSQUEDA lo genera 010_benchmark_indices_lancedb.py; si no existe se usan los defaults de LanceDB
+
+def extraer_metadatos_documento(lineas: List[str], texto_contenido: str) -> Dict:
+    """
+    Extrae metadatos escalares de un archivo generado por 004:
+    - codigo_dof y fecha_publicacion de la línea 'URL:' (nota_detalle.php?codigo=...&fecha=dd/mm/aaaa)
+    - tipo_documento del inicio de 'TÍTULO ORIGINAL:'
+    - dependencia (siglas) de los primeros caracteres del contenido
+    Los valores desconocidos quedan como "" (o 0 para el año) para que la columna no sea nula.
+    """
+    cabecera = analizar_cabecera(lineas)
+    metadatos = {"fecha_publicacion": cabecera["fecha_publicacion"], "anio_publicacion": cabecera["anio_publicacion"],
+                 "dependencia": "", "tipo_documento": "", "codigo_dof": cabecera["codigo_dof"]}
+    titulo = normalizar_texto_metadato(cabecera["titulo"])
+
+    for tipo in TIPOS_DOCUMENTO_DOF:
+        if titulo.startswith(tipo):
+            metadatos["tipo_documento"] = tipo; break
+    else:
+        primera_palabra = titulo.split(" ", 1)[0] if titulo else ""
+        metadatos["tipo_documento"] = primera_palabra if primera_palabra.isalpha() else ("OTRO" if titulo else "")
+
+    inicio_contenido = normalizar_texto_metadato(texto_contenido[:400])
+    coincidencias = [(inicio_contenido.find(nombre), siglas) for siglas, nombre in DEPENDENCIAS_DOF.items() if nombre in inicio_contenido]
+    if coincidencias: metadatos["dependencia"] = min(coincidencias)[1] # La que aparece primero en el encabezado
+    return metadatos
+
+@medir_punto_caliente("indices_escalares")
+def crear_indices_escalares_metadatos(tabla):
+    for columna, tipo_indice in INDICES_ESCALARES_METADATOS.items():
+        try:
+            tabla.create_scalar_index(columna, index_type=tipo_indice, replace=True)
+            print(f"  Índice escalar {tipo_indice} creado sobre '{columna}'.")
+        except Exception as e_idx:
+            print(f"  Advertencia: No se pudo crear el índice escalar sobre '{columna}': {e_idx}")
+
+@medir_punto_caliente("indice_fts")
+def crear_indice_texto_completo(tabla):
+    from lancedb.index import FTS
+    try:
+        tabla.create_index("texto", config=FTS(language=IDIOMA_INDICE_FTS, stem=True, remove_stop_words=True, ascii_folding=True), replace=True)
+        print("  Índice de texto completo (FTS) creado sobre 'texto'.")
+    except Exception as e_fts:
+        print(f"  Advertencia: No se pudo crear el índice FTS sobre 'texto': {e_fts}")
+
+def cuantizar_vector_int8(vector: List[float]) -> Tuple[List[int], float]:
+    """Cuantización escalar simétrica por vector: v ~= vector_int8 * escala, sobre el vector normalizado (coseno)."""
+    v = np.asarray(vector, dtype=np.float32)
+    v = v / (np.linalg.norm(v) or 1.0)
+    escala = float(np.max(np.abs(v))) / 127.0 or 1.0
+    return np.clip(np.round(v / escala), -127, 127).astype(np.int8).tolist(), escala
+
+def columnas_vector_para_almacenar(vector: List[float]) -> Dict:
+    if TIPO_VECTOR_ALMACENADO == "int8":
+        vector_int8, escala = cuantizar_vector_int8(vector)
+        return {"vector_int8": vector_int8, "escala_vector": escala}
+    return {"vector": vector} # LanceDB convierte a float16 según el esquema
+
+def crear_tabla_resumenes(db, nombre_tabla_lancedb: str, carpeta_resumenes_txt: str) -> int:
+    """
+    Completa '<tabla>_resumenes' con los _resumen.txt que aún no estén en ella. 005 ya escribe cada resumen
+    directamente en la tabla; esto cubre resúmenes generados antes de eso. Índice BTREE por nombre_archivo_original.
+    """
+    if not os.path.isdir(carpeta_resumenes_txt):
+        print(f"Advertencia: Carpeta de resúmenes '{carpeta_resumenes_txt}' no existe. No se completa la tabla de resúmenes.")
+        return 0
+    nombre_tabla_resumenes = nombre_tabla_lancedb + SUFIJO_TABLA_RESUMENES
+    tabla_resumenes = db.open_table(nombre_tabla_resumenes) if nombre_tabla_resumenes in db.table_names() else None
+    ya_guardados = set()
+    if tabla_resumenes is not None:
+        ya_guardados = set(tabla_resumenes.search().select(["nombre_archivo_original"]).limit(None).to_arrow()
+                           .column("nombre_archivo_original").to_pylist())
+    filas = []
+    for nombre_resumen in sorted(os.listdir(carpeta_resumenes_txt)):
+        if not nombre_resumen.endswith(SUFIJO_ARCHIVO_RESUMEN): continue
+        nombre_archivo_original = nombre_resumen.rsplit(SUFIJO_ARCHIVO_RESUMEN, 1)[0] + ".txt"
+        if nombre_archivo_original in ya_guardados: continue
+        try:
+            with open(os.path.join(carpeta_resumenes_txt, nombre_resumen), 'r', encoding='utf-8') as f:
+                resumen = f.read().strip()
+        except Exception as e:
+            print(f"  Advertencia: No se pudo leer '{nombre_resumen}': {e}"); continue
+        if resumen: filas.append(construir_fila_resumen(nombre_archivo_original, resumen))
+    if filas:
+        if tabla_resumenes is None: tabla_resumenes = db.create_table(nombre_tabla_resumenes, data=filas)
+        else: tabla_resumenes.add(filas)
+    if tabla_resumenes is None:
+        print("No se encontraron resúmenes para la tabla de resúmenes."); return 0
+    try: tabla_resumenes.create_scalar_index("nombre_archivo_original", index_type="BTREE", replace=True)
+    except Exception as e_index: print(f"  Advertencia: No se pudo crear el índice de '{nombre_tabla_resumenes}': {e_index}")
+    print(f"Tabla '{nombre_tabla_resumenes}': {len(ya_guardados)} resúmenes de 005, {len(filas)} añadidos desde la carpeta.")
+    return len(ya_guardados) + len(filas)
+
+def guardar_tabla_alias(db, nombre_tabla_lancedb: str, filas_alias: List[Dict]):
+    """Reescribe '<tabla>_alias' junto con la tabla de fragmentos; sin duplicados la borra para no dejar ids viejos."""
+    nombre_tabla_alias = nombre_tabla_lancedb + SUFIJO_TABLA_ALIAS
+    if not filas_alias:
+        if nombre_tabla_alias in db.table_names(): db.drop_table(nombre_tabla_alias)
+        return
+    tabla_alias = db.create_table(nombre_tabla_alias, data=filas_alias, mode="overwrite")
+    for columna in ("id_canonico", "nombre_archivo_original"):
+        try: tabla_alias.create_scalar_index(columna, index_type="BTREE", replace=True)
+        except Exception as e_index: print(f"  Advertencia: No se pudo crear el índice de '{nombre_tabla_alias}' sobre '{columna}': {e_index}")
+    print(f"Tabla '{nombre_tabla_alias}': {len(filas_alias)} fragmentos duplicados registrados como alias.")
+
+def crear_tabla_vectores_float32(db, nombre_tabla_lancedb: str, dimension: int):
+    """'<tabla>_float32' vacía para los originales de vectores float16/int8; con float32 borra la de una ingesta anterior."""
+    nombre_tabla_float32 = nombre_tabla_lancedb + SUFIJO_TABLA_FLOAT32
+    if TIPO_VECTOR_ALMACENADO == "float32":
+        if nombre_tabla_float32 in db.table_names(): db.drop_table(nombre_tabla_float32)
+        return None
+    esquema = pa.schema([("id", pa.string()), ("vector", pa.list_(pa.float32(), dimension))])
+    return db.create_table(nombre_tabla_float32, schema=esquema, mode="overwrite")
+
+def obtener_embedding_ollama_para_bd(texto: str, modelo: str = MODELO_EMBEDDING_OLLAMA) -> Optional[List[float]]:
+    """Embedding como lista (lo que guarda columnas_vector_para_almacenar); None si Ollama falla."""
+    vector = obtener_embedding_ollama(texto, modelo)
+    return vector.tolist() if vector is not None else None
+
+def crear_base_de_datos_lance(carpeta_documentos_txt: str,
+                               nombre_tabla_lancedb: str,
+                               directorio_bd_lance: str = "./lance_db",
+                               carpeta_resumenes_txt: Optional[str] = None,
+                               ruta_config_busqueda: Optional[str] = None):
+    if not os.path.isdir(directorio_bd_lance):
+        os.makedirs(directorio_bd_lance)
+        print(f"Directorio de LanceDB creado: {directorio_bd_lance}")
+
+    # lancedb tarda en importarse (~2 s): se carga en otro hilo mientras Ollama responde el embedding de prueba
+    precargar_modulos("lancedb")
+
+    # Determinar la dimensión del embedding dinámicamente
+    actual_dimension_usar = DIMENSION_EMBEDDING # Valor por defecto
+    print(f"Obteniendo embedding de prueba para determinar dimensión con {MODELO_EMBEDDING_OLLAMA}...")
+    test_embedding = obtener_embedding_ollama_para_bd("texto de prueba para dimension")
+    if test_embedding:
+        actual_dimension_usar = len(test_embedding)
+        print(f"Dimensión de embedding detectada para '{MODELO_EMBEDDING_OLLAMA}': {actual_dimension_usar}. Usando esta dimensión para el esquema.")
+    else:
+        print(f"No se pudo obtener embedding de prueba. Usando dimensión por defecto: {actual_dimension_usar}. ¡ESTO PODRÍA CAUSAR PROBLEMAS SI NO ES CORRECTO!")
+        # Considerar salir si no se puede determinar la dimensión si es crítico
+        # return
+
+    db = lancedb.connect(directorio_bd_lance)
+    print(f"Conectado a LanceDB en: {directorio_bd_lance}")
+    from lancedb.pydantic import LanceModel, Vector as LanceVector
+
+    # --- Definición del Esquema con LanceModel ---
+    class DocumentoFragmentoBase(LanceModel): # <--- USAR LanceModel
+        id: str
+        texto: str
+        nombre_archivo_original: str
+        indice_fragmento_en_doc: int
+        fecha_publicacion: str # 'AAAA-MM-DD' (comparable como texto en filtros de rango)
+        anio_publicacion: int
+        dependencia: str # Siglas, p.ej. 'SHCP'
+        tipo_documento: str # p.ej. 'DECRETO'
+        codigo_dof: str
+        num_tokens: int # Tokens de 'texto' (ENCODING_TIKTOKEN_CHUNKING)
+        caracteres_traslape: int # Prefijo de 'texto' repetido del fragmento anterior; 0 en el primero
+
+    class DocumentoFragmento(DocumentoFragmentoBase):
+        # Usar LanceVector con la dimensión determinada (float32 o float16 según TIPO_VECTOR_ALMACENADO)
+        vector: LanceVector(actual_dimension_usar, value_type=pa.float16() if TIPO_VECTOR_ALMACENADO == "float16" else pa.float32())
+
+    class DocumentoFragmentoInt8(DocumentoFragmentoBase):
+        vector_int8: LanceVector(actual_dimension_usar, value_type=pa.int8())
+        escala_vector: float
+
+    esquema_tabla = DocumentoFragmentoInt8 if TIPO_VECTOR_ALMACENADO == "int8" else DocumentoFragmento
+    print(f"Vectores almacenados como: {TIPO_VECTOR_ALMACENADO}")
+
+    try:
+        print(f"Intentando crear/sobrescribir tabla '{nombre_tabla_lancedb}'...")
+        tabla = db.create_table(
+            nombre_tabla_lancedb,
+            schema=esquema_tabla, # Pasar la clase LanceModel directamente
+            mode="overwrite"
+        )
+        print(f"Tabla '{nombre_tabla_lancedb}' creada/abierta exitosamente.")
+    except Exception as e:
+        print(f"Error crítico al definir esquema o crear tabla LanceDB: {e}")
+        print("Posibles causas:")
+        print("- La dimensión del vector en el esquema no coincide con la dimensión de los embeddings generados.")
+        print("- Problemas de permisos en el directorio de LanceDB.")
+        print("- Inconsistencias en la instalación de LanceDB o PyArrow.")
+        return
+
+    if not os.path.isdir(carpeta_documentos_txt):
+        print(f"Error: La carpeta de documentos '{carpeta_documentos_txt}' no existe.")
+        return
+    tabla_float32 = crear_tabla_vectores_float32(db, nombre_tabla_lancedb, actual_dimension_usar)
+
+    print(f"Procesando archivos .txt en: {carpeta_documentos_txt}")
+    archivos_procesados_count = 0
+    fragmentos_totales_guardados = 0
+    datos_para_lote = [] # Para añadir en lotes
+    vectores_float32_lote = [] # Sus vectores originales, para '<tabla>_float32' (solo con float16/int8)
+    indice_fragmentos, indice_documentos = IndiceDuplicados(), IndiceDuplicados()
+    filas_alias = []
+    documentos_duplicados_count = 0
+
+    for nombre_archivo in sorted(os.listdir(carpeta_documentos_txt)):
+        if nombre_archivo.endswith(".txt"):
+            print(f"\n  Procesando archivo original: {nombre_archivo}")
+            ruta_completa_archivo_txt = os.path.join(carpeta_documentos_txt, nombre_archivo)
+            try:
+                lineas, texto_documento_completo = leer_documento(ruta_completa_archivo_txt)
+
+                if not texto_documento_completo:
+                    print(f"    El contenido principal del documento {nombre_archivo} está vacío. Saltando.")
+                    continue
+
+                metadatos_documento = extraer_metadatos_documento(lineas, texto_documento_completo)
+                print(f"    Metadatos: {metadatos_documento}")
+                if DEDUPLICAR_FRAGMENTOS:
+                    with punto_caliente("minhash"):
+                        firma_documento = firma_minhash(texto_documento_completo)
+                        duplicado_documento = indice_documentos.buscar(firma_documento)
+                    if duplicado_documento:
+                        documentos_duplicados_count += 1
+                        print(f"    Casi duplicado de '{duplicado_documento[0]}' (similitud estimada {duplicado_documento[1]:.2f}).")
+                    else: indice_documentos.agregar(nombre_archivo, firma_documento)
+
+                for i, (fragmento_texto, caracteres_traslape) in enumerate(fragmentar_documento(texto_documento_completo, MODO_FRAGMENTACION)):
+                    id_frag = generar_id_fragmento(nombre_archivo, i)
+                    firma_fragmento = None
+                    if DEDUPLICAR_FRAGMENTOS:
+                        with punto_caliente("minhash"):
+                            firma_fragmento = firma_minhash(fragmento_texto)
+                            duplicado = indice_fragmentos.buscar(firma_fragmento)
+                        if duplicado:
+                            id_canonico, similitud = duplicado
+                            filas_alias.append({"id": id_frag, "nombre_archivo_original": nombre_archivo, "indice_fragmento_en_doc": i,
+                                                "id_canonico": id_canonico, "similitud": similitud, **metadatos_documento})
+                            continue
+                    # print(f"    Generando embedding para fragmento {i+1} de '{nombre_archivo}'...") # Log menos verboso
+                    embedding_vector = obtener_embedding_ollama_para_bd(fragmento_texto)
+                    if embedding_vector:
+                        if len(embedding_vector) != actual_dimension_usar:
+                            print(f"    ADVERTENCIA: Dimensión de embedding ({len(embedding_vector)}) no coincide con esquema ({actual_dimension_usar}) para fragmento {i+1} de '{nombre_archivo}'. Saltando.")
+                            continue
+                        indice_fragmentos.agregar(id_frag, firma_fragmento)
+                        datos_para_lote.append({
+                            "id": id_frag,
+                            "texto": fragmento_texto,
+                            **columnas_vector_para_almacenar(embedding_vector),
+                            "nombre_archivo_original": nombre_archivo,
+                            "indice_fragmento_en_doc": i,
+                            "num_tokens": contar_tokens(fragmento_texto, ENCODING_TIKTOKEN_CHUNKING),
+                            "caracteres_traslape": caracteres_traslape,
+                            **metadatos_documento
+                        })
+                        if tabla_float32 is not None: vectores_float32_lote.append({"id": id_frag, "vector": embedding_vector})
+                        # print(f"      Embedding generado para fragmento {id_frag} (Texto: '{fragmento_texto[:30]}...')")
+                    else:
+                        print(f"      No se pudo generar embedding para fragmento {i+1} de '{nombre_archivo}'.")
+                    with punto_caliente("pausa_entre_embeddings"):
+                        time.sleep(0.02) # Reducir pausa si Ollama es local y rápido
+
+                archivos_procesados_count += 1
+                if len(datos_para_lote) >= 100: # Añadir en lotes de 100 (o ajusta)
+                    if datos_para_lote:
+                        with punto_caliente("tabla_add"):
+                            tabla.add(datos_para_lote)
+                            if vectores_float32_lote: tabla_float32.add(vectores_float32_lote)
+                        print(f"    Se añadieron {len(datos_para_lote)} fragmentos a la tabla LanceDB.")
+                        fragmentos_totales_guardados += len(datos_para_lote)
+                        datos_para_lote, vectores_float32_lote = [], []
+
+
+            except Exception as e_file:
+                print(f"  Error procesando el archivo {nombre_archivo}: {e_file}")
+    
+    # Añadir cualquier fragmento restante en el lote
+    if datos_para_lote:
+        with punto_caliente("tabla_add"):
+            tabla.add(datos_para_lote)
+            if vectores_float32_lote: tabla_float32.add(vectores_float32_lote)
+        print(f"    Se añadieron {len(datos_para_lote)} fragmentos finales a la tabla LanceDB.")
+        fragmentos_totales_guardados += len(datos_para_lote)
+
+    print(f"\nProcesamiento de {archivos_procesados_count} archivos completado.")
+    if DEDUPLICAR_FRAGMENTOS:
+        print(f"Casi duplicados: {documentos_duplicados_count} documentos y {len(filas_alias)} fragmentos sin embedding propio.")
+    guardar_tabla_alias(db, nombre_tabla_lancedb, filas_alias)
+    if fragmentos_totales_guardados > 0:
+        print("Creando índices escalares sobre metadatos (fecha, dependencia, tipo, código)...")
+        crear_indices_escalares_metadatos(tabla)
+        print("Creando índice de texto completo para la búsqueda por palabras clave...")
+        crear_indice_texto_completo(tabla)
+        if tabla_float32 is not None: # El rescoring lee sus filas por id
+            try: tabla_float32.create_scalar_index("id", index_type="BTREE", replace=True)
+            except Exception as e_index: print(f"  Advertencia: No se pudo crear el índice de '{tabla_float32.name}' sobre 'id': {e_index}")
+        if ruta_config_busqueda is None: # Por defecto, junto al directorio de la BD (donde lo escribe 010)
+            ruta_config_busqueda = os.path.join(os.path.dirname(os.path.abspath(directorio_bd_lance)), ARCHIVO_CONFIG_BUSQUEDA)
+        config_busqueda = cargar_config_busqueda_lancedb(ruta_config_busqueda)
+        index_type = config_busqueda.get("index_type", "IVF_PQ")
+        if TIPO_VECTOR_ALMACENADO == "int8":
+            print("Vectores int8: la búsqueda escanea la matriz cuantizada en memoria. No se crea índice vectorial.")
+        elif index_type == "FLAT":
+            print("Configuración de búsqueda indica búsqueda exacta (FLAT). No se crea índice vectorial.")
+        else:
+            print(f"Creando índice {index_type} en la tabla (puede tardar un poco)...")
+            try:
+                # Los parámetros (num_partitions, num_sub_vectors, m, ef_construction) los elige
+                # 010_benchmark_indices_lancedb.py midiendo recall@k y latencia sobre los mismos datos.
+                # Sin archivo de configuración se dejan los defaults de LanceDB.
+                parametros_indice = {c: config_busqueda[c] for c in ("num_partitions", "num_sub_vectors", "m", "ef_construction")
+                                     if config_busqueda.get(c) is not None}
+                print(f"Número de filas para indexar: {tabla.count_rows()}. Parámetros: {parametros_indice or 'defaults de LanceDB'}")
+                with punto_caliente("indice_vectorial"):
+                    tabla.create_index(
+                        metric=config_busqueda.get("metric", "cosine"),
+                        index_type=index_type,
+                        replace=True,
+                        **parametros_indice
+                    )
+                print(f"Índice {index_type} creado exitosamente.")
+            except Exception as e_index:
+                print(f"Error al crear el índice {index_type}: {e_index}")
+                print("La tabla se creó, pero la búsqueda puede ser más lenta sin un índice vectorial optimizado.")
+
+    if carpeta_resumenes_txt:
+        crear_tabla_resumenes(db, nombre_tabla_lancedb, carpeta_resumenes_txt)
+
+    print(f"Total de {fragmentos_totales_guardados} fragmentos con embeddings guardados en la tabla '{nombre_tabla_lancedb}'.")
+    print(f"Base de datos LanceDB guardada en: {directorio_bd_lance}")
+
+
+def main(argv: Optional[List[str]] = None, directorio_base: Optional[str] = None):
+    """'rag-dof index' y 007: documentos, BD y catálogo bajo directorio_base (por defecto, el directorio actual)."""
+    parser_cli = agregar_argumentos_perfilado(argparse.ArgumentParser(description="Crea la base LanceDB (fragmentos, embeddings e índices) a partir de los documentos descargados."))
+    iniciar_perfilado_si_se_pide(parser_cli.parse_args(argv), __file__)
+    termino_busqueda_original_main = "decreto" 
+    script_dir_main = directorio_base or os.getcwd()
+    carpeta_textos_entrada_main = sanitizar_nombre(termino_busqueda_original_main, es_carpeta=True) + "_colectados"
+    ruta_carpeta_textos_completa = os.path.join(script_dir_main, carpeta_textos_entrada_main)
+    nombre_tabla_db = sanitizar_nombre_tabla_lancedb(termino_busqueda_original_main)
+    directorio_lance = os.path.join(script_dir_main, "lancedb_store_bge_m3") # Nuevo nombre de directorio para esta BD
+
+    print(f"Iniciando creación de base de datos LanceDB para la búsqueda: '{termino_busqueda_original_main}'")
+    print(f"Modelo de embedding Ollama: {MODELO_EMBEDDING_OLLAMA}")
+    print(f"Directorio de LanceDB: {directorio_lance}")
+    print(f"Nombre de la tabla en LanceDB: {nombre_tabla_db}")
+    print(f"Carpeta de documentos de entrada: {ruta_carpeta_textos_completa}")
+
+    ruta_carpeta_resumenes_completa = os.path.join(script_dir_main, carpeta_textos_entrada_main + "_resumen")
+    crear_base_de_datos_lance(ruta_carpeta_textos_completa, nombre_tabla_db, directorio_bd_lance=directorio_lance,
+                              carpeta_resumenes_txt=ruta_carpeta_resumenes_completa,
+                              ruta_config_busqueda=os.path.join(script_dir_main, ARCHIVO_CONFIG_BUSQUEDA))
+    # Catálogo para /explore y /api/documents: incremental, solo relee los archivos nuevos o modificados
+    actualizar_catalogo(os.path.join(script_dir_main, ARCHIVO_CATALOGO), ruta_carpeta_textos_completa, ruta_carpeta_resumenes_completa)
+    
+    print("\nScript de creación de base de datos LanceDB finalizado.")
+    print(f"Para verificar, puedes abrir la tabla '{nombre_tabla_db}' en otra sesión de Python:")
+    print(f"  import lancedb")
+    print(f"  db = lancedb.connect('{directorio_lance}')")
+    print(f"  try:")
+    print(f"    table = db.open_table('{nombre_tabla_db}')")
+    print(f"    print(table.schema)")
+    print(f"    print(f'Número de filas: {{table.count_rows()}}'))")
+    print(f"    print(table.head(2).to_pandas())")
+    print(f"  except Exception as e: print(f'Error al abrir la tabla: {{e}}')")
+
+if __name__ == "__main__":
+    main()
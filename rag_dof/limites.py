@@ -0,0 +1,91 @@
+import time
+import asyncio
+import threading
+from typing import List, Optional
+
+# --- Configuración ---
+# Límites por minuto de una API (solicitudes y tokens procesados), para los scripts que llaman a Groq desde un solo
+# proceso (005, 009). Los límites se pasan en cada llamada: cada script los define en su configuración según su modelo.
+# La web reparte la cuota entre workers con la caché compartida (core/admision.py), no con esta clase; de aquí usa solo
+# la estimación de espera y la decisión de admisión (segundos_hasta_cuota, estado_rechazo_admision).
+SEGUNDOS_VENTANA = 60.0
+MARGEN_CAMBIO_MINUTO_SEGUNDOS = 0.1 # Se espera un poco más que el fin del minuto para no caer en el mismo lado del reloj de la API
+FRACCION_SOLICITUD_GRANDE = 0.90 # Una solicitud que por sí sola ocupa esta fracción del límite de tokens espera un minuto limpio
+
+class LimitadorPorMinuto:
+    """Contadores del minuto en curso; esperar_turno() duerme lo necesario antes de cada solicitud y registrar() la cuenta."""
+    def __init__(self, nombre_api: str):
+        self.nombre_api = nombre_api
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self, inicio: float = None):
+        """Empieza un minuto nuevo (también tras un 429: la API ya dijo que la cuota del minuto se agotó)."""
+        self.solicitudes, self.tokens, self.inicio_minuto = 0, 0, time.time() if inicio is None else inicio
+
+    def _esperar_fin_de_minuto(self, motivo: str):
+        espera = SEGUNDOS_VENTANA + MARGEN_CAMBIO_MINUTO_SEGUNDOS - (time.time() - self.inicio_minuto)
+        if espera > 0:
+            print(f"    {motivo} ({self.nombre_api}). Esperando {espera:.2f}s...")
+            time.sleep(espera)
+        self.reiniciar()
+
+    def esperar_turno(self, tokens_proyectados: int, limite_solicitudes: int, limite_tokens: int, esperar_si_es_grande: bool = False):
+        """
+        tokens_proyectados: prompt más la salida máxima esperada. Espera al minuto siguiente si se alcanzó el límite de
+        solicitudes o si los tokens del minuto más los proyectados lo exceden. Con esperar_si_es_grande, una solicitud
+        que por sí sola se acerca al límite tampoco comparte minuto con otras.
+        """
+        with self._lock:
+            if time.time() - self.inicio_minuto >= SEGUNDOS_VENTANA:
+                if self.solicitudes or self.tokens:
+                    print(f"    -- Nuevo minuto API {self.nombre_api}. Reset (Sols: {self.solicitudes}, Tokens: {self.tokens}) --")
+                self.reiniciar()
+            if esperar_si_es_grande and self.tokens > 0 and tokens_proyectados > limite_tokens * FRACCION_SOLICITUD_GRANDE:
+                self._esperar_fin_de_minuto(f"Solicitud grande ({tokens_proyectados} tokens) y ya se usaron {self.tokens} este minuto")
+            if self.solicitudes >= limite_solicitudes:
+                self._esperar_fin_de_minuto(f"Límite de {limite_solicitudes} Sols/min alcanzado")
+            if self.tokens + tokens_proyectados > limite_tokens:
+                self._esperar_fin_de_minuto(f"Límite Tokens/min (proy. {self.tokens + tokens_proyectados}/{limite_tokens}) cercano")
+
+    def registrar(self, tokens: int):
+        """Cuenta una solicitud terminada con sus tokens reales (prompt + respuesta)."""
+        with self._lock:
+            self.solicitudes += 1; self.tokens += tokens
+
+class CuotaLimitadorPorMinuto:
+    """
+    Cuota de generar_respuesta_groq_stream (rag_dof/generacion.py) para un solo proceso: espera turno en un
+    LimitadorPorMinuto (en un hilo, sin detener el event loop) y registra los tokens que de verdad se consumieron.
+    """
+    def __init__(self, limitador: LimitadorPorMinuto, limite_solicitudes: int, limite_tokens: int, max_tokens_respuesta: int):
+        self.limitador, self.limite_solicitudes, self.limite_tokens = limitador, limite_solicitudes, limite_tokens
+        self.max_tokens_respuesta = max_tokens_respuesta
+
+    async def esperar_turno(self, tokens_prompt: int):
+        await asyncio.to_thread(self.limitador.esperar_turno, tokens_prompt + self.max_tokens_respuesta, self.limite_solicitudes, self.limite_tokens)
+
+    async def reiniciar(self):
+        self.limitador.reiniciar()
+
+    def liquidar(self, tokens_usados: int):
+        if tokens_usados: self.limitador.registrar(tokens_usados)
+
+def segundos_hasta_cuota(inicio_minuto: float, solicitudes_usadas: int, tokens_usados: int, tokens_delante: List[int], tokens: int,
+                         limite_solicitudes: int, limite_tokens: int, ahora: Optional[float] = None) -> float:
+    """
+    Segundos hasta que una solicitud de 'tokens' obtendría cuota: lo usado en el minuto actual más lo que piden las que
+    esperan delante (tokens_delante, una entrada por solicitud), contado en minutos completos.
+    """
+    if not tokens_delante and not solicitudes_usadas and not tokens_usados: return 0.0
+    minutos = max((tokens_usados + sum(tokens_delante) + tokens - 1) // limite_tokens,
+                  (solicitudes_usadas + len(tokens_delante)) // limite_solicitudes)
+    if minutos == 0: return 0.0
+    ahora = time.time() if ahora is None else ahora
+    return max(0.0, SEGUNDOS_VENTANA - (ahora - inicio_minuto)) + (minutos - 1) * SEGUNDOS_VENTANA
+
+def estado_rechazo_admision(pendientes: int, max_en_cola: int, espera: float, plazo: float) -> Optional[int]:
+    """429 si la cola ya está llena, 503 si la espera estimada excede el plazo; None si la solicitud se admite."""
+    if pendientes >= max_en_cola: return 429
+    if espera > plazo: return 503
+    return None
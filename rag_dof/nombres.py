@@ -0,0 +1,28 @@
+import re
+import unicodedata
+
+# --- Configuración ---
+# Nombres de carpetas, archivos y tablas derivados del término de búsqueda o del título de una nota. 004 crea la carpeta
+# y los .txt, 005-012 y la web los vuelven a calcular para encontrarlos: todos tienen que usar estas mismas funciones.
+MAX_LONGITUD_NOMBRE = 150
+MAX_LONGITUD_NOMBRE_TABLA = 60
+NOMBRE_CARPETA_VACIA = "documentos_sin_nombre_busqueda"
+NOMBRE_ARCHIVO_VACIO = "documento_sin_titulo"
+NOMBRE_TABLA_VACIA = "documentos_dof"
+
+def sanitizar_nombre(nombre: str, es_carpeta=False) -> str:
+    """Minúsculas, '_' en lugar de espacios y solo letras, dígitos, '_' y '-' (y '.' en archivos), hasta MAX_LONGITUD_NOMBRE."""
+    nombre = re.sub(r'\s+', '_', str(nombre).lower())
+    nombre = re.sub(r'[^\w-]' if es_carpeta else r'[^\w.-]', '', nombre)[:MAX_LONGITUD_NOMBRE]
+    if not nombre: return NOMBRE_CARPETA_VACIA if es_carpeta else NOMBRE_ARCHIVO_VACIO
+    return nombre
+
+def sanitizar_nombre_tabla_lancedb(nombre: str) -> str:
+    """Nombre de tabla de LanceDB (sin puntos, hasta MAX_LONGITUD_NOMBRE_TABLA); la de resúmenes le agrega un sufijo."""
+    nombre = re.sub(r'[^\w-]', '', re.sub(r'\s+', '_', str(nombre).lower()))[:MAX_LONGITUD_NOMBRE_TABLA]
+    return nombre or NOMBRE_TABLA_VACIA
+
+def normalizar_texto_metadato(texto: str) -> str:
+    """Mayúsculas sin acentos ni espacios repetidos, para comparar contra catálogos y filtrar."""
+    sin_acentos = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r'\s+', ' ', sin_acentos).strip().upper()
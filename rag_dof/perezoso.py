@@ -0,0 +1,50 @@
+import sys
+import types
+import importlib
+import threading
+from concurrent.futures import Future
+from typing import Callable
+
+# --- Configuración ---
+# Carga diferida de dependencias pesadas. 'import lancedb' tarda unos 2 s (sobre todo su cliente REST de namespaces),
+# ollama unos 0.4 s y groq 0.3 s, aunque el script los use hasta después de leer argumentos o esperar una pregunta.
+# importar_perezoso("lancedb") devuelve un módulo vacío que importa el real en el primer acceso a un atributo, y
+# precargar_modulos() / iniciar_en_segundo_plano() adelantan ese trabajo en un hilo mientras el script hace otra cosa.
+# bench/arranque_importaciones.py mide el efecto con 'python -X importtime'.
+PREFIJO_HILOS_PRECARGA = "precarga"
+
+class ModuloPerezoso(types.ModuleType):
+    """Sustituto de un módulo: lo importa en el primer acceso a un atributo y desde entonces expone lo mismo que él."""
+    def __getattr__(self, atributo: str):
+        # import_module toma el bloqueo de importación del módulo: si otro hilo lo está precargando, se espera a que termine
+        modulo = importlib.import_module(self.__name__)
+        self.__dict__.update(modulo.__dict__)
+        return getattr(modulo, atributo)
+
+    def __repr__(self) -> str:
+        return f"<módulo perezoso '{self.__name__}' ({'cargado' if esta_cargado(self.__name__) else 'sin cargar'})>"
+
+def importar_perezoso(nombre: str) -> types.ModuleType:
+    """El módulo si ya está importado; si no, un ModuloPerezoso que lo importa al usarse por primera vez."""
+    return sys.modules.get(nombre) or ModuloPerezoso(nombre)
+
+def esta_cargado(nombre: str) -> bool:
+    return nombre in sys.modules
+
+def iniciar_en_segundo_plano(funcion: Callable, *args, **kwargs) -> Future:
+    """Ejecuta funcion en un hilo daemon (importar, abrir una tabla, cargar la BPE) y devuelve su Future.
+    El hilo es daemon para que salir del script no espere a una precarga que ya no hace falta."""
+    futuro = Future()
+    def ejecutar():
+        if not futuro.set_running_or_notify_cancel(): return
+        try: futuro.set_result(funcion(*args, **kwargs))
+        except BaseException as e_tarea: futuro.set_exception(e_tarea)
+    threading.Thread(target=ejecutar, daemon=True, name=f"{PREFIJO_HILOS_PRECARGA}_{getattr(funcion, '__name__', 'tarea')}").start()
+    return futuro
+
+def importar_modulos(*nombres: str):
+    for nombre in nombres: importlib.import_module(nombre)
+
+def precargar_modulos(*nombres: str) -> Future:
+    """Importa los módulos, en orden, en un hilo aparte; el Future se resuelve cuando están todos cargados."""
+    return iniciar_en_segundo_plano(importar_modulos, *nombres)
@@ -0,0 +1,187 @@
+import os
+import sys
+import json
+import time
+import atexit
+import pstats
+import cProfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from io import StringIO
+from typing import Dict, List, Optional, Tuple
+
+# --- Configuración ---
+# Perfilado opcional de los scripts 004-009 (opción --profile). La aplicación web usa la misma lógica en core/perfilado.py.
+# 'cprofile': estadísticas exactas por función del hilo principal (.prof para snakeviz/pstats y un reporte de texto).
+# 'muestreo': pilas de todos los hilos cada INTERVALO_MUESTREO_SEGUNDOS (speedscope .json, pilas plegadas para
+# flamegraph.pl/speedscope y reporte por función). Los puntos calientes declarados con punto_caliente() se reportan en ambos.
+MODOS_PERFILADO = ("cprofile", "muestreo")
+DIRECTORIO_PERFILES = "perfiles"
+INTERVALO_MUESTREO_SEGUNDOS = 0.005
+NUM_FUNCIONES_EN_REPORTE = 40
+_perfilado_activo = False
+_lock_puntos_calientes = threading.Lock()
+_puntos_calientes: Dict[str, List[float]] = {} # nombre -> [llamadas, total_s, max_s]
+
+def agregar_argumentos_perfilado(parser):
+    parser.add_argument("--profile", nargs="?", const="cprofile", choices=MODOS_PERFILADO, default=None,
+                        help="Perfilar la ejecución: 'cprofile' (por defecto) o 'muestreo' (todos los hilos; genera speedscope y flamegraph).")
+    parser.add_argument("--profile-dir", default=DIRECTORIO_PERFILES, help="Carpeta donde se escriben los perfiles.")
+    return parser
+
+@contextmanager
+def punto_caliente(nombre: str):
+    """Temporizador de una sección declarada (tokenización, embeddings, tabla.add...). Sin --profile no mide nada."""
+    if not _perfilado_activo: yield; return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion = time.perf_counter() - inicio
+        with _lock_puntos_calientes:
+            estadisticas = _puntos_calientes.setdefault(nombre, [0, 0.0, 0.0])
+            estadisticas[0] += 1; estadisticas[1] += duracion; estadisticas[2] = max(estadisticas[2], duracion)
+
+def medir_punto_caliente(nombre: str):
+    """Decorador equivalente a envolver cada llamada de la función en punto_caliente(nombre)."""
+    def decorador(funcion):
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not _perfilado_activo: return funcion(*args, **kwargs)
+            with punto_caliente(nombre): return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+def reporte_puntos_calientes() -> str:
+    with _lock_puntos_calientes:
+        filas = sorted(_puntos_calientes.items(), key=lambda item: item[1][1], reverse=True)
+    lineas = [f"{'punto caliente':<28} {'llamadas':>9} {'total(s)':>10} {'media(ms)':>10} {'max(ms)':>9}"]
+    for nombre, (llamadas, total, maximo) in filas:
+        lineas.append(f"{nombre:<28} {llamadas:>9.0f} {total:>10.3f} {total * 1000 / max(1, llamadas):>10.3f} {maximo * 1000:>9.3f}")
+    return "\n".join(lineas)
+
+class MuestreadorPilas(threading.Thread):
+    """Hilo que toma la pila de cada hilo vivo a intervalos fijos; cada pila acumula el tiempo real entre muestras."""
+    def __init__(self, intervalo_segundos: float = INTERVALO_MUESTREO_SEGUNDOS):
+        super().__init__(name="muestreador_perfilado", daemon=True)
+        self.intervalo_segundos = intervalo_segundos
+        self.muestras: Counter = Counter() # (nombre_hilo, pila de (función, archivo, línea) de raíz a hoja) -> segundos
+        self._detener = threading.Event()
+
+    def run(self):
+        anterior = time.perf_counter()
+        while not self._detener.wait(self.intervalo_segundos):
+            ahora = time.perf_counter(); transcurrido = ahora - anterior; anterior = ahora
+            nombres_hilos = {hilo.ident: hilo.name for hilo in threading.enumerate()}
+            for id_hilo, frame in sys._current_frames().items():
+                if id_hilo == self.ident: continue
+                pila = []
+                while frame is not None:
+                    codigo = frame.f_code
+                    pila.append((codigo.co_name, codigo.co_filename, codigo.co_firstlineno))
+                    frame = frame.f_back
+                self.muestras[(nombres_hilos.get(id_hilo, str(id_hilo)), tuple(reversed(pila)))] += transcurrido
+
+    def detener(self):
+        self._detener.set(); self.join(timeout=1.0)
+
+def nombre_frame(frame: Tuple[str, str, int]) -> str:
+    funcion, archivo, linea = frame
+    return f"{funcion} ({os.path.basename(archivo)}:{linea})"
+
+def exportar_speedscope(muestras: Counter, ruta: str, nombre: str):
+    """Formato de archivo de speedscope (https://www.speedscope.app): un perfil 'sampled' por hilo, pesos en ms."""
+    indices_frames: Dict[Tuple[str, str, int], int] = {}
+    frames: List[Dict] = []
+    perfiles: Dict[str, Dict] = {}
+    for (nombre_hilo, pila), segundos in muestras.most_common():
+        indices = []
+        for frame in pila:
+            if frame not in indices_frames:
+                indices_frames[frame] = len(frames)
+                frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+            indices.append(indices_frames[frame])
+        perfil = perfiles.setdefault(nombre_hilo, {"type": "sampled", "name": nombre_hilo, "unit": "milliseconds",
+                                                   "startValue": 0, "endValue": 0, "samples": [], "weights": []})
+        perfil["samples"].append(indices); perfil["weights"].append(segundos * 1000)
+        perfil["endValue"] += segundos * 1000
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump({"$schema": "https://www.speedscope.app/file-format-schema.json", "name": nombre, "exporter": "perfilado_dof",
+                   "activeProfileIndex": 0, "shared": {"frames": frames}, "profiles": list(perfiles.values())}, f)
+
+def exportar_pilas_plegadas(muestras: Counter, ruta: str):
+    """Una línea 'hilo;raíz;...;hoja milisegundos' por pila: entrada de flamegraph.pl, inferno o speedscope."""
+    with open(ruta, "w", encoding="utf-8") as f:
+        for (nombre_hilo, pila), segundos in muestras.most_common():
+            if round(segundos * 1000) > 0:
+                f.write(";".join([nombre_hilo] + [nombre_frame(fr).replace(";", ",") for fr in pila]) + f" {round(segundos * 1000)}\n")
+
+def reporte_funciones_muestreo(muestras: Counter, intervalo_segundos: float, num_funciones: int = NUM_FUNCIONES_EN_REPORTE) -> str:
+    """Por hilo (el principal primero): funciones con más tiempo propio, con su tiempo acumulado. Incluye esperas."""
+    propias, acumuladas, por_hilo = Counter(), Counter(), Counter()
+    for (nombre_hilo, pila), segundos in muestras.items():
+        por_hilo[nombre_hilo] += segundos
+        if not pila: continue
+        propias[(nombre_hilo, pila[-1])] += segundos
+        for frame in set(pila): acumuladas[(nombre_hilo, frame)] += segundos # Una vez por muestra aunque haya recursión
+    hilos = sorted(por_hilo, key=lambda hilo: (hilo != "MainThread", -por_hilo[hilo]))
+    lineas = [f"Muestreo cada {intervalo_segundos * 1000:.1f} ms; tiempo de pared por hilo (incluye esperas)."]
+    for nombre_hilo in hilos:
+        lineas += ["", f"== {nombre_hilo}: {por_hilo[nombre_hilo]:.2f}s muestreados",
+                   f"{'propio(s)':>10} {'propio%':>8} {'acum(s)':>10}  función"]
+        filas = sorted(((frame, seg) for (hilo, frame), seg in propias.items() if hilo == nombre_hilo), key=lambda f: -f[1])
+        for frame, segundos in filas[:num_funciones]:
+            lineas.append(f"{segundos:>10.3f} {segundos * 100 / por_hilo[nombre_hilo]:>7.1f}% "
+                          f"{acumuladas[(nombre_hilo, frame)]:>10.3f}  {nombre_frame(frame)}")
+    return "\n".join(lineas)
+
+def iniciar_perfilado(modo: str, nombre_script: str, directorio: str = DIRECTORIO_PERFILES) -> str:
+    """Activa el perfilador y registra su volcado al salir del proceso (también con exit() o Ctrl+C). Devuelve la ruta base."""
+    global _perfilado_activo
+    os.makedirs(directorio, exist_ok=True)
+    nombre_base = os.path.splitext(os.path.basename(nombre_script))[0]
+    ruta_base = os.path.join(directorio, f"{nombre_base}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    _perfilado_activo = True
+    inicio = time.perf_counter()
+    if modo == "muestreo":
+        perfilador = MuestreadorPilas(); perfilador.start()
+    else:
+        perfilador = cProfile.Profile(); perfilador.enable()
+
+    def volcar():
+        global _perfilado_activo
+        _perfilado_activo = False
+        duracion = time.perf_counter() - inicio
+        archivos = []
+        if modo == "muestreo":
+            perfilador.detener()
+            exportar_speedscope(perfilador.muestras, ruta_base + ".speedscope.json", nombre_base)
+            exportar_pilas_plegadas(perfilador.muestras, ruta_base + ".folded")
+            reporte = reporte_funciones_muestreo(perfilador.muestras, perfilador.intervalo_segundos)
+            archivos += [ruta_base + ".speedscope.json", ruta_base + ".folded"]
+        else:
+            perfilador.disable()
+            perfilador.dump_stats(ruta_base + ".prof")
+            salida = StringIO()
+            pstats.Stats(perfilador, stream=salida).sort_stats("cumulative").print_stats(NUM_FUNCIONES_EN_REPORTE)
+            reporte = salida.getvalue()
+            archivos.append(ruta_base + ".prof")
+        with open(ruta_base + "_funciones.txt", "w", encoding="utf-8") as f:
+            f.write(reporte)
+        with open(ruta_base + "_puntos_calientes.txt", "w", encoding="utf-8") as f:
+            f.write(reporte_puntos_calientes() + "\n")
+        archivos += [ruta_base + "_funciones.txt", ruta_base + "_puntos_calientes.txt"]
+        print(f"\n--- Perfil ({modo}) de {nombre_base}: {duracion:.1f}s ---")
+        print(reporte_puntos_calientes())
+        print("Archivos: " + ", ".join(archivos))
+
+    atexit.register(volcar)
+    print(f"Perfilado '{modo}' activo; los resultados se escriben en '{ruta_base}*' al terminar.")
+    return ruta_base
+
+def iniciar_perfilado_si_se_pide(args, nombre_script: str) -> Optional[str]:
+    if not getattr(args, "profile", None): return None
+    return iniciar_perfilado(args.profile, nombre_script, args.profile_dir)
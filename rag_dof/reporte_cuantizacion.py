@@ -0,0 +1,137 @@
+import os
+import time
+import shutil
+import argparse
+import numpy as np
+import pyarrow as pa
+from typing import List, Dict, Optional, Tuple
+from .perezoso import importar_perezoso
+from .busqueda import FACTOR_SOBREMUESTREO_RESCORING # El mismo default con que consultan 008/009/011 y la web
+from .evaluacion import (NUM_VECTORES_SINTETICOS, DIMENSION_SINTETICA, generar_vectores_sinteticos, generar_consultas,
+                         cargar_vectores_de_tabla, top_k, calcular_recall, tamano_directorio_bytes)
+lancedb = importar_perezoso("lancedb") # Se importa al primer uso (ver rag_dof/perezoso.py)
+
+# --- Configuración ---
+# Etapa 012 ('rag-dof bench cuantizacion').
+# Compara las representaciones de vectores que admite 007 (TIPO_VECTOR_ALMACENADO): float32, float16 e int8. El rescoring
+# reordena los k * factor candidatos con los originales float32 ('<tabla>_float32', como ejecutar_busqueda_vectorial), cuyo
+# tamaño se suma al disco de esas variantes; la variante "cuantizado" reordena con los mismos valores cuantizados.
+DIRECTORIO_BD_REPORTE = "lancedb_reporte_cuantizacion" # Copia de trabajo; nunca se toca la BD real
+K_RECALL = 10
+NUM_CONSULTAS = 200
+
+def cuantizar_matriz_int8(vectores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Misma cuantización que cuantizar_vector_int8 de 007, aplicada fila por fila."""
+    escalas = np.max(np.abs(vectores), axis=1) / 127.0
+    escalas[escalas == 0] = 1.0
+    return np.clip(np.round(vectores / escalas[:, None]), -127, 127).astype(np.int8), escalas.astype(np.float32)
+
+def rescoring_float32(candidatos: np.ndarray, matriz_rescoring: np.ndarray, consultas: np.ndarray, k: int) -> np.ndarray:
+    """Reordena los candidatos de cada consulta con la consulta en float32 contra las filas de matriz_rescoring."""
+    finales = np.empty((len(consultas), k), dtype=np.int64)
+    for i, (fila_candidatos, q) in enumerate(zip(candidatos, consultas)):
+        similitudes = matriz_rescoring[fila_candidatos].astype(np.float32) @ q
+        finales[i] = fila_candidatos[np.argsort(-similitudes)[:k]]
+    return finales
+
+def medir_disco_lancedb(db, directorio_bd: str, nombre: str, columnas: Dict[str, pa.Array]) -> int:
+    """Escribe una tabla LanceDB solo con la(s) columna(s) de vectores y devuelve su tamaño en disco."""
+    db.create_table(nombre, data=pa.table(columnas), mode="overwrite")
+    return tamano_directorio_bytes(os.path.join(directorio_bd, f"{nombre}.lance"))
+
+def generar_reporte(vectores: np.ndarray, consultas: np.ndarray, directorio_bd: str, k: int = K_RECALL,
+                    factor: int = FACTOR_SOBREMUESTREO_RESCORING) -> List[Dict]:
+    n_filas, dim = vectores.shape
+    print(f"Calculando vecinos exactos (float32, fuerza bruta) para {len(consultas)} consultas sobre {n_filas} vectores de dim {dim}...")
+    vecinos_exactos = top_k(consultas @ vectores.T, k)
+
+    matriz_f16 = vectores.astype(np.float16)
+    matriz_int8, escalas = cuantizar_matriz_int8(vectores)
+    decuantizada_int8 = matriz_int8.astype(np.float32) * escalas[:, None]
+
+    if os.path.isdir(directorio_bd): shutil.rmtree(directorio_bd)
+    db = lancedb.connect(directorio_bd)
+    disco = {
+        "float32": medir_disco_lancedb(db, directorio_bd, "vectores_float32",
+                                       {"vector": pa.FixedSizeListArray.from_arrays(pa.array(vectores.reshape(-1)), dim)}),
+        "float16": medir_disco_lancedb(db, directorio_bd, "vectores_float16",
+                                       {"vector": pa.FixedSizeListArray.from_arrays(pa.array(matriz_f16.reshape(-1)), dim)}),
+        "int8": medir_disco_lancedb(db, directorio_bd, "vectores_int8",
+                                    {"vector_int8": pa.FixedSizeListArray.from_arrays(pa.array(matriz_int8.reshape(-1)), dim),
+                                     "escala_vector": pa.array(escalas)}),
+        "copia_float32": medir_disco_lancedb(db, directorio_bd, "vectores_copia_float32",
+                                             {"id": pa.array([f"{i:08d}" for i in range(n_filas)]),
+                                              "vector": pa.FixedSizeListArray.from_arrays(pa.array(vectores.reshape(-1)), dim)}),
+    }
+    ram = {"float32": vectores.nbytes, "float16": matriz_f16.nbytes, "int8": matriz_int8.nbytes + escalas.nbytes}
+
+    def medir(nombre: str, representacion: str, buscar, con_copia_float32: bool = False) -> Dict:
+        inicio = time.perf_counter()
+        vecinos = buscar()
+        ms_por_consulta = (time.perf_counter() - inicio) * 1000 / len(consultas)
+        fila = {"variante": nombre, "representacion": representacion, "recall_at_k": calcular_recall(vecinos, vecinos_exactos),
+                "ms_por_consulta": ms_por_consulta, "disco_bytes": disco[representacion] + (disco["copia_float32"] if con_copia_float32 else 0),
+                "ram_bytes": ram[representacion]}
+        print(f"  {nombre:<36} recall@{k}: {fila['recall_at_k']:.3f}  {ms_por_consulta:.3f} ms/consulta")
+        return fila
+
+    consultas_f16 = consultas.astype(np.float16)
+    # Igual que buscar_int8_con_rescoring: la consulta también se cuantiza para la puntuación aproximada
+    consultas_int8, _ = cuantizar_matriz_int8(consultas)
+    puntuar_int8 = lambda: (consultas_int8.astype(np.float32) @ matriz_int8.astype(np.float32).T) * escalas[None, :]
+
+    puntuar_f16 = lambda: (consultas_f16 @ matriz_f16.T).astype(np.float32)
+
+    return [
+        medir("float32 exacto", "float32", lambda: top_k(consultas @ vectores.T, k)),
+        medir("float16 sin rescoring", "float16", lambda: top_k(puntuar_f16(), k)),
+        medir(f"float16 + rescoring cuantizado x{factor}", "float16",
+              lambda: rescoring_float32(top_k(puntuar_f16(), k * factor), matriz_f16, consultas, k)),
+        medir(f"float16 + rescoring float32 x{factor}", "float16",
+              lambda: rescoring_float32(top_k(puntuar_f16(), k * factor), vectores, consultas, k), con_copia_float32=True),
+        medir("int8 sin rescoring", "int8", lambda: top_k(puntuar_int8(), k)),
+        medir(f"int8 + rescoring cuantizado x{factor}", "int8",
+              lambda: rescoring_float32(top_k(puntuar_int8(), k * factor), decuantizada_int8, consultas, k)),
+        medir(f"int8 + rescoring float32 x{factor}", "int8",
+              lambda: rescoring_float32(top_k(puntuar_int8(), k * factor), vectores, consultas, k), con_copia_float32=True),
+    ]
+
+
+def main(argv: Optional[List[str]] = None, directorio_base: Optional[str] = None):
+    """'rag-dof bench cuantizacion' y 012: BD real y copia de trabajo en directorio_base (por defecto, el directorio actual)."""
+    parser = argparse.ArgumentParser(description="Reporte de tamaño y recall@k de vectores float32 / float16 / int8.")
+    parser.add_argument("--sintetico", action="store_true", help="Usar vectores aleatorios agrupados en lugar de la tabla real.")
+    parser.add_argument("--n", type=int, default=NUM_VECTORES_SINTETICOS, help="Número de vectores sintéticos.")
+    parser.add_argument("--dim", type=int, default=DIMENSION_SINTETICA, help="Dimensión de los vectores sintéticos.")
+    parser.add_argument("--consultas", type=int, default=NUM_CONSULTAS)
+    parser.add_argument("--k", type=int, default=K_RECALL)
+    parser.add_argument("--factor", type=int, default=FACTOR_SOBREMUESTREO_RESCORING, help="Candidatos = k * factor antes del rescoring.")
+    args = parser.parse_args(argv)
+
+    termino_busqueda_usado = "decreto"
+    script_dir = directorio_base or os.getcwd()
+    directorio_bd_real = os.path.join(script_dir, "lancedb_store_bge_m3")
+    directorio_bd_reporte = os.path.join(script_dir, DIRECTORIO_BD_REPORTE)
+
+    if args.sintetico:
+        vectores_base = generar_vectores_sinteticos(args.n, args.dim)
+    else:
+        try:
+            vectores_base = cargar_vectores_de_tabla(directorio_bd_real, termino_busqueda_usado, exigir_sin_cuantizar=True)
+        except Exception as e_tabla:
+            print(f"Error al leer la tabla '{termino_busqueda_usado}' en '{directorio_bd_real}': {e_tabla}")
+            print("Ejecuta primero 007 o usa --sintetico.")
+            return
+    consultas_reporte = generar_consultas(vectores_base, args.consultas)
+
+    filas_reporte = generar_reporte(vectores_base, consultas_reporte, directorio_bd_reporte, k=args.k, factor=args.factor)
+    shutil.rmtree(directorio_bd_reporte, ignore_errors=True)
+
+    print("\n================ Resumen ================")
+    print(f"{'variante':<36} {'recall':>7} {'ms/cons':>8} {'disco(MB)':>10} {'RAM(MB)':>9} {'B/vector':>9}")
+    for r in filas_reporte:
+        print(f"{r['variante']:<36} {r['recall_at_k']:>7.3f} {r['ms_por_consulta']:>8.3f} {r['disco_bytes'] / 1e6:>10.2f} "
+              f"{r['ram_bytes'] / 1e6:>9.2f} {r['ram_bytes'] / len(vectores_base):>9.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import time
+import threading
+from typing import Dict, List
+from .perfilado import medir_punto_caliente
+from .trazas import trazar, registrar_acceso_cache
+
+# --- Configuración ---
+# Reranking: se recuperan NUM_CANDIDATOS_RERANKING por ANN y un modelo que ve pregunta+fragmento juntos elige los k finales.
+# Modos: "cross_encoder" (sentence-transformers), "bge_m3_colbert" (FlagEmbedding, puntuación multivector de bge-m3) o
+# "ninguno". Ambas dependencias son opcionales (pip install -e .[reranking]); sin ellas se conserva el orden ANN.
+# 008/009 y la web eligen el modo en su configuración y lo pasan en cada llamada.
+MODOS_RERANKING = ("cross_encoder", "bge_m3_colbert", "ninguno")
+MODO_RERANKING = "cross_encoder"
+MODELO_CROSS_ENCODER = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1" # Multilingüe y ligero para CPU
+MODELO_BGE_M3_RERANKING = "BAAI/bge-m3" # Pesos de Hugging Face (Ollama solo expone el embedding denso)
+NUM_CANDIDATOS_RERANKING = 50
+TAMANO_LOTE_RERANKING = 16
+PRESUPUESTO_LATENCIA_RERANKING_MS = 1500 # Incluye la carga del modelo; lo que no se alcance a puntuar conserva el orden ANN
+_rerankers_cargados: Dict = {}
+_lock_carga = threading.Lock() # Varios hilos (asyncio.to_thread en la web) pueden pedir el mismo modelo a la vez
+
+def cargar_reranker(modo: str = MODO_RERANKING):
+    """
+    Devuelve una función puntuar(pregunta, textos) -> List[float] (mayor es más relevante), o None si el modo está
+    desactivado o su dependencia opcional no está instalada. El modelo se carga una sola vez por proceso; conviene
+    llamarla al arrancar (el lifespan de la web y 009 lo hacen) para que la carga no caiga dentro de una consulta.
+    """
+    if modo == "ninguno": return None
+    registrar_acceso_cache("modelo_reranker", modo in _rerankers_cargados)
+    if modo in _rerankers_cargados: return _rerankers_cargados[modo]
+    with _lock_carga:
+        if modo not in _rerankers_cargados: _rerankers_cargados[modo] = _crear_reranker(modo)
+    return _rerankers_cargados[modo]
+
+def _crear_reranker(modo: str):
+    puntuar = None
+    try:
+        if modo == "cross_encoder":
+            from sentence_transformers import CrossEncoder
+            modelo = CrossEncoder(MODELO_CROSS_ENCODER, max_length=512, device="cpu")
+            puntuar = lambda pregunta, textos: [float(s) for s in modelo.predict([(pregunta, t) for t in textos], batch_size=len(textos))]
+        elif modo == "bge_m3_colbert":
+            from FlagEmbedding import BGEM3FlagModel
+            modelo = BGEM3FlagModel(MODELO_BGE_M3_RERANKING, use_fp16=False)
+            puntuar = lambda pregunta, textos: [float(s) for s in modelo.compute_score([(pregunta, t) for t in textos], batch_size=len(textos))["colbert"]]
+        else:
+            print(f"Advertencia: MODO_RERANKING '{modo}' desconocido. Se usa el orden ANN.")
+    except ImportError as e_import:
+        print(f"Advertencia: Reranking '{modo}' no disponible ({e_import}). Se usa el orden ANN.")
+    except Exception as e_carga:
+        print(f"Advertencia: No se pudo cargar el reranker '{modo}': {e_carga}. Se usa el orden ANN.")
+    return puntuar
+
+@medir_punto_caliente("reranking")
+@trazar("reranking")
+def reordenar_fragmentos(pregunta: str, candidatos: List[Dict], k: int, modo: str = MODO_RERANKING,
+                         presupuesto_ms: float = PRESUPUESTO_LATENCIA_RERANKING_MS, tamano_lote: int = TAMANO_LOTE_RERANKING) -> List[Dict]:
+    """
+    Puntúa los candidatos por lotes con el reranker y devuelve los k mejores (campo '_score_reranking').
+    Respeta un presupuesto de latencia que cuenta desde antes de cargar el modelo: entre lotes se comprueba el plazo y
+    no se empieza un lote que, al ritmo del anterior, no terminaría a tiempo. Los candidatos ya puntuados se ordenan
+    por score y el resto conserva el orden ANN detrás de ellos. Sin reranker: orden ANN.
+    """
+    inicio_reranking = time.perf_counter()
+    limite = inicio_reranking + presupuesto_ms / 1000.0
+    puntuar = cargar_reranker(modo)
+    if puntuar is None or len(candidatos) <= 1: return candidatos[:k]
+    scores: List[float] = []
+    duracion_lote = 0.0
+    for inicio in range(0, len(candidatos), tamano_lote):
+        inicio_lote = time.perf_counter()
+        if inicio_lote + duracion_lote > limite:
+            print(f"  Reranking excedió {presupuesto_ms:.0f}ms; {len(scores)}/{len(candidatos)} candidatos puntuados, el resto en orden ANN.")
+            break
+        lote = candidatos[inicio:inicio + tamano_lote]
+        scores.extend(puntuar(pregunta, [c.get("texto", "") for c in lote]))
+        duracion_lote = time.perf_counter() - inicio_lote
+    n_puntuados = min(len(scores), len(candidatos))
+    puntuados = [dict(c, _score_reranking=s) for c, s in zip(candidatos[:n_puntuados], scores[:n_puntuados])]
+    puntuados.sort(key=lambda c: c["_score_reranking"], reverse=True)
+    print(f"  Reranking ({modo}): {n_puntuados} candidatos en {(time.perf_counter() - inicio_reranking) * 1000:.0f}ms.")
+    return (puntuados + candidatos[n_puntuados:])[:k]
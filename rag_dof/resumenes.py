@@ -0,0 +1,249 @@
+import os
+import csv
+import time
+import argparse
+from .perezoso import importar_perezoso
+from .tokenizador import contar_tokens, recortar_a_tokens
+from .nombres import sanitizar_nombre, sanitizar_nombre_tabla_lancedb
+from .documentos import leer_documento
+from .limites import LimitadorPorMinuto
+from .contexto import SUFIJO_TABLA_RESUMENES, construir_fila_resumen
+from dotenv import load_dotenv
+from typing import Optional, List, Dict
+import shutil # Para renombrar carpetas
+from .perfilado import agregar_argumentos_perfilado, iniciar_perfilado_si_se_pide, punto_caliente, medir_punto_caliente
+lancedb = importar_perezoso("lancedb") # Se importan al primer uso (ver rag_dof/perezoso.py)
+groq = importar_perezoso("groq")
+
+# --- Configuración ---
+# Etapa 005 ('rag-dof summarize'): resumen con Groq de cada documento descargado por 004.
+load_dotenv()
+
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+# NUEVO MODELO Y LÍMITES
+MODELO_GROQ = "meta-llama/Llama-4-Scout-17B-16E-Instruct" # Asegúrate que este sea el nombre exacto del modelo en Groq
+ENCODING_TIKTOKEN = "cl100k_base" # Generalmente bueno para modelos Llama recientes
+
+# Límites de la API para Llama-4-Scout-17B
+LIMITE_SOLICITUDES_POR_MINUTO = 30
+LIMITE_TOKENS_POR_MINUTO_PROCESADOS = 30000 # Nuevo límite más alto
+# LIMITE_TOKENS_POR_DIA ya no es una preocupación según lo indicado ("No limit")
+
+# Configuración del script
+# Asumamos que el contexto efectivo que queremos usar es menor que el TPM para una sola solicitud.
+# Si Llama-4-Scout-17B-16E-Instruct tiene un contexto de 16K, podemos ser más generosos.
+# Vamos a apuntar a no exceder ~25K tokens en una sola solicitud para estar seguros con el TPM de 30K.
+MAX_TOKENS_PARA_ENVIAR_MODELO = 25000 # Ajusta esto basado en el contexto real del modelo y pruebas
+MAX_COMPLETION_TOKENS_RESUMEN = 768 # Llama 4 puede ser bueno con resúmenes un poco más largos si es necesario
+TEMPERATURE_RESUMEN = 0.4 # Ligeramente más bajo para mayor factualidad
+MAX_API_REINTENTOS = 3
+TIEMPO_ESPERA_REINTENTO_SEGUNDOS = 10
+PAUSA_MINIMA_ENTRE_SOLICITUDES_SEGUNDOS = 2.0 # (30 solicitudes/min -> 2 segs/solicitud)
+
+# Cada resumen se escribe también en LanceDB ('<tabla>_resumenes'), de donde lo leen 009 y la app web sin tocar archivos.
+# La versión recortada para el prompt y el sufijo de la tabla vienen de rag_dof/contexto.py (los mismos que usan 009 y la web).
+DIRECTORIO_LANCEDB = "lancedb_store_bge_m3" # El mismo que usa 007
+
+limitador_groq = LimitadorPorMinuto("Groq")
+
+def renombrar_carpeta_si_existe(ruta_carpeta: str):
+    """Si la carpeta existe, la renombra añadiendo un sufijo _OLD_XXX."""
+    if os.path.exists(ruta_carpeta):
+        i = 1
+        while True:
+            nueva_ruta_old = f"{ruta_carpeta}_OLD_{i:03d}"
+            if not os.path.exists(nueva_ruta_old):
+                print(f"La carpeta '{ruta_carpeta}' ya existe. Renombrando a '{nueva_ruta_old}'.")
+                try:
+                    shutil.move(ruta_carpeta, nueva_ruta_old)
+                    print(f"Carpeta renombrada exitosamente.")
+                except Exception as e:
+                    print(f"Error al renombrar la carpeta '{ruta_carpeta}': {e}. Puede que necesites hacerlo manualmente.")
+                    # Podrías optar por detener el script aquí o continuar con la creación de la nueva
+                    # si el renombrado falla, pero es más seguro verificar.
+                    raise # Re-lanza la excepción si el renombrado es crítico
+                break
+            i += 1
+
+def truncar_texto_por_tokens(texto: str, encoding_nombre: str, max_tokens: int) -> str:
+    texto_truncado, num_tokens = recortar_a_tokens(texto, max_tokens, encoding_nombre)
+    if len(texto_truncado) < len(texto): print(f"    Texto truncado a {num_tokens} tokens.")
+    return texto_truncado
+
+@medir_punto_caliente("guardar_resumen_lancedb")
+def guardar_resumen_en_lancedb(directorio_bd: str, nombre_tabla_resumenes: str, nombre_archivo_original: str, resumen: str) -> bool:
+    """Inserta o reemplaza (por nombre_archivo_original) el resumen en la tabla de resúmenes; la crea si no existe."""
+    try:
+        db = lancedb.connect(directorio_bd)
+        fila = construir_fila_resumen(nombre_archivo_original, resumen)
+        if nombre_tabla_resumenes not in db.table_names():
+            tabla = db.create_table(nombre_tabla_resumenes, data=[fila])
+            tabla.create_scalar_index("nombre_archivo_original", index_type="BTREE", replace=True)
+        else:
+            (db.open_table(nombre_tabla_resumenes).merge_insert("nombre_archivo_original")
+             .when_matched_update_all().when_not_matched_insert_all().execute([fila]))
+        return True
+    except Exception as e:
+        print(f"    Error al guardar el resumen en LanceDB ('{nombre_tabla_resumenes}'): {e}")
+        return False
+
+def generar_resumen_con_groq(cliente_groq: "groq.Groq", texto_documento: str) -> Optional[str]:
+    prompt_resumen = (
+        "Eres un asistente experto en la extracción de información clave de documentos oficiales mexicanos. "
+        "Tu tarea es generar un resumen muy conciso, en un solo párrafo, que capture la esencia y los puntos más importantes del siguiente documento. "
+        "Evita frases introductorias como 'El documento habla de...' o 'Este texto es sobre...'. Ve directamente a los hechos y el propósito principal."
+        f"\n\n--- INICIO DEL DOCUMENTO ---\n{texto_documento}\n--- FIN DEL DOCUMENTO ---\n\n"
+        "RESUMEN CONCISO EN UN PÁRRAFO:"
+    )
+    tokens_prompt_estimados = contar_tokens(prompt_resumen, ENCODING_TIKTOKEN)
+
+    with punto_caliente("espera_limites_groq"):
+        limitador_groq.esperar_turno(tokens_prompt_estimados + MAX_COMPLETION_TOKENS_RESUMEN, LIMITE_SOLICITUDES_POR_MINUTO,
+                                     LIMITE_TOKENS_POR_MINUTO_PROCESADOS, esperar_si_es_grande=True)
+
+    for intento in range(MAX_API_REINTENTOS):
+        try:
+            print(f"    Enviando a Groq (modelo: {MODELO_GROQ}, intento {intento + 1}/{MAX_API_REINTENTOS}, tokens_prompt: {tokens_prompt_estimados})...")
+            start_time_api = time.time()
+            with punto_caliente("llamada_groq"):
+                stream = cliente_groq.chat.completions.create(
+                    model=MODELO_GROQ,
+                    messages=[{"role": "user", "content": prompt_resumen}],
+                    temperature=TEMPERATURE_RESUMEN,
+                    max_tokens=MAX_COMPLETION_TOKENS_RESUMEN,
+                    top_p=1,
+                    stream=True,
+                    stop=None,
+                )
+
+                resumen_completo = ""
+                for chunk in stream:
+                    content = chunk.choices[0].delta.content or ""
+                    resumen_completo += content
+            
+            api_call_duration = time.time() - start_time_api
+            resumen_limpio = resumen_completo.strip()
+            tokens_resumen_salida = contar_tokens(resumen_limpio, ENCODING_TIKTOKEN)
+
+            limitador_groq.registrar(tokens_prompt_estimados + tokens_resumen_salida)
+            print(f"    Resumen recibido ({tokens_resumen_salida} tokens) en {api_call_duration:.2f}s. Sols este min: {limitador_groq.solicitudes}. Tokens este min: {limitador_groq.tokens}.")
+            
+            if resumen_limpio:
+                return resumen_limpio
+            else:
+                print("    Groq devolvió un resumen vacío.")
+                return None
+
+        except Exception as e:
+            error_str = str(e).lower()
+            print(f"    Error en la API de Groq (intento {intento + 1}): {e}")
+            # Ya no necesitamos preocuparnos por TPD, pero otros rate limits o errores 413/429 pueden ocurrir.
+            if "rate limit" in error_str or "ratelimit" in error_str or "429" in error_str or "413" in error_str:
+                print("    Error de Rate Limit o tamaño de solicitud detectado por la API.")
+                espera_adicional = 60 if "429" in error_str else TIEMPO_ESPERA_REINTENTO_SEGUNDOS * (intento + 1) # Espera más si es 429
+                print(f"    Esperando {espera_adicional} segundos antes de reintentar...")
+                time.sleep(espera_adicional)
+                # Reiniciar contadores después de esperar por rate limit puede ser una buena idea
+                if "429" in error_str: # Si es un rate limit más serio, resetear el minuto
+                    limitador_groq.reiniciar()
+            elif intento < MAX_API_REINTENTOS - 1:
+                print(f"    Reintentando en {TIEMPO_ESPERA_REINTENTO_SEGUNDOS} segundos...")
+                time.sleep(TIEMPO_ESPERA_REINTENTO_SEGUNDOS)
+            else:
+                print("    Se alcanzó el máximo de reintentos para la API de Groq.")
+                return None
+    return None
+
+
+def procesar_documentos_para_resumen(carpeta_textos_entrada: str, termino_busqueda_original: str, directorio_base: str = "."):
+    if not GROQ_API_KEY:
+        print("Error: GROQ_API_KEY no configurada.")
+        return
+
+    cliente_groq = groq.Groq()
+
+    nombre_carpeta_resumenes_base = sanitizar_nombre(termino_busqueda_original, es_carpeta=True) + "_colectados_resumen"
+    script_dir = directorio_base
+    ruta_carpeta_resumenes = os.path.join(script_dir, nombre_carpeta_resumenes_base)
+    ruta_carpeta_textos = os.path.join(script_dir, carpeta_textos_entrada)
+    directorio_bd = os.path.join(script_dir, DIRECTORIO_LANCEDB)
+    nombre_tabla_resumenes = sanitizar_nombre_tabla_lancedb(termino_busqueda_original) + SUFIJO_TABLA_RESUMENES
+
+    if not os.path.isdir(ruta_carpeta_textos):
+        print(f"Error: Carpeta de entrada '{ruta_carpeta_textos}' no existe.")
+        return
+
+    # Renombrar carpeta de resúmenes existente si es necesario
+    renombrar_carpeta_si_existe(ruta_carpeta_resumenes)
+    
+    # Crear la nueva carpeta de resúmenes
+    try:
+        os.makedirs(ruta_carpeta_resumenes)
+        print(f"Carpeta de resúmenes creada: {ruta_carpeta_resumenes}")
+    except OSError as e:
+        print(f"Error al crear la carpeta de resúmenes '{ruta_carpeta_resumenes}': {e}. Verifique los permisos o si es un archivo.")
+        return
+
+
+    archivos_txt_encontrados = sorted([f for f in os.listdir(ruta_carpeta_textos) if f.endswith(".txt")])
+    if not archivos_txt_encontrados:
+        print(f"No se encontraron archivos .txt en '{ruta_carpeta_textos}'.")
+        return
+
+    print(f"Procesando {len(archivos_txt_encontrados)} archivos .txt de: {carpeta_textos_entrada}")
+
+    for i, nombre_archivo in enumerate(archivos_txt_encontrados):
+        print(f"\nProcesando documento {i+1}/{len(archivos_txt_encontrados)}: {nombre_archivo}")
+        ruta_completa_archivo_txt = os.path.join(ruta_carpeta_textos, nombre_archivo)
+
+        try:
+            _, texto_documento_completo = leer_documento(ruta_completa_archivo_txt)
+
+            if not texto_documento_completo:
+                print("    El contenido principal del documento está vacío. Saltando.")
+                continue
+
+            print(f"    Tokenizando y truncando texto (límite envío: {MAX_TOKENS_PARA_ENVIAR_MODELO} tokens)...")
+            texto_para_modelo = truncar_texto_por_tokens(
+                texto_documento_completo, ENCODING_TIKTOKEN, MAX_TOKENS_PARA_ENVIAR_MODELO
+            )
+            
+            resumen = generar_resumen_con_groq(cliente_groq, texto_para_modelo)
+
+            if resumen:
+                nombre_archivo_resumen = nombre_archivo.rsplit('.txt', 1)[0] + "_resumen.txt"
+                ruta_archivo_resumen = os.path.join(ruta_carpeta_resumenes, nombre_archivo_resumen)
+                try:
+                    with open(ruta_archivo_resumen, "w", encoding="utf-8") as f_resumen:
+                        f_resumen.write(resumen)
+                    print(f"    Resumen guardado en: {ruta_archivo_resumen}")
+                except Exception as e_write_resumen:
+                    print(f"    Error al escribir archivo de resumen {ruta_archivo_resumen}: {e_write_resumen}")
+                if guardar_resumen_en_lancedb(directorio_bd, nombre_tabla_resumenes, nombre_archivo, resumen):
+                    print(f"    Resumen guardado en LanceDB: {nombre_tabla_resumenes}")
+            else:
+                print("    No se generó resumen para este documento.")
+            
+            if i + 1 < len(archivos_txt_encontrados):
+                print(f"    Pausa mínima de {PAUSA_MINIMA_ENTRE_SOLICITUDES_SEGUNDOS:.2f}s antes del siguiente documento...")
+                time.sleep(PAUSA_MINIMA_ENTRE_SOLICITUDES_SEGUNDOS)
+
+        except Exception as e_file:
+            print(f"  Error grave procesando archivo {nombre_archivo}: {e_file}")
+
+    print("\nProcesamiento de resúmenes finalizado.")
+
+
+def main(argv: Optional[List[str]] = None, directorio_base: Optional[str] = None):
+    """'rag-dof summarize' y 005: documentos y resúmenes bajo directorio_base (por defecto, el directorio actual)."""
+    parser_cli = agregar_argumentos_perfilado(argparse.ArgumentParser(description="Genera resúmenes con Groq de los documentos descargados por 004."))
+    iniciar_perfilado_si_se_pide(parser_cli.parse_args(argv), __file__)
+    termino_busqueda_original_main = "decreto" 
+    script_dir_main = directorio_base or os.getcwd()
+    carpeta_textos_entrada_main = sanitizar_nombre(termino_busqueda_original_main, es_carpeta=True) + "_colectados"
+    
+    print(f"Iniciando script para generar resúmenes de docs en: '{carpeta_textos_entrada_main}' con el modelo {MODELO_GROQ}")
+    procesar_documentos_para_resumen(carpeta_textos_entrada_main, termino_busqueda_original_main, script_dir_main)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import os
+import shutil
+import argparse
+import threading
+from concurrent.futures import Future
+from typing import Dict, Iterable, List, Tuple
+from .perezoso import importar_perezoso, iniciar_en_segundo_plano
+from .perfilado import medir_punto_caliente
+
+# --- Configuración ---
+# Conteo de tokens con tiktoken leyendo las tablas BPE de una carpeta del repo en lugar de $TMPDIR/data-gym-cache:
+# esa se pierde al limpiar /tmp (o en cada contenedor nuevo) y entonces el primer get_encoding la descarga otra vez.
+# TIKTOKEN_CACHE_DIR del entorno tiene prioridad; si no está, la carpeta se indica solo mientras se carga cada tabla
+# (importar el módulo no toca el entorno). La web fija la suya con configurar_cache_bpe en su lifespan.
+# 'python -m rag_dof.tokenizador' deja listas las codificaciones que usan los scripts y la web (descargándolas una vez,
+# o copiándolas de otra carpeta con --origen).
+DIRECTORIO_CACHE_BPE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache_tiktoken")
+CODIFICACIONES_USADAS = ("cl100k_base",)
+tiktoken = importar_perezoso("tiktoken")
+_cache_bpe = {"directorio": DIRECTORIO_CACHE_BPE}
+_codificaciones: Dict = {}
+_lock_codificaciones = threading.Lock()
+
+def configurar_cache_bpe(directorio: str):
+    """Carpeta de tablas BPE para las codificaciones que se carguen después (sin efecto si TIKTOKEN_CACHE_DIR está fijada)."""
+    _cache_bpe["directorio"] = directorio
+
+def directorio_cache_bpe() -> str:
+    return os.environ.get("TIKTOKEN_CACHE_DIR") or _cache_bpe["directorio"]
+
+def obtener_codificacion(nombre: str):
+    """tiktoken.Encoding de 'nombre', construida una vez por proceso; las siguientes llamadas son un dict."""
+    codificacion = _codificaciones.get(nombre)
+    if codificacion is not None: return codificacion
+    with _lock_codificaciones:
+        if nombre not in _codificaciones: _codificaciones[nombre] = _cargar_codificacion(nombre)
+    return _codificaciones[nombre]
+
+def _cargar_codificacion(nombre: str):
+    # tiktoken no acepta la carpeta como argumento: lee TIKTOKEN_CACHE_DIR solo al leer o descargar la tabla BPE, así
+    # que se fija durante esta carga (con el lock tomado) y se quita al terminar
+    if os.environ.get("TIKTOKEN_CACHE_DIR"): return tiktoken.get_encoding(nombre)
+    os.environ["TIKTOKEN_CACHE_DIR"] = _cache_bpe["directorio"]
+    try: return tiktoken.get_encoding(nombre)
+    finally: os.environ.pop("TIKTOKEN_CACHE_DIR", None)
+
+@medir_punto_caliente("tokenizacion")
+def contar_tokens(texto: str, nombre: str = CODIFICACIONES_USADAS[0]) -> int:
+    """Tokens de texto; si tiktoken no puede cargar la codificación, una aproximación por palabras."""
+    try: return len(obtener_codificacion(nombre).encode(texto))
+    except Exception: return len(texto.split())
+
+@medir_punto_caliente("tokenizacion")
+def recortar_a_tokens(texto: str, max_tokens: int, nombre: str = CODIFICACIONES_USADAS[0]) -> Tuple[str, int]:
+    """(texto recortado a max_tokens, sus tokens). Sin la codificación, el recorte y el conteo son por palabras."""
+    try:
+        encoding = obtener_codificacion(nombre)
+        tokens = encoding.encode(texto)
+        if len(tokens) <= max_tokens: return texto, len(tokens)
+        return encoding.decode(tokens[:max_tokens]), max_tokens
+    except Exception:
+        palabras = texto.split()
+        if len(palabras) <= max_tokens: return texto, len(palabras)
+        return " ".join(palabras[:max_tokens]), max_tokens
+
+def precargar_codificaciones(nombres: Iterable[str] = CODIFICACIONES_USADAS) -> List[str]:
+    for nombre in nombres: obtener_codificacion(nombre).encode("precarga")
+    return list(nombres)
+
+def precargar_tokenizador(nombres: Iterable[str] = CODIFICACIONES_USADAS) -> Future:
+    """Importa tiktoken y construye las codificaciones en un hilo aparte (unos 0.2 s por tabla BPE)."""
+    return iniciar_en_segundo_plano(precargar_codificaciones, tuple(nombres))
+
+def copiar_cache_bpe(directorio_origen: str, directorio_destino: str) -> int:
+    """Copia los archivos de caché de tiktoken (nombrados por el sha1 de su URL) que falten en el destino."""
+    os.makedirs(directorio_destino, exist_ok=True)
+    copiados = 0
+    for nombre_archivo in os.listdir(directorio_origen):
+        origen, destino = os.path.join(directorio_origen, nombre_archivo), os.path.join(directorio_destino, nombre_archivo)
+        if os.path.isfile(origen) and not os.path.exists(destino):
+            shutil.copy2(origen, destino); copiados += 1
+    return copiados
+
+if __name__ == "__main__":
+    parser_cli = argparse.ArgumentParser(description="Deja en la caché local las tablas BPE de tiktoken que usan los scripts y la web.")
+    parser_cli.add_argument("--origen", default=None, help="Carpeta de caché de tiktoken de la que copiar (p. ej. /tmp/data-gym-cache) en lugar de descargar.")
+    parser_cli.add_argument("--codificacion", action="append", default=None, help=f"Codificación a preparar (por defecto: {', '.join(CODIFICACIONES_USADAS)}).")
+    args = parser_cli.parse_args()
+    directorio_cache = directorio_cache_bpe()
+    if args.origen: print(f"{copiar_cache_bpe(args.origen, directorio_cache)} archivo(s) copiados de '{args.origen}'.")
+    for nombre_codificacion in precargar_codificaciones(args.codificacion or CODIFICACIONES_USADAS):
+        print(f"Codificación '{nombre_codificacion}' lista.")
+    print(f"Caché BPE en '{directorio_cache}': {', '.join(sorted(os.listdir(directorio_cache))) if os.path.isdir(directorio_cache) else '(vacía)'}")
@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import asyncio
+import secrets
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+
+# --- Configuración ---
+# Trazas por consulta (spans de embedding, búsqueda, reranking, resúmenes, prompt y LLM) exportadas como OTLP/JSON, una
+# traza por línea, legibles por el receptor 'otlpjsonfile' del OpenTelemetry Collector. Los scripts 008/009 y la web
+# (core/trazas.py) usan este módulo; cada uno pasa su archivo y su nombre de servicio.
+# Histogramas de latencia y aciertos de caché en memoria para /metrics (formato de texto de Prometheus).
+NOMBRE_SERVICIO_POR_DEFECTO = "rag-dof"
+BUCKETS_LATENCIA_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_traza_actual: ContextVar = ContextVar("traza_actual", default=None)
+_lock_metricas = threading.Lock()
+_lock_archivo_trazas = threading.Lock()
+_histogramas: Dict[Tuple[str, str, str], List[float]] = {} # (métrica, etiqueta, valor) -> conteos por bucket + [+Inf, suma]
+_accesos_cache: Dict[str, List[int]] = {} # caché -> [aciertos, fallos]
+
+def observar_latencia(metrica: str, etiqueta: str, valor_etiqueta: str, segundos: float):
+    with _lock_metricas:
+        conteos = _histogramas.setdefault((metrica, etiqueta, valor_etiqueta), [0.0] * (len(BUCKETS_LATENCIA_SEGUNDOS) + 2))
+        for i, limite in enumerate(BUCKETS_LATENCIA_SEGUNDOS):
+            if segundos <= limite: conteos[i] += 1
+        conteos[-2] += 1; conteos[-1] += segundos
+
+def registrar_acceso_cache(nombre_cache: str, acierto: bool):
+    with _lock_metricas:
+        _accesos_cache.setdefault(nombre_cache, [0, 0])[0 if acierto else 1] += 1
+
+def nueva_traza(nombre: str, **atributos) -> Dict:
+    """Traza de una consulta: un span raíz y un span por etapa (todos hijos directos de la raíz)."""
+    return {"trace_id": secrets.token_hex(16), "span_id": secrets.token_hex(8), "nombre": nombre,
+            "inicio_ns": time.time_ns(), "atributos": atributos, "spans": []}
+
+def obtener_traza_actual() -> Optional[Dict]:
+    return _traza_actual.get()
+
+def registrar_span(traza: Optional[Dict], nombre: str, inicio_ns: int, fin_ns: int, **atributos):
+    # El histograma se alimenta siempre (también sin traza activa, p. ej. en /api/search/batch)
+    observar_latencia("rag_etapa_duracion_segundos", "etapa", nombre, (fin_ns - inicio_ns) / 1e9)
+    if traza is None: return
+    traza["spans"].append({"span_id": secrets.token_hex(8), "nombre": nombre, "inicio_ns": inicio_ns, "fin_ns": fin_ns, "atributos": atributos})
+
+@contextmanager
+def span(nombre: str, traza: Optional[Dict] = None, **atributos):
+    """Mide un bloque como span de la traza activa. Solo lee la traza (no la cambia), así que sirve en hilos y generadores."""
+    traza = traza or _traza_actual.get()
+    inicio_ns = time.time_ns()
+    try: yield atributos
+    finally: registrar_span(traza, nombre, inicio_ns, time.time_ns(), **atributos)
+
+def trazar(nombre: str):
+    """Decorador: cada llamada a la función (o cada await, si es una corrutina) queda como un span de la traza activa."""
+    def decorador(funcion):
+        if asyncio.iscoroutinefunction(funcion):
+            @wraps(funcion)
+            async def envoltura_async(*args, **kwargs):
+                with span(nombre): return await funcion(*args, **kwargs)
+            return envoltura_async
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with span(nombre): return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+async def ejecutar_con_traza(traza: Dict, corrutina):
+    """Para generadores (SSE): envuelto en asyncio.create_task activa la traza solo en esa tarea; sus tareas y hilos la heredan."""
+    _traza_actual.set(traza)
+    return await corrutina
+
+def atributo_otlp(clave: str, valor) -> Dict:
+    if isinstance(valor, bool): return {"key": clave, "value": {"boolValue": valor}}
+    if isinstance(valor, int): return {"key": clave, "value": {"intValue": str(valor)}}
+    if isinstance(valor, float): return {"key": clave, "value": {"doubleValue": valor}}
+    return {"key": clave, "value": {"stringValue": str(valor)}}
+
+def finalizar_traza(traza: Dict, ruta_archivo: Optional[str] = None, nombre_servicio: str = NOMBRE_SERVICIO_POR_DEFECTO,
+                    max_bytes_archivo: Optional[int] = None):
+    """
+    Cierra el span raíz y agrega la traza a ruta_archivo como una línea OTLP/JSON (resourceSpans -> scopeSpans -> spans).
+    Sin ruta solo alimenta el histograma. Con max_bytes_archivo, al pasarse de tamaño el archivo se rota a '.1'.
+    """
+    traza["fin_ns"] = time.time_ns()
+    observar_latencia("rag_solicitud_duracion_segundos", "tipo", traza["nombre"], (traza["fin_ns"] - traza["inicio_ns"]) / 1e9)
+    if not ruta_archivo: return
+    def span_otlp(span_id, nombre, inicio_ns, fin_ns, atributos, padre=None):
+        datos = {"traceId": traza["trace_id"], "spanId": span_id, "name": nombre, "kind": 1,
+                 "startTimeUnixNano": str(inicio_ns), "endTimeUnixNano": str(fin_ns),
+                 "attributes": [atributo_otlp(c, v) for c, v in atributos.items() if v is not None]}
+        if padre: datos["parentSpanId"] = padre
+        return datos
+    spans = [span_otlp(traza["span_id"], traza["nombre"], traza["inicio_ns"], traza["fin_ns"], traza["atributos"])]
+    spans += [span_otlp(s["span_id"], s["nombre"], s["inicio_ns"], s["fin_ns"], s["atributos"], traza["span_id"]) for s in list(traza["spans"])]
+    linea = {"resourceSpans": [{"resource": {"attributes": [atributo_otlp("service.name", nombre_servicio)]},
+                                "scopeSpans": [{"scope": {"name": "rag_dof"}, "spans": spans}]}]}
+    try:
+        with _lock_archivo_trazas:
+            if max_bytes_archivo and os.path.exists(ruta_archivo) and os.path.getsize(ruta_archivo) > max_bytes_archivo:
+                os.replace(ruta_archivo, ruta_archivo + ".1") # Una sola generación anterior
+            with open(ruta_archivo, "a", encoding="utf-8") as f_trazas: f_trazas.write(json.dumps(linea, ensure_ascii=False) + "\n")
+    except Exception as e_trazas: print(f"Advertencia: No se pudo escribir la traza en '{ruta_archivo}': {e_trazas}")
+
+@contextmanager
+def traza_activa(nombre: str, ruta_archivo: Optional[str] = None, nombre_servicio: str = NOMBRE_SERVICIO_POR_DEFECTO,
+                 max_bytes_archivo: Optional[int] = None, **atributos):
+    """Activa una traza nueva para el bloque (asyncio.create_task y asyncio.to_thread la heredan) y la exporta al salir."""
+    traza = nueva_traza(nombre, **atributos)
+    token = _traza_actual.set(traza)
+    try: yield traza
+    finally:
+        _traza_actual.reset(token)
+        finalizar_traza(traza, ruta_archivo, nombre_servicio, max_bytes_archivo)
+
+def resumen_traza(traza: Dict) -> str:
+    return ", ".join(f"{s['nombre']} {(s['fin_ns'] - s['inicio_ns']) / 1e6:.0f} ms" for s in sorted(traza["spans"], key=lambda s: s["inicio_ns"]))
+
+def calcular_ruta_critica(tiempos_etapas: Dict[str, Tuple[float, float]]) -> List[str]:
+    """Desde la etapa que terminó al final, retrocede a la etapa que terminó justo antes de que cada una empezara."""
+    if not tiempos_etapas: return []
+    actual = max(tiempos_etapas, key=lambda e: tiempos_etapas[e][1])
+    ruta = [actual]
+    while True:
+        previas = [e for e, (_, fin) in tiempos_etapas.items() if e not in ruta and fin <= tiempos_etapas[actual][0] + 1.0]
+        if not previas: return list(reversed(ruta))
+        actual = max(previas, key=lambda e: tiempos_etapas[e][1]); ruta.append(actual)
+
+def exportar_metricas_prometheus() -> str:
+    lineas: List[str] = []
+    with _lock_metricas:
+        histogramas = {clave: list(conteos) for clave, conteos in _histogramas.items()}
+        accesos = {nombre: list(valores) for nombre, valores in _accesos_cache.items()}
+    for metrica in sorted({m for m, _, _ in histogramas}):
+        lineas += [f"# HELP {metrica} Latencia en segundos.", f"# TYPE {metrica} histogram"]
+        for (m, etiqueta, valor), conteos in sorted(histogramas.items()):
+            if m != metrica: continue
+            for limite, conteo in zip(BUCKETS_LATENCIA_SEGUNDOS, conteos):
+                lineas.append(f'{metrica}_bucket{{{etiqueta}="{valor}",le="{limite}"}} {conteo:.0f}')
+            lineas.append(f'{metrica}_bucket{{{etiqueta}="{valor}",le="+Inf"}} {conteos[-2]:.0f}')
+            lineas.append(f'{metrica}_sum{{{etiqueta}="{valor}"}} {conteos[-1]:.6f}')
+            lineas.append(f'{metrica}_count{{{etiqueta}="{valor}"}} {conteos[-2]:.0f}')
+    if accesos:
+        lineas += ["# HELP rag_cache_accesos_total Accesos a cachés en memoria por resultado.", "# TYPE rag_cache_accesos_total counter"]
+        for nombre, (aciertos, fallos) in sorted(accesos.items()):
+            lineas.append(f'rag_cache_accesos_total{{cache="{nombre}",resultado="acierto"}} {aciertos}')
+            lineas.append(f'rag_cache_accesos_total{{cache="{nombre}",resultado="fallo"}} {fallos}')
+        lineas += ["# HELP rag_cache_tasa_aciertos Fracción de accesos que encontraron el valor en caché.", "# TYPE rag_cache_tasa_aciertos gauge"]
+        for nombre, (aciertos, fallos) in sorted(accesos.items()):
+            lineas.append(f'rag_cache_tasa_aciertos{{cache="{nombre}"}} {aciertos / max(1, aciertos + fallos):.4f}')
+    return "\n".join(lineas) + "\n"
@@ -11,6 +11,10 @@ PROJECT_ROOT = os.getcwd()
 CORE_DIR = os.path.join(PROJECT_ROOT, "core")
 TEMPLATES_DIR = os.path.join(PROJECT_ROOT, "templates")
 STATIC_DIR = os.path.join(PROJECT_ROOT, "static")
+CACHE_TIKTOKEN_DIR = os.path.join(PROJECT_ROOT, "cache_tiktoken")
+CACHE_TIKTOKEN_REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache_tiktoken") # La deja lista 'python -m rag_dof.tokenizador'
+RAG_DOF_DIR = os.path.join(PROJECT_ROOT, "rag_dof")
+RAG_DOF_REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rag_dof") # Junto a este archivo en el repo y al instalarlo
 
 KEYWORD_FOR_DATA = "decreto"
 LANCEDB_TABLE_NAME_FIXED = KEYWORD_FOR_DATA
@@ -122,6 +126,18 @@ def setup_directories():
     create_dir_if_not_exists(CORE_DIR); create_dir_if_not_exists(TEMPLATES_DIR); create_dir_if_not_exists(STATIC_DIR)
     create_file_with_content(os.path.join(CORE_DIR, "__init__.py"), "# Core module", overwrite_if_exists=True)
     create_file_with_content(os.path.join(STATIC_DIR, "style.css"), "/* CSS */ body { font-family: sans-serif; }", overwrite_if_exists=True)
+    # Tablas BPE de tiktoken del repo: así ningún worker las descarga ni depende de la caché de /tmp
+    if os.path.isdir(CACHE_TIKTOKEN_REPO_DIR) and os.path.abspath(CACHE_TIKTOKEN_REPO_DIR) != os.path.abspath(CACHE_TIKTOKEN_DIR):
+        create_dir_if_not_exists(CACHE_TIKTOKEN_DIR)
+        for nombre_archivo in os.listdir(CACHE_TIKTOKEN_REPO_DIR):
+            if not os.path.exists(os.path.join(CACHE_TIKTOKEN_DIR, nombre_archivo)):
+                shutil.copy2(os.path.join(CACHE_TIKTOKEN_REPO_DIR, nombre_archivo), CACHE_TIKTOKEN_DIR)
+    # Paquete rag_dof junto a main.py: core/ importa de él búsqueda, contexto, reranking, trazas y catálogo (se actualiza siempre)
+    if os.path.isdir(RAG_DOF_REPO_DIR) and os.path.abspath(RAG_DOF_REPO_DIR) != os.path.abspath(RAG_DOF_DIR):
+        shutil.copytree(RAG_DOF_REPO_DIR, RAG_DOF_DIR, ignore=shutil.ignore_patterns("__pycache__"), dirs_exist_ok=True)
+        print(f"INFO: Paquete compartido copiado: {RAG_DOF_DIR}")
+    elif not os.path.isdir(RAG_DOF_DIR):
+        print(f"ERROR_CRITICAL: No se encontró el paquete rag_dof en {RAG_DOF_REPO_DIR}; core/ no podrá importarlo.")
     print("-" * 30 + "\n")
 
 # --- 2. Crear Archivos del Módulo `core` ---
@@ -129,20 +145,18 @@ def setup_core_module():
     print("--- Configurando Módulo 'core' ---")
 
     # config.py (Sobrescrito)
-    sanitizar_tabla_func_code_str = """
-def sanitizar_nombre_tabla_lancedb(nombre: str) -> str:
-    nombre = str(nombre).lower()
-    nombre = re.sub(r'\\s+', '_', nombre)
-    nombre = re.sub(r'[^\\w-]', '', nombre)
-    nombre = nombre[:60]
-    return nombre if nombre else "documentos_dof"
-"""
-    # CORRECCIÓN: Las f-strings internas DEBEN usar las variables definidas DENTRO de config.py.
-    # El .format() exterior solo inserta el bloque de sanitizar_tabla_func_code_str.
+    # Las llaves de las f-strings internas van dobladas: el .format() exterior solo inserta los nombres fijos.
     config_py_content_template = """# core/config.py (SOBRESCRITO POR SETUP)
 import os
+import json
 from dotenv import load_dotenv
-import re
+# Paquete compartido con los scripts numerados (setup lo copia junto a main.py): modelos y parámetros que deben coincidir con la ingesta
+from rag_dof.embeddings import MODELO_EMBEDDING_OLLAMA
+from rag_dof.fragmentacion import CHUNK_OVERLAP_TOKENS # Fragmentos consecutivos comparten estos tokens (007)
+from rag_dof.contexto import (MAX_TOKENS_POR_RESUMEN_EN_CONTEXTO, MARGEN_TOKENS_EMPAQUETADO, MIN_TOKENS_FRAGMENTO_PARCIAL,
+                              TOKENS_ENCABEZADO_PIEZA)
+from rag_dof.reranking import MODELO_CROSS_ENCODER, MODELO_BGE_M3_RERANKING
+from rag_dof.busqueda import NUM_RESULTADOS_FTS, CONSTANTE_RRF
 
 DOTENV_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env')
 if not os.path.exists(DOTENV_PATH):
@@ -152,7 +166,6 @@ else:
     load_dotenv(dotenv_path=DOTENV_PATH)
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
-MODELO_EMBEDDING_OLLAMA = "bge-m3"
 MODELO_GENERACION_GROQ = "deepseek-r1-distill-llama-70b"
 
 PROJECT_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -165,18 +178,78 @@ RESUMENES_DIR = os.path.join(PROJECT_ROOT_DIR, RESUMENES_DIR_NAME)
 
 NUM_FRAGMENTOS_A_RECUPERAR_LANCEDB = 4
 LANCEDB_TABLE_NAME_DEFAULT = "{fixed_lancedb_table_name}"
+LANCEDB_TABLE_RESUMENES = LANCEDB_TABLE_NAME_DEFAULT + "_resumenes" # Resúmenes con conteos de tokens (la escribe 005)
 NUM_DOCUMENTOS_RELEVANTES_K_RAG = 4
-MAX_TOKENS_POR_FRAGMENTO_EN_CONTEXTO = 1000
-MAX_TOKENS_POR_RESUMEN_EN_CONTEXTO = 400
 ENCODING_TIKTOKEN_GENERACION = "cl100k_base"
+# Tablas BPE locales (setup copia las de cache_tiktoken/ del repo): tiktoken no las busca en /tmp ni las descarga en cada
+# worker. core/arranque.py las configura al iniciar el lifespan; TIKTOKEN_CACHE_DIR del entorno tiene prioridad.
+DIRECTORIO_CACHE_TIKTOKEN = os.path.join(PROJECT_ROOT_DIR, "cache_tiktoken")
 LIMITE_SOLICITUDES_POR_MINUTO_GROQ = 30
 LIMITE_TOKENS_POR_MINUTO_PROCESADOS_GROQ = 6000
 MAX_COMPLETION_TOKENS_GENERACION = 768
+MAX_CONTEXTO_TOTAL_PARA_GENERACION = int(LIMITE_TOKENS_POR_MINUTO_PROCESADOS_GROQ * 0.85) # El contexto se empaqueta para caber aquí
 TEMPERATURE_GENERACION = 0.3
 MAX_API_REINTENTOS_GROQ = 3
 TIEMPO_ESPERA_REINTENTO_GROQ_SEGUNDOS = 10
+# Control de admisión a Groq (ver core/admision.py): cola de prioridad acotada con plazos; al saturarse, 429/503 con Retry-After
+MAX_SOLICITUDES_EN_COLA_GROQ = 16
+PLAZO_MAX_ESPERA_GROQ_SEGUNDOS = {{"interactiva": 20, "api": 90}} # Espera máxima por cuota, desde que llega la solicitud
+DEGRADAR_A_SOLO_RECUPERACION = True # En lugar de rechazar, responder con los fragmentos recuperados, sin generación
+TAMANO_LOTE_EMBEDDINGS_BATCH = 32
+NUM_HILOS_BUSQUEDA_BATCH = 8
+# Endpoints asíncronos: Ollama y Groq con clientes async; las llamadas bloqueantes a LanceDB van a un pool acotado
+NUM_HILOS_LANCEDB = 8
+# Catálogo de documentos (SQLite, ver core/catalogo.py): /explore y /api/documents paginan sobre él; 007 también lo actualiza
+ARCHIVO_CATALOGO_DOCUMENTOS = os.path.join(PROJECT_ROOT_DIR, "catalogo_documentos.sqlite")
+TAMANO_PAGINA_CATALOGO = 50
+# Entrega de documentos (/view y /raw, ver core/entrega_documentos.py): lectura desde el desplazamiento del contenido, 304 y rangos
+MAX_BYTES_VISTA_EN_LINEA = 256 * 1024 # Documentos más grandes: /view muestra el inicio y enlaza al texto completo en /raw
+TAMANO_BLOQUE_STREAMING_BYTES = 64 * 1024
+CACHE_CONTROL_DOCUMENTOS = "public, max-age=300" # Después, el navegador revalida con ETag/Last-Modified (304 sin cuerpo)
+MIN_BYTES_COMPRESION = 1024
+NIVEL_COMPRESION_GZIP = 6
+CALIDAD_COMPRESION_BROTLI = 5 # Solo si el paquete 'brotli' está instalado
+MAX_BYTES_DOCUMENTO_EN_CACHE_COMPRIMIDOS = 4 * 1024 * 1024 # Más grandes se comprimen al vuelo por bloques
+MAX_BYTES_CACHE_COMPRIMIDOS = 64 * 1024 * 1024
+MAX_PREGUNTAS_POR_LOTE_API = 1000 # Búsquedas en lote (/api/search/batch, POST /api/v1/search): más preguntas -> 422
+MAX_K_API = 100 # k máximo por pregunta en las búsquedas de la API
+# Reranking: se recuperan NUM_CANDIDATOS_RERANKING por ANN y un modelo que ve pregunta+fragmento juntos elige los k finales.
+# MODO_RERANKING: "cross_encoder" (sentence-transformers), "bge_m3_colbert" (FlagEmbedding, puntuación multivector de bge-m3) o "ninguno".
+MODO_RERANKING = "cross_encoder"
+NUM_CANDIDATOS_RERANKING = 50
+TAMANO_LOTE_RERANKING = 16
+PRESUPUESTO_LATENCIA_RERANKING_MS = 1500 # Si se agota, se conserva el orden ANN para lo que falte por puntuar
+# Diversificación del contexto RAG (rag_dof/diversificacion.py): el reranker devuelve k * FACTOR_SOBREMUESTREO_MMR candidatos y MMR
+# elige los k que van al prompt, para no gastarlos en fragmentos consecutivos que se repiten. None: sin límite por documento.
+USAR_MMR = True
+MAX_FRAGMENTOS_POR_DOCUMENTO = None
+# Orquestador del chat RAG: embedding, rama FTS y calentamiento de Groq en paralelo; resúmenes precargados por cada lista.
+USAR_RAMA_FTS = True # Requiere el índice FTS sobre 'texto' que crea 007; sin él la rama se omite
+# Preguntas idénticas en curso (misma pregunta normalizada y mismos filtros) comparten una sola ejecución del RAG
+COALESCER_PREGUNTAS_EN_VUELO = True
+# Caché compartida entre workers (SQLite en WAL, ver core/cache_compartida.py): embeddings de preguntas y respuestas RAG
+USAR_CACHE_COMPARTIDA = True
+ARCHIVO_CACHE_COMPARTIDA = os.path.join(PROJECT_ROOT_DIR, "cache_compartida.sqlite")
+TIMEOUT_CACHE_COMPARTIDA_SEGUNDOS = 5.0
+TTL_CACHE_EMBEDDINGS_SEGUNDOS = 7 * 24 * 3600
+TTL_CACHE_RESPUESTAS_SEGUNDOS = 24 * 3600 # La clave incluye la versión de la tabla: reindexar con 007 invalida las respuestas
+# Modo producción (python main.py --produccion): varios workers, cada uno calienta sus servicios en el lifespan (core/arranque.py)
+NUM_WORKERS_PRODUCCION = min(4, os.cpu_count() or 1) # Cada worker carga su propio reranker y matriz int8 en RAM
+CALENTAMIENTO_BLOQUEA_ARRANQUE = True # False: el worker acepta conexiones de inmediato y /ready da 503 hasta terminar
+SEGUNDOS_MAX_PASO_CALENTAMIENTO = 300 # La primera carga del reranker puede incluir su descarga
+SEGUNDOS_ENTRE_REINTENTOS_CALENTAMIENTO = 30
+SEGUNDOS_CONSISTENCIA_LANCEDB = 30 # Cada cuánto la tabla abierta (una por worker) revisa si 007 escribió una versión nueva
+ARCHIVO_TRAZAS_JSONL = os.path.join(PROJECT_ROOT_DIR, "trazas_rag.jsonl") # None desactiva la exportación
+NOMBRE_SERVICIO_TRAZAS = "rag-dof-web"
+MAX_BYTES_ARCHIVO_TRAZAS = 50 * 1024 * 1024 # Al superarlo se rota a .1
 
-{s_func_code}
+# Parámetros de índice/consulta elegidos por 010_benchmark_indices_lancedb.py (métrica, nprobes, refine_factor, ef)
+ARCHIVO_CONFIG_BUSQUEDA_LANCEDB = os.path.join(PROJECT_ROOT_DIR, "config_busqueda_lancedb.json")
+CONFIG_BUSQUEDA_LANCEDB = {{}}
+if os.path.exists(ARCHIVO_CONFIG_BUSQUEDA_LANCEDB):
+    try:
+        with open(ARCHIVO_CONFIG_BUSQUEDA_LANCEDB, "r", encoding="utf-8") as f_cfg: CONFIG_BUSQUEDA_LANCEDB = json.load(f_cfg)
+    except Exception as e_cfg: print(f"ADVERTENCIA_CONFIG: No se pudo leer {{ARCHIVO_CONFIG_BUSQUEDA_LANCEDB}}: {{e_cfg}}")
 
 print(f"INFO_CONFIG: core/config.py inicializado. GROQ_API_KEY: {{'Presente' if GROQ_API_KEY else 'AUSENTE - ¡Revisar .env!'}}")
 for name, path_val in [
@@ -186,9 +259,6 @@ for name, path_val in [
     print(f"  {{name}}: {{path_val}} ({{status}})")
 """
     config_py_content = config_py_content_template.format(
-        s_func_code=sanitizar_tabla_func_code_str, # Este es el único placeholder para .format()
-        # Los siguientes son para los f-strings internos de la plantilla, así que no necesitan pasarse al .format() exterior
-        # DOTENV_PATH="DOTENV_PATH", # Esto era incorrecto
         fixed_lancedb_dir_name=DIR_LANCEDB_FIXED,
         fixed_decretos_dir_name=DIR_DOCUMENTOS_COMPLETOS_FIXED,
         fixed_resumenes_dir_name=DIR_RESUMENES_FIXED,
@@ -204,15 +274,9 @@ for name, path_val in [
     if not os.path.exists(fp_path):
         # La función sanitizar_nombre no se extrae, se define una genérica.
         file_operations_content = """# core/file_operations.py (Creado por setup)
-import os; import re; from . import config
-
-def sanitizar_nombre(nombre: str, es_carpeta=False) -> str:
-    # Implementación genérica de sanitizar_nombre
-    n = str(nombre).lower()
-    n = re.sub(r'\\s+', '_', n) # Doble backslash para \s
-    n = re.sub(r'[^\\w\\-\\.]' if not es_carpeta else r'[^\\w-]', '', n) # Doble backslash para \w, \-
-    n = n[:150] # Limitar longitud
-    return n if n else ('carpeta_vacia' if es_carpeta else 'archivo_vacio')
+import os; from . import config
+from rag_dof.nombres import sanitizar_nombre
+from rag_dof.documentos import SEPARADOR_CONTENIDO
 
 def _list_files_generic(directory: str, extension: str = ".txt") -> list:
     if not os.path.isdir(directory): return []
@@ -224,10 +288,9 @@ def _read_content_generic(directory: str, filename: str) -> str | None:
     if not os.path.exists(filepath): return None
     try:
         with open(filepath, 'r', encoding='utf-8') as f: lines = f.readlines()
-        separator = "-------------------- CONTENIDO --------------------"
         doc_content = "".join(lines)
-        if separator in doc_content:
-            content_part = doc_content.split(separator, 1)
+        if SEPARADOR_CONTENIDO in doc_content:
+            content_part = doc_content.split(SEPARADOR_CONTENIDO, 1)
             return content_part[1].strip() if len(content_part) > 1 else doc_content.strip()
         return doc_content.strip()
     except Exception as e: print(f"ERROR_FILE_OPS (read): {filepath} {e}"); return None
@@ -249,144 +312,1246 @@ def get_summary_content_by_original_filename(original_doc_filename: str) -> str
         lancedb_service_content = """# core/lancedb_service.py (Creado por setup con lógica funcional)
 from . import config
 import numpy as np
-from typing import List, Dict, Optional
-import lancedb
+from typing import List, Dict, Optional, Tuple
+import pyarrow as pa
 import traceback
 import ollama
 import os
+import asyncio
+import contextvars
+import threading
+import time
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from .file_operations import get_summary_content_by_original_filename
+from .cache_compartida import leer_cache, guardar_en_cache
+from .trazas import trazar
+from .perfilado import punto_caliente
+# Búsqueda compartida con 008-012 (rag_dof/busqueda.py): filtros, config de índice, float16/int8 con rescoring y FTS
+from rag_dof.nombres import normalizar_texto_metadato
+from rag_dof.busqueda import detectar_tipo_vector, cargar_matriz_int8, ejecutar_busqueda_vectorial, buscar_fts
+from rag_dof.embeddings import obtener_embeddings_ollama_lote as obtener_embeddings_ollama_lote_compartida
+from rag_dof.tokenizador import recortar_a_tokens
+
+COLUMNAS_RESULTADO_LOTE = ["id", "nombre_archivo_original", "indice_fragmento_en_doc", "texto", "_distance"]
+_tabla_abierta: Dict = {} # Una conexión y sus tablas por proceso; LanceDB comprueba versiones nuevas cada SEGUNDOS_CONSISTENCIA_LANCEDB
+_lock_tabla = threading.Lock()
+cliente_ollama_async = ollama.AsyncClient()
+_pool_lancedb = ThreadPoolExecutor(max_workers=config.NUM_HILOS_LANCEDB, thread_name_prefix="lancedb")
+ESQUEMA_RESULTADOS_LOTE = pa.schema([
+    ("consulta_idx", pa.int32()), ("pregunta", pa.string()), ("rango", pa.int32()),
+    ("id", pa.string()), ("nombre_archivo_original", pa.string()), ("indice_fragmento_en_doc", pa.int64()),
+    ("_distance", pa.float32()), ("texto", pa.string()),
+])
 
-def obtener_embedding_ollama_pregunta(texto: str, modelo: str = config.MODELO_EMBEDDING_OLLAMA) -> Optional[np.ndarray]:
+@trazar("embedding")
+async def obtener_embedding_ollama_pregunta_async(texto: str, modelo: str = config.MODELO_EMBEDDING_OLLAMA) -> Optional[np.ndarray]:
+    # Primero la caché compartida entre workers (float32 por modelo y texto exactos); si no está, cliente async de
+    # Ollama: mientras responde, el event loop atiende otras solicitudes.
+    clave = f"{modelo}|{texto}"
+    guardado = await asyncio.to_thread(leer_cache, "embedding", clave)
+    if guardado is not None: return np.frombuffer(guardado, dtype=np.float32)
     try:
-        response = ollama.embeddings(model=modelo, prompt=texto)
+        with punto_caliente("embedding_ollama"): response = await cliente_ollama_async.embeddings(model=modelo, prompt=texto)
         embedding = response.get('embedding')
-        return np.array(embedding) if embedding else None
+        if not embedding: return None
+        vector = np.asarray(embedding, dtype=np.float32)
+        await asyncio.to_thread(guardar_en_cache, "embedding", clave, vector.tobytes(), config.TTL_CACHE_EMBEDDINGS_SEGUNDOS)
+        return vector
     except Exception as e_ollama:
         print(f"ERROR_OLLAMA_EMBED: No se pudo generar embedding con Ollama (modelo: {modelo}): {e_ollama}")
         return None
 
-def buscar_en_lancedb_web(pregunta_texto: str, k: int = config.NUM_FRAGMENTOS_A_RECUPERAR_LANCEDB) -> List[Dict]:
+async def en_pool_lancedb(funcion, *args):
+    # Ejecuta una llamada bloqueante (LanceDB, lectura de resúmenes) en el pool acotado sin ocupar el event loop.
+    # Copia el contexto como asyncio.to_thread, para que los spans caigan en la traza de la solicitud.
+    contexto = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(_pool_lancedb, contexto.run, funcion, *args)
+
+@trazar("carga_resumenes")
+def obtener_resumenes_para_contexto(nombres_archivo: List[str]) -> Dict[str, Optional[Tuple[str, int]]]:
+    # Una sola consulta filtrada a config.LANCEDB_TABLE_RESUMENES (escrita por 005) para todos los documentos recuperados:
+    # nombre_archivo -> (resumen recortado, num_tokens). Sin esa tabla (BD anterior), se leen los _resumen.txt.
+    resumenes = {nombre: None for nombre in nombres_archivo}
+    if not nombres_archivo: return resumenes
+    try:
+        tabla_resumenes = abrir_tabla_resumenes_web()
+        if tabla_resumenes is not None:
+            lista_nombres = ", ".join("'" + n.replace("'", "''") + "'" for n in nombres_archivo)
+            filas = (tabla_resumenes.search().where(f"nombre_archivo_original IN ({lista_nombres})")
+                     .select(["nombre_archivo_original", "resumen_contexto", "num_tokens_contexto"]).limit(len(nombres_archivo)).to_list())
+            for fila in filas: resumenes[fila["nombre_archivo_original"]] = (fila["resumen_contexto"], fila["num_tokens_contexto"])
+            return resumenes
+    except Exception as e_resumen:
+        print(f"ERROR_LANCEDB (resumenes): {e_resumen}")
+    for nombre in nombres_archivo:
+        resumen = get_summary_content_by_original_filename(nombre)
+        if resumen: resumenes[nombre] = recortar_a_tokens(resumen, config.MAX_TOKENS_POR_RESUMEN_EN_CONTEXTO, config.ENCODING_TIKTOKEN_GENERACION)
+    return resumenes
+
+def conectar_lancedb_web():
+    # Llamar con _lock_tabla tomado. lancedb se importa aquí y no al cargar el módulo (tarda unos 2 s): en el arranque
+    # del worker eso ocurre en el pool de LanceDB, a la vez que los demás pasos del calentamiento
+    if "db" not in _tabla_abierta:
+        import lancedb
+        _tabla_abierta["db"] = lancedb.connect(config.LANCEDB_DIR, read_consistency_interval=timedelta(seconds=config.SEGUNDOS_CONSISTENCIA_LANCEDB))
+    return _tabla_abierta["db"]
+
+def abrir_tabla_fragmentos_web():
+    # La tabla se abre una vez por proceso (el lifespan la abre al arrancar) y se comparte entre hilos.
+    table = _tabla_abierta.get("tabla")
+    if table is not None: return table
     if not os.path.isdir(config.LANCEDB_DIR):
         print(f"ERROR_LANCEDB: Directorio LanceDB no existe: {config.LANCEDB_DIR}")
-        return []
-    pregunta_embedding_np = obtener_embedding_ollama_pregunta(pregunta_texto)
-    if pregunta_embedding_np is None: return []
-    query_vector_list = pregunta_embedding_np.tolist()
-    try:
-        db = lancedb.connect(config.LANCEDB_DIR)
+        return None
+    with _lock_tabla:
+        if "tabla" in _tabla_abierta: return _tabla_abierta["tabla"]
+        db = conectar_lancedb_web()
         if config.LANCEDB_TABLE_NAME_DEFAULT not in db.table_names():
             print(f"ERROR_LANCEDB: Tabla '{config.LANCEDB_TABLE_NAME_DEFAULT}' no en {db.table_names()}.")
-            return []
-        table = db.open_table(config.LANCEDB_TABLE_NAME_DEFAULT)
-        results = table.search(query_vector_list).limit(k).to_list()
-        print(f"INFO_LANCEDB: {len(results)} resultados para '{pregunta_texto[:20].replace(chr(10),' ')}...'")
-        return results
+            return None
+        _tabla_abierta["tabla"] = db.open_table(config.LANCEDB_TABLE_NAME_DEFAULT)
+        return _tabla_abierta["tabla"]
+
+def abrir_tabla_resumenes_web():
+    # Igual que la de fragmentos: una vez por proceso. Si aún no existe (005 no ha corrido), se vuelve a buscar como
+    # mucho cada SEGUNDOS_CONSISTENCIA_LANCEDB, para no listar las tablas en cada solicitud.
+    table = _tabla_abierta.get("resumenes")
+    if table is not None: return table
+    if time.monotonic() - _tabla_abierta.get("resumenes_revisada", float("-inf")) < config.SEGUNDOS_CONSISTENCIA_LANCEDB: return None
+    if not os.path.isdir(config.LANCEDB_DIR): return None
+    with _lock_tabla:
+        if "resumenes" in _tabla_abierta: return _tabla_abierta["resumenes"]
+        db = conectar_lancedb_web()
+        _tabla_abierta["resumenes_revisada"] = time.monotonic()
+        if config.LANCEDB_TABLE_RESUMENES not in db.table_names(): return None
+        _tabla_abierta["resumenes"] = db.open_table(config.LANCEDB_TABLE_RESUMENES)
+        return _tabla_abierta["resumenes"]
+
+def version_tabla_fragmentos() -> Optional[int]:
+    table = abrir_tabla_fragmentos_web()
+    return table.version if table is not None else None
+
+def buscar_vectorial_web(pregunta_embedding_np: np.ndarray, k: int = config.NUM_FRAGMENTOS_A_RECUPERAR_LANCEDB,
+                         filtros: Optional[Dict[str, str]] = None) -> List[Dict]:
+    try:
+        table = abrir_tabla_fragmentos_web()
+        if table is None: return []
+        return ejecutar_busqueda_vectorial(table, pregunta_embedding_np, k, config.CONFIG_BUSQUEDA_LANCEDB, filtros)
     except Exception as e_search:
         print(f"ERROR_LANCEDB (search): {e_search}\\n{traceback.format_exc()}")
         return []
+
+def buscar_fts_web(pregunta_texto: str, k: int = config.NUM_RESULTADOS_FTS, filtros: Optional[Dict[str, str]] = None) -> List[Dict]:
+    # Búsqueda por palabras clave (BM25) sobre el índice FTS de 'texto' (007); sin índice, [] (ver rag_dof/busqueda.py).
+    try:
+        table = abrir_tabla_fragmentos_web()
+        return buscar_fts(table, pregunta_texto, k, filtros) if table is not None else []
+    except Exception as e_fts:
+        print(f"ADVERTENCIA_LANCEDB: Rama FTS no disponible ({e_fts}).")
+        return []
+
+async def buscar_en_lancedb_web_async(pregunta_texto: str, k: int = config.NUM_FRAGMENTOS_A_RECUPERAR_LANCEDB, filtros: Optional[Dict[str, str]] = None) -> List[Dict]:
+    if not os.path.isdir(config.LANCEDB_DIR):
+        print(f"ERROR_LANCEDB: Directorio LanceDB no existe: {config.LANCEDB_DIR}")
+        return []
+    pregunta_embedding_np = await obtener_embedding_ollama_pregunta_async(pregunta_texto)
+    if pregunta_embedding_np is None: return []
+    results = await en_pool_lancedb(buscar_vectorial_web, pregunta_embedding_np, k, filtros)
+    print(f"INFO_LANCEDB: {len(results)} resultados para '{pregunta_texto[:20].replace(chr(10),' ')}...'")
+    return results
+
+def obtener_embeddings_ollama_lote(textos: List[str], modelo: str = config.MODELO_EMBEDDING_OLLAMA,
+                                   tamano_lote: int = config.TAMANO_LOTE_EMBEDDINGS_BATCH) -> List[Optional[List[float]]]:
+    return obtener_embeddings_ollama_lote_compartida(textos, modelo, tamano_lote)
+
+def buscar_en_lancedb_lote_web(preguntas: List[str], k: int = config.NUM_FRAGMENTOS_A_RECUPERAR_LANCEDB, filtros: Optional[Dict[str, str]] = None) -> pa.Table:
+    # Embeddings en lotes + búsquedas concurrentes sobre una sola tabla abierta; una fila Arrow por fragmento.
+    filas = {campo: [] for campo in ESQUEMA_RESULTADOS_LOTE.names}
+    table = abrir_tabla_fragmentos_web() if preguntas else None
+    if table is None: return pa.table(filas, schema=ESQUEMA_RESULTADOS_LOTE)
+    vectores = obtener_embeddings_ollama_lote(preguntas)
+    def buscar_uno(vector):
+        if vector is None: return []
+        try: return ejecutar_busqueda_vectorial(table, np.asarray(vector, dtype=np.float32), k, config.CONFIG_BUSQUEDA_LANCEDB, filtros, COLUMNAS_RESULTADO_LOTE)
+        except Exception as e_search: print(f"ERROR_LANCEDB (search lote): {e_search}"); return []
+    if detectar_tipo_vector(table) == "int8": cargar_matriz_int8(table) # Una sola carga antes de repartir entre hilos
+    with ThreadPoolExecutor(max_workers=config.NUM_HILOS_BUSQUEDA_BATCH) as executor:
+        resultados = list(executor.map(buscar_uno, vectores))
+    for idx, (pregunta, fragmentos) in enumerate(zip(preguntas, resultados)):
+        for rango, frag in enumerate(fragmentos, start=1):
+            filas["consulta_idx"].append(idx); filas["pregunta"].append(pregunta); filas["rango"].append(rango)
+            for campo in ("id", "nombre_archivo_original", "indice_fragmento_en_doc", "_distance", "texto"):
+                filas[campo].append(frag.get(campo))
+    print(f"INFO_LANCEDB: Lote de {len(preguntas)} preguntas -> {len(filas['id'])} fragmentos")
+    return pa.table(filas, schema=ESQUEMA_RESULTADOS_LOTE)
 """
         create_file_with_content(ls_path, lancedb_service_content, overwrite_if_exists=False)
 
     rs_path = os.path.join(CORE_DIR, "rag_service.py")
     if not os.path.exists(rs_path):
         rag_service_content = """# core/rag_service.py (Creado por setup con lógica adaptada)
+# El orquestador, el prompt y la respuesta de Groq en streaming son los de 009 (rag_dof/generacion.py); aquí solo se
+# ponen los servicios de la web (embedding async, pool de LanceDB, cola de admisión) y los valores de config.py.
 from . import config
-from .lancedb_service import buscar_en_lancedb_web
-from .file_operations import get_summary_content_by_original_filename
-import time; import tiktoken; from groq import Groq
-from typing import List, Dict, Optional, Tuple; import traceback
+from .lancedb_service import buscar_fts_web, buscar_vectorial_web, obtener_embedding_ollama_pregunta_async, en_pool_lancedb
+from .reranker_service import reordenar_fragmentos
+from .lancedb_service import obtener_resumenes_para_contexto, normalizar_texto_metadato, version_tabla_fragmentos
+from .cache_compartida import leer_cache, guardar_en_cache
+from .admision import SaturacionGroq, CuotaAdmision, precomprobar_admision, plazo_para
+from .trazas import traza_activa, nueva_traza, finalizar_traza, ejecutar_con_traza, registrar_acceso_cache
+from rag_dof.generacion import MARCAS_RESPUESTA_FALLIDA, OrquestadorRag, generar_respuesta_groq_stream
+from rag_dof.trazas import calcular_ruta_critica
+import re; import time; import json; import asyncio; from groq import AsyncGroq
+from typing import List, Dict, Optional, Tuple, AsyncIterator; import traceback
 
-cliente_groq_rag = Groq(api_key=config.GROQ_API_KEY) if config.GROQ_API_KEY else None
+cliente_groq_rag = AsyncGroq(api_key=config.GROQ_API_KEY) if config.GROQ_API_KEY else None
 if not cliente_groq_rag: print("ADVERTENCIA_RAG: Cliente Groq NO inicializado.")
 
-solicitudes_en_minuto_actual_groq = 0
-tokens_procesados_en_minuto_actual_groq = 0
-inicio_minuto_actual_groq = time.time()
-
-def obtener_conteo_tokens_tiktoken(texto: str, encoding_nombre: str = config.ENCODING_TIKTOKEN_GENERACION) -> int:
-    try: return len(tiktoken.get_encoding(encoding_nombre).encode(texto))
-    except: return len(texto.split())
-
-def verificar_y_esperar_limites_groq(tokens_entrada_prompt: int):
-    global solicitudes_en_minuto_actual_groq, tokens_procesados_en_minuto_actual_groq, inicio_minuto_actual_groq
-    tiempo_actual = time.time()
-    if tiempo_actual - inicio_minuto_actual_groq >= 60:
-        print(f"INFO_RAG_LIMITS: Nuevo minuto API Groq. Reset (Sols: {solicitudes_en_minuto_actual_groq}, Tokens: {tokens_procesados_en_minuto_actual_groq})")
-        solicitudes_en_minuto_actual_groq=0;tokens_procesados_en_minuto_actual_groq=0;inicio_minuto_actual_groq=tiempo_actual
-    max_prompt_seguro = config.LIMITE_TOKENS_POR_MINUTO_PROCESADOS_GROQ * 0.85
-    if tokens_entrada_prompt > max_prompt_seguro and (tokens_procesados_en_minuto_actual_groq > 0 or solicitudes_en_minuto_actual_groq > 0):
-        espera = (60.1-(tiempo_actual-inicio_minuto_actual_groq));
-        if espera > 0: print(f"  ADVERTENCIA_RAG_LIMITS: Prompt grande. Esperando {espera:.2f}s..."); time.sleep(espera); solicitudes_en_minuto_actual_groq=0;tokens_procesados_en_minuto_actual_groq=0;inicio_minuto_actual_groq=time.time()
-    if solicitudes_en_minuto_actual_groq >= config.LIMITE_SOLICITUDES_POR_MINUTO_GROQ:
-        espera = (60.1-(tiempo_actual-inicio_minuto_actual_groq));
-        if espera > 0: print(f"INFO_RAG_LIMITS: RPM Límite. Esperando {espera:.2f}s..."); time.sleep(espera); solicitudes_en_minuto_actual_groq=0;tokens_procesados_en_minuto_actual_groq=0;inicio_minuto_actual_groq=time.time()
-    proyectados = tokens_procesados_en_minuto_actual_groq + tokens_entrada_prompt + config.MAX_COMPLETION_TOKENS_GENERACION
-    if proyectados > config.LIMITE_TOKENS_POR_MINUTO_PROCESADOS_GROQ:
-        espera = (60.1-(tiempo_actual-inicio_minuto_actual_groq));
-        if espera > 0: print(f"INFO_RAG_LIMITS: TPM Límite. Esperando {espera:.2f}s..."); time.sleep(espera); solicitudes_en_minuto_actual_groq=0;tokens_procesados_en_minuto_actual_groq=0;inicio_minuto_actual_groq=time.time()
-
-def generar_respuesta_con_groq_directo(prompt_completo_para_llm: str) -> Tuple[Optional[str], int]:
-    global solicitudes_en_minuto_actual_groq, tokens_procesados_en_minuto_actual_groq
-    tokens_prompt = obtener_conteo_tokens_tiktoken(prompt_completo_para_llm)
-    try: verificar_y_esperar_limites_groq(tokens_prompt)
-    except ValueError as ve: return f"Error: Prompt demasiado grande ({tokens_prompt} tokens).", tokens_prompt
-    for intento in range(config.MAX_API_REINTENTOS_GROQ):
+_tareas_en_segundo_plano: set = set() # Referencias a tareas sin await (producción de eventos SSE) para que no las recoja el GC
+_respuestas_en_vuelo: Dict[str, asyncio.Task] = {} # clave de pregunta -> tarea del RAG completo en curso
+_difusiones_en_vuelo: Dict[str, "DifusionEventos"] = {} # clave de pregunta -> eventos SSE de la respuesta en curso
+PREFIJOS_COLUMNAS_VECTOR = ("vector", "escala_vector") # No se guardan en la caché de respuestas
+
+def generar_respuesta_con_groq_stream(prompt_completo_para_llm: str, tokens_prompt_estimados: Optional[int] = None,
+                                      traza: Optional[Dict] = None, prioridad: str = "interactiva",
+                                      plazo: Optional[float] = None) -> AsyncIterator[str]:
+    # Fragmentos de texto de la respuesta según llegan de Groq. La cuota es la cola de admisión (CuotaAdmision): si
+    # vence el plazo, SaturacionGroq sale sin haber emitido nada; la reserva se liquida con los tokens realmente
+    # emitidos, también si el cliente se desconecta a mitad del stream. La traza se recibe explícita desde el
+    # endpoint SSE, que no la activa en su contexto.
+    return generar_respuesta_groq_stream(cliente_groq_rag, prompt_completo_para_llm, tokens_prompt_estimados, CuotaAdmision(prioridad, plazo),
+                                         modelo=config.MODELO_GENERACION_GROQ, temperatura=config.TEMPERATURE_GENERACION,
+                                         max_tokens=config.MAX_COMPLETION_TOKENS_GENERACION, max_reintentos=config.MAX_API_REINTENTOS_GROQ,
+                                         espera_reintento_segundos=config.TIEMPO_ESPERA_REINTENTO_GROQ_SEGUNDOS,
+                                         encoding=config.ENCODING_TIKTOKEN_GENERACION, traza=traza)
+
+async def calentar_conexion_groq():
+    # Petición ligera (lista de modelos) para abrir la conexión TLS con Groq mientras se recupera el contexto.
+    try: await cliente_groq_rag.models.list()
+    except Exception as e_calentar: print(f"ADVERTENCIA_RAG_GROQ: No se pudo calentar la conexión: {e_calentar}")
+
+def resumir_tiempos_etapas(tiempos_etapas: Dict[str, Tuple[float, float]]) -> List[Dict]:
+    ruta_critica = calcular_ruta_critica(tiempos_etapas)
+    return [{"etapa": etapa, "inicio_ms": round(inicio, 1), "fin_ms": round(fin, 1), "duracion_ms": round(fin - inicio, 1),
+             "ruta_critica": etapa in ruta_critica} for etapa, (inicio, fin) in sorted(tiempos_etapas.items(), key=lambda x: x[1][0])]
+
+# Embedding -> búsqueda vectorial || búsqueda FTS || calentamiento de Groq. Las llamadas bloqueantes a LanceDB van a su
+# pool acotado; el reranker (CPU) al pool por defecto de asyncio. consultar() devuelve (fragmentos, prompt, tokens, tiempos).
+orquestador_rag = OrquestadorRag(
+    obtener_embedding=obtener_embedding_ollama_pregunta_async,
+    buscar_vectorial=lambda embedding, k, filtros: en_pool_lancedb(buscar_vectorial_web, embedding, k, filtros),
+    buscar_fts=lambda pregunta, k, filtros: en_pool_lancedb(buscar_fts_web, pregunta, k, filtros),
+    obtener_resumenes=lambda nombres: en_pool_lancedb(obtener_resumenes_para_contexto, nombres),
+    reordenar=reordenar_fragmentos,
+    calentar_llm=calentar_conexion_groq if cliente_groq_rag else None,
+    k=config.NUM_DOCUMENTOS_RELEVANTES_K_RAG, modo_reranking=config.MODO_RERANKING, num_candidatos_reranking=config.NUM_CANDIDATOS_RERANKING,
+    usar_mmr=config.USAR_MMR, max_fragmentos_por_documento=config.MAX_FRAGMENTOS_POR_DOCUMENTO, usar_rama_fts=config.USAR_RAMA_FTS,
+    num_resultados_fts=config.NUM_RESULTADOS_FTS, max_tokens_prompt=config.MAX_CONTEXTO_TOTAL_PARA_GENERACION,
+    encoding=config.ENCODING_TIKTOKEN_GENERACION,
+)
+
+def clave_pregunta_en_vuelo(pregunta_usuario: str, filtros: Optional[Dict[str, str]] = None) -> str:
+    # Preguntas iguales salvo mayúsculas, acentos, espacios y puntuación, con los mismos filtros, comparten clave.
+    texto = re.sub(r"[^\\w\\s]", " ", normalizar_texto_metadato(pregunta_usuario))
+    filtros_activos = {campo: valor for campo, valor in sorted((filtros or {}).items()) if valor}
+    return " ".join(texto.split()) + "|" + json.dumps(filtros_activos, ensure_ascii=False)
+
+def leer_respuesta_cacheada(pregunta_usuario: str, filtros: Optional[Dict[str, str]] = None) -> Tuple[Optional[str], Optional[Dict]]:
+    # Bloqueante (abre la tabla la primera vez): se llama en el pool de LanceDB. Devuelve (clave, respuesta guardada o None).
+    # La clave es la de la coalescencia más el modelo de Groq y la versión de la tabla.
+    if not config.USAR_CACHE_COMPARTIDA: return None, None
+    version = version_tabla_fragmentos()
+    if version is None: return None, None
+    clave = f"{clave_pregunta_en_vuelo(pregunta_usuario, filtros)}|{config.MODELO_GENERACION_GROQ}|{version}"
+    guardada = leer_cache("respuesta", clave)
+    return clave, json.loads(guardada) if guardada else None
+
+def guardar_respuesta_cacheada(clave: Optional[str], respuesta: str, fragmentos: List[Dict], prompt: str, tokens_prompt: int):
+    # Solo respuestas completas: ni errores de Groq ni cortes a mitad del stream
+    if not clave or not respuesta or any(marca in respuesta for marca in MARCAS_RESPUESTA_FALLIDA): return
+    entrada = {"respuesta": respuesta, "prompt": prompt, "tokens_prompt": tokens_prompt,
+               "fragmentos": [{c: v for c, v in f.items() if not c.startswith(PREFIJOS_COLUMNAS_VECTOR)} for f in fragmentos]}
+    guardar_en_cache("respuesta", clave, json.dumps(entrada, ensure_ascii=False, default=str).encode("utf-8"), config.TTL_CACHE_RESPUESTAS_SEGUNDOS)
+
+def resumen_fragmentos_stream(fragmentos: List[Dict]) -> List[Dict]:
+    return [{c: f.get(c) for c in ("id", "nombre_archivo_original", "indice_fragmento_en_doc", "id_canonico", "_distance", "_score_reranking", "_score_rrf") if c in f}
+            for f in fragmentos]
+
+class DifusionEventos:
+    # Eventos de una respuesta en curso que varios suscriptores leen desde el principio, cada uno a su ritmo.
+    def __init__(self):
+        self.eventos: List[Tuple[str, any]] = []
+        self.terminada = False
+        self._cambio = asyncio.Event()
+
+    def publicar(self, evento: Tuple[str, any]):
+        self.eventos.append(evento)
+        self._cambio.set(); self._cambio = asyncio.Event()
+
+    def cerrar(self):
+        self.terminada = True; self._cambio.set()
+
+    async def suscribir(self) -> AsyncIterator[Tuple[str, any]]:
+        indice = 0
+        while True:
+            while indice < len(self.eventos):
+                yield self.eventos[indice]; indice += 1
+            if self.terminada: return
+            await self._cambio.wait()
+
+def estado_respuesta(cacheada: bool = False, saturacion: Optional[SaturacionGroq] = None) -> Dict:
+    # Sexto elemento de la respuesta del RAG completo: si vino de la caché o si se degradó a solo recuperación
+    return {"cacheada": cacheada, "degradada": saturacion is not None,
+            "reintentar_en": saturacion.segundos_reintento() if saturacion is not None else None}
+
+async def realizar_rag_completo_web_async(pregunta_usuario: str, filtros: Optional[Dict[str, str]] = None, prioridad: str = "interactiva"
+                                          ) -> Tuple[str | None, List[Dict], str, int, List[Dict], Dict]:
+    # RAG completo para el formulario HTML. Con COALESCER_PREGUNTAS_EN_VUELO, las solicitudes con la misma clave que
+    # llegan mientras otra está en curso esperan su resultado en lugar de repetir embedding, búsqueda y llamada a Groq.
+    # La ejecución compartida es una tarea aparte (asyncio.shield): si un cliente se desconecta, las demás siguen.
+    # Antes se consulta la caché compartida: una respuesta que ya generó cualquier worker se devuelve sin recalcular.
+    inicio = time.perf_counter()
+    clave_cache, guardada = await en_pool_lancedb(leer_respuesta_cacheada, pregunta_usuario, filtros)
+    if guardada:
+        tiempos = resumir_tiempos_etapas({"cache_respuestas": (0.0, (time.perf_counter() - inicio) * 1000)})
+        return guardada["respuesta"], guardada["fragmentos"], guardada["prompt"], guardada["tokens_prompt"], tiempos, estado_respuesta(cacheada=True)
+    if not config.COALESCER_PREGUNTAS_EN_VUELO: return await ejecutar_rag_completo_web(pregunta_usuario, filtros, clave_cache, prioridad)
+    clave = clave_pregunta_en_vuelo(pregunta_usuario, filtros)
+    tarea = _respuestas_en_vuelo.get(clave)
+    registrar_acceso_cache("rag_en_vuelo", tarea is not None)
+    if tarea is None:
+        tarea = asyncio.create_task(ejecutar_rag_completo_web(pregunta_usuario, filtros, clave_cache, prioridad))
+        _respuestas_en_vuelo[clave] = tarea
+        tarea.add_done_callback(lambda t: _respuestas_en_vuelo.pop(clave, None) if _respuestas_en_vuelo.get(clave) is t else None)
+    return await asyncio.shield(tarea)
+
+async def ejecutar_rag_completo_web(pregunta_usuario: str, filtros: Optional[Dict[str, str]] = None, clave_cache: Optional[str] = None,
+                                    prioridad: str = "interactiva") -> Tuple[str | None, List[Dict], str, int, List[Dict], Dict]:
+    # Orquestador + respuesta de Groq consumida entera. Devuelve (respuesta, fragmentos, prompt, tokens del prompt,
+    # tiempos por etapa de resumir_tiempos_etapas, estado_respuesta). Con clave_cache, la respuesta completa queda en la
+    # caché compartida. Si Groq está saturado lanza SaturacionGroq antes de recuperar nada o, con
+    # DEGRADAR_A_SOLO_RECUPERACION, devuelve los fragmentos con un aviso en lugar de la respuesta.
+    if not cliente_groq_rag: return "Error: Cliente Groq no configurado.", [], "Cliente Groq no configurado.", 0, [], estado_respuesta()
+    plazo = plazo_para(prioridad)
+    saturacion = await precomprobar_admision(prioridad)
+    with traza_activa("rag_chat", pregunta=pregunta_usuario[:200], filtros=json.dumps(filtros or {}, ensure_ascii=False)):
+        fragmentos, prompt_completo_str, tokens_del_prompt, tiempos = await orquestador_rag.consultar(pregunta_usuario, filtros)
+        if not fragmentos: return "No se encontraron fragmentos relevantes en LanceDB.", [], "", 0, resumir_tiempos_etapas(tiempos), estado_respuesta()
+        marcas, partes = {}, []
+        inicio_llm = time.perf_counter()
+        if saturacion is None:
+            try:
+                async for parte in generar_respuesta_con_groq_stream(prompt_completo_str, tokens_del_prompt, prioridad=prioridad, plazo=plazo):
+                    marcas.setdefault("primer_token", time.perf_counter()); partes.append(parte)
+            except SaturacionGroq as e_saturacion:
+                if not config.DEGRADAR_A_SOLO_RECUPERACION: raise
+                saturacion = e_saturacion
+        if saturacion is not None:
+            return (saturacion.mensaje_degradado(), fragmentos, prompt_completo_str, tokens_del_prompt, resumir_tiempos_etapas(tiempos),
+                    estado_respuesta(saturacion=saturacion))
+        respuesta_texto = "".join(partes).strip()
+        fin_prompt_ms = max(fin for _, fin in tiempos.values())
+        primer_token_ms = (marcas.get("primer_token", time.perf_counter()) - inicio_llm) * 1000
+        tiempos["llm_primer_token"] = (fin_prompt_ms, fin_prompt_ms + primer_token_ms)
+        tiempos["llm_respuesta_completa"] = (fin_prompt_ms + primer_token_ms, fin_prompt_ms + (time.perf_counter() - inicio_llm) * 1000)
+        await asyncio.to_thread(guardar_respuesta_cacheada, clave_cache, respuesta_texto, fragmentos, prompt_completo_str, tokens_del_prompt)
+        return respuesta_texto or "El modelo generó una respuesta vacía.", fragmentos, prompt_completo_str, tokens_del_prompt, resumir_tiempos_etapas(tiempos), estado_respuesta()
+
+async def realizar_rag_stream_web(pregunta_usuario: str, filtros: Optional[Dict[str, str]] = None,
+                                  prioridad: str = "interactiva") -> AsyncIterator[Tuple[str, any]]:
+    # Eventos SSE de la pregunta. Con COALESCER_PREGUNTAS_EN_VUELO, una sola tarea genera la respuesta y la publica
+    # en una DifusionEventos; quien llega con la misma clave mientras sigue en curso la recibe completa desde el
+    # principio. A esos suscriptores el evento 'fin' les llega con 'coalescida': True. Una respuesta que ya está en la
+    # caché compartida se repite en un solo evento 'token' y 'fin' con 'cacheada': True. Si Groq está saturado y no se
+    # degrada, SaturacionGroq sale antes del primer evento (el endpoint responde 429/503 sin abrir el stream).
+    inicio = time.perf_counter()
+    clave_cache, guardada = await en_pool_lancedb(leer_respuesta_cacheada, pregunta_usuario, filtros)
+    if guardada:
+        total_ms = (time.perf_counter() - inicio) * 1000
+        yield "fragmentos", resumen_fragmentos_stream(guardada["fragmentos"])
+        yield "token", guardada["respuesta"]
+        yield "fin", {"tokens_prompt": guardada["tokens_prompt"], "primer_token_ms": total_ms, "total_ms": total_ms, "cacheada": True,
+                      "tiempos_etapas": resumir_tiempos_etapas({"cache_respuestas": (0.0, total_ms)})}
+        return
+    plazo = plazo_para(prioridad)
+    if not config.COALESCER_PREGUNTAS_EN_VUELO:
+        saturacion = await precomprobar_admision(prioridad)
+        async for evento in generar_eventos_rag_stream(pregunta_usuario, filtros, clave_cache, prioridad, plazo, saturacion): yield evento
+        return
+    clave = clave_pregunta_en_vuelo(pregunta_usuario, filtros)
+    difusion = _difusiones_en_vuelo.get(clave)
+    registrar_acceso_cache("rag_stream_en_vuelo", difusion is not None)
+    coalescida = difusion is not None
+    if difusion is None:
+        saturacion = await precomprobar_admision(prioridad) # Solo quien genera pasa por la admisión: los coalescidos no gastan cuota
+        difusion = _difusiones_en_vuelo[clave] = DifusionEventos()
+        async def producir():
+            try:
+                async for evento in generar_eventos_rag_stream(pregunta_usuario, filtros, clave_cache, prioridad, plazo, saturacion): difusion.publicar(evento)
+            except Exception as e_stream:
+                print(f"ERROR_RAG_STREAM: {e_stream}\\n{traceback.format_exc()}")
+                difusion.publicar(("error", str(e_stream)))
+            finally:
+                if _difusiones_en_vuelo.get(clave) is difusion: del _difusiones_en_vuelo[clave]
+                difusion.cerrar()
+        # La tarea sigue aunque el cliente que la inició se desconecte: puede haber otros suscritos
+        tarea = asyncio.create_task(producir())
+        _tareas_en_segundo_plano.add(tarea); tarea.add_done_callback(_tareas_en_segundo_plano.discard)
+    async for nombre_evento, datos in difusion.suscribir():
+        yield (nombre_evento, dict(datos, coalescida=True)) if coalescida and nombre_evento == "fin" else (nombre_evento, datos)
+
+async def generar_eventos_rag_stream(pregunta_usuario: str, filtros: Optional[Dict[str, str]] = None,
+                                     clave_cache: Optional[str] = None, prioridad: str = "interactiva", plazo: Optional[float] = None,
+                                     saturacion: Optional[SaturacionGroq] = None) -> AsyncIterator[Tuple[str, any]]:
+    # Versión incremental para el endpoint SSE: produce eventos (nombre, datos) en orden 'fragmentos' (metadatos de lo
+    # recuperado), 'token' (uno por fragmento de texto de Groq) y 'fin' con tiempos por etapa (o 'error').
+    # Con 'saturacion' (o si vence el plazo en la cola de admisión) no se llama a Groq: tras los fragmentos llega un
+    # 'token' con el aviso y 'fin' con 'degradada': True y 'reintentar_en'; sin DEGRADAR_A_SOLO_RECUPERACION, 'error'.
+    # Corre en el event loop del servidor. La traza se activa solo en la tarea del orquestador (ejecutar_con_traza):
+    # un generador no puede fijar y restaurar una ContextVar entre sus 'yield'.
+    if not cliente_groq_rag: yield "error", "Cliente Groq no configurado."; return
+    traza = nueva_traza("rag_stream", pregunta=pregunta_usuario[:200], filtros=json.dumps(filtros or {}, ensure_ascii=False))
+    try:
+        fragmentos, prompt_final_para_llm, tokens_prompt, tiempos = await asyncio.create_task(ejecutar_con_traza(traza, orquestador_rag.consultar(pregunta_usuario, filtros)))
+        yield "fragmentos", resumen_fragmentos_stream(fragmentos)
+        if not fragmentos: yield "error", "No se encontraron fragmentos relevantes en LanceDB."; return
+        fin_prompt_ms = max(fin for _, fin in tiempos.values())
+        inicio = time.perf_counter(); primer_token_ms = None; partes = []
+        if saturacion is None:
+            try:
+                async for parte in generar_respuesta_con_groq_stream(prompt_final_para_llm, tokens_prompt, traza, prioridad, plazo):
+                    if primer_token_ms is None: primer_token_ms = (time.perf_counter() - inicio) * 1000
+                    partes.append(parte)
+                    yield "token", parte
+            except SaturacionGroq as e_saturacion:
+                saturacion = e_saturacion
+        total_ms = (time.perf_counter() - inicio) * 1000
+        if saturacion is not None:
+            if not config.DEGRADAR_A_SOLO_RECUPERACION:
+                yield "error", f"{saturacion.motivo} Reintenta en {saturacion.segundos_reintento()} s."; return
+            yield "token", saturacion.mensaje_degradado()
+            yield "fin", {"tokens_prompt": tokens_prompt, "primer_token_ms": None, "total_ms": total_ms, "tiempos_etapas": resumir_tiempos_etapas(tiempos),
+                          "trace_id": traza["trace_id"], "degradada": True, "reintentar_en": saturacion.segundos_reintento()}
+            return
+        await asyncio.to_thread(guardar_respuesta_cacheada, clave_cache, "".join(partes).strip(), fragmentos, prompt_final_para_llm, tokens_prompt)
+        if primer_token_ms is not None:
+            tiempos["llm_primer_token"] = (fin_prompt_ms, fin_prompt_ms + primer_token_ms)
+            tiempos["llm_respuesta_completa"] = (fin_prompt_ms + primer_token_ms, fin_prompt_ms + total_ms)
+        yield "fin", {"tokens_prompt": tokens_prompt, "primer_token_ms": primer_token_ms, "total_ms": total_ms,
+                      "tiempos_etapas": resumir_tiempos_etapas(tiempos),
+                      "trace_id": traza["trace_id"]}
+    finally:
+        finalizar_traza(traza) # También si el cliente cierra la conexión a mitad del stream
+"""
+        create_file_with_content(rs_path, rag_service_content, overwrite_if_exists=False)
+
+    rr_path = os.path.join(CORE_DIR, "reranker_service.py")
+    if not os.path.exists(rr_path):
+        reranker_service_content = """# core/reranker_service.py (Creado por setup)
+# El reranker es el de 009 (rag_dof/reranking.py); aquí solo se fijan el modo, el presupuesto y el lote de config.py.
+from . import config
+from typing import List, Dict
+from rag_dof import reranking
+
+def cargar_reranker(modo: str = config.MODO_RERANKING):
+    # Función puntuar(pregunta, textos) -> List[float], o None si el modo está desactivado o falta su dependencia.
+    return reranking.cargar_reranker(modo)
+
+def reordenar_fragmentos(pregunta: str, candidatos: List[Dict], k: int, modo: str = config.MODO_RERANKING,
+                         presupuesto_ms: float = config.PRESUPUESTO_LATENCIA_RERANKING_MS) -> List[Dict]:
+    # Los k mejores candidatos por score del reranker (campo '_score_reranking'); al agotarse el presupuesto, orden ANN.
+    return reranking.reordenar_fragmentos(pregunta, candidatos, k, modo, presupuesto_ms, config.TAMANO_LOTE_RERANKING)
+"""
+        create_file_with_content(rr_path, reranker_service_content, overwrite_if_exists=False)
+
+    tr_path = os.path.join(CORE_DIR, "trazas.py")
+    if not os.path.exists(tr_path):
+        trazas_content = """# core/trazas.py (Creado por setup)
+# Trazas por solicitud (spans de embedding, búsqueda, resúmenes, prompt y LLM) exportadas como OTLP/JSON a un JSONL,
+# e histogramas de latencia y aciertos de caché en memoria para el endpoint /metrics (formato de texto de Prometheus).
+# La implementación es la de los scripts (rag_dof/trazas.py): así los spans de las funciones compartidas (embedding,
+# búsqueda, reranking) caen en la misma traza activa. Aquí solo se fijan el archivo y el servicio de config.py.
+from . import config
+from contextlib import contextmanager
+from typing import Dict
+from rag_dof import trazas as trazas_compartidas
+from rag_dof.trazas import (observar_latencia, registrar_acceso_cache, nueva_traza, obtener_traza_actual, registrar_span, span,
+                            trazar, ejecutar_con_traza, calcular_ruta_critica, exportar_metricas_prometheus)
+
+def finalizar_traza(traza: Dict):
+    # Cierra el span raíz y agrega la traza a config.ARCHIVO_TRAZAS_JSONL como una línea OTLP/JSON
+    # (resourceSpans -> scopeSpans -> spans), legible por el receptor 'otlpjsonfile' del OpenTelemetry Collector.
+    trazas_compartidas.finalizar_traza(traza, config.ARCHIVO_TRAZAS_JSONL, config.NOMBRE_SERVICIO_TRAZAS, config.MAX_BYTES_ARCHIVO_TRAZAS)
+
+@contextmanager
+def traza_activa(nombre: str, **atributos):
+    # Activa una traza nueva para el bloque (asyncio.create_task y asyncio.to_thread la heredan) y la exporta al salir.
+    with trazas_compartidas.traza_activa(nombre, config.ARCHIVO_TRAZAS_JSONL, config.NOMBRE_SERVICIO_TRAZAS,
+                                         config.MAX_BYTES_ARCHIVO_TRAZAS, **atributos) as traza:
+        yield traza
+"""
+        create_file_with_content(tr_path, trazas_content, overwrite_if_exists=False)
+
+    ct_path = os.path.join(CORE_DIR, "catalogo.py")
+    if not os.path.exists(ct_path):
+        catalogo_content = """# core/catalogo.py (Creado por setup)
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+from . import config
+from .trazas import registrar_acceso_cache
+# Catálogo de documentos (SQLite) para /explore y /api/documents: la lógica es la de rag_dof/catalogo.py, que 007 usa para
+# actualizarlo. Cada página sale de un índice en O(página) en lugar de listar y ordenar las carpetas en cada visita.
+from rag_dof.catalogo import (abrir_catalogo, actualizar_coleccion, listar_documentos, obtener_documento, ubicar_documento,
+                              nombre_original_de_resumen, nombre_resumen_de_original)
+
+# --- Configuración ---
+TAMANO_PAGINA_POR_DEFECTO = config.TAMANO_PAGINA_CATALOGO
+
+# --- Servicio web ---
+MAX_TOTALES_EN_CACHE = 1024
+_conexiones = threading.local() # sqlite3 no comparte conexiones entre hilos; FastAPI atiende los 'def' en su pool
+_lock_refresco = threading.Lock()
+_mtimes_refrescados: List = [None]
+_totales_cache: Dict[Tuple, int] = {} # (versión del catálogo, colección, filtros) -> total
+
+def conexion_catalogo() -> sqlite3.Connection:
+    conexion = getattr(_conexiones, "conexion", None)
+    if conexion is None: conexion = _conexiones.conexion = abrir_catalogo(config.ARCHIVO_CATALOGO_DOCUMENTOS)
+    return conexion
+
+def mtimes_carpetas() -> List[int]:
+    return [os.stat(c).st_mtime_ns if os.path.isdir(c) else 0 for c in (config.DECRETOS_COLECTADOS_DIR, config.RESUMENES_DIR)]
+
+def refrescar_catalogo_si_cambio():
+    # Solo un stat por carpeta si nada cambió. Los mtimes refrescados se guardan en 'meta', así un reinicio
+    # (u otro worker) no vuelve a recorrer las carpetas. Se leen antes del recorrido: un cambio durante él se ve la próxima vez.
+    mtimes = mtimes_carpetas()
+    if mtimes == _mtimes_refrescados[0]: return
+    with _lock_refresco:
+        if mtimes == _mtimes_refrescados[0]: return
+        conexion = conexion_catalogo()
+        guardados = conexion.execute("SELECT valor FROM meta WHERE clave = 'mtimes_carpetas'").fetchone()
+        if guardados is None or json.loads(guardados[0]) != mtimes:
+            inicio = time.perf_counter()
+            cambios = {"completo": actualizar_coleccion(conexion, "completo", config.DECRETOS_COLECTADOS_DIR),
+                       "resumen": actualizar_coleccion(conexion, "resumen", config.RESUMENES_DIR)}
+            with conexion: conexion.execute("INSERT OR REPLACE INTO meta (clave, valor) VALUES ('mtimes_carpetas', ?)", (json.dumps(mtimes),))
+            print(f"INFO_CATALOGO: Refrescado en {time.perf_counter() - inicio:.2f}s (actualizados, borrados): {cambios}")
+        _mtimes_refrescados[0] = mtimes
+
+def version_catalogo(conexion: sqlite3.Connection) -> str:
+    fila = conexion.execute("SELECT valor FROM meta WHERE clave = 'version'").fetchone()
+    return fila[0] if fila else "0"
+
+def listar_documentos_web(coleccion: str = "completo", pagina: int = 1, tamano_pagina: int = TAMANO_PAGINA_POR_DEFECTO, orden: str = "nombre",
+                          prefijo: Optional[str] = None, desde: Optional[str] = None, hasta: Optional[str] = None,
+                          cursor: Optional[List] = None) -> Dict:
+    # El COUNT(*) recorre el índice entero; se guarda por versión del catálogo y filtros para que cada página siga siendo O(página)
+    refrescar_catalogo_si_cambio()
+    conexion = conexion_catalogo()
+    prefijo = prefijo.strip().lower() if prefijo else None # Los nombres de archivo están sanitizados en minúsculas
+    clave_total = (version_catalogo(conexion), coleccion, prefijo, desde, hasta)
+    total = _totales_cache.get(clave_total)
+    registrar_acceso_cache("catalogo_totales", total is not None)
+    resultado = listar_documentos(conexion, coleccion, pagina, tamano_pagina, orden, prefijo, desde, hasta, cursor, contar_total=total is None)
+    if total is None:
+        if len(_totales_cache) >= MAX_TOTALES_EN_CACHE: _totales_cache.clear()
+        _totales_cache[clave_total] = resultado["total"]
+    else:
+        resultado["total"] = total
+        resultado["total_paginas"] = (total + resultado["tamano_pagina"] - 1) // resultado["tamano_pagina"]
+    return resultado
+"""
+        create_file_with_content(ct_path, catalogo_content, overwrite_if_exists=False)
+
+    ed_path = os.path.join(CORE_DIR, "entrega_documentos.py")
+    if not os.path.exists(ed_path):
+        entrega_documentos_content = """# core/entrega_documentos.py (Creado por setup)
+import os
+import zlib
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Iterator, Optional, Tuple
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.middleware.gzip import GZipMiddleware
+from . import config
+from .catalogo import conexion_catalogo, ubicar_documento
+from .trazas import registrar_acceso_cache
+try:
+    import brotli # Opcional: sin él se negocia solo gzip
+    BROTLI_DISPONIBLE = True
+except ImportError:
+    BROTLI_DISPONIBLE = False
+
+# --- Configuración ---
+# Texto de los documentos para /view y /raw: se lee desde el byte donde empieza el contenido (guardado en el catálogo)
+# por bloques, sin cargar el archivo entero. ETag/Last-Modified permiten 304; /raw acepta Range (sobre el contenido)
+# y negocia br/gzip. Los cuerpos comprimidos de documentos medianos se guardan en una LRU acotada por bytes.
+CARPETAS_POR_TIPO = {"full": ("completo", config.DECRETOS_COLECTADOS_DIR), "summary": ("resumen", config.RESUMENES_DIR)}
+SUFIJOS_ETAG = {"br": "-br", "gzip": "-gz", None: ""} # Una ETag fuerte por representación
+PREFIJO_RUTAS_CON_COMPRESION_PROPIA = "/raw/" # Estas rutas comprimen por su cuenta (y no deben comprimir un 206)
+TIPO_MEDIO_TEXTO = "text/plain; charset=utf-8"
+_lock_cache = threading.Lock()
+_cache_comprimidos: "OrderedDict[Tuple, bytes]" = OrderedDict()
+_bytes_en_cache = [0]
+
+class CompresionGzipSalvoDocumentos(GZipMiddleware):
+    # gzip para HTML y JSON; las rutas de /raw/ ya negocian br/gzip y sirven rangos sin codificar
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(PREFIJO_RUTAS_CON_COMPRESION_PROPIA):
+            await self.app(scope, receive, send); return
+        await super().__call__(scope, receive, send)
+
+def ubicar_documento_web(tipo: str, nombre: str) -> Optional[Dict]:
+    # Solo nombres de archivo .txt dentro de la carpeta del tipo (sin rutas relativas)
+    if tipo not in CARPETAS_POR_TIPO or os.path.basename(nombre) != nombre or not nombre.endswith(".txt"): return None
+    coleccion, carpeta = CARPETAS_POR_TIPO[tipo]
+    return ubicar_documento(conexion_catalogo(), coleccion, carpeta, nombre)
+
+def etag_documento(documento: Dict, sufijo: str = "") -> str:
+    return f'"{documento["tamano_bytes"]:x}-{documento["modificado"]:x}-{documento["desplazamiento_contenido"]:x}{sufijo}"'
+
+def encabezados_cache(documento: Dict, etag: str) -> Dict[str, str]:
+    return {"ETag": etag, "Last-Modified": formatdate(documento["modificado"] / 1e9, usegmt=True),
+            "Cache-Control": config.CACHE_CONTROL_DOCUMENTOS, "Vary": "Accept-Encoding"}
+
+def no_modificado(r: Request, documento: Dict) -> bool:
+    # If-None-Match tiene prioridad sobre If-Modified-Since. Comparación débil: cualquier representación del mismo archivo vale.
+    si_no_coincide = r.headers.get("if-none-match")
+    if si_no_coincide is not None:
+        base = etag_documento(documento).strip('"')
+        for etiqueta in si_no_coincide.split(","):
+            etiqueta = etiqueta.strip().removeprefix("W/").strip('"')
+            if etiqueta == "*" or etiqueta == base or etiqueta.startswith(base + "-"): return True
+        return False
+    si_modificado_desde = r.headers.get("if-modified-since")
+    if not si_modificado_desde: return False
+    try: return int(documento["modificado"] // 1_000_000_000) <= parsedate_to_datetime(si_modificado_desde).timestamp()
+    except (TypeError, ValueError): return False
+
+def negociar_codificacion(r: Request) -> Optional[str]:
+    aceptadas = {}
+    for parte in r.headers.get("accept-encoding", "").split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        calidad = 1.0
+        if parametros.strip().startswith("q="):
+            try: calidad = float(parametros.strip()[2:])
+            except ValueError: calidad = 0.0
+        if nombre: aceptadas[nombre.strip().lower()] = calidad
+    for codificacion in (("br",) if BROTLI_DISPONIBLE else ()) + ("gzip",):
+        if aceptadas.get(codificacion, aceptadas.get("*", 0.0)) > 0: return codificacion
+    return None
+
+def rango_solicitado(r: Request, longitud: int, etag: str) -> Optional[Tuple[int, int]]:
+    # Un solo rango ('bytes=a-b', 'bytes=a-' o 'bytes=-n') sobre el contenido; con varios rangos o un If-Range que ya no
+    # coincide se responde completo (200). ValueError si el rango no se puede satisfacer (416).
+    encabezado = r.headers.get("range", "")
+    if not encabezado.startswith("bytes=") or "," in encabezado: return None
+    si_rango = r.headers.get("if-range")
+    if si_rango and si_rango.strip() != etag: return None
+    inicio_texto, _, fin_texto = encabezado[len("bytes="):].strip().partition("-")
+    try:
+        if inicio_texto: inicio, fin = int(inicio_texto), min(int(fin_texto), longitud - 1) if fin_texto else longitud - 1
+        else: inicio, fin = max(0, longitud - int(fin_texto)), longitud - 1
+    except ValueError:
+        return None
+    if inicio > fin or inicio >= longitud: raise ValueError(f"Rango fuera del contenido ({longitud} bytes): {encabezado}")
+    return inicio, fin
+
+def iterar_bytes_archivo(ruta: str, inicio: int, fin: int) -> Iterator[bytes]:
+    # fin inclusivo. Bloques de TAMANO_BLOQUE_STREAMING_BYTES: memoria constante sin importar el tamaño del decreto
+    with open(ruta, "rb") as f:
+        f.seek(inicio)
+        restantes = fin - inicio + 1
+        while restantes > 0:
+            bloque = f.read(min(config.TAMANO_BLOQUE_STREAMING_BYTES, restantes))
+            if not bloque: break
+            restantes -= len(bloque)
+            yield bloque
+
+def iterar_comprimido(bloques: Iterator[bytes], codificacion: str) -> Iterator[bytes]:
+    if codificacion == "br":
+        compresor = brotli.Compressor(quality=config.CALIDAD_COMPRESION_BROTLI); comprimir, terminar = compresor.process, compresor.finish
+    else:
+        compresor = zlib.compressobj(config.NIVEL_COMPRESION_GZIP, zlib.DEFLATED, 31); comprimir, terminar = compresor.compress, compresor.flush # 31: contenedor gzip
+    for bloque in bloques:
+        salida = comprimir(bloque)
+        if salida: yield salida
+    yield terminar()
+
+def contenido_comprimido(documento: Dict, codificacion: str) -> bytes:
+    clave = (documento["ruta"], documento["tamano_bytes"], documento["modificado"], codificacion)
+    with _lock_cache:
+        cuerpo = _cache_comprimidos.get(clave)
+        if cuerpo is not None: _cache_comprimidos.move_to_end(clave)
+    registrar_acceso_cache("documentos_comprimidos", cuerpo is not None)
+    if cuerpo is not None: return cuerpo
+    cuerpo = b"".join(iterar_comprimido(iterar_bytes_archivo(documento["ruta"], documento["desplazamiento_contenido"], documento["tamano_bytes"] - 1), codificacion))
+    with _lock_cache:
+        if clave not in _cache_comprimidos:
+            _cache_comprimidos[clave] = cuerpo; _bytes_en_cache[0] += len(cuerpo)
+            while _bytes_en_cache[0] > config.MAX_BYTES_CACHE_COMPRIMIDOS and _cache_comprimidos:
+                _, descartado = _cache_comprimidos.popitem(last=False); _bytes_en_cache[0] -= len(descartado)
+    return cuerpo
+
+def leer_contenido_documento(documento: Dict, max_bytes: int) -> Tuple[str, bool]:
+    # Hasta max_bytes del contenido (un corte a mitad de un carácter UTF-8 se descarta). Devuelve (texto, truncado).
+    longitud = documento["tamano_bytes"] - documento["desplazamiento_contenido"]
+    with open(documento["ruta"], "rb") as f:
+        f.seek(documento["desplazamiento_contenido"])
+        datos = f.read(min(longitud, max_bytes))
+    return datos.decode("utf-8", errors="ignore").rstrip(), longitud > max_bytes
+
+def responder_contenido_documento(r: Request, tipo: str, nombre: str) -> Response:
+    documento = ubicar_documento_web(tipo, nombre)
+    if documento is None: return Response("Documento no encontrado.", status_code=404, media_type=TIPO_MEDIO_TEXTO)
+    inicio_contenido, longitud = documento["desplazamiento_contenido"], documento["tamano_bytes"] - documento["desplazamiento_contenido"]
+    etag = etag_documento(documento)
+    if no_modificado(r, documento): return Response(status_code=304, headers=encabezados_cache(documento, etag))
+    try:
+        rango = rango_solicitado(r, longitud, etag)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{longitud}", "Accept-Ranges": "bytes"})
+    if rango:
+        inicio, fin = rango
+        encabezados = dict(encabezados_cache(documento, etag), **{"Accept-Ranges": "bytes", "Content-Range": f"bytes {inicio}-{fin}/{longitud}",
+                                                                 "Content-Length": str(fin - inicio + 1)})
+        return StreamingResponse(iterar_bytes_archivo(documento["ruta"], inicio_contenido + inicio, inicio_contenido + fin),
+                                 status_code=206, media_type=TIPO_MEDIO_TEXTO, headers=encabezados)
+    codificacion = negociar_codificacion(r) if longitud >= config.MIN_BYTES_COMPRESION else None
+    encabezados = dict(encabezados_cache(documento, etag_documento(documento, SUFIJOS_ETAG[codificacion])), **{"Accept-Ranges": "bytes"})
+    bloques = iterar_bytes_archivo(documento["ruta"], inicio_contenido, documento["tamano_bytes"] - 1)
+    if codificacion is None:
+        encabezados["Content-Length"] = str(longitud)
+        return StreamingResponse(bloques, media_type=TIPO_MEDIO_TEXTO, headers=encabezados)
+    encabezados["Content-Encoding"] = codificacion
+    if longitud <= config.MAX_BYTES_DOCUMENTO_EN_CACHE_COMPRIMIDOS:
+        return Response(contenido_comprimido(documento, codificacion), media_type=TIPO_MEDIO_TEXTO, headers=encabezados)
+    return StreamingResponse(iterar_comprimido(bloques, codificacion), media_type=TIPO_MEDIO_TEXTO, headers=encabezados)
+"""
+        create_file_with_content(ed_path, entrega_documentos_content, overwrite_if_exists=False)
+
+    api_path = os.path.join(CORE_DIR, "api_v1.py")
+    if not os.path.exists(api_path):
+        api_v1_content = """# core/api_v1.py (Creado por setup)
+import io
+import json
+from typing import Dict, List, Optional
+import pyarrow as pa
+from fastapi import APIRouter, Request, Query
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, Field
+from . import config
+from .catalogo import listar_documentos_web, obtener_documento, conexion_catalogo, nombre_resumen_de_original
+from .entrega_documentos import ubicar_documento_web, etag_documento, encabezados_cache, no_modificado, leer_contenido_documento
+from .lancedb_service import buscar_en_lancedb_web_async, buscar_en_lancedb_lote_web
+from .rag_service import realizar_rag_completo_web_async
+from .admision import SaturacionGroq
+from .trazas import traza_activa
+try:
+    import orjson # Opcional (ORJSONResponse lo necesita): serializa más rápido que json y acepta tipos de numpy
+    from fastapi.responses import ORJSONResponse as RespuestaJSON
+except ImportError:
+    RespuestaJSON = JSONResponse
+
+# --- Configuración ---
+# API JSON versionada para clientes programáticos (/api/v1): las mismas funciones que la interfaz HTML, sin plantillas.
+# Las búsquedas también se pueden pedir como flujo Arrow IPC (?formato=arrow o Accept: application/vnd.apache.arrow.stream)
+# para leerlas con pyarrow/polars sin parsear JSON. La compresión gzip la aplica el middleware de main.py.
+TIPO_MEDIO_ARROW = "application/vnd.apache.arrow.stream"
+PREFIJOS_COLUMNAS_VECTOR = ("vector", "escala_vector") # Se omiten salvo incluir_vectores=true
+router_api_v1 = APIRouter(prefix="/api/v1", tags=["API v1"], default_response_class=RespuestaJSON)
+
+class SolicitudBusquedaV1(BaseModel):
+    preguntas: List[str] = Field(max_length=config.MAX_PREGUNTAS_POR_LOTE_API)
+    k: int = Field(config.NUM_FRAGMENTOS_A_RECUPERAR_LANCEDB, ge=1, le=config.MAX_K_API)
+    filtros: Optional[Dict[str, str]] = None # dependencia, tipo, anio, desde, hasta, codigo
+
+class SolicitudRagV1(BaseModel):
+    pregunta: str
+    filtros: Optional[Dict[str, str]] = None
+    incluir_prompt: bool = False
+
+def quiere_arrow(r: Request, formato: Optional[str]) -> bool:
+    return formato == "arrow" or (formato is None and TIPO_MEDIO_ARROW in r.headers.get("accept", ""))
+
+def respuesta_arrow(tabla: pa.Table) -> Response:
+    salida = io.BytesIO()
+    with pa.ipc.new_stream(salida, tabla.schema) as escritor: escritor.write_table(tabla)
+    return Response(salida.getvalue(), media_type=TIPO_MEDIO_ARROW)
+
+def sin_vectores(fila: Dict) -> Dict:
+    return {clave: valor for clave, valor in fila.items() if not clave.startswith(PREFIJOS_COLUMNAS_VECTOR)}
+
+@router_api_v1.get("/search")
+async def api_v1_search(r: Request, q: str, k: int = Query(config.NUM_FRAGMENTOS_A_RECUPERAR_LANCEDB, ge=1, le=config.MAX_K_API), dependencia: Optional[str] = None,
+                        tipo: Optional[str] = None, desde: Optional[str] = None, hasta: Optional[str] = None,
+                        formato: Optional[str] = None, incluir_vectores: bool = False):
+    filtros = {"dependencia": dependencia, "tipo": tipo, "desde": desde, "hasta": hasta}
+    with traza_activa("api_search", pregunta=q[:200]): resultados = await buscar_en_lancedb_web_async(q, k=k, filtros=filtros)
+    if not incluir_vectores: resultados = [sin_vectores(fila) for fila in resultados]
+    if quiere_arrow(r, formato): return respuesta_arrow(pa.Table.from_pylist(resultados))
+    return {"pregunta": q, "k": k, "filtros": {c: v for c, v in filtros.items() if v}, "num_resultados": len(resultados), "resultados": resultados}
+
+@router_api_v1.post("/search")
+def api_v1_search_lote(r: Request, solicitud: SolicitudBusquedaV1, formato: Optional[str] = None):
+    # Búsqueda en lote (una fila por fragmento, con consulta_idx y rango). 'def': corre en el pool de hilos de FastAPI.
+    with traza_activa("api_search_lote", num_preguntas=len(solicitud.preguntas)):
+        tabla = buscar_en_lancedb_lote_web(solicitud.preguntas, k=solicitud.k, filtros=solicitud.filtros)
+    if quiere_arrow(r, formato): return respuesta_arrow(tabla)
+    return {"num_preguntas": len(solicitud.preguntas), "num_resultados": tabla.num_rows, "resultados": tabla.to_pylist()}
+
+@router_api_v1.post("/rag")
+async def api_v1_rag(solicitud: SolicitudRagV1):
+    if not config.GROQ_API_KEY: return RespuestaJSON(status_code=503, content={"error": "GROQ_API_KEY no está configurada."})
+    # Prioridad 'api' en la cola de admisión: cede el paso al chat y tiene un plazo más largo
+    try:
+        respuesta, fragmentos, prompt, tokens_prompt, tiempos, estado = await realizar_rag_completo_web_async(solicitud.pregunta, filtros=solicitud.filtros, prioridad="api")
+    except SaturacionGroq as e_saturacion:
+        return RespuestaJSON(status_code=e_saturacion.estado, content={"error": e_saturacion.motivo, "reintentar_en": e_saturacion.segundos_reintento()},
+                             headers=e_saturacion.encabezados())
+    cuerpo = dict({"pregunta": solicitud.pregunta, "respuesta": respuesta, "tokens_prompt": tokens_prompt, "tiempos_etapas": tiempos,
+                   "fragmentos": [sin_vectores(fila) for fila in fragmentos]}, **estado)
+    if solicitud.incluir_prompt: cuerpo["prompt"] = prompt
+    if estado["degradada"]: return RespuestaJSON(cuerpo, headers={"Retry-After": str(estado["reintentar_en"])})
+    return cuerpo
+
+@router_api_v1.get("/documents")
+def api_v1_documents(coleccion: str = "completo", page: int = 1, size: int = config.TAMANO_PAGINA_CATALOGO, orden: str = "nombre",
+                     prefijo: Optional[str] = None, desde: Optional[str] = None, hasta: Optional[str] = None, cursor: Optional[str] = None):
+    try:
+        return listar_documentos_web(coleccion, page, size, orden, prefijo, desde, hasta, json.loads(cursor) if cursor else None)
+    except (ValueError, TypeError) as e:
+        return RespuestaJSON(status_code=400, content={"error": str(e)})
+
+def responder_documento(r: Request, tipo: str, coleccion: str, nombre: str, incluir_contenido: bool):
+    # Metadatos del catálogo y contenido desde su desplazamiento, con la misma ETag que /raw (304 si no cambió)
+    documento = ubicar_documento_web(tipo, nombre)
+    if documento is None: return RespuestaJSON(status_code=404, content={"error": f"No existe '{nombre}'."})
+    encabezados = encabezados_cache(documento, etag_documento(documento, "-json" if incluir_contenido else "-meta"))
+    if no_modificado(r, documento): return Response(status_code=304, headers=encabezados)
+    cuerpo = dict(obtener_documento(conexion_catalogo(), coleccion, nombre) or {"nombre": nombre}, coleccion=coleccion,
+                  tamano_contenido_bytes=documento["tamano_bytes"] - documento["desplazamiento_contenido"],
+                  url_texto=str(r.url_for("raw_document", type=tipo, filename=nombre)))
+    if incluir_contenido: cuerpo["contenido"] = leer_contenido_documento(documento, documento["tamano_bytes"])[0]
+    return RespuestaJSON(cuerpo, headers=encabezados)
+
+@router_api_v1.get("/documents/{id}")
+def api_v1_document(r: Request, id: str, incluir_contenido: bool = True):
+    # id: nombre del archivo en la carpeta de documentos completos (con o sin .txt)
+    return responder_documento(r, "full", "completo", id if id.endswith(".txt") else id + ".txt", incluir_contenido)
+
+@router_api_v1.get("/summaries/{id}")
+def api_v1_summary(r: Request, id: str, incluir_contenido: bool = True):
+    # id: nombre del resumen ('..._resumen.txt') o del documento original al que resume (con o sin .txt)
+    nombre = id if id.endswith(".txt") else id + ".txt"
+    if not nombre.endswith("_resumen.txt"): nombre = nombre_resumen_de_original(nombre)
+    return responder_documento(r, "summary", "resumen", nombre, incluir_contenido)
+"""
+        create_file_with_content(api_path, api_v1_content, overwrite_if_exists=False)
+
+    cc_path = os.path.join(CORE_DIR, "cache_compartida.py")
+    if not os.path.exists(cc_path):
+        cache_compartida_content = """# core/cache_compartida.py (Creado por setup)
+# Caché compartida por todos los workers de uvicorn (--workers N) y que sobrevive a reinicios: un archivo SQLite en
+# modo WAL con una conexión por hilo en cada proceso. Guarda embeddings de preguntas y respuestas RAG completas con
+# caducidad, así lo que calcula un worker lo aprovechan los demás. Las funciones bloquean (de microsegundos a pocos
+# milisegundos): desde el event loop se llaman con asyncio.to_thread o en el pool de LanceDB.
+# También guarda las cuotas por minuto de APIs externas (Groq), para que todos los workers respeten un solo límite.
+from . import config
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Optional, Tuple
+from .trazas import registrar_acceso_cache
+
+SENTENCIAS_ESQUEMA_CACHE = (
+    "CREATE TABLE IF NOT EXISTS entradas (espacio TEXT NOT NULL, clave BLOB NOT NULL, valor BLOB NOT NULL, "
+    "expira REAL NOT NULL, PRIMARY KEY (espacio, clave)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS idx_entradas_expira ON entradas(expira)",
+    "CREATE TABLE IF NOT EXISTS cuotas (nombre TEXT PRIMARY KEY, inicio_minuto REAL NOT NULL, solicitudes INTEGER NOT NULL, tokens INTEGER NOT NULL)",
+)
+ESCRITURAS_ENTRE_PURGAS = 500 # Cada tantas escrituras de un proceso se borran las entradas caducadas
+_local = threading.local()
+_escrituras = [0]
+
+def conexion_cache() -> sqlite3.Connection:
+    # Autocommit (isolation_level=None): cada escritura es su propia transacción corta y no retiene el bloqueo de WAL
+    conexion = getattr(_local, "conexion", None)
+    if conexion is None:
+        conexion = sqlite3.connect(config.ARCHIVO_CACHE_COMPARTIDA, timeout=config.TIMEOUT_CACHE_COMPARTIDA_SEGUNDOS, isolation_level=None)
+        conexion.execute("PRAGMA journal_mode=WAL"); conexion.execute("PRAGMA synchronous=NORMAL")
+        for sentencia in SENTENCIAS_ESQUEMA_CACHE: conexion.execute(sentencia)
+        _local.conexion = conexion
+    return conexion
+
+def clave_hash(clave: str) -> bytes:
+    return hashlib.blake2b(clave.encode("utf-8"), digest_size=16).digest()
+
+def leer_cache(espacio: str, clave: str) -> Optional[bytes]:
+    if not config.USAR_CACHE_COMPARTIDA: return None
+    try:
+        fila = conexion_cache().execute("SELECT valor FROM entradas WHERE espacio = ? AND clave = ? AND expira > ?",
+                                        (espacio, clave_hash(clave), time.time())).fetchone()
+    except sqlite3.Error as e_cache:
+        print(f"ADVERTENCIA_CACHE_COMPARTIDA: No se pudo leer '{espacio}': {e_cache}")
+        fila = None
+    registrar_acceso_cache(f"compartida_{espacio}", fila is not None)
+    return fila[0] if fila else None
+
+def guardar_en_cache(espacio: str, clave: str, valor: bytes, ttl_segundos: float):
+    if not config.USAR_CACHE_COMPARTIDA: return
+    try:
+        conexion_cache().execute("INSERT INTO entradas (espacio, clave, valor, expira) VALUES (?, ?, ?, ?) "
+                                 "ON CONFLICT(espacio, clave) DO UPDATE SET valor = excluded.valor, expira = excluded.expira",
+                                 (espacio, clave_hash(clave), valor, time.time() + ttl_segundos))
+        _escrituras[0] += 1
+        if _escrituras[0] % ESCRITURAS_ENTRE_PURGAS == 0: purgar_caducadas()
+    except sqlite3.Error as e_cache:
+        print(f"ADVERTENCIA_CACHE_COMPARTIDA: No se pudo guardar en '{espacio}': {e_cache}")
+
+def purgar_caducadas() -> int:
+    if not config.USAR_CACHE_COMPARTIDA: return 0
+    return conexion_cache().execute("DELETE FROM entradas WHERE expira <= ?", (time.time(),)).rowcount
+
+def leer_cuota(nombre: str) -> Tuple[float, int, int]:
+    # (inicio del minuto, solicitudes, tokens); un minuto ya vencido cuenta como uno nuevo que empieza ahora
+    ahora = time.time()
+    fila = conexion_cache().execute("SELECT inicio_minuto, solicitudes, tokens FROM cuotas WHERE nombre = ?", (nombre,)).fetchone()
+    return tuple(fila) if fila and ahora - fila[0] < 60 else (ahora, 0, 0)
+
+def reservar_cuota(nombre: str, tokens: int, limite_solicitudes: int, limite_tokens: int) -> Tuple[float, float]:
+    # Si la solicitud cabe en el minuto actual la registra y devuelve (0, inicio del minuto); si no, (segundos hasta el
+    # minuto siguiente, inicio del minuto). Una solicitud sola en un minuto vacío siempre pasa. BEGIN IMMEDIATE toma el
+    # bloqueo de escritura antes de leer: dos workers no pueden reservar el mismo hueco.
+    conexion = conexion_cache()
+    conexion.execute("BEGIN IMMEDIATE")
+    try:
+        inicio, solicitudes, usados = leer_cuota(nombre)
+        if solicitudes >= limite_solicitudes or ((solicitudes or usados) and usados + tokens > limite_tokens):
+            espera = max(0.1, 60.1 - (time.time() - inicio))
+        else:
+            espera = 0.0; solicitudes += 1; usados += tokens
+        conexion.execute("INSERT OR REPLACE INTO cuotas (nombre, inicio_minuto, solicitudes, tokens) VALUES (?, ?, ?, ?)",
+                         (nombre, inicio, solicitudes, usados))
+        conexion.execute("COMMIT")
+    except BaseException:
+        conexion.execute("ROLLBACK"); raise
+    return espera, inicio
+
+def ajustar_cuota(nombre: str, inicio_minuto: float, diferencia_tokens: int):
+    # Cambia lo reservado por lo consumido, solo si el minuto de la reserva sigue vigente
+    conexion_cache().execute("UPDATE cuotas SET tokens = MAX(0, tokens + ?) WHERE nombre = ? AND inicio_minuto = ?",
+                             (diferencia_tokens, nombre, inicio_minuto))
+
+def reiniciar_cuota(nombre: str):
+    # Tras un 429 de la API: el minuto vuelve a empezar vacío ahora
+    conexion_cache().execute("INSERT OR REPLACE INTO cuotas (nombre, inicio_minuto, solicitudes, tokens) VALUES (?, ?, 0, 0)", (nombre, time.time()))
+"""
+        create_file_with_content(cc_path, cache_compartida_content, overwrite_if_exists=False)
+
+    ar_path = os.path.join(CORE_DIR, "arranque.py")
+    if not os.path.exists(ar_path):
+        arranque_content = """# core/arranque.py (Creado por setup)
+# Calentamiento de cada worker en el lifespan de FastAPI: tablas LanceDB abiertas (y matriz int8 en RAM), modelo de
+# embeddings cargado en Ollama, codificación de tiktoken, reranker, una búsqueda vectorial y la conexión TLS con Groq.
+# Con CALENTAMIENTO_BLOQUEA_ARRANQUE, uvicorn no acepta conexiones en el worker hasta terminar; si no, lo hace en
+# segundo plano. /ready devuelve 200 solo cuando los pasos obligatorios salieron bien (y reintenta si fallaron).
+from . import config
+import os
+import time
+import asyncio
+import numpy as np
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+from .cache_compartida import purgar_caducadas
+from .lancedb_service import (abrir_tabla_fragmentos_web, abrir_tabla_resumenes_web, detectar_tipo_vector, cargar_matriz_int8, ejecutar_busqueda_vectorial,
+                              en_pool_lancedb, cliente_ollama_async)
+from .rag_service import calentar_conexion_groq, cliente_groq_rag
+from .reranker_service import cargar_reranker
+from rag_dof.tokenizador import configurar_cache_bpe, obtener_codificacion
+
+PASOS_OBLIGATORIOS = ("tabla_lancedb", "modelo_embedding", "tokenizador")
+TEXTO_CALENTAMIENTO = "Decreto por el que se reforman diversas disposiciones"
+estado_arranque: Dict = {"listo": False, "pid": os.getpid(), "en_curso": False, "inicio": None, "fin": None, "pasos": {}}
+_tarea_calentamiento: Dict[str, Optional[asyncio.Task]] = {"tarea": None}
+
+def preparar_tabla():
+    table = abrir_tabla_fragmentos_web()
+    if table is None: raise RuntimeError(f"Tabla '{config.LANCEDB_TABLE_NAME_DEFAULT}' no disponible en {config.LANCEDB_DIR}")
+    if detectar_tipo_vector(table) == "int8": cargar_matriz_int8(table)
+    abrir_tabla_resumenes_web() # Opcional: sin ella el contexto usa los _resumen.txt
+    return table
+
+async def calentar_modelo_embedding():
+    # Directo a Ollama (sin la caché compartida): lo que importa es que el modelo quede cargado en su memoria
+    response = await cliente_ollama_async.embeddings(model=config.MODELO_EMBEDDING_OLLAMA, prompt=TEXTO_CALENTAMIENTO)
+    if not response.get('embedding'): raise RuntimeError(f"Ollama no devolvió embedding con '{config.MODELO_EMBEDDING_OLLAMA}'")
+    return response['embedding']
+
+def calentar_tokenizador():
+    # Carga en memoria la tabla BPE de cache_tiktoken/ (la descarga solo si falta); a diferencia de contar_tokens, falla si no puede
+    return len(obtener_codificacion(config.ENCODING_TIKTOKEN_GENERACION).encode(TEXTO_CALENTAMIENTO))
+
+def calentar_reranker():
+    puntuar = cargar_reranker(config.MODO_RERANKING)
+    if puntuar is not None: puntuar(TEXTO_CALENTAMIENTO, [TEXTO_CALENTAMIENTO])
+
+async def ejecutar_paso(nombre: str, corrutina):
+    # Registra duración y error del paso; un paso que falla o excede SEGUNDOS_MAX_PASO_CALENTAMIENTO devuelve None
+    inicio = time.perf_counter()
+    try:
+        resultado = await asyncio.wait_for(corrutina, config.SEGUNDOS_MAX_PASO_CALENTAMIENTO)
+        estado_arranque["pasos"][nombre] = {"ok": True, "ms": round((time.perf_counter() - inicio) * 1000, 1)}
+        return resultado
+    except Exception as e_paso:
+        error = f"{type(e_paso).__name__}: {e_paso}"
+        estado_arranque["pasos"][nombre] = {"ok": False, "ms": round((time.perf_counter() - inicio) * 1000, 1), "error": error}
+        print(f"ADVERTENCIA_ARRANQUE: Paso '{nombre}' falló en el worker {os.getpid()}: {error}")
+        return None
+
+async def calentar_servicios() -> Dict:
+    estado_arranque.update(en_curso=True, inicio=time.time(), pasos={})
+    pasos = [ejecutar_paso("tabla_lancedb", en_pool_lancedb(preparar_tabla)),
+             ejecutar_paso("modelo_embedding", calentar_modelo_embedding()),
+             ejecutar_paso("tokenizador", asyncio.to_thread(calentar_tokenizador)),
+             ejecutar_paso("reranker", asyncio.to_thread(calentar_reranker)),
+             ejecutar_paso("cache_compartida", asyncio.to_thread(purgar_caducadas))]
+    if cliente_groq_rag: pasos.append(ejecutar_paso("conexion_groq", calentar_conexion_groq()))
+    table, embedding, *_ = await asyncio.gather(*pasos)
+    if table is not None and embedding is not None:
+        # Primera consulta real: carga el índice ANN (o las columnas) en la caché de páginas
+        vector = np.asarray(embedding, dtype=np.float32)
+        await ejecutar_paso("busqueda_vectorial", en_pool_lancedb(ejecutar_busqueda_vectorial, table, vector, 1, config.CONFIG_BUSQUEDA_LANCEDB))
+    estado_arranque.update(listo=all(estado_arranque["pasos"].get(p, {}).get("ok") for p in PASOS_OBLIGATORIOS), en_curso=False, fin=time.time())
+    print(f"INFO_ARRANQUE: Worker {os.getpid()} {'listo' if estado_arranque['listo'] else 'NO listo'} en "
+          f"{estado_arranque['fin'] - estado_arranque['inicio']:.1f}s: " + ", ".join(f"{n}={p['ms']:.0f}ms{'' if p['ok'] else ' (falló)'}" for n, p in estado_arranque["pasos"].items()))
+    return estado_arranque
+
+def lanzar_calentamiento():
+    tarea = _tarea_calentamiento["tarea"]
+    if tarea is None or tarea.done(): _tarea_calentamiento["tarea"] = asyncio.create_task(calentar_servicios())
+
+async def comprobar_preparacion() -> Tuple[bool, Dict]:
+    # Para /ready. Si el calentamiento falló (p. ej. Ollama aún no arrancaba), lo reintenta en segundo plano pasados
+    # SEGUNDOS_ENTRE_REINTENTOS_CALENTAMIENTO; la respuesta no espera al reintento.
+    if (not estado_arranque["listo"] and not estado_arranque["en_curso"] and estado_arranque["fin"] is not None
+            and time.time() - estado_arranque["fin"] >= config.SEGUNDOS_ENTRE_REINTENTOS_CALENTAMIENTO):
+        lanzar_calentamiento()
+    return estado_arranque["listo"], estado_arranque
+
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    # lifespan de FastAPI: corre una vez por worker antes de atender solicitudes
+    configurar_cache_bpe(config.DIRECTORIO_CACHE_TIKTOKEN)
+    if config.CALENTAMIENTO_BLOQUEA_ARRANQUE: await calentar_servicios()
+    else: estado_arranque["en_curso"] = True; lanzar_calentamiento()
+    yield
+    tarea = _tarea_calentamiento["tarea"]
+    if tarea is not None and not tarea.done(): tarea.cancel()
+"""
+        create_file_with_content(ar_path, arranque_content, overwrite_if_exists=False)
+
+    ad_path = os.path.join(CORE_DIR, "admision.py")
+    if not os.path.exists(ad_path):
+        admision_content = """# core/admision.py (Creado por setup)
+# Control de admisión delante de la cuota RPM/TPM de Groq. Cada solicitud que va a generar estima su costo en tokens
+# (prompt + respuesta máxima) y espera su turno en una cola de prioridad acotada, con plazo, en lugar de dormir por su
+# cuenta. Si la cola está llena (429) o la espera estimada excede el plazo de su prioridad (503) se rechaza al momento
+# con Retry-After; con DEGRADAR_A_SOLO_RECUPERACION se responde con los fragmentos recuperados, sin generación.
+# La cuota del minuto vive en la caché compartida (SQLite): los workers la respetan juntos; la cola es de cada worker.
+# Toda lectura o escritura de la cuota va a un hilo (asyncio.to_thread): reservar toma BEGIN IMMEDIATE y, con varios
+# workers compitiendo por el archivo, puede esperar hasta TIMEOUT_CACHE_COMPARTIDA_SEGUNDOS sin detener el event loop.
+from . import config
+import math
+import time
+import heapq
+import asyncio
+import sqlite3
+import itertools
+from typing import Dict, List, Optional, Set
+from .cache_compartida import leer_cuota, reservar_cuota, ajustar_cuota, reiniciar_cuota
+from .trazas import observar_latencia
+from rag_dof.limites import segundos_hasta_cuota, estado_rechazo_admision
+
+NOMBRE_CUOTA_GROQ = "groq"
+PRIORIDADES_ADMISION = {"interactiva": 0, "api": 1} # Menor número, antes en la cola: el chat y el streaming pasan delante de la API
+INTERVALO_REVISION_COLA_SEGUNDOS = 2.0 # Otros workers pueden liberar cuota: la cabeza de la cola se reintenta al menos así de seguido
+PESO_PROMEDIO_TOKENS_PROMPT = 0.2 # Media móvil exponencial de los tokens reales de los prompts
+MENSAJE_SOLO_RECUPERACION = ("La generación de respuestas está saturada en este momento (reintenta en {segundos} s). "
+                             "Se muestran los fragmentos más relevantes encontrados para tu pregunta.")
+_tokens_prompt_promedio = [float(config.MAX_CONTEXTO_TOTAL_PARA_GENERACION)]
+
+class SaturacionGroq(Exception):
+    # Rechazo de admisión: estado HTTP (429 cola llena, 503 espera mayor que el plazo) y segundos sugeridos para reintentar
+    def __init__(self, estado: int, reintentar_en: float, motivo: str):
+        super().__init__(motivo)
+        self.estado, self.reintentar_en, self.motivo = estado, reintentar_en, motivo
+
+    def segundos_reintento(self) -> int:
+        return max(1, math.ceil(self.reintentar_en))
+
+    def encabezados(self) -> Dict[str, str]:
+        return {"Retry-After": str(self.segundos_reintento())}
+
+    def mensaje_degradado(self) -> str:
+        return MENSAJE_SOLO_RECUPERACION.format(segundos=self.segundos_reintento())
+
+def registrar_tokens_prompt(tokens_prompt: int):
+    _tokens_prompt_promedio[0] += PESO_PROMEDIO_TOKENS_PROMPT * (tokens_prompt - _tokens_prompt_promedio[0])
+
+def costo_estimado(tokens_prompt: Optional[int] = None) -> int:
+    # Antes de recuperar el contexto aún no se conoce el prompt: se usa el promedio de los últimos
+    return int(tokens_prompt if tokens_prompt is not None else _tokens_prompt_promedio[0]) + config.MAX_COMPLETION_TOKENS_GENERACION
+
+class ColaAdmisionGroq:
+    def __init__(self):
+        self._cola: List[list] = [] # heap de [prioridad, orden de llegada, tokens, futuro]; las canceladas se descartan al llegar a la cabeza
+        self._orden = itertools.count()
+        self._temporizador: Optional[asyncio.TimerHandle] = None
+        self._tarea_despacho: Optional[asyncio.Task] = None
+        self._despacho_pedido = False
+        self._tareas_ajuste: Set[asyncio.Task] = set()
+
+    def pendientes(self) -> int:
+        return sum(1 for entrada in self._cola if not entrada[3].done())
+
+    async def estimar_espera(self, tokens: int, prioridad: str) -> float:
+        # Segundos hasta que una solicitud de 'tokens' con esta prioridad obtendría cuota: lo usado en el minuto actual
+        # (por todos los workers) más lo que piden las que esperan delante (igual o mayor prioridad); ver rag_dof/limites.py.
+        inicio, solicitudes, usados = await asyncio.to_thread(leer_cuota, NOMBRE_CUOTA_GROQ)
+        delante = [e[2] for e in self._cola if e[0] <= PRIORIDADES_ADMISION[prioridad] and not e[3].done()]
+        return segundos_hasta_cuota(inicio, solicitudes, usados, delante, tokens,
+                                    config.LIMITE_SOLICITUDES_POR_MINUTO_GROQ, config.LIMITE_TOKENS_POR_MINUTO_PROCESADOS_GROQ)
+
+    async def comprobar(self, tokens: int, prioridad: str, segundos_disponibles: Optional[float] = None):
+        # Rechazo rápido, sin encolar: lanza SaturacionGroq si no hay lugar o no se alcanzaría a atender dentro del plazo
+        # (el de la prioridad completo o, ya en curso la solicitud, lo que le queda)
+        espera = await self.estimar_espera(tokens, prioridad)
+        plazo = config.PLAZO_MAX_ESPERA_GROQ_SEGUNDOS[prioridad] if segundos_disponibles is None else round(segundos_disponibles)
+        estado = estado_rechazo_admision(self.pendientes(), config.MAX_SOLICITUDES_EN_COLA_GROQ, espera, plazo)
+        if estado == 429:
+            raise SaturacionGroq(429, espera, f"Cola de generación llena ({config.MAX_SOLICITUDES_EN_COLA_GROQ} solicitudes).")
+        if estado == 503:
+            raise SaturacionGroq(503, espera, f"Espera estimada para generar ({espera:.0f} s) mayor que el plazo ({plazo} s).")
+
+    async def esperar_turno(self, tokens: int, prioridad: str, plazo: Optional[float] = None) -> float:
+        # Encola y espera hasta que la cuota alcance, en orden de prioridad y de llegada. Devuelve el inicio del minuto
+        # en que quedó reservada. plazo: instante (time.monotonic) tras el cual se rinde con SaturacionGroq; None, sin plazo.
+        # Con plazo se vuelve a comprobar al encolar: entre la precomprobación y aquí pudieron llegar otras solicitudes.
+        inicio_espera = time.monotonic()
+        if plazo is not None: await self.comprobar(tokens, prioridad, plazo - inicio_espera)
+        futuro = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._cola, [PRIORIDADES_ADMISION[prioridad], next(self._orden), tokens, futuro])
+        self._programar_despacho()
         try:
-            print(f"INFO_RAG_GROQ: Enviando a Groq (intento {intento+1}), tokens: {tokens_prompt}")
-            stream = cliente_groq_rag.chat.completions.create(model=config.MODELO_GENERACION_GROQ, messages=[{"role": "user", "content": prompt_completo_para_llm}], temperature=config.TEMPERATURE_GENERACION, max_tokens=config.MAX_COMPLETION_TOKENS_GENERACION, stream=True)
-            resp_completa = "".join(c.choices[0].delta.content or "" for c in stream)
-            resp_limpia = resp_completa.strip()
-            tokens_resp = obtener_conteo_tokens_tiktoken(resp_limpia) if resp_limpia else 0
-            solicitudes_en_minuto_actual_groq+=1; tokens_procesados_en_minuto_actual_groq+=tokens_prompt+tokens_resp
-            return resp_limpia if resp_limpia else "El modelo generó una respuesta vacía.", tokens_prompt
-        except Exception as e:
-            err_str=str(e).lower(); print(f"ERROR_RAG_GROQ (API intento {intento+1}): {e}")
-            if "rate limit" in err_str or "429" in err_str or "413" in err_str:
-                espera=60.1 if "429" in err_str else config.TIEMPO_ESPERA_REINTENTO_GROQ_SEGUNDOS*(intento+1); print(f" Rate limit. Esperando {espera:.1f}s..."); time.sleep(espera)
-                if "429" in err_str or "413" in err_str: solicitudes_en_minuto_actual_groq=0;tokens_procesados_en_minuto_actual_groq=0;inicio_minuto_actual_groq=time.time()
-            elif intento < config.MAX_API_REINTENTOS_GROQ-1: time.sleep(config.TIEMPO_ESPERA_REINTENTO_GROQ_SEGUNDOS)
-            else: return f"Error persistente con API Groq: {str(e)}", tokens_prompt
-    return "No se pudo obtener respuesta de Groq.", tokens_prompt
-
-def generar_respuesta_rag_web(pregunta_usuario: str, fragmentos_contexto: List[Dict[str, any]]) -> Tuple[str | None, int, str]:
-    if not cliente_groq_rag: return "Error: Cliente Groq no configurado.", 0, "Cliente Groq no configurado."
-    if not fragmentos_contexto: return "No se proporcionaron fragmentos.", 0, "Sin contexto."
-    contexto_str_parts = []
-    archivos_ya_con_resumen = set()
-    for frag in fragmentos_contexto:
-        orig_fn = frag.get('nombre_archivo_original')
-        if orig_fn and orig_fn not in archivos_ya_con_resumen:
-            resumen = get_summary_content_by_original_filename(orig_fn)
-            if resumen:
+            return await asyncio.wait_for(futuro, None if plazo is None else max(0.0, plazo - time.monotonic()))
+        except asyncio.TimeoutError:
+            raise SaturacionGroq(503, await self.estimar_espera(tokens, prioridad), "Se venció el plazo esperando cuota de Groq.") from None
+        finally:
+            observar_latencia("rag_espera_admision_segundos", "prioridad", prioridad, time.monotonic() - inicio_espera)
+
+    def _programar_despacho(self):
+        # Una sola tarea despacha a la vez; si ya corre, repasa la cola otra vez antes de terminar
+        self._despacho_pedido = True
+        if self._tarea_despacho is None or self._tarea_despacho.done():
+            self._tarea_despacho = asyncio.get_running_loop().create_task(self._despachar())
+
+    async def _despachar(self):
+        # Entrega cuota a la cabeza de la cola mientras quepa; si no cabe, reintenta al empezar el minuto siguiente (o
+        # antes, por si otro worker ajustó su reserva). Solo la cabeza: una solicitud grande no queda relegada por pequeñas.
+        while self._despacho_pedido:
+            self._despacho_pedido = False
+            while self._cola:
+                entrada = self._cola[0]
+                if entrada[3].done(): heapq.heappop(self._cola); continue
                 try:
-                    enc = tiktoken.get_encoding(config.ENCODING_TIKTOKEN_GENERACION); toks = enc.encode(resumen)
-                    res_final = enc.decode(toks[:config.MAX_TOKENS_POR_RESUMEN_EN_CONTEXTO]) if len(toks) > config.MAX_TOKENS_POR_RESUMEN_EN_CONTEXTO else resumen
-                    contexto_str_parts.append("Resumen del documento '{}':\\n{}".format(orig_fn, res_final))
-                    archivos_ya_con_resumen.add(orig_fn)
-                except Exception as e: print(f"ERR_SUM_PROC_WEB: {orig_fn} {e}")
-    if contexto_str_parts: contexto_str_parts.append("\\n--- Fragmentos Específicos ---")
-    for i, frag in enumerate(fragmentos_contexto):
-        txt = frag.get('texto','');
-        try:
-            enc=tiktoken.get_encoding(config.ENCODING_TIKTOKEN_GENERACION); toks=enc.encode(txt)
-            txt_final = enc.decode(toks[:config.MAX_TOKENS_POR_FRAGMENTO_EN_CONTEXTO]) if len(toks) > config.MAX_TOKENS_POR_FRAGMENTO_EN_CONTEXTO else txt
-            contexto_str_parts.append("Fragmento {} (de '{}', ID: {}):\\n{}".format(i+1, frag.get('nombre_archivo_original','N/A'), frag.get('id','N/A'), txt_final))
-        except Exception as e: print(f"ERR_FRAG_PROC_WEB: frag {i+1} {e}")
-    contexto_completo_str = "\\n\\n".join(contexto_str_parts)
-    prompt_sistema = ("Eres un asistente experto respondiendo sobre documentos del DOF de México. "
-                      "Basa tu respuesta ESTRICTAMENTE en la información de los resúmenes y fragmentos provistos. "
-                      "Si la info no está, di: 'La información específica no se encuentra en los documentos proporcionados.' "
-                      "No inventes. Cita el archivo original si es relevante, ej: '(según archivo.txt)'.")
-    prompt_final_para_llm = (prompt_sistema + "\\n\\nPREGUNTA DEL USUARIO:\\n" + pregunta_usuario + "\\n\\nCONTEXTO:\\n" + contexto_completo_str + "\\n\\nRESPUESTA:")
-    respuesta_llm, tokens_prompt = generar_respuesta_con_groq_directo(prompt_final_para_llm)
-    return respuesta_llm, tokens_prompt, prompt_final_para_llm
-
-def realizar_rag_completo_web(pregunta_usuario: str) -> Tuple[str | None, List[Dict], str, int]:
-    fragmentos = buscar_en_lancedb_web(pregunta_usuario, k=config.NUM_DOCUMENTOS_RELEVANTES_K_RAG)
-    if not fragmentos: return "No se encontraron fragmentos relevantes en LanceDB.", [], "", 0
-    respuesta_texto, tokens_del_prompt, prompt_completo_str = generar_respuesta_rag_web(pregunta_usuario, fragmentos)
-    return respuesta_texto, fragmentos, prompt_completo_str, tokens_del_prompt
+                    espera, inicio = await asyncio.to_thread(reservar_cuota, NOMBRE_CUOTA_GROQ, entrada[2], config.LIMITE_SOLICITUDES_POR_MINUTO_GROQ,
+                                                             config.LIMITE_TOKENS_POR_MINUTO_PROCESADOS_GROQ)
+                except sqlite3.Error as e_cuota: # Bloqueo prolongado del archivo: se reintenta sin perder la cola
+                    print(f"ADVERTENCIA_ADMISION: No se pudo reservar cuota: {e_cuota}"); espera = INTERVALO_REVISION_COLA_SEGUNDOS
+                if espera > 0:
+                    if self._temporizador is None:
+                        self._temporizador = asyncio.get_running_loop().call_later(min(espera, INTERVALO_REVISION_COLA_SEGUNDOS), self._despachar_por_tiempo)
+                    break
+                # Mientras se reservaba pudo entrar otra solicitud delante: se saca la entrada reservada, no la cabeza actual
+                self._cola.remove(entrada); heapq.heapify(self._cola)
+                if entrada[3].done(): # Venció su plazo durante la reserva: la cuota se devuelve
+                    self.devolver_cuota(inicio, entrada[2], 0)
+                else: entrada[3].set_result(inicio)
+
+    def _despachar_por_tiempo(self):
+        self._temporizador = None; self._programar_despacho()
+
+    def devolver_cuota(self, inicio_minuto: float, tokens_reservados: int, tokens_usados: int):
+        # Cambia la reserva por lo consumido en una tarea aparte, sin esperarla: se puede llamar desde un 'finally' de un
+        # generador que se cierra o se cancela (cliente desconectado). Si sobró, puede que ya quepa la siguiente.
+        async def ajustar():
+            try: await asyncio.to_thread(ajustar_cuota, NOMBRE_CUOTA_GROQ, inicio_minuto, tokens_usados - tokens_reservados)
+            except sqlite3.Error as e_cuota: print(f"ADVERTENCIA_ADMISION: No se pudo ajustar la cuota: {e_cuota}"); return
+            if tokens_usados < tokens_reservados: self._programar_despacho()
+        tarea = asyncio.get_running_loop().create_task(ajustar())
+        self._tareas_ajuste.add(tarea); tarea.add_done_callback(self._tareas_ajuste.discard)
+
+    async def reiniciar(self):
+        await asyncio.to_thread(reiniciar_cuota, NOMBRE_CUOTA_GROQ)
+
+def plazo_para(prioridad: str) -> float:
+    return time.monotonic() + config.PLAZO_MAX_ESPERA_GROQ_SEGUNDOS[prioridad]
+
+async def precomprobar_admision(prioridad: str) -> Optional[SaturacionGroq]:
+    # Antes de recuperar el contexto, con el costo estimado. Con DEGRADAR_A_SOLO_RECUPERACION devuelve la saturación
+    # (la solicitud seguirá sin llamar a Groq); si no, la lanza para responder 429/503 de inmediato.
+    try:
+        await cola_admision.comprobar(costo_estimado(), prioridad); return None
+    except SaturacionGroq as saturacion:
+        print(f"ADVERTENCIA_ADMISION: {saturacion.motivo} Reintentar en {saturacion.segundos_reintento()} s.")
+        if config.DEGRADAR_A_SOLO_RECUPERACION: return saturacion
+        raise
+
+class CuotaAdmision:
+    # Cuota de una respuesta para generar_respuesta_groq_stream (rag_dof/generacion.py): reserva prompt + respuesta máxima
+    # en la cola con la prioridad y el plazo de la solicitud, y al terminar cambia la reserva por los tokens consumidos.
+    def __init__(self, prioridad: str = "interactiva", plazo: Optional[float] = None):
+        self.prioridad, self.plazo = prioridad, plazo
+        self.tokens_reservados, self.inicio_minuto = 0, None
+
+    async def esperar_turno(self, tokens_prompt: int):
+        self.tokens_reservados = costo_estimado(tokens_prompt); registrar_tokens_prompt(tokens_prompt)
+        self.inicio_minuto = await cola_admision.esperar_turno(self.tokens_reservados, self.prioridad, self.plazo)
+
+    async def reiniciar(self):
+        # Tras un 429 ya se esperó un minuto: se vuelve a la cola sin plazo
+        self.inicio_minuto = None; await cola_admision.reiniciar()
+        self.inicio_minuto = await cola_admision.esperar_turno(self.tokens_reservados, self.prioridad)
+
+    def liquidar(self, tokens_usados: int):
+        if self.inicio_minuto is not None: # Sin turno obtenido no hay reserva que devolver
+            cola_admision.devolver_cuota(self.inicio_minuto, self.tokens_reservados, tokens_usados)
+
+cola_admision = ColaAdmisionGroq()
 """
-        create_file_with_content(rs_path, rag_service_content, overwrite_if_exists=False)
+        create_file_with_content(ad_path, admision_content, overwrite_if_exists=False)
+
+    pf_path = os.path.join(CORE_DIR, "perfilado.py")
+    if not os.path.exists(pf_path):
+        perfilado_content = """# core/perfilado.py (Creado por setup)
+# Perfilado opcional del servidor (python main.py --profile [cprofile|muestreo]) con el módulo de los scripts
+# (rag_dof/perfilado.py): así los puntos calientes de las funciones compartidas (tokenización, embeddings, búsqueda,
+# reranking) se miden con el mismo interruptor. 'cprofile' solo ve el hilo principal (el bucle de eventos); las rutas
+# síncronas corren en el threadpool de Starlette, así que para ellas conviene 'muestreo', que toma las pilas de todos los hilos.
+from rag_dof.perfilado import (MODOS_PERFILADO, agregar_argumentos_perfilado, punto_caliente, medir_punto_caliente,
+                               iniciar_perfilado, iniciar_perfilado_si_se_pide, reporte_puntos_calientes)
+"""
+        create_file_with_content(pf_path, perfilado_content, overwrite_if_exists=False)
 
     print("-" * 30 + "\n")
 
@@ -403,19 +1568,20 @@ def setup_html_templates():
     """
     create_file_with_content(os.path.join(TEMPLATES_DIR, "index.html"), index_html_content, overwrite_if_exists=False)
     explore_html_content = """
-    {% extends "base.html" %} {% block title %}Explorar Documentos{% endblock %} {% block content %} <h2>Explorar Documentos y Resúmenes</h2> <h3>Documentos Completos (de carpeta: '{{ dir_full_name }}')</h3> {% if full_docs %} <ul class="file-list"> {% for doc in full_docs %} <li><a href="{{ url_for('view_document_page', type='full', filename=doc) }}">{{ doc }}</a></li> {% endfor %} </ul> {% else %} <p class="error">No se encontraron documentos completos en la carpeta '{{ dir_full_name }}'. Verifica la ruta en <code>core/config.py</code> (variable <code>DECRETOS_COLECTADOS_DIR</code>) y asegúrate de que los archivos <code>.txt</code> existan allí. </p> {% endif %} <h3>Resúmenes (de carpeta: '{{ dir_summaries_name }}')</h3> {% if summaries %} <ul class="file-list"> {% for summary_file in summaries %} <li><a href="{{ url_for('view_document_page', type='summary', filename=summary_file) }}">{{ summary_file }}</a></li> {% endfor %} </ul> {% else %} <p class="error">No se encontraron resúmenes en la carpeta '{{ dir_summaries_name }}'. Verifica la ruta en <code>core/config.py</code> (variable <code>RESUMENES_DIR</code>) y asegúrate de que los archivos <code>_resumen.txt</code> existan allí. </p> {% endif %} {% endblock %}
+    {% extends "base.html" %} {% block title %}Explorar Documentos{% endblock %} {% block content %} <h2>Explorar Documentos y Resúmenes</h2> <p> <a href="{{ url_for('explore_documents_page') }}?coleccion=completo" {% if filtros.coleccion == 'completo' %}class="active"{% endif %}>Documentos Completos ('{{ dir_full_name }}')</a> | <a href="{{ url_for('explore_documents_page') }}?coleccion=resumen" {% if filtros.coleccion == 'resumen' %}class="active"{% endif %}>Resúmenes ('{{ dir_summaries_name }}')</a> </p> <form method="get" action="{{ url_for('explore_documents_page') }}"> <input type="hidden" name="coleccion" value="{{ filtros.coleccion }}"> <input type="text" name="prefijo" value="{{ filtros.prefijo or '' }}" placeholder="Nombre de archivo empieza con... (p.ej. decreto_por_el_que)"> <div style="display:flex; gap:10px; align-items:center; flex-wrap:wrap; margin-bottom:12px;"> <label>Desde <input type="date" name="desde" value="{{ filtros.desde or '' }}"></label> <label>Hasta <input type="date" name="hasta" value="{{ filtros.hasta or '' }}"></label> <label>Orden <select name="orden"> {% for valor, etiqueta in [('nombre', 'Nombre (A-Z)'), ('-nombre', 'Nombre (Z-A)'), ('-fecha', 'Fecha (recientes primero)'), ('fecha', 'Fecha (antiguos primero)'), ('-modificado', 'Modificados recientemente')] %} <option value="{{ valor }}" {% if filtros.orden == valor %}selected{% endif %}>{{ etiqueta }}</option> {% endfor %} </select></label> <button type="submit">Filtrar</button> </div> </form> {% if error_catalogo %}<p class="error">{{ error_catalogo }}</p>{% endif %} {% if pagina and pagina.documentos %} <p class="metadata">{{ pagina.total }} documentos. Página {{ pagina.pagina }} de {{ pagina.total_paginas }}.</p> <ul class="file-list"> {% for doc in pagina.documentos %} <li><a href="{{ url_for('view_document_page', type='full' if pagina.coleccion == 'completo' else 'summary', filename=doc.nombre) }}">{{ doc.nombre }}</a> <div class="metadata">{% if doc.fecha_publicacion %}{{ doc.fecha_publicacion }} · {% endif %}{% if doc.codigo_dof %}código {{ doc.codigo_dof }} · {% endif %}{{ (doc.tamano_bytes / 1024) | round(1) }} KB</div> {% if doc.titulo %}<div>{{ doc.titulo | truncate(200) }}</div>{% endif %}</li> {% endfor %} </ul> <p> {% if pagina.pagina > 1 %}<a href="{{ url_for('explore_documents_page') }}?{{ consulta_filtros }}&page=1">« Primera</a> <a href="{{ url_for('explore_documents_page') }}?{{ consulta_filtros }}&page={{ pagina.pagina - 1 }}">‹ Anterior</a>{% endif %} {% if pagina.pagina < pagina.total_paginas %}<a href="{{ url_for('explore_documents_page') }}?{{ consulta_filtros }}&page={{ pagina.pagina + 1 }}">Siguiente ›</a> <a href="{{ url_for('explore_documents_page') }}?{{ consulta_filtros }}&page={{ pagina.total_paginas }}">Última »</a>{% endif %} </p> {% elif pagina %} <p class="error">No hay documentos {% if filtros.prefijo or filtros.desde or filtros.hasta %}que cumplan los filtros{% else %}en la carpeta '{{ dir_full_name if filtros.coleccion == 'completo' else dir_summaries_name }}'. Verifica <code>DECRETOS_COLECTADOS_DIR</code> y <code>RESUMENES_DIR</code> en <code>core/config.py</code>{% endif %}.</p> {% endif %} {% endblock %}
     """
     create_file_with_content(os.path.join(TEMPLATES_DIR, "explore_documents.html"), explore_html_content, overwrite_if_exists=False)
     view_doc_html_content = """
-    {% extends "base.html" %} {% block title %}Ver {{ doc_type_display }} - {{ filename }}{% endblock %} {% block content %} <h2>{{ doc_type_display }}: {{ filename }}</h2> <p><a href="{{ url_for('explore_documents_page') }}">« Volver a la lista de exploración</a></p> {% if content %} <div class="document-content"> <h3>Contenido del Archivo:</h3> <pre>{{ content }}</pre> </div> {% elif content is none and filename %} <p class="error">El archivo '{{ filename }}' fue encontrado, pero su contenido principal parece estar vacío o no se pudo leer. Verifica el archivo y la lógica de extracción de contenido.</p> {% else %} <p class="error">No se pudo cargar el contenido del documento '{{ filename }}'.</p> {% endif %} {% endblock %}
+    {% extends "base.html" %} {% block title %}Ver {{ doc_type_display }} - {{ filename }}{% endblock %} {% block content %} <h2>{{ doc_type_display }}: {{ filename }}</h2> <p><a href="{{ url_for('explore_documents_page') }}">« Volver a la lista de exploración</a>{% if url_contenido %} · <a href="{{ url_contenido }}">Texto plano</a>{% endif %}</p> {% if content %} <div class="document-content"> <h3>Contenido del Archivo:</h3> {% if truncado %}<p class="metadata">Se muestran los primeros {{ max_kb_vista }} KB de {{ tamano_contenido_kb }} KB. <a href="{{ url_contenido }}">Ver el documento completo</a>.</p>{% endif %} <pre>{{ content }}</pre> </div> {% elif content is none and filename %} <p class="error">El archivo '{{ filename }}' fue encontrado, pero su contenido principal parece estar vacío o no se pudo leer. Verifica el archivo y la lógica de extracción de contenido.</p> {% else %} <p class="error">No se pudo cargar el contenido del documento '{{ filename }}'.</p> {% endif %} {% endblock %}
     """
     create_file_with_content(os.path.join(TEMPLATES_DIR, "view_document.html"), view_doc_html_content, overwrite_if_exists=False)
     lancedb_query_html_content = """
-    {% extends "base.html" %} {% block title %}Consultar LanceDB{% endblock %} {% block content %} <h2>Consultar Base de Datos LanceDB (Embeddings)</h2> <p>Ingresa una pregunta para buscar fragmentos similares en LanceDB (tabla: '<strong>{{ lancedb_table_name }}</strong>').</p> <form method="post"> <textarea name="query_text_lancedb" rows="3" placeholder="Escribe tu pregunta para LanceDB...">{{ query_text_lancedb if query_text_lancedb else '' }}</textarea><br> <button type="submit">Buscar en LanceDB</button> </form> {% if error_lancedb %} <p class="error">Error en LanceDB: {{ error_lancedb }}</p> {% endif %} {% if results_lancedb is defined %} <h3>Resultados ({{ results_lancedb|length }} fragmentos):</h3> {% if results_lancedb %} {% for result_item in results_lancedb %} <div class="result-box"> <h4>Fragmento {{ loop.index }}</h4> <p class="metadata"><strong>ID:</strong> {{ result_item.get('id', 'N/A') }}</p> <p class="metadata"><strong>Archivo Original:</strong> {{ result_item.get('nombre_archivo_original', 'N/A') }}</p> <p class="metadata"><strong>Distancia:</strong> {{ "%.4f"|format(result_item.get('_distance', -1.0)) }}</p> <pre>{{ result_item.get('texto', '')[:500] }}{% if result_item.get('texto', '')|length > 500 %}...{% endif %}</pre> </div> {% endfor %} {% elif query_text_lancedb %} <p>No se encontraron resultados.</p> {% endif %} {% endif %} {% endblock %}
+    {% extends "base.html" %} {% block title %}Consultar LanceDB{% endblock %} {% block content %} <h2>Consultar Base de Datos LanceDB (Embeddings)</h2> <p>Ingresa una pregunta para buscar fragmentos similares en LanceDB (tabla: '<strong>{{ lancedb_table_name }}</strong>').</p> <form method="post"> <textarea name="query_text_lancedb" rows="3" placeholder="Escribe tu pregunta para LanceDB...">{{ query_text_lancedb if query_text_lancedb else '' }}</textarea><br> <div class="filtros"> <input type="text" name="dependencia" placeholder="Dependencia (siglas, ej. SHCP)" value="{{ filtros.dependencia if filtros and filtros.dependencia else '' }}"> <input type="text" name="tipo" placeholder="Tipo (ej. decreto)" value="{{ filtros.tipo if filtros and filtros.tipo else '' }}"> <input type="text" name="desde" placeholder="Desde (AAAA-MM-DD)" value="{{ filtros.desde if filtros and filtros.desde else '' }}"> <input type="text" name="hasta" placeholder="Hasta (AAAA-MM-DD)" value="{{ filtros.hasta if filtros and filtros.hasta else '' }}"> </div> <button type="submit">Buscar en LanceDB</button> </form> {% if error_lancedb %} <p class="error">Error en LanceDB: {{ error_lancedb }}</p> {% endif %} {% if results_lancedb is defined %} <h3>Resultados ({{ results_lancedb|length }} fragmentos):</h3> {% if results_lancedb %} {% for result_item in results_lancedb %} <div class="result-box"> <h4>Fragmento {{ loop.index }}</h4> <p class="metadata"><strong>ID:</strong> {{ result_item.get('id', 'N/A') }}</p> <p class="metadata"><strong>Archivo Original:</strong> {{ result_item.get('nombre_archivo_original', 'N/A') }}</p> <p class="metadata"><strong>Distancia:</strong> {{ "%.4f"|format(result_item.get('_distance', -1.0)) }}</p> <pre>{{ result_item.get('texto', '')[:500] }}{% if result_item.get('texto', '')|length > 500 %}...{% endif %}</pre> </div> {% endfor %} {% elif query_text_lancedb %} <p>No se encontraron resultados.</p> {% endif %} {% endif %} {% endblock %}
     """
     create_file_with_content(os.path.join(TEMPLATES_DIR, "lancedb_query.html"), lancedb_query_html_content, overwrite_if_exists=False)
     rag_chat_html_content = """
-    {% extends "base.html" %} {% block title %}Chat RAG con Groq{% endblock %} {% block content %} <h2>Chat RAG (LanceDB + Groq)</h2> <p>Pregunta al sistema RAG (tabla '<strong>{{ lancedb_table_name }}</strong>', modelo Groq: <strong>{{ groq_model_name }}</strong>).</p> <form method="post"> <textarea name="query_text_rag" rows="4" placeholder="Escribe tu pregunta aquí...">{{ query_text_rag if query_text_rag else '' }}</textarea><br> <button type="submit">Enviar Pregunta RAG</button> </form> {% if error_rag %} <p class="error">Error RAG: {{ error_rag }}</p> {% endif %} {% if rag_response_text is defined and rag_response_text is not none %} <div class="result-box"> <h3>Respuesta del Asistente RAG:</h3> <pre>{{ rag_response_text }}</pre> </div> {% if prompt_sent_to_groq %} <div class="result-box"> <h4>Contexto Enviado a Groq (Depuración):</h4> <details> <summary>Mostrar/Ocultar Prompt (Tokens: {{ tokens_in_prompt_num }})</summary> <pre>{{ prompt_sent_to_groq }}</pre> </details> </div> {% endif %} {% if retrieved_fragments_list %} <div class="result-box"> <h4>Fragmentos Recuperados de LanceDB ({{ retrieved_fragments_list|length }}):</h4> {% for fragment_item in retrieved_fragments_list %} <div style="border-top: 1px solid #eee; padding-top:10px; margin-top:10px;"> <h5>Fragmento {{ loop.index }}</h5> <p class="metadata"><strong>ID:</strong> {{ fragment_item.get('id', 'N/A') }}</p> <p class="metadata"><strong>Archivo Original:</strong> {{ fragment_item.get('nombre_archivo_original', 'N/A') }}</p> <p class="metadata"><strong>Distancia:</strong> {{ "%.4f"|format(fragment_item.get('_distance', -1.0)) }}</p> <pre>{{ fragment_item.get('texto', '')[:300] }}{% if fragment_item.get('texto', '')|length > 300 %}...{% endif %}</pre> </div> {% endfor %} </div> {% endif %} {% elif query_text_rag and not error_rag %} <p>Procesando...</p> {% endif %} {% endblock %}
+    {% extends "base.html" %} {% block title %}Chat RAG con Groq{% endblock %} {% block content %} <h2>Chat RAG (LanceDB + Groq)</h2> <p>Pregunta al sistema RAG (tabla '<strong>{{ lancedb_table_name }}</strong>', modelo Groq: <strong>{{ groq_model_name }}</strong>).</p> <form method="post"> <textarea name="query_text_rag" rows="4" placeholder="Escribe tu pregunta aquí...">{{ query_text_rag if query_text_rag else '' }}</textarea><br> <div class="filtros"> <input type="text" name="dependencia" placeholder="Dependencia (siglas, ej. SHCP)" value="{{ filtros.dependencia if filtros and filtros.dependencia else '' }}"> <input type="text" name="tipo" placeholder="Tipo (ej. decreto)" value="{{ filtros.tipo if filtros and filtros.tipo else '' }}"> <input type="text" name="desde" placeholder="Desde (AAAA-MM-DD)" value="{{ filtros.desde if filtros and filtros.desde else '' }}"> <input type="text" name="hasta" placeholder="Hasta (AAAA-MM-DD)" value="{{ filtros.hasta if filtros and filtros.hasta else '' }}"> </div> <button type="submit">Enviar Pregunta RAG</button> <button type="button" id="btn-rag-stream">Respuesta en streaming</button> </form> <div class="result-box" id="rag-stream-box" style="display:none;"> <h3>Respuesta del Asistente RAG (streaming):</h3> <p class="metadata" id="rag-stream-estado"></p> <pre id="rag-stream-texto"></pre> </div> <script> document.getElementById('btn-rag-stream').addEventListener('click', function () { var f = this.form, params = new URLSearchParams({q: f.query_text_rag.value}); ['dependencia', 'tipo', 'desde', 'hasta'].forEach(function (c) { if (f[c].value) params.append(c, f[c].value); }); var texto = document.getElementById('rag-stream-texto'), estado = document.getElementById('rag-stream-estado'); document.getElementById('rag-stream-box').style.display = 'block'; texto.textContent = ''; estado.textContent = 'Recuperando fragmentos...'; var es = new EventSource('/api/rag/stream?' + params.toString()); es.addEventListener('fragmentos', function (e) { estado.textContent = JSON.parse(e.data).length + ' fragmento(s) recuperados. Generando...'; }); es.addEventListener('token', function (e) { texto.textContent += JSON.parse(e.data); }); es.addEventListener('fin', function (e) { var d = JSON.parse(e.data); estado.textContent = 'Primer token: ' + Math.round(d.primer_token_ms || 0) + ' ms; total: ' + Math.round(d.total_ms) + ' ms; tokens del prompt: ' + d.tokens_prompt; es.close(); }); es.addEventListener('error', function (e) { estado.textContent = e.data ? 'Error: ' + JSON.parse(e.data) : 'Conexión cerrada.'; es.close(); }); }); </script> {% if error_rag %} <p class="error">Error RAG: {{ error_rag }}</p> {% endif %} {% if rag_response_text is defined and rag_response_text is not none %} <div class="result-box"> <h3>Respuesta del Asistente RAG:</h3> <pre>{{ rag_response_text }}</pre> </div> {% if tiempos_etapas %} <div class="result-box"> <h4>Tiempos por Etapa (ms; * = ruta crítica):</h4> <pre>{% for t in tiempos_etapas %}{{ '*' if t.ruta_critica else ' ' }} {{ "%-24s"|format(t.etapa) }} {{ "%8.0f"|format(t.inicio_ms) }} {{ "%8.0f"|format(t.fin_ms) }} {{ "%8.0f"|format(t.duracion_ms) }}
+{% endfor %}</pre> </div> {% endif %} {% if prompt_sent_to_groq %} <div class="result-box"> <h4>Contexto Enviado a Groq (Depuración):</h4> <details> <summary>Mostrar/Ocultar Prompt (Tokens: {{ tokens_in_prompt_num }})</summary> <pre>{{ prompt_sent_to_groq }}</pre> </details> </div> {% endif %} {% if retrieved_fragments_list %} <div class="result-box"> <h4>Fragmentos Recuperados de LanceDB ({{ retrieved_fragments_list|length }}):</h4> {% for fragment_item in retrieved_fragments_list %} <div style="border-top: 1px solid #eee; padding-top:10px; margin-top:10px;"> <h5>Fragmento {{ loop.index }}</h5> <p class="metadata"><strong>ID:</strong> {{ fragment_item.get('id', 'N/A') }}</p> <p class="metadata"><strong>Archivo Original:</strong> {{ fragment_item.get('nombre_archivo_original', 'N/A') }}</p> <p class="metadata"><strong>Distancia:</strong> {{ "%.4f"|format(fragment_item.get('_distance', -1.0)) }}</p> <pre>{{ fragment_item.get('texto', '')[:300] }}{% if fragment_item.get('texto', '')|length > 300 %}...{% endif %}</pre> </div> {% endfor %} </div> {% endif %} {% elif query_text_rag and not error_rag %} <p>Procesando...</p> {% endif %} {% endblock %}
     """
     create_file_with_content(os.path.join(TEMPLATES_DIR, "rag_chat.html"), rag_chat_html_content, overwrite_if_exists=False)
     print("-" * 30 + "\n")
@@ -427,54 +1593,106 @@ def setup_main_app():
     main_py_lines = [
         "# main.py (SOBRESCRITO POR SETUP)",
         "from fastapi import FastAPI, Request, Form",
-        "from fastapi.responses import HTMLResponse",
+        "from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, PlainTextResponse, Response",
         "from fastapi.staticfiles import StaticFiles",
         "from fastapi.templating import Jinja2Templates",
-        "import os; import traceback",
+        "import os; import json; import time; import traceback",
+        "from urllib.parse import urlencode",
         "from typing import List, Dict, Optional, Tuple",
+        "from pydantic import BaseModel, Field",
         "",
         "try:",
         "    from core import config",
-        "    from core.file_operations import get_full_documents_list, get_summaries_list, get_full_document_content, get_summary_content_by_summary_filename",
-        "    from core.lancedb_service import buscar_en_lancedb_web",
-        "    from core.rag_service import realizar_rag_completo_web",
+        "    from core.catalogo import listar_documentos_web",
+        "    from core.entrega_documentos import (CompresionGzipSalvoDocumentos, ubicar_documento_web, etag_documento, encabezados_cache,",
+        "                                         no_modificado, leer_contenido_documento, responder_contenido_documento)",
+        "    from core.lancedb_service import buscar_en_lancedb_web_async, buscar_en_lancedb_lote_web",
+        "    from core.rag_service import realizar_rag_completo_web_async, realizar_rag_stream_web",
+        "    from core.trazas import traza_activa, observar_latencia, exportar_metricas_prometheus",
+        "    from core.api_v1 import router_api_v1, quiere_arrow, respuesta_arrow",
+        "    from core.arranque import ciclo_de_vida, comprobar_preparacion",
+        "    from core.admision import SaturacionGroq",
         "except ImportError as ie:",
         "    print(\"ERROR_CRITICAL_IMPORTS_MAIN: Fallo al importar de 'core'. {}\\n{}\".format(ie, traceback.format_exc()))",
         "    raise",
         "",
-        "app = FastAPI(title=\"Proyecto DOF RAG\", version=\"0.8.1\")",
+        "# lifespan: cada worker abre LanceDB y calienta Ollama, tiktoken, el reranker y Groq antes de atender (core/arranque.py)",
+        "app = FastAPI(title=\"Proyecto DOF RAG\", version=\"0.8.1\", lifespan=ciclo_de_vida)",
         "MAIN_DIR = os.path.dirname(os.path.abspath(__file__))",
         "templates = Jinja2Templates(directory=os.path.join(MAIN_DIR, \"templates\"))",
         "app.mount(\"/static\", StaticFiles(directory=os.path.join(MAIN_DIR, \"static\")), name=\"static_files\")",
+        "# gzip para HTML y JSON (no para SSE); /raw/ negocia br/gzip por su cuenta y sirve rangos sin comprimir",
+        "app.add_middleware(CompresionGzipSalvoDocumentos, minimum_size=config.MIN_BYTES_COMPRESION, compresslevel=config.NIVEL_COMPRESION_GZIP)",
+        "# API JSON/Arrow versionada para servicios internos: /api/v1/search, /api/v1/rag, /api/v1/documents/{id}, /api/v1/summaries/{id}",
+        "app.include_router(router_api_v1)",
+        "",
+        "@app.middleware(\"http\")",
+        "async def medir_latencia_http(r: Request, call_next):",
+        "    # Histograma por ruta (plantilla, no URL concreta). En respuestas SSE mide hasta el envío de los encabezados.",
+        "    inicio = time.perf_counter()",
+        "    respuesta = await call_next(r)",
+        "    ruta = getattr(r.scope.get(\"route\"), \"path\", \"sin_ruta\")",
+        "    if ruta != \"/metrics\": observar_latencia(\"rag_http_duracion_segundos\", \"ruta\", ruta, time.perf_counter() - inicio)",
+        "    return respuesta",
         "",
         "@app.get(\"/\", response_class=HTMLResponse, tags=[\"Interfaz\"])",
         "async def home(r: Request): return templates.TemplateResponse(\"index.html\", {\"request\": r})",
         "",
         "@app.get(\"/explore\", response_class=HTMLResponse, tags=[\"Interfaz\"])",
-        "async def explore_documents_page(r: Request):",
+        "def explore_documents_page(r: Request, page: int = 1, coleccion: str = \"completo\", orden: str = \"nombre\",",
+        "                           prefijo: Optional[str] = None, desde: Optional[str] = None, hasta: Optional[str] = None):",
+        "    # Una página del catálogo SQLite (core/catalogo.py) en lugar de listar y ordenar las carpetas en cada visita",
+        "    filtros = {\"coleccion\": coleccion, \"orden\": orden, \"prefijo\": prefijo, \"desde\": desde, \"hasta\": hasta}",
+        "    pagina, err = None, None",
+        "    try: pagina = listar_documentos_web(coleccion, page, config.TAMANO_PAGINA_CATALOGO, orden, prefijo, desde, hasta)",
+        "    except ValueError as e: err = str(e)",
+        "    nombres = [d[\"nombre\"] for d in pagina[\"documentos\"]] if pagina else []",
         "    return templates.TemplateResponse(\"explore_documents.html\", {",
-        "        \"request\": r, \"full_docs\": get_full_documents_list(), \"summaries\": get_summaries_list(),",
+        "        \"request\": r, \"pagina\": pagina, \"error_catalogo\": err, \"filtros\": filtros,",
+        "        \"consulta_filtros\": urlencode({k: v for k, v in filtros.items() if v}),",
+        "        \"full_docs\": nombres if coleccion == \"completo\" else [], \"summaries\": nombres if coleccion == \"resumen\" else [],",
         "        \"dir_full_name\": config.DECRETOS_DIR_NAME, \"dir_summaries_name\": config.RESUMENES_DIR_NAME",
         "    })",
         "",
         "@app.get(\"/view/{type}/{filename}\", response_class=HTMLResponse, tags=[\"Interfaz\"])",
-        "async def view_document_page(r: Request, type: str, filename: str):",
-        "    ct, dt = (get_full_document_content(filename), \"Documento Completo\") if type==\"full\" else \\",
-        "             (get_summary_content_by_summary_filename(filename), \"Resumen\") if type==\"summary\" else (None, \"Tipo Desconocido\")",
-        "    return templates.TemplateResponse(\"view_document.html\", {\"request\": r, \"filename\": filename, \"content\": ct, \"doc_type_display\": dt})",
+        "def view_document_page(r: Request, type: str, filename: str):",
+        "    # Lee desde el desplazamiento del contenido guardado en el catálogo y a lo más MAX_BYTES_VISTA_EN_LINEA; con ETag vigente responde 304 sin leer",
+        "    dt = {\"full\": \"Documento Completo\", \"summary\": \"Resumen\"}.get(type, \"Tipo Desconocido\")",
+        "    documento = ubicar_documento_web(type, filename)",
+        "    if documento is None:",
+        "        return templates.TemplateResponse(\"view_document.html\", {\"request\": r, \"filename\": filename, \"content\": \"\", \"doc_type_display\": dt}, status_code=404)",
+        "    encabezados = encabezados_cache(documento, etag_documento(documento, \"-html\"))",
+        "    if no_modificado(r, documento): return Response(status_code=304, headers=encabezados)",
+        "    ct, truncado = leer_contenido_documento(documento, config.MAX_BYTES_VISTA_EN_LINEA)",
+        "    respuesta = templates.TemplateResponse(\"view_document.html\", {",
+        "        \"request\": r, \"filename\": filename, \"content\": ct or None, \"doc_type_display\": dt, \"truncado\": truncado,",
+        "        \"url_contenido\": r.url_for(\"raw_document\", type=type, filename=filename),",
+        "        \"tamano_contenido_kb\": (documento[\"tamano_bytes\"] - documento[\"desplazamiento_contenido\"]) // 1024, \"max_kb_vista\": config.MAX_BYTES_VISTA_EN_LINEA // 1024",
+        "    })",
+        "    respuesta.headers.update(encabezados)",
+        "    return respuesta",
+        "",
+        "@app.api_route(\"/raw/{type}/{filename}\", methods=[\"GET\", \"HEAD\"], tags=[\"Interfaz\"])",
+        "def raw_document(r: Request, type: str, filename: str):",
+        "    # Texto plano del contenido por bloques desde disco: Range (bytes del contenido), ETag/Last-Modified (304) y br/gzip",
+        "    return responder_contenido_documento(r, type, filename)",
         "",
         "@app.get(\"/lancedb-query\", response_class=HTMLResponse, tags=[\"Funcionalidad\"])",
         "async def lancedb_query_page(r: Request):",
         "    return templates.TemplateResponse(\"lancedb_query.html\", {\"request\": r, \"lancedb_table_name\": config.LANCEDB_TABLE_NAME_DEFAULT})",
         "",
         "@app.post(\"/lancedb-query\", response_class=HTMLResponse, tags=[\"Funcionalidad\"])",
-        "async def handle_lancedb_query(r: Request, query_text_lancedb: str = Form(...)):",
+        "async def handle_lancedb_query(r: Request, query_text_lancedb: str = Form(...), dependencia: Optional[str] = Form(None),",
+        "                               tipo: Optional[str] = Form(None), desde: Optional[str] = Form(None), hasta: Optional[str] = Form(None)):",
         "    res, err = [], None",
-        "    try: res = buscar_en_lancedb_web(query_text_lancedb)",
+        "    filtros = {\"dependencia\": dependencia, \"tipo\": tipo, \"desde\": desde, \"hasta\": hasta}",
+        "    try:",
+        "        # Embedding con el cliente async de Ollama y búsqueda en el pool de LanceDB: el event loop queda libre",
+        "        with traza_activa(\"lancedb_query\", pregunta=query_text_lancedb[:200]): res = await buscar_en_lancedb_web_async(query_text_lancedb, filtros=filtros)",
         "    except Exception as e: err = str(e); print(\"ERR_LANCEDB_EP: {}\\n{}\".format(err, traceback.format_exc()))",
         "    return templates.TemplateResponse(\"lancedb_query.html\", {",
         "        \"request\": r, \"results_lancedb\": res, \"query_text_lancedb\": query_text_lancedb,",
-        "        \"error_lancedb\": err, \"lancedb_table_name\": config.LANCEDB_TABLE_NAME_DEFAULT",
+        "        \"error_lancedb\": err, \"lancedb_table_name\": config.LANCEDB_TABLE_NAME_DEFAULT, \"filtros\": filtros",
         "    })",
         "",
         "@app.get(\"/rag-chat\", response_class=HTMLResponse, tags=[\"Funcionalidad\"])",
@@ -485,25 +1703,109 @@ def setup_main_app():
         "    })",
         "",
         "@app.post(\"/rag-chat\", response_class=HTMLResponse, tags=[\"Funcionalidad\"])",
-        "async def handle_rag_chat(r: Request, query_text_rag: str = Form(...)):",
-        "    resp, frags, prompt, toks, err = None, [], \"\", 0, None",
+        "async def handle_rag_chat(r: Request, query_text_rag: str = Form(...), dependencia: Optional[str] = Form(None),",
+        "                          tipo: Optional[str] = Form(None), desde: Optional[str] = Form(None), hasta: Optional[str] = Form(None)):",
+        "    resp, frags, prompt, toks, tiempos, err, codigo, encabezados = None, [], \"\", 0, [], None, 200, {}",
+        "    filtros = {\"dependencia\": dependencia, \"tipo\": tipo, \"desde\": desde, \"hasta\": hasta}",
         "    if not config.GROQ_API_KEY: err = \"Error Crítico: GROQ_API_KEY no está configurada.\"",
         "    else:",
-        "        try: resp, frags, prompt, toks = realizar_rag_completo_web(query_text_rag)",
+        "        # Ollama y Groq con clientes async, LanceDB en su pool y la cuota de Groq en la cola de admisión: nada bloquea el event loop",
+        "        try:",
+        "            resp, frags, prompt, toks, tiempos, estado = await realizar_rag_completo_web_async(query_text_rag, filtros=filtros)",
+        "            if estado[\"degradada\"]: encabezados = {\"Retry-After\": str(estado[\"reintentar_en\"])}",
+        "        except SaturacionGroq as e: err, codigo, encabezados = \"{} Reintenta en {} s.\".format(e.motivo, e.segundos_reintento()), e.estado, e.encabezados()",
         "        except Exception as e: err = str(e); print(\"ERR_RAG_EP: {}\\n{}\".format(err, traceback.format_exc()))",
         "    return templates.TemplateResponse(\"rag_chat.html\", {",
         "        \"request\": r, \"rag_response_text\": resp, \"retrieved_fragments_list\": frags,",
-        "        \"prompt_sent_to_groq\": prompt, \"tokens_in_prompt_num\": toks,",
-        "        \"query_text_rag\": query_text_rag, \"error_rag\": err,",
+        "        \"prompt_sent_to_groq\": prompt, \"tokens_in_prompt_num\": toks, \"tiempos_etapas\": tiempos,",
+        "        \"query_text_rag\": query_text_rag, \"error_rag\": err, \"filtros\": filtros,",
         "        \"lancedb_table_name\": config.LANCEDB_TABLE_NAME_DEFAULT,",
         "        \"groq_model_name\": config.MODELO_GENERACION_GROQ",
-        "    })",
+        "    }, status_code=codigo, headers=encabezados)",
+        "",
+        "class SolicitudBusquedaLote(BaseModel):",
+        "    # Con tope: cada pregunta es un embedding y una búsqueda de k filas (422 si se excede)",
+        "    preguntas: List[str] = Field(max_length=config.MAX_PREGUNTAS_POR_LOTE_API)",
+        "    k: int = Field(config.NUM_FRAGMENTOS_A_RECUPERAR_LANCEDB, ge=1, le=config.MAX_K_API)",
+        "    filtros: Optional[Dict[str, str]] = None # dependencia, tipo, anio, desde, hasta, codigo",
+        "",
+        "@app.post(\"/api/search/batch\", tags=[\"API\"])",
+        "def api_search_batch(r: Request, solicitud: SolicitudBusquedaLote, formato: Optional[str] = None):",
+        "    # 'def' (no 'async def'): FastAPI lo ejecuta en su pool de hilos y no bloquea el event loop.",
+        "    # Con Accept: application/vnd.apache.arrow.stream (o ?formato=arrow) la tabla sale tal cual como flujo Arrow IPC.",
+        "    tabla = buscar_en_lancedb_lote_web(solicitud.preguntas, k=solicitud.k, filtros=solicitud.filtros)",
+        "    if quiere_arrow(r, formato): return respuesta_arrow(tabla)",
+        "    return {\"num_preguntas\": len(solicitud.preguntas), \"num_resultados\": tabla.num_rows, \"resultados\": tabla.to_pylist()}",
+        "",
+        "@app.get(\"/api/rag/stream\", tags=[\"API\"])",
+        "async def api_rag_stream(q: str, dependencia: Optional[str] = None, tipo: Optional[str] = None, desde: Optional[str] = None, hasta: Optional[str] = None):",
+        "    # Server-Sent Events: cada token de Groq se envía en cuanto llega ('fragmentos' -> 'token'* -> 'fin' | 'error').",
+        "    # Generador asíncrono: cada conexión abierta no ocupa un hilo del pool mientras espera a Groq.",
+        "    filtros = {\"dependencia\": dependencia, \"tipo\": tipo, \"desde\": desde, \"hasta\": hasta}",
+        "    async def eventos_sse(eventos, primero):",
+        "        try:",
+        "            yield \"event: {}\\ndata: {}\\n\\n\".format(primero[0], json.dumps(primero[1], ensure_ascii=False))",
+        "            async for evento, datos in eventos:",
+        "                yield \"event: {}\\ndata: {}\\n\\n\".format(evento, json.dumps(datos, ensure_ascii=False))",
+        "        except Exception as e:",
+        "            print(\"ERR_RAG_STREAM_EP: {}\\n{}\".format(e, traceback.format_exc()))",
+        "            yield \"event: error\\ndata: {}\\n\\n\".format(json.dumps(str(e), ensure_ascii=False))",
+        "    if not config.GROQ_API_KEY:",
+        "        return JSONResponse(status_code=503, content={\"error\": \"GROQ_API_KEY no está configurada.\"})",
+        "    # El primer evento se espera antes de abrir el stream: si la admisión rechaza la pregunta, responde 429/503 con Retry-After",
+        "    eventos = realizar_rag_stream_web(q, filtros=filtros)",
+        "    try: primero = await eventos.__anext__()",
+        "    except SaturacionGroq as e:",
+        "        return JSONResponse(status_code=e.estado, content={\"error\": e.motivo, \"reintentar_en\": e.segundos_reintento()}, headers=e.encabezados())",
+        "    return StreamingResponse(eventos_sse(eventos, primero), media_type=\"text/event-stream\", headers={\"Cache-Control\": \"no-cache\", \"X-Accel-Buffering\": \"no\"})",
+        "",
+        "@app.get(\"/api/documents\", tags=[\"API\"])",
+        "def api_documents(coleccion: str = \"completo\", page: int = 1, size: int = config.TAMANO_PAGINA_CATALOGO, orden: str = \"nombre\",",
+        "                  prefijo: Optional[str] = None, desde: Optional[str] = None, hasta: Optional[str] = None, cursor: Optional[str] = None):",
+        "    # 'cursor' es el 'siguiente_cursor' de la respuesta anterior: salta por el índice sin OFFSET, útil para recorrer todo el catálogo",
+        "    try:",
+        "        return listar_documentos_web(coleccion, page, size, orden, prefijo, desde, hasta, json.loads(cursor) if cursor else None)",
+        "    except (ValueError, TypeError) as e:",
+        "        return JSONResponse(status_code=400, content={\"error\": str(e)})",
+        "",
+        "@app.get(\"/health\", tags=[\"API\"])",
+        "async def health():",
+        "    # Liveness: el proceso responde, aunque aún no termine de calentar",
+        "    return {\"estado\": \"vivo\", \"pid\": os.getpid()}",
+        "",
+        "@app.get(\"/ready\", tags=[\"API\"])",
+        "async def ready():",
+        "    # Readiness: 200 solo cuando este worker abrió la tabla y calentó embeddings y tokenizador; si no, 503 con el detalle por paso",
+        "    listo, estado = await comprobar_preparacion()",
+        "    return JSONResponse(status_code=200 if listo else 503, content=estado)",
+        "",
+        "@app.get(\"/metrics\", response_class=PlainTextResponse, tags=[\"API\"])",
+        "async def metrics():",
+        "    # Formato de texto de Prometheus: latencias por etapa, por solicitud y por ruta HTTP; aciertos de cachés en memoria",
+        "    return PlainTextResponse(exportar_metricas_prometheus(), media_type=\"text/plain; version=0.0.4\")",
         "",
         "if __name__ == \"__main__\":",
+        "    import argparse",
         "    import uvicorn",
+        "    from core.perfilado import agregar_argumentos_perfilado, iniciar_perfilado_si_se_pide",
+        "    parser = agregar_argumentos_perfilado(argparse.ArgumentParser(description=\"Aplicación web DOF RAG\"))",
+        "    parser.add_argument(\"--produccion\", action=\"store_true\", help=\"Varios workers sin recarga automática (cada uno calienta sus servicios al arrancar)\")",
+        "    parser.add_argument(\"--workers\", type=int, default=config.NUM_WORKERS_PRODUCCION, help=\"Procesos con --produccion\")",
+        "    parser.add_argument(\"--host\", default=\"127.0.0.1\")",
+        "    parser.add_argument(\"--port\", type=int, default=8000)",
+        "    args_cli = parser.parse_args()",
         "    project_root_for_msg = PROJECT_ROOT if \"PROJECT_ROOT\" in globals() and PROJECT_ROOT else os.getcwd()",
-        "    print(\"INFO: Ejecuta 'uvicorn main:app --reload --host 127.0.0.1 --port 8000' desde {}\".format(project_root_for_msg))",
-        "    uvicorn.run(\"main:app\", host=\"127.0.0.1\", port=8000, reload=True)"
+        "    if iniciar_perfilado_si_se_pide(args_cli, __file__):",
+        "        # Con --profile el servidor corre en este proceso (sin recarga) para que el perfil vea las solicitudes; Ctrl+C escribe los archivos",
+        "        uvicorn.run(app, host=args_cli.host, port=args_cli.port, reload=False)",
+        "    elif args_cli.produccion:",
+        "        # Equivale a 'uvicorn main:app --workers N': los cachés en memoria son por worker; embeddings y respuestas se comparten por SQLite",
+        "        print(\"INFO: Modo producción con {} workers en http://{}:{} (readiness en /ready)\".format(args_cli.workers, args_cli.host, args_cli.port))",
+        "        uvicorn.run(\"main:app\", host=args_cli.host, port=args_cli.port, workers=args_cli.workers, reload=False)",
+        "    else:",
+        "        # Solo para desarrollo: un proceso que se reinicia al editar el código (y repite el calentamiento)",
+        "        print(\"INFO: Modo desarrollo con recarga automática desde {}. Para servir: python main.py --produccion\".format(project_root_for_msg))",
+        "        uvicorn.run(\"main:app\", host=args_cli.host, port=args_cli.port, reload=True)"
     ]
     create_file_with_content(os.path.join(PROJECT_ROOT, "main.py"), "\n".join(main_py_lines), is_critical_structure_file=True)
     print("-" * 30 + "\n")
@@ -531,7 +1833,7 @@ if __name__ == "__main__":
         "     `GROQ_API_KEY=tu_gsk_api_key_aqui`",
         "\n  B. DEPENDENCIAS:",
         "     En tu terminal (con entorno Conda activado):",
-        "     `pip install fastapi uvicorn jinja2 python-dotenv tiktoken groq lancedb ollama numpy python-multipart`",
+        "     `pip install fastapi uvicorn jinja2 python-dotenv tiktoken groq lancedb ollama numpy python-multipart orjson`",
 
         "\n  PASO 2: VERIFICACIÓN DEL CÓDIGO GENERADO EN `core/`",
         "  " + "-" * 59,
@@ -544,7 +1846,7 @@ if __name__ == "__main__":
         "\n  B. `core/lancedb_service.py` y `core/rag_service.py`:",
         "     - Estas funciones AHORA están implementadas directamente por el script de setup.",
         "     - Revisa la lógica interna si encuentras comportamientos inesperados, especialmente",
-        "       en `verificar_y_esperar_limites_groq` y `generar_respuesta_con_groq_directo` dentro de `core/rag_service.py`.",
+        "       en `core/admision.py` (cola y cuota de Groq) y en `rag_dof/generacion.py` (orquestador, prompt y streaming de Groq, los mismos de 009).",
         "       El objetivo es que funcionen directamente, pero la lógica de rate limiting y llamadas a API",
         "       puede necesitar ajustes finos basados en los límites reales de tu cuenta Groq y el comportamiento del modelo.",
 
@@ -552,14 +1854,15 @@ if __name__ == "__main__":
         "  " + "-" * 35,
         "  A. Activa tu entorno Conda.",
         "  B. Navega a la raíz del proyecto: `cd \"{}\"`".format(PROJECT_ROOT),
-        "  C. Ejecuta Uvicorn:",
-        "     `uvicorn main:app --reload --host 127.0.0.1 --port 8000`",
+        "  C. Arranca el servidor (varios workers, sin recarga; cada uno se calienta antes de aceptar conexiones):",
+        "     `python main.py --produccion --host 127.0.0.1 --port 8000`",
+        "     Solo mientras editas el código: `python main.py` (un proceso con recarga automática).",
 
         "\n  PASO 4: PROBAR Y DEPURAR",
         "  " + "-" * 26,
         "  A. Abre tu navegador web y ve a `http://127.0.0.1:8000`.",
         "  B. Prueba todas las secciones, especialmente el Chat RAG.",
-        "  C. OBSERVA LA CONSOLA de `uvicorn` para logs y errores.",
+        "  C. OBSERVA LA CONSOLA del servidor para logs y errores; `/ready` indica si cada worker terminó de calentarse.",
         "  D. Si hay errores, revisa la lógica en `core/` o los mensajes de error para pistas.",
         "\n  Con esta versión, la necesidad de adaptación manual post-setup debería ser mínima para el flujo principal.",
         "  El foco principal es asegurar que `config.py` y `.env` estén correctos y que Ollama esté disponible si lo usas.",
@@ -0,0 +1,30 @@
+import re
+import types
+import pytest
+from rag_dof import tokenizador
+
+# Las pruebas no descargan las tablas BPE de tiktoken: una codificación determinista reemplaza a la real. Como la de
+# tiktoken, cada token lleva pegados los espacios que lo preceden, así que decode(encode(t)[:n]) es un prefijo de t.
+PATRON_TOKEN_PRUEBA = re.compile(r'\s*\w+|\s*[^\w\s]|\s+')
+
+class CodificacionDePrueba:
+    def __init__(self, nombre: str):
+        self.name = nombre
+        self._ids, self._piezas = {}, []
+
+    def encode(self, texto: str, **_) -> list:
+        tokens = []
+        for pieza in PATRON_TOKEN_PRUEBA.findall(texto):
+            if pieza not in self._ids: self._ids[pieza] = len(self._piezas); self._piezas.append(pieza)
+            tokens.append(self._ids[pieza])
+        return tokens
+
+    def decode(self, tokens: list) -> str:
+        return "".join(self._piezas[t] for t in tokens)
+
+@pytest.fixture(autouse=True)
+def codificacion_sin_red(monkeypatch):
+    codificaciones = {}
+    obtener = lambda nombre: codificaciones.setdefault(nombre, CodificacionDePrueba(nombre))
+    monkeypatch.setattr(tokenizador, "tiktoken", types.SimpleNamespace(get_encoding=obtener))
+    monkeypatch.setattr(tokenizador, "_codificaciones", {})
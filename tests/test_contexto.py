@@ -0,0 +1,54 @@
+import pytest
+from rag_dof.contexto import empaquetar_contexto, unir_fragmentos_contiguos, MARGEN_TOKENS_EMPAQUETADO
+from rag_dof.fragmentacion import fragmentar_documento
+from rag_dof.tokenizador import contar_tokens
+
+def documento(numero: int, palabras: int = 3000) -> str:
+    return " ".join(f"disposicion{numero}_{i}" for i in range(palabras))
+
+def fragmentos_de(nombre: str, texto: str, con_traslape: bool = True):
+    filas = []
+    for indice, (fragmento, traslape) in enumerate(fragmentar_documento(texto, modo="tokens")):
+        fila = {"id": f"{nombre}_{indice}", "nombre_archivo_original": nombre, "indice_fragmento_en_doc": indice,
+                "texto": fragmento, "num_tokens": contar_tokens(fragmento)}
+        if con_traslape: fila["caracteres_traslape"] = traslape
+        filas.append(fila)
+    return filas
+
+def sin_espacios(texto: str) -> str:
+    return "".join(texto.split())
+
+@pytest.mark.parametrize("con_traslape", [True, False]) # Sin la columna (tablas anteriores) el traslape se calcula
+def test_bloques_unidos_quitan_el_traslape(con_traslape):
+    texto = documento(1)
+    fragmentos = fragmentos_de("a.txt", texto, con_traslape)
+    assert len(fragmentos) > 2
+    bloques = unir_fragmentos_contiguos(fragmentos)
+    assert len(bloques) == 1
+    assert sin_espacios(bloques[0]["texto"]) == sin_espacios(texto)
+    assert bloques[0]["ids"] == [f["id"] for f in fragmentos]
+    # El conteo del bloque se estima en proporción a los caracteres; sumar los traslapes agregaría 150 tokens por unión
+    assert abs(bloques[0]["num_tokens"] - contar_tokens(texto)) <= 0.01 * contar_tokens(texto)
+
+def test_no_contiguos_quedan_separados_y_en_orden_de_relevancia():
+    fragmentos = fragmentos_de("a.txt", documento(1)) + fragmentos_de("b.txt", documento(2))
+    recuperados = [fragmentos[0], fragmentos[-1], fragmentos[2], fragmentos[1]] # a0, b_ultimo, a2, a1
+    bloques = unir_fragmentos_contiguos(recuperados)
+    assert [(b["nombre_archivo_original"], b["indice_inicial"], b["indice_final"]) for b in bloques] == \
+        [("a.txt", 0, 2), ("b.txt", fragmentos[-1]["indice_fragmento_en_doc"], fragmentos[-1]["indice_fragmento_en_doc"])]
+
+@pytest.mark.parametrize("presupuesto", [150, 400, 900, 2000, 6000])
+def test_contexto_no_excede_el_presupuesto(presupuesto):
+    fragmentos = fragmentos_de("a.txt", documento(1))[:3] + fragmentos_de("b.txt", documento(2))[1:2] + fragmentos_de("c.txt", documento(3))[:1]
+    resumenes = {"a.txt": ("Resumen del decreto " * 40, contar_tokens("Resumen del decreto " * 40)), "b.txt": None}
+    contexto, tokens, bloques = empaquetar_contexto(fragmentos, resumenes, presupuesto)
+    assert bloques >= 1
+    assert tokens <= presupuesto - MARGEN_TOKENS_EMPAQUETADO
+    assert contar_tokens(contexto) <= presupuesto
+
+def test_todo_cabe_con_presupuesto_amplio():
+    fragmentos = fragmentos_de("a.txt", documento(1, palabras=200)) + fragmentos_de("b.txt", documento(2, palabras=200))
+    contexto, _, bloques = empaquetar_contexto(fragmentos, {"a.txt": ("Resumen A", 3)}, 100000)
+    assert bloques == 2
+    assert contexto.startswith("Resumen del documento 'a.txt':\nResumen A")
+    assert all(f["texto"] in contexto for f in fragmentos)
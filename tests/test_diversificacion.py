@@ -0,0 +1,50 @@
+import numpy as np
+from rag_dof.diversificacion import diversificar_fragmentos, num_candidatos_diversificacion, FACTOR_SOBREMUESTREO_MMR
+
+def candidato(id_fragmento: str, documento: str, score: float, vector) -> dict:
+    return {"id": id_fragmento, "nombre_archivo_original": documento, "_score_reranking": score, "vector": vector}
+
+def candidatos_con_copia():
+    return [candidato("a", "doc1.txt", 0.90, [1.0, 0.0, 0.0]),
+            candidato("a_copia", "doc1.txt", 0.88, [0.99, 0.05, 0.0]), # Fragmento contiguo que repite casi todo el texto
+            candidato("b", "doc2.txt", 0.70, [0.1, 1.0, 0.0]),
+            candidato("c", "doc3.txt", 0.20, [0.0, 0.0, 1.0])] # Los scores se normalizan a [0, 1]: este queda en 0
+
+def ids(filas):
+    return [fila["id"] for fila in filas]
+
+def test_mmr_prefiere_fragmento_distinto_a_casi_copia():
+    assert ids(diversificar_fragmentos(candidatos_con_copia(), 2, usar_mmr=True, max_por_documento=None)) == ["a", "b"]
+
+def test_sin_mmr_conserva_el_orden():
+    assert ids(diversificar_fragmentos(candidatos_con_copia(), 2, usar_mmr=False, max_por_documento=None)) == ["a", "a_copia"]
+
+def test_lambda_uno_es_solo_relevancia():
+    assert ids(diversificar_fragmentos(candidatos_con_copia(), 2, usar_mmr=True, max_por_documento=None, lambda_mmr=1.0)) == ["a", "a_copia"]
+
+def test_vectores_int8_con_escala():
+    candidatos = candidatos_con_copia()
+    for fila in candidatos:
+        vector = np.asarray(fila.pop("vector"))
+        fila["escala_vector"] = float(np.abs(vector).max() / 127)
+        fila["vector_int8"] = np.round(vector / fila["escala_vector"]).astype(np.int8)
+    assert ids(diversificar_fragmentos(candidatos, 2, usar_mmr=True, max_por_documento=None)) == ["a", "b"]
+
+def test_limite_por_documento():
+    rng = np.random.default_rng(0)
+    candidatos = [candidato(f"x{i}", "x.txt", 1.0 - i / 10, rng.standard_normal(8)) for i in range(5)]
+    candidatos += [candidato(f"y{i}", "y.txt", 0.4 - i / 10, rng.standard_normal(8)) for i in range(2)]
+    for usar_mmr in (False, True):
+        elegidos = diversificar_fragmentos(candidatos, 4, usar_mmr=usar_mmr, max_por_documento=2)
+        assert len(elegidos) == 4
+        assert sorted(fila["nombre_archivo_original"] for fila in elegidos) == ["x.txt", "x.txt", "y.txt", "y.txt"]
+    assert ids(diversificar_fragmentos(candidatos, 4, usar_mmr=False, max_por_documento=2)) == ["x0", "x1", "y0", "y1"]
+
+def test_limite_deja_menos_de_k_si_no_hay_mas_documentos():
+    candidatos = [candidato(f"x{i}", "x.txt", 1.0 - i / 10, [1.0, float(i)]) for i in range(5)]
+    assert ids(diversificar_fragmentos(candidatos, 3, usar_mmr=False, max_por_documento=1)) == ["x0"]
+
+def test_num_candidatos():
+    assert num_candidatos_diversificacion(5, usar_mmr=False, max_por_documento=None) == 5
+    assert num_candidatos_diversificacion(5, usar_mmr=True, max_por_documento=None) == 5 * FACTOR_SOBREMUESTREO_MMR
+    assert num_candidatos_diversificacion(5, usar_mmr=False, max_por_documento=2) == 5 * FACTOR_SOBREMUESTREO_MMR
@@ -0,0 +1,39 @@
+import numpy as np
+from rag_dof.duplicados import IndiceDuplicados, firma_minhash, shingles_de_texto, similitud_estimada
+
+PALABRAS = [f"termino{i}" for i in range(400)]
+
+def jaccard(texto_a: str, texto_b: str) -> float:
+    a, b = set(shingles_de_texto(texto_a).tolist()), set(shingles_de_texto(texto_b).tolist())
+    return len(a & b) / len(a | b)
+
+def texto_con_cambios(posiciones) -> str:
+    return " ".join(f"cambio{i}" if i in posiciones else p for i, p in enumerate(PALABRAS))
+
+def test_normaliza_acentos_y_mayusculas():
+    assert np.array_equal(firma_minhash("Artículo Único: se PUBLICA el decreto"), firma_minhash("articulo unico se publica el decreto"))
+    assert firma_minhash("  ...  ") is None
+
+def test_encuentra_casi_duplicado():
+    original, republicado = " ".join(PALABRAS), texto_con_cambios({100, 300})
+    assert 0.93 <= jaccard(original, republicado) <= 0.97
+    indice = IndiceDuplicados()
+    indice.agregar("original", firma_minhash(original))
+    encontrado = indice.buscar(firma_minhash(republicado))
+    assert encontrado is not None and encontrado[0] == "original"
+    assert abs(encontrado[1] - jaccard(original, republicado)) < 0.06
+
+def test_rechaza_texto_a_medias_parecido():
+    original, distinto = " ".join(PALABRAS), texto_con_cambios(set(range(134, 267)))
+    assert 0.45 <= jaccard(original, distinto) <= 0.55
+    assert abs(similitud_estimada(firma_minhash(original), firma_minhash(distinto)) - jaccard(original, distinto)) < 0.15
+    indice = IndiceDuplicados()
+    indice.agregar("original", firma_minhash(original))
+    assert indice.buscar(firma_minhash(distinto)) is None
+
+def test_gana_el_primero_indexado():
+    indice = IndiceDuplicados()
+    indice.agregar("primero", firma_minhash(" ".join(PALABRAS)))
+    indice.agregar("copia", firma_minhash(" ".join(PALABRAS)))
+    assert indice.buscar(firma_minhash(" ".join(PALABRAS))) == ("primero", 1.0)
+    assert len(indice) == 2
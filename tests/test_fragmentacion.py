@@ -0,0 +1,50 @@
+from rag_dof.fragmentacion import fragmentador_por_estructura, fragmentar_documento, PATRON_ENCABEZADO_DOF
+from rag_dof.tokenizador import contar_tokens
+
+def articulo(numero: int, parrafos: int = 1) -> str:
+    cuerpo = "\n".join(f"{chr(ord('I') + p)}. La dependencia {numero} publicará el padrón de beneficiarios del programa "
+                       f"correspondiente al ejercicio fiscal, con el monto asignado y la entidad federativa {p}."
+                       for p in range(parrafos))
+    return f"ARTÍCULO {numero}.- Se reforma la fracción {numero} del reglamento interior de la Secretaría.\n{cuerpo}"
+
+def traslapes_correctos(fragmentos):
+    """Cada fragmento con traslape repite exactamente el final del anterior."""
+    for (anterior, _), (texto, traslape) in zip(fragmentos, fragmentos[1:]):
+        if traslape: assert anterior.endswith(texto[:traslape])
+
+def test_encabezados_dof():
+    for encabezado in ("ARTÍCULO 5.- Texto", "Artículo 1o. Texto", "ARTÍCULO PRIMERO.- Texto", "CAPÍTULO I", "T R A N S I T O R I O S"):
+        assert PATRON_ENCABEZADO_DOF.match(encabezado), encabezado
+    assert not PATRON_ENCABEZADO_DOF.match("artículo 5. de la ley") # Referencia partida en minúsculas
+
+def test_corta_en_articulos():
+    articulos = [articulo(n, parrafos=3) for n in range(1, 6)]
+    tamano = max(contar_tokens(a) for a in articulos)
+    fragmentos = list(fragmentador_por_estructura("\n".join(articulos), chunk_size=tamano + 5, chunk_overlap=0))
+    assert [texto for texto, _ in fragmentos] == articulos
+    assert all(traslape == 0 for _, traslape in fragmentos)
+
+def test_junta_articulos_que_caben():
+    articulos = [articulo(n, parrafos=3) for n in range(1, 5)]
+    tamano = max(contar_tokens(a) for a in articulos)
+    fragmentos = list(fragmentador_por_estructura("\n".join(articulos), chunk_size=2 * tamano + 10, chunk_overlap=0))
+    assert len(fragmentos) == 2
+    assert fragmentos[0][0] == "\n".join(articulos[:2]) and fragmentos[1][0] == "\n".join(articulos[2:])
+
+def test_articulo_grande_se_parte_por_parrafos_con_traslape():
+    texto = articulo(1, parrafos=12)
+    tamano_parrafo = max(contar_tokens(p) for p in texto.split("\n"))
+    fragmentos = list(fragmentador_por_estructura(texto, chunk_size=4 * tamano_parrafo, chunk_overlap=2 * tamano_parrafo))
+    assert len(fragmentos) > 1
+    assert any(traslape for _, traslape in fragmentos[1:])
+    assert fragmentos[0][1] == 0
+    traslapes_correctos(fragmentos)
+    for texto_fragmento, _ in fragmentos: # Solo párrafos completos
+        assert all(linea in texto.split("\n") for linea in texto_fragmento.split("\n"))
+
+def test_modo_tokens_traslape_correcto():
+    texto = " ".join(f"palabra{i}" for i in range(5000))
+    fragmentos = list(fragmentar_documento(texto, modo="tokens"))
+    assert len(fragmentos) > 1 and fragmentos[0][1] == 0
+    assert all(traslape > 0 for _, traslape in fragmentos[1:])
+    traslapes_correctos(fragmentos)
@@ -0,0 +1,64 @@
+import asyncio
+from types import SimpleNamespace
+from rag_dof.generacion import OrquestadorRag, generar_respuesta_groq_stream
+
+def fila(id_fragmento: str, documento: str, texto: str) -> dict:
+    return {"id": id_fragmento, "nombre_archivo_original": documento, "indice_fragmento_en_doc": 0, "texto": texto,
+            "num_tokens": len(texto.split()), "_distance": 0.1}
+
+def crear_orquestador(resumenes_pedidos: list, **parametros) -> OrquestadorRag:
+    async def obtener_embedding(pregunta): return [1.0, 0.0]
+    async def buscar_vectorial(embedding, k, filtros): return [fila("a", "doc1.txt", "decreto uno"), fila("b", "doc2.txt", "decreto dos")][:k]
+    async def buscar_fts(pregunta, k, filtros): return [fila("c", "doc3.txt", "acuerdo tres")]
+    async def obtener_resumenes(nombres):
+        resumenes_pedidos.extend(nombres)
+        return {n: (f"resumen de {n}", 3) for n in nombres}
+    opciones = dict(k=2, modo_reranking="ninguno", num_candidatos_reranking=50, usar_mmr=False, max_fragmentos_por_documento=None,
+                    usar_rama_fts=True, num_resultados_fts=5, max_tokens_prompt=2000)
+    opciones.update(parametros)
+    return OrquestadorRag(obtener_embedding, buscar_vectorial, buscar_fts, obtener_resumenes, lambda pregunta, candidatos, k: candidatos[:k], **opciones)
+
+def test_orquestador_arma_prompt_con_fragmentos_y_resumenes():
+    pedidos = []
+    fragmentos, prompt, tokens, tiempos = asyncio.run(crear_orquestador(pedidos).consultar("¿Qué dice el decreto?"))
+    assert len(fragmentos) == 2 and tokens > 0
+    assert "¿Qué dice el decreto?" in prompt and "resumen de" in prompt
+    # Los resúmenes se piden una vez por documento, en cuanto llega cada lista de resultados
+    assert sorted(pedidos) == sorted(set(pedidos))
+    assert {"embedding", "busqueda_vectorial", "busqueda_fts", "reranking", "construccion_prompt"} <= set(tiempos)
+
+def test_orquestador_sin_rama_fts():
+    fragmentos, _, _, tiempos = asyncio.run(crear_orquestador([], usar_rama_fts=False).consultar("decreto"))
+    assert {f["id"] for f in fragmentos} == {"a", "b"} and "busqueda_fts" not in tiempos
+
+class CuotaDePrueba:
+    def __init__(self): self.turnos, self.liquidados = [], []
+    async def esperar_turno(self, tokens_prompt): self.turnos.append(tokens_prompt)
+    async def reiniciar(self): pass
+    def liquidar(self, tokens_usados): self.liquidados.append(tokens_usados)
+
+def cliente_groq(partes, error=None):
+    async def stream():
+        for parte in partes: yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=parte))])
+        if error: raise error
+    async def create(**_): return stream()
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+def consumir(cliente, cuota) -> str:
+    async def leer():
+        partes = []
+        async for parte in generar_respuesta_groq_stream(cliente, "prompt", 100, cuota, modelo="m", temperatura=0.0, max_tokens=10,
+                                                         max_reintentos=2, espera_reintento_segundos=0.0):
+            partes.append(parte)
+        return "".join(partes)
+    return asyncio.run(leer())
+
+def test_stream_liquida_prompt_y_respuesta():
+    cuota = CuotaDePrueba()
+    assert consumir(cliente_groq(["Hola", " mundo"]), cuota) == "Hola mundo"
+    assert cuota.turnos == [100] and len(cuota.liquidados) == 1 and cuota.liquidados[0] > 100
+
+def test_corte_a_mitad_no_reintenta():
+    cuota = CuotaDePrueba()
+    texto = consumir(cliente_groq(["Hola"], error=RuntimeError("conexión cerrada")), cuota)
+    assert texto.startswith("Hola") and "[Respuesta interrumpida" in texto
@@ -0,0 +1,58 @@
+import pytest
+from rag_dof import limites
+from rag_dof.limites import LimitadorPorMinuto, estado_rechazo_admision, segundos_hasta_cuota
+
+INICIO = 1000.0
+LIMITE_SOLICITUDES, LIMITE_TOKENS = 30, 6000
+
+def espera(solicitudes_usadas, tokens_usados, tokens_delante, tokens, segundos_transcurridos=20.0):
+    return segundos_hasta_cuota(INICIO, solicitudes_usadas, tokens_usados, tokens_delante, tokens,
+                                LIMITE_SOLICITUDES, LIMITE_TOKENS, ahora=INICIO + segundos_transcurridos)
+
+def test_sin_uso_ni_cola_no_espera():
+    assert espera(0, 0, [], 5000) == 0.0
+
+def test_cabe_en_el_minuto_actual():
+    assert espera(1, 1000, [], 2000) == 0.0
+    assert espera(1, 1000, [], 5000) == 0.0 # Justo el límite
+    assert espera(1, 1000, [2000], 3000) == 0.0
+
+def test_excede_el_minuto_actual():
+    assert espera(1, 1000, [], 5001) == pytest.approx(40.0)
+    assert espera(1, 5000, [], 2000, segundos_transcurridos=55.0) == pytest.approx(5.0)
+    assert espera(1, 5000, [], 2000, segundos_transcurridos=75.0) == 0.0 # El minuto ya terminó
+
+def test_cuenta_lo_que_espera_delante_en_minutos_completos():
+    assert espera(1, 0, [6000, 6000], 100) == pytest.approx(40.0 + 60.0)
+    assert espera(1, 3000, [3000, 6000, 6000], 6000) == pytest.approx(40.0 + 2 * 60.0) # 24000 tokens: cuarto minuto
+
+def test_limite_de_solicitudes():
+    assert espera(LIMITE_SOLICITUDES - 1, 0, [], 10) == 0.0
+    assert espera(LIMITE_SOLICITUDES, 0, [], 10) == pytest.approx(40.0)
+    assert espera(LIMITE_SOLICITUDES - 1, 0, [10] * (LIMITE_SOLICITUDES + 1), 10) == pytest.approx(40.0 + 60.0)
+
+@pytest.mark.parametrize("pendientes, espera_estimada, esperado", [
+    (0, 0.0, None),
+    (9, 30.0, None), # Espera igual al plazo: se admite
+    (10, 0.0, 429), # Cola llena
+    (10, 100.0, 429), # Cola llena tiene prioridad sobre el plazo
+    (9, 30.01, 503),
+    (0, 90.0, 503),
+])
+def test_estado_rechazo_admision(pendientes, espera_estimada, esperado):
+    assert estado_rechazo_admision(pendientes, max_en_cola=10, espera=espera_estimada, plazo=30.0) == esperado
+
+def test_limitador_espera_fin_de_minuto(monkeypatch):
+    reloj = {"ahora": INICIO}
+    monkeypatch.setattr(limites.time, "time", lambda: reloj["ahora"])
+    monkeypatch.setattr(limites.time, "sleep", lambda segundos: reloj.update(ahora=reloj["ahora"] + segundos))
+    limitador = LimitadorPorMinuto("prueba")
+    limitador.esperar_turno(4000, LIMITE_SOLICITUDES, LIMITE_TOKENS)
+    limitador.registrar(4000)
+    reloj["ahora"] += 10
+    limitador.esperar_turno(2000, LIMITE_SOLICITUDES, LIMITE_TOKENS) # 6000: cabe
+    assert reloj["ahora"] == INICIO + 10
+    limitador.registrar(2000)
+    limitador.esperar_turno(1, LIMITE_SOLICITUDES, LIMITE_TOKENS)
+    assert reloj["ahora"] == pytest.approx(INICIO + limites.SEGUNDOS_VENTANA + limites.MARGEN_CAMBIO_MINUTO_SEGUNDOS)
+    assert (limitador.solicitudes, limitador.tokens) == (0, 0)
@@ -0,0 +1,38 @@
+import time
+import threading
+from rag_dof import reranking
+from rag_dof.reranking import cargar_reranker, reordenar_fragmentos
+
+def candidatos(n: int):
+    return [{"id": f"c{i}", "texto": f"texto {i}"} for i in range(n)]
+
+def test_carga_concurrente_crea_un_solo_modelo(monkeypatch):
+    cargas = []
+    def crear_lento(modo):
+        cargas.append(modo); time.sleep(0.05)
+        return lambda pregunta, textos: [0.0] * len(textos)
+    monkeypatch.setattr(reranking, "_rerankers_cargados", {})
+    monkeypatch.setattr(reranking, "_crear_reranker", crear_lento)
+    hilos = [threading.Thread(target=cargar_reranker, args=("cross_encoder",)) for _ in range(8)]
+    for hilo in hilos: hilo.start()
+    for hilo in hilos: hilo.join()
+    assert cargas == ["cross_encoder"]
+
+def test_puntua_todo_dentro_del_presupuesto(monkeypatch):
+    # Score = número del texto: el orden final invierte el ANN
+    puntuar = lambda pregunta, textos: [float(t.split()[1]) for t in textos]
+    monkeypatch.setattr(reranking, "_rerankers_cargados", {"cross_encoder": puntuar})
+    filas = reordenar_fragmentos("p", candidatos(10), 3, "cross_encoder", presupuesto_ms=5000, tamano_lote=4)
+    assert [f["id"] for f in filas] == ["c9", "c8", "c7"]
+
+def test_presupuesto_se_revisa_entre_lotes(monkeypatch):
+    lotes = []
+    def puntuar_lento(pregunta, textos):
+        lotes.append(len(textos)); time.sleep(0.06)
+        return [float(t.split()[1]) for t in textos]
+    monkeypatch.setattr(reranking, "_rerankers_cargados", {"cross_encoder": puntuar_lento})
+    filas = reordenar_fragmentos("p", candidatos(20), 20, "cross_encoder", presupuesto_ms=100, tamano_lote=4)
+    # El segundo lote no terminaría a tiempo: no se empieza, y no queda ningún hilo puntuando en segundo plano
+    assert lotes == [4]
+    assert [f["id"] for f in filas[:5]] == ["c3", "c2", "c1", "c0", "c4"]
+    assert "_score_reranking" not in filas[4]